@@ -37,10 +37,18 @@ claude_path = os.path.join(current_dir, "claude.py")
 # Import the claude module with better error handling
 try:
     if os.path.exists(claude_path):
-        # Import directly from file path to ensure correct resolution
-        spec = importlib.util.spec_from_file_location("claude", claude_path)
+        # Import directly from file path to ensure correct resolution. The module
+        # is registered as Structify.claude before it runs so that pickle can
+        # resolve its functions by name (process pools submit them by reference).
+        module_name = f"{__name__}.claude"
+        spec = importlib.util.spec_from_file_location(module_name, claude_path)
         claude = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(claude)
+        sys.modules[module_name] = claude
+        try:
+            spec.loader.exec_module(claude)
+        except BaseException:
+            sys.modules.pop(module_name, None)
+            raise
         logger.info("Successfully imported claude.py from Structify package")
     else:
         # Try normal import if file not found at expected location
@@ -70,6 +78,9 @@ if claude:
         
     if hasattr(claude, 'process_all_files'):
         process_all_files = claude.process_all_files
+
+    if hasattr(claude, 'ProcessingManifest'):
+        ProcessingManifest = claude.ProcessingManifest
         
     # Export default constants
     if hasattr(claude, 'DEFAULT_STOP_WORDS'):
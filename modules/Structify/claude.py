@@ -1,20 +1,25 @@
 import os
 import sys
+import gc
 import json
 import time
 import logging
 import re
 import hashlib
 import tempfile
+import uuid
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-from typing import Optional, Tuple, Dict, List, Set, Any, Union, Callable
-from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Optional, Tuple, Dict, List, Set, Any, Union, Callable, Iterator
+from collections import Counter, deque
 from dataclasses import dataclass, field, asdict
 from pathlib import Path
 from functools import lru_cache
 import threading
 import traceback
+import sqlite3
+import codecs
+import zlib
 # -----------------------------------------------------------------------------
 # LOGGING SETUP
 # -----------------------------------------------------------------------------
@@ -107,13 +112,23 @@ BINARY_SIGNATURES = {
 # Performance tuning parameters
 DEFAULT_PROCESS_TIMEOUT = 600  # seconds
 DEFAULT_MEMORY_LIMIT = 1024 * 1024 * 1024  # 1GB - avoid OOM issues
+STREAM_READ_THRESHOLD = 64 * 1024 * 1024  # Larger text files are decoded and chunked as a stream
+STREAM_BUFFER_SIZE = 1024 * 1024           # Bytes read per block when streaming
+STREAM_DOC_BATCH = 256                     # Streamed documents handed to the output per batch
+ENCODING_SAMPLE_SIZE = 64 * 1024           # Prefix bytes inspected to detect a file's encoding
 OCR_RESOLUTION = 300           # DPI for OCR
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB - skip larger files by default
 MAX_PDF_PAGES = 1000           # Skip PDFs with more pages than this
+PIPELINE_QUEUE_FACTOR = 4      # In-flight files per worker in process_all_files
 
 # Cache file with timestamp for better identification
 CACHE_FILE = f"processed_cache_{datetime.now().strftime('%Y%m%d')}.json"
 
+# Persistent manifest for incremental runs (not date-stamped so it survives across days)
+MANIFEST_FILE = "structify_manifest.db"
+MANIFEST_COMMIT_INTERVAL = 500  # Records between SQLite commits
+MANIFEST_SCHEMA_VERSION = 1     # Part of every row's config key; bump when the chunk output format changes
+
 # Enhanced keyword lists with PDF-specific terms
 WORD_PATTERN = re.compile(r"\b[A-Za-z0-9_]+\b")
 FILE_TYPE_KEYWORDS: Dict[str, Set[str]] = {
@@ -173,7 +188,8 @@ OCR_CONFIG = {
     "timeout": 60,      # Maximum time for OCR processing per page (seconds)
     "resolution": 300,  # DPI for OCR
     "cleanup_delay": 1, # Seconds to wait before cleaning up temp files
-    "temp_dir": TEMP_OCR_DIR  # Add this line to explicitly set temp directory
+    "temp_dir": TEMP_OCR_DIR,  # Add this line to explicitly set temp directory
+    "max_workers": os.cpu_count() or 1  # Upper bound on parallel OCR processes
 }
 os.environ["TESSDATA_PREFIX"] = TEMP_OCR_DIR  # Set environment variable for Tesseract
 section_name_cache: Dict[str, str] = {}
@@ -258,66 +274,284 @@ def initialize_ocr_environment():
             return False
     return False
 
+# OCR text layout shared with pdf_extractor (lives next to the Structify package)
+try:
+    from ocr_text import tesseract_data_to_text
+except ImportError:
+    def tesseract_data_to_text(data: Dict[str, List[Any]]) -> Tuple[str, float]:
+        """Fallback when ocr_text is not on the path: one line per tesseract line, no paragraph breaks."""
+        lines: Dict[Tuple[int, ...], List[str]] = {}
+        confidences = []
+        for i, word in enumerate(data.get("text", [])):
+            try:
+                conf = float(data["conf"][i])
+            except (TypeError, ValueError):
+                conf = -1.0
+            if conf >= 0:
+                confidences.append(conf)
+            if word and str(word).strip():
+                key = (data["page_num"][i], data["block_num"][i], data["par_num"][i], data["line_num"][i])
+                lines.setdefault(key, []).append(str(word))
+        text = "\n".join(" ".join(words) for words in lines.values())
+        return text, sum(confidences) / len(confidences) if confidences else 0.0
+
+try:
+    from ocr_cache import ocr_cache_key, get_ocr_cache, configure_ocr_cache, ocr_cache_settings
+except ImportError:
+    get_ocr_cache = None
+
+
+def build_tesseract_config(psm: int = 3, dpi: Optional[int] = None) -> str:
+    """Tesseract command-line options using the bundled tessdata directory."""
+    config = f'--tessdata-dir "{os.path.join(TEMP_OCR_DIR, "tessdata")}" --oem 1 --psm {psm}'
+    if dpi:
+        config += f" --dpi {dpi}"
+    return config
+
+
+def preprocess_ocr_image(gray, method: str = "otsu"):
+    """
+    Clean up a grayscale page image in memory before OCR.
+
+    Args:
+        gray: 2-D uint8 numpy array
+        method: "otsu" (denoise, then global threshold) or "adaptive"
+            (local threshold, then denoise; better for uneven scans)
+
+    Returns:
+        Binarised numpy array with a 10px white border
+    """
+    import cv2
+
+    if method == "adaptive":
+        binary = cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 21, 12
+        )
+        cleaned = cv2.fastNlMeansDenoising(binary, None, 10, 7, 21)
+    else:
+        denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+        _, cleaned = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    # Add border to avoid edge text loss
+    return cv2.copyMakeBorder(cleaned, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=255)
+
+
+def ocr_image_array(image, language: str = 'eng', config: Optional[str] = None) -> Dict[str, Any]:
+    """
+    OCR an in-memory image with a single tesseract run.
+
+    Args:
+        image: numpy array (grayscale or RGB) or PIL image
+        language: Tesseract language code
+        config: Extra tesseract options (defaults to build_tesseract_config())
+
+    Returns:
+        Dict with "text" and "confidence"
+    """
+    import pytesseract
+    from PIL import Image
+
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(image)
+    data = pytesseract.image_to_data(
+        image, lang=language, config=config or build_tesseract_config(),
+        output_type=pytesseract.Output.DICT
+    )
+    text, confidence = tesseract_data_to_text(data)
+    return {"text": text, "confidence": confidence}
+
+
+def cached_ocr(pixels, language: str, config: str, run: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Serve an OCR result from the persistent OCR cache, or compute and store it.
+
+    Args:
+        pixels: numpy array of the image as rendered, before any preprocessing
+        language: Tesseract language code
+        config: Tesseract options plus the preprocessing applied by run
+        run: Callable performing the OCR, returning at least "text" and "confidence"
+
+    Returns:
+        The OCR result with "cached" set to whether it came from the cache
+    """
+    cache = get_ocr_cache() if get_ocr_cache else None
+    if cache is None:
+        result = run()
+        result["cached"] = False
+        return result
+
+    import numpy as np
+    pixels = np.ascontiguousarray(pixels)
+    key = ocr_cache_key(pixels, pixels.shape[1], pixels.shape[0], language, f"{config}|{pixels.ndim}")
+    cached = cache.get(key)
+    if cached is not None:
+        cached["cached"] = True
+        return cached
+
+    result = run()
+    cache.put(key, {k: v for k, v in result.items() if k != "ocr_time"})
+    result["cached"] = False
+    return result
+
+
+def render_page_array(page, zoom: float = 2.0):
+    """Rasterize a PyMuPDF page straight into a grayscale numpy array (no image file)."""
+    import fitz
+    import numpy as np
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width].copy()
+
+
+# Open document reused by consecutive pages handled in the same OCR worker process
+_ocr_worker_doc: Dict[str, Any] = {"path": None, "doc": None}
+
+
+def _ocr_pdf_page(file_path: str, page_idx: int, language: str, zoom: float,
+                  preprocess: Optional[str], config: str,
+                  cache_settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Render, preprocess and OCR one page; runs in OCR pool workers or in-process."""
+    import fitz
+
+    start = time.time()
+    # Spawned workers do not inherit the parent's cache configuration
+    if cache_settings and get_ocr_cache and cache_settings != ocr_cache_settings():
+        configure_ocr_cache(**cache_settings)
+    if _ocr_worker_doc["path"] != file_path:
+        if _ocr_worker_doc["doc"] is not None:
+            _ocr_worker_doc["doc"].close()
+        _ocr_worker_doc["doc"] = fitz.open(file_path)
+        _ocr_worker_doc["path"] = file_path
+
+    image = render_page_array(_ocr_worker_doc["doc"][page_idx], zoom)
+
+    def run():
+        processed = image
+        preprocessing_applied = False
+        if preprocess:
+            try:
+                processed = preprocess_ocr_image(image, preprocess)
+                preprocessing_applied = True
+            except ImportError:
+                pass
+        result = ocr_image_array(processed, language, config)
+        result["preprocessing_applied"] = preprocessing_applied
+        return result
+
+    result = cached_ocr(image, language, f"{config}|{preprocess}", run)
+    result.update({
+        "page_idx": page_idx,
+        "ocr_time": time.time() - start
+    })
+    return result
+
+
+def ocr_pdf_pages(file_path: str, page_indices: List[int], language: Optional[str] = None,
+                  zoom: float = 2.0, preprocess: Optional[str] = "otsu",
+                  max_workers: Optional[int] = None, config: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    OCR PDF pages entirely in memory, in parallel across a bounded process pool.
+
+    Each page is rasterized into a numpy buffer, preprocessed with OpenCV when
+    available and recognised with one tesseract run that yields both text and
+    confidences. No page images are written to disk.
+
+    Args:
+        file_path: Path to the PDF file
+        page_indices: 0-based pages to OCR
+        language: Tesseract language (defaults to OCR_CONFIG["language"])
+        zoom: Rasterization zoom factor (2.0 = 144 DPI)
+        preprocess: "otsu", "adaptive" or None to skip preprocessing
+        max_workers: Pool size (defaults to OCR_CONFIG["max_workers"])
+        config: Extra tesseract options
+
+    Returns:
+        Dict mapping page index to {"text", "confidence", "ocr_time", ...}, or
+        {"error": ...} for pages that failed
+    """
+    import multiprocessing
+
+    language = language or OCR_CONFIG["language"]
+    config = config or build_tesseract_config()
+    cache_settings = ocr_cache_settings() if get_ocr_cache else None
+    workers = min(max_workers or OCR_CONFIG["max_workers"], len(page_indices))
+    results: Dict[int, Dict[str, Any]] = {}
+
+    # Don't nest pools inside process_all_files workers
+    if workers > 1 and multiprocessing.parent_process() is None:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(_ocr_pdf_page, file_path, idx, language, zoom, preprocess, config,
+                                    cache_settings): idx
+                    for idx in page_indices
+                }
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        logger.warning(f"OCR error on page {idx+1}: {e}")
+                        results[idx] = {"page_idx": idx, "error": str(e)}
+            failed = sum(1 for r in results.values() if "error" in r)
+            if not failed:
+                return results
+            logger.warning(f"OCR pool failed on {failed}/{len(page_indices)} pages of {file_path}, "
+                           f"retrying them in-process")
+        except Exception as e:
+            logger.warning(f"OCR process pool failed, continuing in-process: {e}")
+
+    # Sequential path; also retries pages the pool could not handle
+    try:
+        for idx in page_indices:
+            if idx in results and "error" not in results[idx]:
+                continue
+            try:
+                results[idx] = _ocr_pdf_page(file_path, idx, language, zoom, preprocess, config, cache_settings)
+            except Exception as e:
+                logger.warning(f"OCR error on page {idx+1}: {e}")
+                results[idx] = {"page_idx": idx, "error": str(e)}
+    finally:
+        if _ocr_worker_doc["doc"] is not None:
+            _ocr_worker_doc["doc"].close()
+            _ocr_worker_doc.update(path=None, doc=None)
+    return results
+
+
 def enhanced_ocr_processing(image_path, language='eng'):
     """
     Enhanced OCR processing with image preprocessing for better results.
+
+    Preprocessing happens in memory and a single tesseract run provides both
+    the text and the confidence. image_path may also be a numpy array.
     """
     try:
         import cv2
-        import numpy as np
-        from PIL import Image
-        import pytesseract
-        
-        # Read the image
-        img = cv2.imread(image_path)
-        
-        # Image preprocessing pipeline
-        # 1. Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # 2. Remove noise
-        denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
-        
-        # 3. Threshold to binary
-        _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # 4. Add border to avoid edge text loss
-        bordered = cv2.copyMakeBorder(binary, 10, 10, 10, 10, cv2.BORDER_CONSTANT, value=[255, 255, 255])
-        
-        # Save the preprocessed image
-        preprocessed_path = f"{os.path.splitext(image_path)[0]}_preprocessed.png"
-        cv2.imwrite(preprocessed_path, bordered)
-        
-        # Use Tesseract on preprocessed image with optimized settings
-        config = f'--tessdata-dir "{os.path.join(TEMP_OCR_DIR, "tessdata")}" --oem 1 --psm 3 -l {language}'
-        text = pytesseract.image_to_string(Image.open(preprocessed_path), config=config)
-        
-        # Also get confidence data
-        data = pytesseract.image_to_data(Image.open(preprocessed_path), config=config, output_type=pytesseract.Output.DICT)
-        
-        # Calculate average confidence
-        confidences = [conf for conf in data['conf'] if conf != -1]
-        avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-        
-        # Clean up the preprocessed image
-        safely_remove_file(preprocessed_path)
-        
-        return {
-            "text": text,
-            "confidence": avg_confidence,
-            "preprocessing_applied": True
-        }
+
+        if isinstance(image_path, (str, os.PathLike)):
+            img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                raise ValueError(f"Could not read image {image_path}")
+        else:
+            img = image_path if image_path.ndim == 2 else cv2.cvtColor(image_path, cv2.COLOR_BGR2GRAY)
+
+        result = cached_ocr(
+            img, language, f"{build_tesseract_config()}|otsu",
+            lambda: ocr_image_array(preprocess_ocr_image(img, "otsu"), language)
+        )
+        result["preprocessing_applied"] = True
+        return result
         
     except Exception as e:
         logger.error(f"Enhanced OCR processing failed: {e}")
         
         # Try fallback with basic OCR
         try:
-            import pytesseract
             from PIL import Image
-            text = pytesseract.image_to_string(Image.open(image_path))
+            image = Image.open(image_path) if isinstance(image_path, (str, os.PathLike)) else image_path
+            result = ocr_image_array(image, language)
             return {
-                "text": text,
+                "text": result["text"],
                 "confidence": 0.0,
                 "preprocessing_applied": False
             }
@@ -618,7 +852,10 @@ def process_pdf(
     timeout: int = DEFAULT_PROCESS_TIMEOUT,
     memory_limit: int = DEFAULT_MEMORY_LIMIT,
     progress_callback: Optional[Callable[[float, str], None]] = None,
-    cancellation_event: Optional[threading.Event] = None
+    cancellation_event: Optional[threading.Event] = None,
+    max_chunk_tokens: int = 0,
+    overlap_tokens: int = 0,
+    tokenizer_name: Optional[str] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Process a PDF file with enhanced features, robust error handling, progress reporting,
@@ -635,6 +872,9 @@ def process_pdf(
         memory_limit: Memory limit for processing in bytes
         progress_callback: Optional callback for progress reporting
         cancellation_event: Optional event to signal cancellation
+        max_chunk_tokens: If set, chunk to this token budget instead of max_chunk_size characters
+        overlap_tokens: Token overlap between chunks when max_chunk_tokens is set
+        tokenizer_name: Tokenizer for token chunking (see TokenCounter)
         
     Returns:
         Optional[Dict[str, Any]]: Processed data if return_data=True, otherwise None
@@ -728,13 +968,21 @@ def process_pdf(
                 if progress_callback:
                     progress_callback(10, "Extracting with pdf_extractor")
                 
+                token_options = {}
+                if max_chunk_tokens:
+                    token_options = {
+                        "max_chunk_tokens": max_chunk_tokens,
+                        "overlap_tokens": overlap_tokens,
+                        "tokenizer_name": tokenizer_name
+                    }
                 result = pdf_extractor.process_pdf(
                     pdf_path=pdf_path,
                     output_path=None,  # Don't write to file yet
                     max_chunk_size=max_chunk_size,
                     extract_tables=extract_tables,
                     use_ocr=use_ocr,
-                    return_data=True  # Always get data for enhancement
+                    return_data=True,  # Always get data for enhancement
+                    **token_options
                 )
                 
                 # Check for cancellation
@@ -986,10 +1234,17 @@ def process_pdf(
         
         # 9. Use intelligent chunking with full content preservation
         update_progress(1, "Creating intelligent chunks")
-        chunks = chunk_document_intelligently(pdf_doc, max_chunk_size, 200)  # Increased overlap for better continuity
+        if max_chunk_tokens:
+            counter = get_token_counter(tokenizer_name)
+            chunks = [
+                {"content": text[s:e], "metadata": {"chunk_type": "token_based", "tokenizer": counter.name}}
+                for s, e in iter_token_chunk_spans(text, max_chunk_tokens, counter, overlap_tokens)
+            ]
+        else:
+            chunks = chunk_document_intelligently(pdf_doc, max_chunk_size, 200)  # Increased overlap for better continuity
         
         # 10. Generate stop words hash for tag generation
-        stop_hash = hashlib.md5(str(sorted(DEFAULT_STOP_WORDS)).encode()).hexdigest()
+        stop_hash = get_stop_words_hash(DEFAULT_STOP_WORDS)
         
         # 11. Create DocData objects with robust error handling
         update_progress(1, "Creating DocData objects")
@@ -1003,7 +1258,7 @@ def process_pdf(
             for chunk in chunks
         )
         
-        if not has_full_content and text:
+        if not has_full_content and text and not max_chunk_tokens:
             # Add a full content chunk at the beginning
             chunks.insert(0, {
                 "content": text,
@@ -1387,7 +1642,10 @@ def process_pdf_safely(
     file_path: str,
     root_directory: str,
     stats_obj,  # Remove the type annotation to avoid circular import
-    max_chunk_size: int
+    max_chunk_size: int,
+    max_chunk_tokens: int = 0,
+    overlap_tokens: int = 0,
+    tokenizer_name: Optional[str] = None
 ) -> Optional[Tuple[str, List["DocData"]]]:  # Use string annotation for DocData
     """
     Process a PDF file with enhanced error recovery and improved output formatting.
@@ -1398,6 +1656,9 @@ def process_pdf_safely(
         root_directory: Root directory for relative path
         stats_obj: Statistics object to update
         max_chunk_size: Maximum chunk size
+        max_chunk_tokens: If set, chunk to this token budget (passed to pdf_extractor)
+        overlap_tokens: Token overlap between chunks in token mode
+        tokenizer_name: Tokenizer for token mode
     
     Returns:
         Tuple of (primary_library, list_of_docdata) or None if processing failed
@@ -1431,13 +1692,21 @@ def process_pdf_safely(
                 )
                 
                 # Process with pdf_extractor
+                token_options = {}
+                if max_chunk_tokens:
+                    token_options = {
+                        "max_chunk_tokens": max_chunk_tokens,
+                        "overlap_tokens": overlap_tokens,
+                        "tokenizer_name": tokenizer_name
+                    }
                 result = pdf_extractor.process_pdf(
                     pdf_path=file_path,
                     output_path=temp_output,
                     max_chunk_size=max_chunk_size,
                     extract_tables=True,
                     use_ocr=True,
-                    return_data=True
+                    return_data=True,
+                    **token_options
                 )
                 
                 # Check if processing was cancelled
@@ -1508,7 +1777,7 @@ def process_pdf_safely(
                         # Generate tags if the function is available
                         tags = set()
                         if 'generate_smart_tags' in globals() and 'DEFAULT_STOP_WORDS' in globals():
-                            stop_hash = hashlib.md5(str(sorted(DEFAULT_STOP_WORDS)).encode()).hexdigest()
+                            stop_hash = get_stop_words_hash(DEFAULT_STOP_WORDS)
                             tags = generate_smart_tags(
                                 section_name,
                                 content,
@@ -1699,7 +1968,19 @@ def process_pdf_safely(
             pdf_doc = None
             chunks = []
             
-            if 'PDFDocument' in globals():
+            if max_chunk_tokens:
+                # Token-budget chunks so the output can go straight to an embedding model
+                counter = get_token_counter(tokenizer_name)
+                for s, e in iter_token_chunk_spans(txt, max_chunk_tokens, counter, overlap_tokens):
+                    chunks.append({
+                        "content": txt[s:e],
+                        "metadata": {
+                            "chunk_index": len(chunks),
+                            "chunk_type": "token_based",
+                            "tokenizer": counter.name
+                        }
+                    })
+            elif 'PDFDocument' in globals():
                 pdf_doc = PDFDocument(
                     file_path=file_path,
                     full_text=txt,
@@ -1755,7 +2036,7 @@ def process_pdf_safely(
             # Prepare tags if available
             tags = set()
             if 'generate_smart_tags' in globals() and 'DEFAULT_STOP_WORDS' in globals():
-                stop_hash = hashlib.md5(str(sorted(DEFAULT_STOP_WORDS)).encode()).hexdigest()
+                stop_hash = get_stop_words_hash(DEFAULT_STOP_WORDS)
                 tags = generate_smart_tags(sec_name, txt, stop_hash, file_path, doc_type, language)
             
             # Always include a full content chunk first
@@ -1854,7 +2135,7 @@ def process_pdf_safely(
                 # Generate tags if the function is available
                 chunk_tags = set()
                 if 'generate_smart_tags' in globals() and 'DEFAULT_STOP_WORDS' in globals():
-                    stop_hash = hashlib.md5(str(sorted(DEFAULT_STOP_WORDS)).encode()).hexdigest()
+                    stop_hash = get_stop_words_hash(DEFAULT_STOP_WORDS)
                     chunk_tags = generate_smart_tags(sec_name, chunk_content, stop_hash, file_path, doc_type, language)
                 
                 try:
@@ -2089,7 +2370,7 @@ def process_document(
         # Generate DocData objects
         docdatas = []
         total_chunks = len(chunks)
-        stop_hash = hashlib.md5(str(sorted(DEFAULT_STOP_WORDS)).encode()).hexdigest()
+        stop_hash = get_stop_words_hash(DEFAULT_STOP_WORDS)
         
         # Always include a full content chunk first
         full_dd = DocData(
@@ -2283,9 +2564,6 @@ def process_scanned_pdf(file_path: str) -> Dict[str, Any]:
         "page_details": []
     }
     
-    # Track temp files for cleanup
-    temp_files = []
-    
     try:
         # Check if OCR capabilities are available
         if not USE_OCR:
@@ -2315,14 +2593,20 @@ def process_scanned_pdf(file_path: str) -> Dict[str, Any]:
         try:
             import fitz  # PyMuPDF
             import pytesseract
-            from PIL import Image
-            import cv2
             import numpy as np
             
             # Configure Tesseract with language and optimization settings
-            tessconfig = f"--tessdata-dir {tessdata_dir} --dpi 300 --oem 1 --psm 3"
+            tessconfig = build_tesseract_config(dpi=300)
             logger.info(f"Using Tesseract config: {tessconfig}")
             
+            # Determine if we'll use enhanced OCR (attempt to detect cv2 availability)
+            try:
+                import cv2
+                use_enhanced_ocr = True
+                logger.info("Using enhanced OCR with image preprocessing")
+            except ImportError:
+                use_enhanced_ocr = False
+            
             with fitz.open(file_path) as doc:
                 # Process a reasonable number of pages (limit for large documents)
                 total_pages = len(doc)
@@ -2331,163 +2615,75 @@ def process_scanned_pdf(file_path: str) -> Dict[str, Any]:
                 if total_pages > max_pages_to_process:
                     logger.warning(f"Document has {total_pages} pages; limiting OCR to first {max_pages_to_process} pages")
                 
-                # Prepare for text extraction
-                text_content = []
-                ocr_applied_pages = 0
-                skipped_pages = 0
-                total_confidence = 0.0
-                page_confidences = []
-                
-                # Determine if we'll use enhanced OCR (attempt to detect cv2 availability)
-                use_enhanced_ocr = 'cv2' in sys.modules
-                if use_enhanced_ocr:
-                    logger.info("Using enhanced OCR with image preprocessing")
+                # Check which pages already have text content
+                page_texts = [doc[page_idx].get_text() for page_idx in range(max_pages_to_process)]
+            
+            # Pages with substantial text are used directly (no OCR needed)
+            ocr_pages = [idx for idx, page_text in enumerate(page_texts)
+                         if len(page_text.strip()) < 150]  # Threshold for "enough text"
+            if ocr_pages:
+                logger.info(f"{len(ocr_pages)} pages appear to be scanned. Applying OCR.")
+            
+            # Render and OCR the scanned pages in memory across the OCR pool
+            ocr_results = ocr_pdf_pages(
+                file_path, ocr_pages,
+                zoom=2.0,  # 2x resolution: better accuracy without excessive memory
+                preprocess="adaptive" if use_enhanced_ocr else None,
+                config=tessconfig
+            ) if ocr_pages else {}
+            
+            # Prepare for text extraction
+            text_content = []
+            ocr_applied_pages = 0
+            skipped_pages = 0
+            total_confidence = 0.0
+            page_confidences = []
+            
+            for page_idx, page_text in enumerate(page_texts):
+                page_detail = {
+                    "page_number": page_idx + 1,
+                    "ocr_applied": False,
+                    "text_length": len(page_text),
+                    "confidence": None
+                }
                 
-                # Process each page in range
-                for page_idx in range(max_pages_to_process):
-                    page = doc[page_idx]
+                ocr_result = ocr_results.get(page_idx)
+                if ocr_result is not None and "ocr_time" in ocr_result:
+                    page_detail["ocr_time"] = round(ocr_result["ocr_time"], 3)
+                    page_detail["ocr_cached"] = ocr_result.get("cached", False)
+                if ocr_result is None:
+                    text_content.append(page_text)
+                    skipped_pages += 1
+                    page_detail["extraction_method"] = "direct_extraction"
+                elif "error" in ocr_result:
+                    # Fallback to using whatever text we got from direct extraction
+                    text_content.append(page_text)
+                    page_detail["extraction_method"] = "ocr_error_fallback"
+                elif ocr_result["text"].strip():
+                    # OCR returned text
+                    ocr_text = ocr_result["text"]
+                    page_confidence = ocr_result["confidence"]
+                    text_content.append(ocr_text)
+                    total_confidence += page_confidence
+                    ocr_applied_pages += 1
                     
-                    # Check if page already has text content
-                    page_text = page.get_text()
-                    page_detail = {
-                        "page_number": page_idx + 1,
-                        "ocr_applied": False,
-                        "text_length": len(page_text),
-                        "confidence": None
-                    }
-                    
-                    # If page has substantial text, use it directly (no OCR needed)
-                    if len(page_text.strip()) >= 150:  # Threshold for "enough text"
-                        text_content.append(page_text)
-                        skipped_pages += 1
-                        page_detail["extraction_method"] = "direct_extraction"
-                        result["page_details"].append(page_detail)
-                        continue
-                    
-                    # Page needs OCR - render to image
-                    logger.info(f"Page {page_idx+1} appears to be scanned. Applying OCR.")
-                    
-                    # Create a unique filename in job temp directory
-                    img_filename = f"page_{page_idx}_{uuid.uuid4().hex}.png"
-                    img_path = os.path.join(job_temp_dir, img_filename)
-                    temp_files.append(img_path)
-                    
-                    # Higher resolution for better OCR accuracy (but not too high to avoid memory issues)
-                    zoom_factor = 2.0  # 2x zoom = 2x resolution
-                    matrix = fitz.Matrix(zoom_factor, zoom_factor)
-                    pix = page.get_pixmap(matrix=matrix)
-                    pix.save(img_path)
-                    
-                    try:
-                        # Apply OCR with appropriate preprocessing
-                        if use_enhanced_ocr:
-                            # Enhanced OCR with preprocessing pipeline
-                            img = cv2.imread(img_path)
-                            
-                            # Image preprocessing pipeline
-                            # 1. Convert to grayscale
-                            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                            
-                            # 2. Apply adaptive thresholding
-                            binary = cv2.adaptiveThreshold(
-                                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                cv2.THRESH_BINARY, 21, 12
-                            )
-                            
-                            # 3. Denoise
-                            denoised = cv2.fastNlMeansDenoising(binary, None, 10, 7, 21)
-                            
-                            # 4. Add border for better edge detection
-                            bordered = cv2.copyMakeBorder(
-                                denoised, 10, 10, 10, 10, 
-                                cv2.BORDER_CONSTANT, value=[255, 255, 255]
-                            )
-                            
-                            # Save preprocessed image
-                            preprocessed_path = f"{os.path.splitext(img_path)[0]}_preprocessed.png"
-                            cv2.imwrite(preprocessed_path, bordered)
-                            temp_files.append(preprocessed_path)
-                            
-                            # Apply OCR to preprocessed image
-                            ocr_data = pytesseract.image_to_data(
-                                Image.open(preprocessed_path),
-                                config=tessconfig,
-                                output_type=pytesseract.Output.DICT
-                            )
-                            
-                            ocr_text = pytesseract.image_to_string(
-                                Image.open(preprocessed_path),
-                                config=tessconfig
-                            )
-                            
-                            # Calculate confidence
-                            conf_values = [float(c) for c in ocr_data['conf'] if c != '-1']
-                            page_confidence = sum(conf_values) / len(conf_values) if conf_values else 0
-                            
-                        else:
-                            # Standard OCR without preprocessing
-                            ocr_text = pytesseract.image_to_string(
-                                Image.open(img_path),
-                                config=tessconfig
-                            )
-                            
-                            # Get confidence data
-                            ocr_data = pytesseract.image_to_data(
-                                Image.open(img_path),
-                                config=tessconfig,
-                                output_type=pytesseract.Output.DICT
-                            )
-                            
-                            # Calculate confidence
-                            conf_values = [float(c) for c in ocr_data['conf'] if c != '-1']
-                            page_confidence = sum(conf_values) / len(conf_values) if conf_values else 0
-                        
-                        # Process results
-                        if ocr_text.strip():
-                            # OCR returned text
-                            text_content.append(ocr_text)
-                            total_confidence += page_confidence
-                            ocr_applied_pages += 1
-                            
-                            # Update page details
-                            page_detail.update({
-                                "ocr_applied": True,
-                                "text_length": len(ocr_text),
-                                "confidence": page_confidence,
-                                "extraction_method": "enhanced_ocr" if use_enhanced_ocr else "standard_ocr"
-                            })
-                            
-                            page_confidences.append(page_confidence)
-                            logger.debug(f"OCR success on page {page_idx+1}, confidence: {page_confidence:.1f}%")
-                        else:
-                            # OCR failed - use whatever text we got from direct extraction
-                            text_content.append(page_text)
-                            logger.debug(f"OCR returned empty result for page {page_idx+1}, using standard extraction")
-                            page_detail["extraction_method"] = "ocr_failed_fallback"
-                        
-                        # Cleanup temp files for this page immediately to save space
-                        for tmp in [img_path, preprocessed_path if use_enhanced_ocr else None]:
-                            if tmp and os.path.exists(tmp):
-                                try:
-                                    safely_remove_file(tmp)
-                                    temp_files.remove(tmp) if tmp in temp_files else None
-                                except Exception as cleanup_err:
-                                    logger.debug(f"Non-critical error during temp file cleanup: {cleanup_err}")
-                        
-                    except Exception as ocr_err:
-                        logger.warning(f"OCR error on page {page_idx+1}: {ocr_err}")
-                        # Fallback to using whatever text we got from direct extraction
-                        text_content.append(page_text)
-                        page_detail["extraction_method"] = "ocr_error_fallback"
-                        
-                        # Cleanup this page's temp files
-                        try:
-                            if os.path.exists(img_path):
-                                safely_remove_file(img_path)
-                        except Exception:
-                            pass
+                    # Update page details
+                    page_detail.update({
+                        "ocr_applied": True,
+                        "text_length": len(ocr_text),
+                        "confidence": page_confidence,
+                        "extraction_method": "enhanced_ocr" if ocr_result["preprocessing_applied"] else "standard_ocr"
+                    })
                     
-                    result["page_details"].append(page_detail)
+                    page_confidences.append(page_confidence)
+                    logger.debug(f"OCR success on page {page_idx+1}, confidence: {page_confidence:.1f}%")
+                else:
+                    # OCR failed - use whatever text we got from direct extraction
+                    text_content.append(page_text)
+                    logger.debug(f"OCR returned empty result for page {page_idx+1}, using standard extraction")
+                    page_detail["extraction_method"] = "ocr_failed_fallback"
+                
+                result["page_details"].append(page_detail)
             
             # Combine all text content
             full_text = "\n\n".join([t for t in text_content if t.strip()])
@@ -2509,6 +2705,7 @@ def process_scanned_pdf(file_path: str) -> Dict[str, Any]:
                 "success": bool(full_text.strip()),
                 "extraction_method": "ocr" if ocr_applied_pages > 0 else "mixed",
                 "ocr_engine": "tesseract_enhanced" if use_enhanced_ocr else "tesseract",
+                "ocr_cache_hits": sum(1 for r in ocr_results.values() if r.get("cached")),
                 "processing_time": time.time() - start_time
             })
             
@@ -2528,7 +2725,8 @@ def process_scanned_pdf(file_path: str) -> Dict[str, Any]:
             
             # Log statistics for diagnostics
             logger.info(f"OCR statistics for {os.path.basename(file_path)}: {ocr_applied_pages} pages OCR'd, " +
-                         f"{skipped_pages} skipped, avg confidence: {avg_confidence:.1f}%")
+                         f"{skipped_pages} skipped, {result['ocr_cache_hits']} from OCR cache, " +
+                         f"avg confidence: {avg_confidence:.1f}%")
             
             return result
         
@@ -2592,16 +2790,8 @@ def process_scanned_pdf(file_path: str) -> Dict[str, Any]:
         return result
     
     finally:
-        # Clean up all temporary files with proper error handling
-        for tmp_file in temp_files:
-            try:
-                if os.path.exists(tmp_file):
-                    safely_remove_file(tmp_file, max_retries=3, retry_delay=0.5)
-                    logger.debug(f"Removed temp file {tmp_file}")
-            except Exception as e:
-                logger.debug(f"Failed to remove temp file {tmp_file}: {e}")
-                
-        # Schedule job temp directory for delayed cleanup
+        # Page images never touch the disk; only tesseract's own scratch files
+        # end up in the job directory. Schedule it for delayed cleanup
         try:
             # Create a separate thread for delayed cleanup
             def delayed_cleanup(dir_path, delay=30):
@@ -4176,15 +4366,50 @@ def batch_process_pdfs(
 # -----------------------------------------------------------------------------
 # JSON AND FILE HANDLING FUNCTIONS
 # -----------------------------------------------------------------------------
-def write_json_safely(data: Dict[str, Any], output_path: str, chunk_size: int = 100000) -> bool:
+# Streaming, compact and compressed JSON output shared with pdf_extractor
+try:
+    from json_output import write_json_file, dumps as fast_json_dumps
+except ImportError:
+    write_json_file = None
+    fast_json_dumps = None
+
+
+def encode_json(obj: Any, indent: Optional[int] = None) -> str:
+    """
+    Encode obj with the fastest installed JSON backend.
+
+    Handles the same extra types as CustomJSONEncoder (datetime, bytes,
+    DocData, sets, tuples, numpy arrays, paths).
+
+    Args:
+        obj: Value to encode
+        indent: Indentation width, or None for compact output
+
+    Returns:
+        str: JSON text
+    """
+    if fast_json_dumps is not None:
+        return fast_json_dumps(obj, indent)
+    return json.dumps(obj, ensure_ascii=False, indent=indent, cls=CustomJSONEncoder)
+
+def write_json_safely(data: Dict[str, Any], output_path: str, chunk_size: int = 100000,
+                      compact: Optional[bool] = None, compression: Optional[str] = None,
+                      omit_full_text: Optional[bool] = None) -> bool:
     """
     Write large JSON content safely to avoid memory issues.
     Properly handles large text fields and provides multiple fallback methods.
     
+    The first attempt streams the JSON element by element (see json_output),
+    so a large result is never encoded into one string. Options left as None
+    use the defaults set with configure_json_output().
+    
     Args:
         data: The data to write as JSON
         output_path: Path to the output JSON file
-        chunk_size: Size of chunks for large string values
+        chunk_size: Unused, kept for compatibility
+        compact: Write without indentation
+        compression: "gzip" or "zstd" (the suffix is appended to output_path)
+        omit_full_text: Leave out full_text when the chunks reproduce it
         
     Returns:
         bool: True if successful, False otherwise
@@ -4193,28 +4418,15 @@ def write_json_safely(data: Dict[str, Any], output_path: str, chunk_size: int =
         # Create a temporary file
         temp_file = f"{output_path}.tmp"
         
-        # First attempt: Standard JSON dump with large strings broken into chunks
+        # First attempt: streamed JSON through a temporary file and an atomic rename
         try:
-            # Create a deep copy with chunked large strings to avoid memory issues
-            def chunk_large_strings(obj):
-                if isinstance(obj, dict):
-                    return {k: chunk_large_strings(v) for k, v in obj.items()}
-                elif isinstance(obj, list):
-                    return [chunk_large_strings(item) for item in obj]
-                elif isinstance(obj, str) and len(obj) > chunk_size:
-                    # For large strings, break them into chunks for better memory management
-                    chunks = [obj[i:i+chunk_size] for i in range(0, len(obj), chunk_size)]
-                    # Join chunks with empty string to avoid modifying content
-                    return "".join(chunks)
-                else:
-                    return obj
-            
-            # Process data to handle large strings
-            processed_data = chunk_large_strings(data)
+            if write_json_file is not None:
+                write_json_file(data, output_path, compact=compact,
+                                compression=compression, omit_full_text=omit_full_text)
+                return True
             
-            # Write to temporary file first
             with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(processed_data, f, ensure_ascii=False, indent=2)
+                json.dump(data, f, ensure_ascii=False, indent=2)
             
             # Rename to final output file
             if os.path.exists(temp_file):
@@ -5350,7 +5562,14 @@ class FileStats:
         self.references_extracted = 0
         self.scanned_pages_processed = 0
         self.ocr_processed_files = 0
-    
+
+        # Incremental processing stats
+        self.reused_files = 0
+
+        # Tag cache effectiveness
+        self.tag_cache_hits = 0
+        self.tag_cache_misses = 0
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization with additional metrics"""
         # Create base dictionary from all attributes
@@ -5369,6 +5588,19 @@ class FileStats:
         d.pop('start_time', None)
         
         return d
+
+    def counters(self) -> Dict[str, Union[int, float]]:
+        """Return the numeric counters, e.g. to ship a worker's stats back to the parent."""
+        return {
+            k: v for k, v in self.__dict__.items()
+            if not k.startswith('_') and k not in ('start_time', 'total_files')
+            and isinstance(v, (int, float)) and not isinstance(v, bool)
+        }
+
+    def merge(self, delta: Dict[str, Union[int, float]]) -> None:
+        """Add counters produced by another FileStats (see counters()) into this one."""
+        for k, v in delta.items():
+            setattr(self, k, getattr(self, k, 0) + v)
 # -----------------------------------------------------------------------------
 # DOCUMENT STRUCTURE ANALYSIS
 # -----------------------------------------------------------------------------
@@ -5992,10 +6224,116 @@ def chunk_document_intelligently(doc_data: Union[Dict[str, Any], PDFDocument], m
     
     return chunks
 
+
+SENTENCE_BREAKS = (". ", "? ", "! ", ".\n", "?\n", "!\n")
+
+
+def _find_chunk_break(text: str, start: int, limit: int, max_size: int) -> int:
+    """
+    Pick the end offset for a chunk starting at start whose hard limit is limit.
+
+    Breaks are searched right-to-left inside the window only, preferring a
+    paragraph break, then a line break, a sentence end and finally whitespace.
+    Each candidate must leave the chunk reasonably full so that progress per
+    chunk stays proportional to max_size.
+    """
+    floor = start + max_size // 2
+    pos = text.rfind("\n\n", floor, limit)
+    if pos != -1:
+        return pos
+    pos = text.rfind("\n", floor, limit)
+    if pos != -1:
+        return pos
+
+    floor = start + max_size // 3
+    pos = max(text.rfind(mark, floor, limit) for mark in SENTENCE_BREAKS)
+    if pos != -1:
+        return pos + 1
+
+    floor = start + max_size // 4
+    pos = max(text.rfind(" ", floor, limit), text.rfind("\t", floor, limit))
+    if pos != -1:
+        return pos
+
+    # No boundary at all (minified text, base64, OCR noise): hard cut
+    return limit
+
+
+def iter_chunk_spans(text: str, max_size: int, overlap: int = 0) -> Iterator[Tuple[int, int]]:
+    """
+    Lazily split text into (start, end) character spans of at most max_size.
+
+    The text is scanned once, left to right, and nothing is copied: each cut is
+    found with bounded rfind calls inside the current window, and the overlap
+    with the previous chunk is expressed as an earlier start offset (moved up
+    to a word boundary) instead of re-joining chunk text.
+
+    Args:
+        text: Text to chunk
+        max_size: Maximum chunk size in characters
+        overlap: Number of characters to overlap between consecutive chunks
+
+    Yields:
+        (start, end) offsets such that text[start:end] is a chunk
+    """
+    n = len(text)
+    if n == 0:
+        return
+    max_size = max(1, max_size)
+    if n <= max_size:
+        yield 0, n
+        return
+    overlap = max(0, min(overlap, max_size // 2))
+
+    start = 0
+    while start < n:
+        limit = start + max_size
+        end = n if limit >= n else _find_chunk_break(text, start, limit, max_size)
+
+        # Don't carry trailing whitespace into the chunk
+        stop = end
+        while stop > start and text[stop - 1].isspace():
+            stop -= 1
+        if stop > start:
+            yield start, stop
+        if end >= n:
+            break
+
+        next_start = end
+        if overlap and stop > start:
+            # Never overlap more than half the chunk so each step makes real progress
+            next_start = max(stop - min(overlap, (stop - start) // 2), start + 1)
+            space = text.find(" ", next_start, stop)
+            if space != -1:
+                next_start = space + 1
+        while next_start < n and text[next_start].isspace():
+            next_start += 1
+        start = next_start
+
+
+def iter_text_chunks(text: str, max_size: int, overlap: int = 0) -> Iterator[str]:
+    """
+    Yield chunk strings for text, see iter_chunk_spans.
+
+    Args:
+        text: Text to chunk
+        max_size: Maximum chunk size
+        overlap: Number of characters to overlap between chunks
+
+    Yields:
+        Text chunks
+    """
+    for start, end in iter_chunk_spans(text, max_size, overlap):
+        yield text[start:end]
+
+
 def chunk_text_by_paragraphs(text: str, max_size: int, overlap: int = 0) -> List[str]:
     """
     Chunk text by preserving paragraph structure.
     
+    Cuts prefer paragraph breaks, then line breaks, sentences and words; see
+    iter_chunk_spans for details.
+    
     Args:
         text: Text to chunk
         max_size: Maximum chunk size
@@ -6006,130 +6344,7 @@ def chunk_text_by_paragraphs(text: str, max_size: int, overlap: int = 0) -> List
     """
     if len(text) <= max_size:
         return [text]
-    
-    # Split text into paragraphs
-    paragraphs = re.split(r'\n\s*\n', text)
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    last_chunk_end = ""
-    
-    for para in paragraphs:
-        para_size = len(para) + 2  # Account for paragraph separator
-        
-        # If this paragraph alone exceeds the max size, split it by sentences
-        if para_size > max_size:
-            # Add any existing paragraphs as a chunk
-            if current_chunk:
-                chunks.append("\n\n".join(current_chunk))
-                # Save end of this chunk for overlap in next chunk
-                if overlap > 0:
-                    last_chunk_end = "\n\n".join(current_chunk[-2:]) if len(current_chunk) > 1 else current_chunk[0]
-                current_chunk = []
-                current_size = 0
-            
-            # Split large paragraph by sentences
-            sentences = re.split(r'(?<=[.!?])\s+', para)
-            sentence_chunk = []
-            sentence_chunk_size = 0
-            
-            # If we have content from the last chunk to overlap, add it first
-            if overlap > 0 and last_chunk_end:
-                sentence_chunk_size += min(len(last_chunk_end), overlap)
-                
-            for sentence in sentences:
-                sentence_size = len(sentence) + 1  # Space after sentence
-                
-                # If this sentence alone exceeds max_size, split by words
-                if sentence_size > max_size:
-                    # Add existing sentences as a chunk
-                    if sentence_chunk:
-                        chunk_text = " ".join(sentence_chunk)
-                        if overlap > 0 and last_chunk_end:
-                            chunk_text = last_chunk_end[-overlap:] + "\n\n" + chunk_text
-                            last_chunk_end = chunk_text[-min(len(chunk_text), overlap):]
-                        chunks.append(chunk_text)
-                        sentence_chunk = []
-                        sentence_chunk_size = overlap if overlap > 0 else 0
-                    
-                    # Split long sentence by words
-                    words = sentence.split()
-                    word_chunk = []
-                    word_chunk_size = 0
-                    
-                    # Add overlap if needed
-                    if overlap > 0 and last_chunk_end:
-                        word_chunk_size += min(len(last_chunk_end), overlap)
-                    
-                    for word in words:
-                        word_size = len(word) + 1  # Space after word
-                        
-                        if word_chunk_size + word_size > max_size:
-                            chunk_text = " ".join(word_chunk)
-                            if overlap > 0 and last_chunk_end:
-                                chunk_text = last_chunk_end[-overlap:] + " " + chunk_text
-                                last_chunk_end = chunk_text[-min(len(chunk_text), overlap):]
-                            chunks.append(chunk_text)
-                            word_chunk = [word]
-                            word_chunk_size = word_size + (overlap if overlap > 0 else 0)
-                        else:
-                            word_chunk.append(word)
-                            word_chunk_size += word_size
-                    
-                    # Add remaining words
-                    if word_chunk:
-                        chunk_text = " ".join(word_chunk)
-                        if overlap > 0 and last_chunk_end:
-                            chunk_text = last_chunk_end[-overlap:] + " " + chunk_text
-                            last_chunk_end = chunk_text[-min(len(chunk_text), overlap):]
-                        chunks.append(chunk_text)
-                
-                # Normal sentence that fits within max_size
-                elif sentence_chunk_size + sentence_size > max_size:
-                    chunk_text = " ".join(sentence_chunk)
-                    if overlap > 0 and last_chunk_end:
-                        chunk_text = last_chunk_end[-overlap:] + " " + chunk_text
-                        last_chunk_end = chunk_text[-min(len(chunk_text), overlap):]
-                    chunks.append(chunk_text)
-                    sentence_chunk = [sentence]
-                    sentence_chunk_size = sentence_size + (overlap if overlap > 0 else 0)
-                else:
-                    sentence_chunk.append(sentence)
-                    sentence_chunk_size += sentence_size
-            
-            # Add remaining sentences
-            if sentence_chunk:
-                chunk_text = " ".join(sentence_chunk)
-                if overlap > 0 and last_chunk_end:
-                    chunk_text = last_chunk_end[-overlap:] + " " + chunk_text
-                    last_chunk_end = chunk_text[-min(len(chunk_text), overlap):]
-                chunks.append(chunk_text)
-            
-        # Normal paragraph that would exceed chunk size limit
-        elif current_size + para_size > max_size:
-            chunk_text = "\n\n".join(current_chunk)
-            if overlap > 0 and last_chunk_end:
-                chunk_text = last_chunk_end[-overlap:] + "\n\n" + chunk_text
-            chunks.append(chunk_text)
-            current_chunk = [para]
-            current_size = para_size
-            # Save this paragraph for potential overlap
-            if overlap > 0:
-                last_chunk_end = para
-        
-        # Paragraph fits in current chunk
-        else:
-            current_chunk.append(para)
-            current_size += para_size
-    
-    # Add the last chunk
-    if current_chunk:
-        chunk_text = "\n\n".join(current_chunk)
-        if overlap > 0 and last_chunk_end and chunks:  # Only add overlap if there are previous chunks
-            chunk_text = last_chunk_end[-overlap:] + "\n\n" + chunk_text
-        chunks.append(chunk_text)
-    
-    return chunks
+    return list(iter_text_chunks(text, max_size, overlap))
 
 def chunk_text_by_words(text: str, max_size: int, overlap: int = 0) -> List[str]:
     """
@@ -6144,20 +6359,13 @@ def chunk_text_by_words(text: str, max_size: int, overlap: int = 0) -> List[str]
     Returns:
         List of text chunks
     """
-    if len(text) <= max_size:
-        return [text]
-    
-    # For very large texts, use dedicated large text chunker
-    if len(text) > 1_000_000:  # 1MB+
-        return chunk_large_text(text, max_size, overlap)
-
-    # First try paragraph-based chunking
     return chunk_text_by_paragraphs(text, max_size, overlap)
 
 def chunk_large_text(text: str, max_size: int, overlap: int = 0) -> List[str]:
     """
-    Efficiently chunk very large texts (multi-MB) into segments of size max_size.
-    Optimized for speed and memory efficiency with large documents.
+    Chunk very large texts (multi-MB) into segments of size max_size.
+    
+    Kept for existing callers; the span chunker is linear for any input size.
     
     Args:
         text: Text to chunk
@@ -6167,96 +6375,184 @@ def chunk_large_text(text: str, max_size: int, overlap: int = 0) -> List[str]:
     Returns:
         List of text chunks
     """
-    chunks = []
-    start = 0
-    last_chunk = ""
-    
-    while start < len(text):
-        # If remaining text fits in chunk, add it all
-        if start + max_size >= len(text):
-            chunk_text = text[start:]
-            if overlap > 0 and chunks:
-                chunk_text = last_chunk[-overlap:] + chunk_text
-            chunks.append(chunk_text)
-            break
-            
-        end = start + max_size
-        
-        # Try to find a paragraph break
-        par_break = text.rfind("\n\n", start, end)
-        if par_break != -1 and par_break > start + (max_size // 2):
-            chunks.append(text[start:par_break])
-            # Save end of chunk for overlap
-            if overlap > 0:
-                last_chunk = text[par_break - overlap:par_break]
-            start = par_break + 2
-            continue
-            
-        # Try to find a line break
-        line_break = text.rfind("\n", start, end)
-        if line_break != -1 and line_break > start + (max_size // 2):
-            chunks.append(text[start:line_break])
-            # Save end of chunk for overlap
-            if overlap > 0:
-                last_chunk = text[line_break - overlap:line_break]
-            start = line_break + 1
-            continue
-            
-        # Try to find sentence boundaries
-        sent_breaks = [
-            text.rfind(". ", start, end),
-            text.rfind("? ", start, end),
-            text.rfind("! ", start, end),
-            text.rfind(".\n", start, end),
-            text.rfind("?\n", start, end),
-            text.rfind("!\n", start, end)
-        ]
-        
-        best_break = max(sent_breaks)
-        if best_break != -1 and best_break > start + (max_size // 3):
-            chunks.append(text[start:best_break + 1])
-            # Save end of chunk for overlap
-            if overlap > 0:
-                last_chunk = text[best_break + 1 - overlap:best_break + 1]
-            start = best_break + 1
-            # Skip any whitespace
-            while start < len(text) and text[start].isspace():
-                start += 1
-            continue
-            
-        # Last resort: break on word boundary
-        while end > start and not text[end].isspace():
+    return chunk_text_by_paragraphs(text, max_size, overlap)
+
+# Token-budget chunking
+TOKEN_COUNT_BATCH = 256
+APPROX_TOKEN_PUNCTUATION = re.compile(r'[.,;:!?\-+=()\[\]{}"/\\@#$%^&*<>~`|]')
+
+
+def approximate_token_count(text: str) -> int:
+    """
+    Estimate tokens from words, punctuation and newlines (no tokenizer needed).
+
+    Half-tokens round up, so the estimate for a text never exceeds the sum of
+    the estimates for its pieces and packed chunks stay within budget.
+    """
+    return len(text.split()) + (len(APPROX_TOKEN_PUNCTUATION.findall(text)) + 1) // 2 + text.count('\n')
+
+
+class TokenCounter:
+    """
+    Counts tokens for one tokenizer, loaded once and reused for every call.
+
+    name selects the tokenizer: None or "approx" for approximate_token_count,
+    a tiktoken encoding name (e.g. "cl100k_base"), or "hf:<model>" for a
+    Hugging Face tokenizer. If the library or model is unavailable the counter
+    falls back to the approximation and logs a warning.
+    """
+
+    def __init__(self, name: Optional[str] = None, count_fn: Optional[Callable[[str], int]] = None):
+        self.name = name or "approx"
+        self._count_batch = None
+        if count_fn is not None:
+            self.name = getattr(count_fn, "__name__", "custom")
+            self._count_batch = lambda texts: [count_fn(t) for t in texts]
+        elif self.name != "approx":
+            try:
+                if self.name.startswith("hf:"):
+                    from transformers import AutoTokenizer
+                    hf_tokenizer = AutoTokenizer.from_pretrained(self.name[3:])
+                    self._count_batch = lambda texts: [
+                        len(ids) for ids in hf_tokenizer(texts, add_special_tokens=False)["input_ids"]
+                    ]
+                else:
+                    import tiktoken
+                    encoding = tiktoken.get_encoding(self.name)
+                    self._count_batch = lambda texts: [len(ids) for ids in encoding.encode_ordinary_batch(texts)]
+            except Exception as e:
+                logger.warning(f"Tokenizer {self.name} unavailable ({e}); using approximate token counts")
+                self.name = "approx"
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for several texts with one tokenizer call."""
+        if self._count_batch is None:
+            return [approximate_token_count(t) for t in texts]
+        return self._count_batch(texts)
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+
+@lru_cache(maxsize=8)
+def get_token_counter(name: Optional[str] = None) -> TokenCounter:
+    """Return the TokenCounter for name; each process loads a tokenizer only once."""
+    return TokenCounter(name)
+
+
+def iter_token_chunk_spans(
+    text: str,
+    max_tokens: int,
+    counter: Optional[TokenCounter] = None,
+    overlap_tokens: int = 0
+) -> Iterator[Tuple[int, int]]:
+    """
+    Lazily split text into (start, end) spans of at most max_tokens tokens.
+
+    The text is cut into small boundary-aligned units with iter_chunk_spans and
+    the units are counted in batches of TOKEN_COUNT_BATCH, so every character
+    is encoded once. Units are then packed greedily by their counts; candidate
+    chunks are never re-encoded. Each unit carries the whitespace before it, so
+    units tile the text and their counts add up to the chunk's token count
+    (give or take merges a tokenizer would make across a unit boundary).
+
+    Args:
+        text: Text to chunk
+        max_tokens: Token budget per chunk
+        counter: TokenCounter to use (defaults to the approximate counter)
+        overlap_tokens: Tokens to repeat from the end of the previous chunk
+
+    Yields:
+        (start, end) offsets such that text[start:end] is a chunk
+    """
+    n = len(text)
+    if n == 0:
+        return
+    counter = counter or get_token_counter()
+    max_tokens = max(1, max_tokens)
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    # Tokens are rarely shorter than a character, so units this size fit the budget
+    unit_chars = max(16, min(max_tokens, 1024))
+
+    def count_units(spans):
+        counts = counter.count_batch([text[s:e] for s, e in spans])
+        for (s, e), c in zip(spans, counts):
+            if c > max_tokens and e - s > 1:
+                mid = (s + e) // 2
+                yield from count_units([(s, mid), (mid, e)])
+            else:
+                yield s, e, c
+
+    def iter_units():
+        pending = []
+        prev_end = 0
+        for _, end in iter_chunk_spans(text, unit_chars):
+            pending.append((prev_end, end))
+            prev_end = end
+            if len(pending) >= TOKEN_COUNT_BATCH:
+                yield from count_units(pending)
+                pending = []
+        if prev_end < n:
+            pending.append((prev_end, n))
+        if pending:
+            yield from count_units(pending)
+
+    def span_of(units):
+        start, end = units[0][0], units[-1][1]
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
             end -= 1
-            
+        return start, end
+
+    window = deque()
+    window_tokens = 0
+    for unit in iter_units():
+        if window and window_tokens + unit[2] > max_tokens:
+            start, end = span_of(window)
+            if end > start:
+                yield start, end
+            # Keep trailing units as overlap, but always drop at least one
+            kept = deque()
+            kept_tokens = 0
+            while len(window) > 1 and kept_tokens + window[-1][2] <= overlap_tokens:
+                last = window.pop()
+                kept.appendleft(last)
+                kept_tokens += last[2]
+            while kept and kept_tokens + unit[2] > max_tokens:
+                kept_tokens -= kept.popleft()[2]
+            window, window_tokens = kept, kept_tokens
+        window.append(unit)
+        window_tokens += unit[2]
+
+    if window:
+        start, end = span_of(window)
         if end > start:
-            chunks.append(text[start:end])
-            # Save end of chunk for overlap
-            if overlap > 0:
-                last_chunk = text[end - overlap:end]
-            start = end
-            # Skip any whitespace
-            while start < len(text) and text[start].isspace():
-                start += 1
-        else:
-            # If we couldn't find a word boundary, just break at max_size
-            chunks.append(text[start:start + max_size])
-            # Save end of chunk for overlap
-            if overlap > 0:
-                last_chunk = text[start + max_size - overlap:start + max_size]
-            start += max_size
-    
-    # Add overlap between chunks if requested
-    if overlap > 0 and len(chunks) > 1:
-        overlapped_chunks = [chunks[0]]
-        for i in range(1, len(chunks)):
-            # If previous chunk is long enough for overlap
-            if len(chunks[i-1]) >= overlap:
-                overlapped_chunks.append(chunks[i-1][-overlap:] + chunks[i])
-            else:
-                overlapped_chunks.append(chunks[i])
-        return overlapped_chunks
-    
-    return chunks
+            yield start, end
+
+
+def chunk_text_by_tokens(text: str, max_tokens: int, tokenizer=None, overlap_tokens: int = 0) -> List[str]:
+    """
+    Chunk text so that each chunk fits a token budget.
+
+    Args:
+        text: Text to chunk
+        max_tokens: Maximum number of tokens per chunk
+        tokenizer: Tokenizer name (see TokenCounter), a TokenCounter, or a
+            function returning the token count of a string
+        overlap_tokens: Number of tokens to overlap between chunks
+
+    Returns:
+        List of text chunks
+    """
+    if isinstance(tokenizer, TokenCounter):
+        counter = tokenizer
+    elif callable(tokenizer):
+        counter = TokenCounter(count_fn=tokenizer)
+    else:
+        counter = get_token_counter(tokenizer)
+    return [text[s:e] for s, e in iter_token_chunk_spans(text, max_tokens, counter, overlap_tokens)]
+
 
 def unify_whitespace(txt: str) -> str:
     """
@@ -6363,14 +6659,11 @@ def is_binary_file(file_path: str, check_bytes: int = 8192) -> bool:
     if ext in known_bin:
         return True
 
-    # Check file size - don't try to read extremely large files
+    # Only a prefix is read, so size alone says nothing (large text files are streamed)
     try:
         size = os.path.getsize(file_path)
         if size <= 0:
             return False
-        if size > MAX_FILE_SIZE:
-            logger.warning(f"File {file_path} exceeds size limit ({size} bytes). Treating as binary.")
-            return True
     except OSError:
         logger.warning(f"Could not determine size of {file_path}")
         return True  # Err on the side of caution
@@ -6599,122 +6892,195 @@ def extract_section_name(file_path: str) -> str:
     section_name_cache[file_path] = name
     return name
 
-def read_file_text(file_path: str, memory_limit: int = DEFAULT_MEMORY_LIMIT) -> str:
+def detect_text_encoding(file_path: str, sample_size: int = ENCODING_SAMPLE_SIZE) -> str:
     """
-    Read text from a file with enhanced error handling, format detection,
-    and memory-efficient processing.
-    
+    Guess a text file's encoding from a bounded prefix sample.
+
+    The file is read once, up to sample_size bytes: BOMs are honoured,
+    NUL-heavy samples are treated as BOM-less UTF-16, and otherwise UTF-8 is
+    preferred over cp1252, with latin-1 (which never fails) as the last resort.
+
     Args:
         file_path: Path to the file
-        memory_limit: Maximum memory to use for file reading
-        
+        sample_size: Number of bytes to inspect
+
     Returns:
-        Extracted text content
+        A codec name usable with codecs.getincrementaldecoder
     """
-    # Special handling for PDF files
-    if file_path.lower().endswith('.pdf'):
-        pdf_data = extract_text_from_pdf(file_path)
-        return pdf_data.get("full_text", "")
-
-    # Check file size to adapt reading strategy
+    with open(file_path, "rb") as f:
+        sample = f.read(sample_size)
+
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if sample.count(b"\x00") > len(sample) // 4:
+        # ASCII text in UTF-16 has a NUL in every other byte
+        return "utf-16-le" if sample[1::2].count(0) >= sample[0::2].count(0) else "utf-16-be"
     try:
-        size = os.path.getsize(file_path)
-        if size > memory_limit:
-            logger.warning(f"File {file_path} exceeds memory limit ({size} bytes). Using streamed reading.")
-            return read_large_file(file_path)
-    except OSError as e:
-        logger.error(f"Unable to get file size for {file_path}: {e}")
-        # Continue anyway and try to read the file
-
-    # Handle small files with direct reading
+        # final=False tolerates a multi-byte character cut off by the sample boundary
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
     try:
-        # Try utf-8 first
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read()
-        except UnicodeDecodeError:
-            # Try different encodings
-            encodings_to_try = ['latin-1', 'cp1252', 'utf-16', 'utf-16-le', 'utf-16-be']
-            for encoding in encodings_to_try:
-                try:
-                    with open(file_path, "r", encoding=encoding) as f:
-                        return f.read()
-                except UnicodeDecodeError:
-                    continue
-                    
-            # If all encodings fail, try binary mode with decoding
-            with open(file_path, "rb") as f:
-                content = f.read()
-                # Try multiple encodings again with binary content
-                for encoding in encodings_to_try + ['utf-8']:
-                    try:
-                        return content.decode(encoding)
-                    except UnicodeDecodeError:
-                        continue
-                
-                # If all else fails, use replace for any decoding errors
-                return content.decode('utf-8', errors='replace')
-    except (UnicodeDecodeError, IOError) as e:
-        logger.error(f"Error reading file {file_path}: {e}")
-        # Last resort: try to read as binary and decode with replace
-        try:
-            with open(file_path, "rb") as f:
-                content = f.read()
-                return content.decode('utf-8', errors='replace')
-        except Exception as e2:
-            logger.error(f"Final fallback reading failed for {file_path}: {e2}")
-            return ""
-    except Exception as e:
-        logger.error(f"Unexpected error reading {file_path}: {e}")
-        return ""
+        sample.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
 
-def read_large_file(file_path: str) -> str:
+
+def iter_file_text(
+    file_path: str,
+    encoding: Optional[str] = None,
+    buffer_size: int = STREAM_BUFFER_SIZE
+) -> Iterator[str]:
     """
-    Read a large text file in chunks to avoid memory issues.
-    Enhanced with multiple encoding support and better error handling.
-    
+    Decode a file incrementally, yielding text blocks of about buffer_size characters.
+
     Args:
         file_path: Path to the file
-        
-    Returns:
-        File content as text
+        encoding: Codec to use (detected from a prefix sample if None)
+        buffer_size: Bytes read per block
+
+    Yields:
+        Decoded text blocks; undecodable bytes become U+FFFD
     """
-    possible_encs = ["utf-8", "latin-1", "cp1252", "utf-16", "utf-16-le", "utf-16-be"]
-    buffer_size = 1024 * 1024  # 1MB buffer
-    
-    # Try reading with different encodings
-    for enc in possible_encs:
+    detected = encoding is None
+    encoding = encoding or detect_text_encoding(file_path)
+    # A detected UTF-8 is only a guess from the prefix, so decode strictly and
+    # switch to cp1252 if non-UTF-8 bytes show up further into the file
+    strict = detected and encoding == "utf-8"
+    decoder = codecs.getincrementaldecoder(encoding)(errors="strict" if strict else "replace")
+
+    def decode(data: bytes, final: bool = False) -> str:
+        nonlocal decoder, strict
+        if not strict:
+            return decoder.decode(data, final)
         try:
-            content_parts = []
-            with open(file_path, "r", encoding=enc, errors="replace") as f:
-                while True:
-                    chunk = f.read(buffer_size)
-                    if not chunk:
-                        break
-                    content_parts.append(chunk)
-            
-            # Successfully read the file with this encoding
-            logger.debug(f"Successfully read {file_path} with encoding {enc}")
-            return "".join(content_parts)
-        except Exception as e:
-            logger.debug(f"Failed to read {file_path} with encoding {enc}: {e}")
-            continue
+            return decoder.decode(data, final)
+        except UnicodeDecodeError as e:
+            logger.debug(f"{file_path} is not UTF-8 past its first {ENCODING_SAMPLE_SIZE} bytes, using cp1252")
+            # e.object is the decoder's pending bytes plus data; everything before
+            # e.start is valid UTF-8, only the rest is decoded as cp1252
+            decoded = e.object[:e.start].decode("utf-8")
+            decoder = codecs.getincrementaldecoder("cp1252")(errors="replace")
+            strict = False
+            return decoded + decoder.decode(e.object[e.start:], final)
+
+    with open(file_path, "rb") as f:
+        while True:
+            block = f.read(buffer_size)
+            if not block:
+                break
+            text = decode(block)
+            if text:
+                yield text
+    tail = decode(b"", final=True)
+    if tail:
+        yield tail
 
-    # If all encodings fail, try binary mode as a last resort
-    try:
-        logger.warning(f"All text-mode reading attempts failed for {file_path}. Trying binary mode.")
-        content_parts = []
-        with open(file_path, "rb") as f:
-            while True:
-                chunk = f.read(buffer_size)
-                if not chunk:
-                    break
-                # Decode each chunk with replace option for invalid characters
-                content_parts.append(chunk.decode("utf-8", errors="replace"))
-        return "".join(content_parts)
-    except Exception as e:
-        logger.error(f"Binary mode reading failed for {file_path}: {e}")
-        return ""
+
+def iter_file_chunks(
+    file_path: str,
+    max_size: int,
+    overlap: int = 0,
+    encoding: Optional[str] = None,
+    buffer_size: int = STREAM_BUFFER_SIZE
+) -> Iterator[str]:
+    """
+    Read, decode and chunk a text file in constant memory.
+
+    Produces exactly the chunks iter_text_chunks would for the whole decoded
+    text: a chunk is only emitted once the window that decides its end is fully
+    buffered, and the undecided tail is carried over to the next block.
+
+    Args:
+        file_path: Path to the file
+        max_size: Maximum chunk size in characters
+        overlap: Number of characters to overlap between chunks
+        encoding: Codec to use (detected from a prefix sample if None)
+        buffer_size: Bytes read per block
+
+    Yields:
+        Text chunks
+    """
+    max_size = max(1, max_size)
+    blocks = iter_file_text(file_path, encoding, buffer_size)
+    buffer = ""
+    emitted = False
+    exhausted = False
+    while True:
+        # Keep at least one full window beyond the next chunk start buffered
+        while not exhausted and len(buffer) < 2 * max_size + buffer_size:
+            block = next(blocks, None)
+            if block is None:
+                exhausted = True
+            else:
+                buffer += block
+
+        if exhausted:
+            if emitted and len(buffer) <= max_size:
+                tail = buffer.rstrip()
+                if tail:
+                    yield tail
+            else:
+                yield from iter_text_chunks(buffer, max_size, overlap)
+            return
+
+        restart = len(buffer)
+        for start, end in iter_chunk_spans(buffer, max_size, overlap):
+            if start + max_size >= len(buffer):
+                # This chunk's window runs past the buffer: decide it after the next read
+                restart = start
+                break
+            yield buffer[start:end]
+            emitted = True
+        buffer = buffer[restart:]
+        if emitted:
+            buffer = buffer.lstrip()
+
+
+def iter_file_token_chunks(
+    file_path: str,
+    max_tokens: int,
+    counter: Optional[TokenCounter] = None,
+    overlap_tokens: int = 0,
+    encoding: Optional[str] = None,
+    buffer_size: int = STREAM_BUFFER_SIZE
+) -> Iterator[str]:
+    """
+    Read, decode and token-chunk a text file in constant memory.
+
+    Each decoded block is appended to the text carried over from the previous
+    one and packed with iter_token_chunk_spans. The last span of a block may
+    still grow with the next block, so it is not emitted: the text from its
+    start (which already includes the overlap with the chunk before it) is
+    carried over instead. Chunks therefore overlap across block boundaries
+    exactly as they do within a block.
+
+    Args:
+        file_path: Path to the file
+        max_tokens: Token budget per chunk
+        counter: TokenCounter to use (defaults to the approximate counter)
+        overlap_tokens: Tokens to repeat from the end of the previous chunk
+        encoding: Codec to use (detected from a prefix sample if None)
+        buffer_size: Bytes read per block
+
+    Yields:
+        Text chunks
+    """
+    carry = ""
+    for block in iter_file_text(file_path, encoding, buffer_size):
+        buffer = carry + block
+        last = None
+        for span in iter_token_chunk_spans(buffer, max_tokens, counter, overlap_tokens):
+            if last is not None:
+                yield buffer[last[0]:last[1]]
+            last = span
+        carry = buffer[last[0]:] if last is not None else buffer
+    for start, end in iter_token_chunk_spans(carry, max_tokens, counter, overlap_tokens):
+        yield carry[start:end]
 
 
 # -----------------------------------------------------------------------------
@@ -6860,7 +7226,7 @@ def process_file(
             sec_name = extract_section_name(file_path)
             
             # Generate stop words hash for tag generation
-            stop_hash = hashlib.md5(str(sorted(stop_words)).encode()).hexdigest()
+            stop_hash = get_stop_words_hash(stop_words)
             
             for i, chunk in enumerate(enhanced_chunks):
                 # Create a unique label for each chunk
@@ -6975,7 +7341,7 @@ def process_file(
         # Generate DocData objects
         docdatas = []
         total_chunks = len(chunks)
-        stop_hash = hashlib.md5(str(sorted(stop_words)).encode()).hexdigest()
+        stop_hash = get_stop_words_hash(stop_words)
 
         for i, chunk in enumerate(chunks, start=1):
             # Check for timeout
@@ -7038,7 +7404,12 @@ def safe_process(
     overlap: int = DEFAULT_CHUNK_OVERLAP,
     max_file_size: int = MAX_FILE_SIZE,
     timeout: int = DEFAULT_PROCESS_TIMEOUT,
-    progress_callback: Optional[Callable[[int, int, str], None]] = None
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    max_chunk_tokens: int = 0,
+    overlap_tokens: int = 0,
+    tokenizer_name: Optional[str] = None,
+    doc_sink: Optional[Callable[[str, List[DocData]], None]] = None,
+    fingerprint: Optional[Dict[str, Any]] = None
 ) -> Optional[Tuple[str, List[DocData]]]:
     """
     Wrapper for process_file to catch errors gracefully.
@@ -7054,6 +7425,13 @@ def safe_process(
         max_file_size: Maximum file size
         timeout: Processing timeout
         progress_callback: Progress callback function
+        max_chunk_tokens: If set, chunk to this token budget instead of max_chunk_size characters
+        overlap_tokens: Token overlap between chunks in token mode
+        tokenizer_name: Tokenizer for token mode (see TokenCounter)
+        doc_sink: Optional callable that receives the documents of very large
+            (streamed) text files in batches instead of returning them
+        fingerprint: Optional dict that receives the "content_hash" of the
+            bytes the documents were built from (files read whole only)
         
     Returns:
         Tuple of (primary_library, list_of_docdata) or None if processing failed
@@ -7063,7 +7441,7 @@ def safe_process(
     try:
         # File size check
         file_size = path.stat().st_size
-        if file_size > max_file_size:
+        if file_size > max_file_size and not is_streamed_text_file(file_path, file_size):
             logging.info(f"Skipping large file: {path} ({file_size} bytes)")
             stats.skipped_files += 1
             return None
@@ -7099,27 +7477,32 @@ def safe_process(
             # Handle case where paths are on different drives
             rel_path = str(path)
         
-        # Simple content reading with error handling
-        try:
-            with open(path, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read()
-        except Exception as read_err:
-            logging.warning(f"Error reading {file_path}: {read_err}, trying binary mode")
-            try:
-                with open(path, 'rb') as f:
-                    binary_content = f.read()
-                    # Check if file is likely binary
-                    if include_binary_detection and b'\0' in binary_content[:1024]:
-                        stats.binary_files += 1
-                        stats.skipped_files += 1
-                        logging.info(f"Skipping binary file: {file_path}")
-                        return None
-                    # Try to decode with a fallback
-                    content = binary_content.decode('utf-8', errors='replace')
-            except Exception as bin_err:
-                logging.error(f"Error reading file in binary mode {file_path}: {bin_err}")
-                stats.error_files += 1
+        # Very large text files (multi-GB logs, CSV dumps) are decoded and chunked
+        # as a stream, one DocData per chunk, without building the whole text
+        if file_size > STREAM_READ_THRESHOLD:
+            if include_binary_detection and is_binary_file(file_path):
+                stats.binary_files += 1
+                stats.skipped_files += 1
+                logging.info(f"Skipping binary file: {file_path}")
                 return None
+            return process_large_text_file(
+                path, rel_path, stats, max_chunk_size, overlap, start_time,
+                max_chunk_tokens, overlap_tokens, tokenizer_name, progress_callback, doc_sink
+            )
+        
+        # Read the bytes once: they are decoded (as text mode would, with universal
+        # newlines) and, for the incremental manifest, hashed right here
+        try:
+            with open(path, 'rb') as f:
+                raw_content = f.read()
+        except OSError as read_err:
+            logging.error(f"Error reading file {file_path}: {read_err}")
+            stats.error_files += 1
+            return None
+        content = raw_content.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+        if fingerprint is not None:
+            fingerprint["content_hash"] = hashlib.md5(raw_content).hexdigest()
+        del raw_content
         
         # Extract the library name from path
         primary_lib = Path(rel_path).parts[0] if len(Path(rel_path).parts) > 0 else "root"
@@ -7135,26 +7518,51 @@ def safe_process(
             "relative_path": rel_path
         }
         
-        # Simple chunking
-        chunks = []
-        for i in range(0, len(content), max_chunk_size - overlap):
-            chunk = content[i:i + max_chunk_size]
-            chunks.append(chunk)
-            stats.total_chunks += 1
-        
-        # Create DocData object
-        docdata = DocData(
-            section_name=os.path.basename(str(path)),
-            content=content,
-            file_path=str(path),
-            file_size=file_info.st_size,
-            last_modified=datetime.fromtimestamp(file_info.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
-            tags=list(set()) if isinstance(set(), set) else [],
-            metadata=metadata
-        )
-        # Set chunks as an attribute
-        docdata.chunks = chunks
-        docdata.relative_path = rel_path
+        # Token-budget chunking for LLM-ready output: one DocData per chunk
+        if max_chunk_tokens:
+            counter = get_token_counter(tokenizer_name)
+            metadata["chunking"] = {"max_tokens": max_chunk_tokens, "tokenizer": counter.name}
+            chunks = [
+                content[s:e] for s, e in iter_token_chunk_spans(content, max_chunk_tokens, counter, overlap_tokens)
+            ] or [content]
+            last_modified = datetime.fromtimestamp(file_info.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+            docdatas = []
+            for i, chunk in enumerate(chunks):
+                dd = DocData(
+                    section_name=path.name if len(chunks) == 1 else f"{path.name}_Part_{i + 1}",
+                    content=chunk,
+                    file_path=str(path),
+                    file_size=file_info.st_size,
+                    last_modified=last_modified,
+                    is_chunked=len(chunks) > 1,
+                    chunk_index=i,
+                    total_chunks=len(chunks),
+                    metadata=dict(metadata)
+                )
+                dd.relative_path = rel_path
+                docdatas.append(dd)
+            stats.total_chunks += len(docdatas)
+        else:
+            # Simple chunking
+            chunks = []
+            for i in range(0, len(content), max_chunk_size - overlap):
+                chunks.append(content[i:i + max_chunk_size])
+            stats.total_chunks += len(chunks)
+            
+            # Create DocData object
+            docdata = DocData(
+                section_name=os.path.basename(str(path)),
+                content=content,
+                file_path=str(path),
+                file_size=file_info.st_size,
+                last_modified=datetime.fromtimestamp(file_info.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+                tags=list(set()) if isinstance(set(), set) else [],
+                metadata=metadata
+            )
+            # Set chunks as an attribute
+            docdata.chunks = chunks
+            docdata.relative_path = rel_path
+            docdatas = [docdata]
         
         # Update statistics
         stats.processed_files += 1
@@ -7164,7 +7572,7 @@ def safe_process(
         if progress_callback:
             progress_callback(stats.processed_files, stats.total_files, "processing")
         
-        return (primary_lib, [docdata])
+        return (primary_lib, docdatas)
     except ProcessTimeoutError:
         logging.error(f"Timeout processing file: {file_path}")
         stats.error_files += 1
@@ -7179,82 +7587,730 @@ def safe_process(
             timeout_thread.cancel()
 
 
-def process_all_files(
-    root_directory: str,
-    output_file: str,
-    max_chunk_size: int = DEFAULT_MAX_CHUNK_SIZE,
-    executor_type: str = "thread",
-    max_workers: Optional[int] = None,
-    stop_words: Set[str] = DEFAULT_STOP_WORDS,
-    use_cache: bool = False,
-    valid_extensions: List[str] = DEFAULT_VALID_EXTENSIONS,
-    ignore_dirs: str = "venv,node_modules,.git,__pycache__,dist,build",
-    stats_only: bool = False,
-    include_binary_detection: bool = True,
+def is_streamed_text_file(file_path: str, file_size: int) -> bool:
+    """
+    Whether safe_process streams this file instead of reading it whole.
+
+    Streamed text files are never held in memory, so max_file_size does not
+    apply to them; binary files above the threshold are still skipped.
+    """
+    return file_size > STREAM_READ_THRESHOLD and not is_binary_file(file_path)
+
+
+def process_large_text_file(
+    path: Path,
+    rel_path: str,
+    stats: FileStats,
+    max_chunk_size: int,
     overlap: int = DEFAULT_CHUNK_OVERLAP,
-    max_file_size: int = MAX_FILE_SIZE,
-    timeout: int = DEFAULT_PROCESS_TIMEOUT,
-    memory_limit: int = DEFAULT_MEMORY_LIMIT,
+    start_time: Optional[float] = None,
+    max_chunk_tokens: int = 0,
+    overlap_tokens: int = 0,
+    tokenizer_name: Optional[str] = None,
     progress_callback: Optional[Callable[[int, int, str], None]] = None,
-    stats_obj = None,  # Remove the type annotation to avoid circular import
-    file_filter: Optional[Callable[[str], bool]] = None,
-    log_level: int = logging.INFO,
-    log_file: Optional[str] = None,
-    error_on_empty: bool = False,
-    include_failed_files: bool = False
-) -> Dict[str, Any]:
+    doc_sink: Optional[Callable[[str, List[DocData]], None]] = None
+) -> Tuple[str, List[DocData]]:
     """
-    Process all files in the root_directory with enhanced PDF handling and error recovery.
+    Stream a large text file through the chunker (used by safe_process).
+
+    The encoding is detected once from a prefix sample, blocks are decoded
+    incrementally and fed to iter_file_chunks (or iter_file_token_chunks),
+    and each chunk becomes its own DocData. With a doc_sink the documents are
+    handed over in batches of STREAM_DOC_BATCH as they are produced and none
+    are returned, so memory stays flat however large the file is; their
+    total_chunks is 0 because the count is not known until the end.
     
     Args:
-        root_directory: Base directory to process
-        output_file: Path to output JSON file
-        max_chunk_size: Maximum size of text chunks
-        executor_type: Type of executor ("thread", "process", or "none")
-        max_workers: Maximum number of worker threads/processes
-        stop_words: Set of words to ignore in tag generation
-        use_cache: Whether to use file caching
-        valid_extensions: List of file extensions to process
-        ignore_dirs: Comma-separated list of directories to ignore
-        stats_only: Whether to only generate statistics
-        include_binary_detection: Whether to detect and skip binary files
-        overlap: Number of characters to overlap between chunks
-        max_file_size: Maximum file size to process
-        timeout: Maximum processing time per file in seconds
-        memory_limit: Maximum memory usage before forcing garbage collection
-        progress_callback: Optional callback for progress reporting
-        stats_obj: Optional statistics object to use
-        file_filter: Optional function to filter files
-        log_level: Logging level
-        log_file: Optional log file path
-        error_on_empty: Whether to error if no files are found
-        include_failed_files: Whether to include details of failed files in output
+        path: Path to the file
+        rel_path: Path relative to the processing root
+        stats: Statistics object
+        max_chunk_size: Maximum chunk size
+        overlap: Chunk overlap size
+        start_time: When processing of this file started
+        max_chunk_tokens: If set, chunk to this token budget instead of max_chunk_size characters
+        overlap_tokens: Token overlap between chunks in token mode
+        tokenizer_name: Tokenizer for token mode (see TokenCounter)
+        progress_callback: Progress callback function
+        doc_sink: Optional callable receiving (primary_library, docs) batches
         
     Returns:
-        Dictionary with statistics and processed data
+        Tuple of (primary_library, list_of_docdata); the list is empty with a doc_sink
     """
-    # Setup logging with specified options
-    global logger
-    # Safely use setup_logging function
-    if 'setup_logging' in globals():
-        logger = setup_logging(log_level, log_file)
+    start_time = start_time or time.time()
+    file_info = path.stat()
+    encoding = detect_text_encoding(str(path))
+    primary_lib = Path(rel_path).parts[0] if len(Path(rel_path).parts) > 0 else "root"
+    last_modified = datetime.fromtimestamp(file_info.st_mtime)
+    metadata = {
+        "file_name": path.name,
+        "file_path": str(path),
+        "file_size": file_info.st_size,
+        "file_extension": path.suffix.lower(),
+        "last_modified": last_modified.isoformat(),
+        "relative_path": rel_path,
+        "encoding": encoding,
+        "streamed": True
+    }
+
+    if max_chunk_tokens:
+        counter = get_token_counter(tokenizer_name)
+        metadata["chunking"] = {"max_tokens": max_chunk_tokens, "tokenizer": counter.name}
+        chunks = iter_file_token_chunks(
+            str(path), max_chunk_tokens, counter, overlap_tokens, encoding, STREAM_BUFFER_SIZE
+        )
     else:
-        # Fallback if setup_logging not available
-        logger = logging.getLogger("file_processor")
-        logger.setLevel(log_level)
-        # Add a handler if necessary
-        if not logger.handlers:
-            handler = logging.StreamHandler()
-            handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-            logger.addHandler(handler)
-            # Add file handler if specified
-            if log_file:
-                file_handler = logging.FileHandler(log_file)
-                file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-                logger.addHandler(file_handler)
-    
-    start_time = time.time()
+        chunks = iter_file_chunks(str(path), max_chunk_size, overlap, encoding, STREAM_BUFFER_SIZE)
+
+    docdatas = []
+    chunk_count = 0
+    for chunk in chunks:
+        docdatas.append(DocData(
+            section_name=f"{path.name}_Part_{chunk_count + 1}",
+            content=chunk,
+            file_path=str(path),
+            file_size=file_info.st_size,
+            last_modified=last_modified.strftime("%Y-%m-%d %H:%M:%S"),
+            is_chunked=True,
+            chunk_index=chunk_count,
+            total_chunks=0,
+            metadata=dict(metadata)
+        ))
+        chunk_count += 1
+        if doc_sink is not None and len(docdatas) >= STREAM_DOC_BATCH:
+            doc_sink(primary_lib, docdatas)
+            docdatas = []
+
+    if doc_sink is not None:
+        if docdatas:
+            doc_sink(primary_lib, docdatas)
+        docdatas = []
+    else:
+        for dd in docdatas:
+            dd.total_chunks = chunk_count
+
+    stats.total_chunks += chunk_count
+    stats.processed_files += 1
+    stats.total_bytes += file_info.st_size
+    stats.total_processing_time += (time.time() - start_time)
+    if progress_callback:
+        progress_callback(stats.processed_files, stats.total_files, "processing")
+    return (primary_lib, docdatas)
+
+
+def process_file_in_worker(
+    file_path: str,
+    config: Dict[str, Any]
+) -> Tuple[str, Optional[str], List[Dict[str, Any]], Dict[str, Union[int, float]], Optional[str], Optional[str]]:
+    """
+    Process one file inside a worker process.
+
+    Only picklable values cross the process boundary: the worker gets a path and
+    a plain config dict, keeps its own FileStats, and returns the documents as
+    dictionaries together with the stats it accumulated so the parent can merge
+    them and report progress. If config has a spool_dir, the documents of very
+    large (streamed) text files are written there as JSONL instead of being
+    returned, and the spool file's path is returned for the parent to copy.
+
+    Args:
+        file_path: Path to the file
+        config: Processing options (root_directory, max_chunk_size, stop_words,
+            include_binary_detection, overlap, max_file_size, timeout, tag_cache_path,
+            max_chunk_tokens, overlap_tokens, tokenizer_name, spool_dir)
+
+    Returns:
+        Tuple of (file_path, primary_library or None on failure, list_of_doc_dicts,
+        stats_delta, spool_path or None, content_hash or None; see safe_process's fingerprint)
+    """
+    local_stats = FileStats()
+    fingerprint: Dict[str, Any] = {}
+    spool = None
+    spool_path = None
+    doc_sink = None
+    if config.get("spool_dir"):
+        def doc_sink(lib: str, docs: List[DocData]) -> None:
+            nonlocal spool, spool_path
+            if spool is None:
+                fd, spool_path = tempfile.mkstemp(suffix=".jsonl", dir=config["spool_dir"])
+                spool = os.fdopen(fd, "w", encoding="utf-8")
+            for d in docs:
+                spool.write(encode_json(d.to_dict()))
+                spool.write("\n")
+
+    if config.get("tag_cache_path"):
+        configure_tag_cache(db_path=config["tag_cache_path"])
+    hits_before, misses_before = TAG_CACHE.counters()
+    try:
+        if file_path.lower().endswith('.pdf'):
+            out = process_pdf_safely(
+                file_path,
+                config["root_directory"],
+                local_stats,
+                config["max_chunk_size"],
+                config["max_chunk_tokens"],
+                config["overlap_tokens"],
+                config["tokenizer_name"]
+            )
+        else:
+            out = safe_process(
+                Path(file_path),
+                config["root_directory"],
+                config["max_chunk_size"],
+                config["stop_words"],
+                config["include_binary_detection"],
+                local_stats,
+                config["overlap"],
+                config["max_file_size"],
+                config["timeout"],
+                None,
+                config["max_chunk_tokens"],
+                config["overlap_tokens"],
+                config["tokenizer_name"],
+                doc_sink,
+                fingerprint
+            )
+    except Exception as e:
+        logger.error(f"Worker failed on {file_path}: {e}")
+        local_stats.error_files += 1
+        out = None
+
+    if spool is not None:
+        spool.close()
+        if not out:
+            os.remove(spool_path)
+            spool_path = None
+
+    hits_after, misses_after = TAG_CACHE.counters()
+    local_stats.tag_cache_hits += hits_after - hits_before
+    local_stats.tag_cache_misses += misses_after - misses_before
+    TAG_CACHE.flush()
+
+    if not out:
+        return file_path, None, [], local_stats.counters(), None, None
+
+    lib, docs = out
+    return (file_path, lib, [d.to_dict() for d in docs], local_stats.counters(), spool_path,
+            fingerprint.get("content_hash"))
+
+
+# -----------------------------------------------------------------------------
+# FILE DISCOVERY
+# -----------------------------------------------------------------------------
+def discover_files(
+    root_directory: str,
+    valid_extensions: List[str],
+    ignore_dirs: List[str],
+    max_file_size: int = MAX_FILE_SIZE,
+    file_filter: Optional[Callable[[str], bool]] = None,
+    skipped: Optional[List[Dict[str, Any]]] = None
+):
+    """
+    Walk root_directory with os.scandir and yield matching files.
+
+    Ignored directories are pruned before descending, extensions are matched
+    against a set, and each file is stat'ed once; the stat result is yielded
+    with the path so later stages (size limit, cache and manifest checks) do
+    not touch the file system again.
+
+    Args:
+        root_directory: Base directory to walk
+        valid_extensions: File extensions to include
+        ignore_dirs: Directory names to skip entirely
+        max_file_size: Files larger than this (except PDFs) are skipped
+        file_filter: Optional predicate on the file path
+        skipped: Optional list that receives records of skipped files
+
+    Yields:
+        Tuples of (Path, os.stat_result)
+    """
+    extensions = {ext.lower() for ext in valid_extensions}
+    ignored = set(ignore_dirs)
+    stack = [str(Path(root_directory))]
+
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning(f"Error accessing directory {current}: {e}")
+            if skipped is not None:
+                skipped.append({"file_path": current, "reason": f"access_error: {str(e)}"})
+            continue
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in ignored:
+                        subdirs.append(entry.path)
+                    continue
+                if name in ignored or not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in extensions:
+                continue
+
+            # Apply custom filter if provided
+            if file_filter and not file_filter(entry.path):
+                continue
+
+            # Skip files that are too large (except PDFs)
+            try:
+                st = entry.stat()
+            except OSError as e:
+                # Log error but continue processing other files
+                logger.warning(f"Error accessing file {entry.path}: {e}")
+                if skipped is not None:
+                    skipped.append({"file_path": entry.path, "reason": f"access_error: {str(e)}"})
+                continue
+            if st.st_size > max_file_size and ext != '.pdf' and not is_streamed_text_file(entry.path, st.st_size):
+                logger.info(f"Skipping large file during discovery: {entry.path} ({st.st_size} bytes)")
+                if skipped is not None:
+                    skipped.append({"file_path": entry.path, "size": st.st_size, "reason": "file_too_large"})
+                continue
+
+            yield Path(entry.path), st
+
+        # Descend in sorted order (pushed reversed so the stack pops them in order)
+        stack.extend(sorted(subdirs, reverse=True))
+
+
+def iter_in_background(iterable, max_queued: int = 10000):
+    """
+    Run an iterator in a background thread and yield its items as they arrive.
+
+    Used to overlap file discovery with processing. At most max_queued items
+    are buffered; exceptions raised by the producer are re-raised in the consumer.
+    """
+    import queue
+
+    sentinel = object()
+    q = queue.Queue(maxsize=max_queued)
+    errors = []
+
+    def producer():
+        try:
+            for item in iterable:
+                q.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            q.put(sentinel)
+
+    thread = threading.Thread(target=producer, daemon=True, name="file-discovery")
+    thread.start()
+    while True:
+        item = q.get()
+        if item is sentinel:
+            break
+        yield item
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+# -----------------------------------------------------------------------------
+# INCREMENTAL PROCESSING MANIFEST
+# -----------------------------------------------------------------------------
+def count_output_chunks(docs: List[Union[DocData, Dict[str, Any]]]) -> int:
+    """
+    Number of chunks a file's output accounts for in FileStats.total_chunks.
+
+    Documents that carry their chunks in a chunks attribute (safe_process)
+    count each of those; every other document is one chunk.
+    """
+    return sum(len(getattr(d, "chunks", None) or ()) or 1 for d in docs)
+
+
+def hash_file_contents(file_path: str, buffer_size: int = 1024 * 1024) -> str:
+    """
+    Calculate the MD5 hash of a file's raw bytes without loading it into memory.
+
+    Args:
+        file_path: Path to the file
+        buffer_size: Read buffer size in bytes
+
+    Returns:
+        Hex digest of the file contents
+    """
+    hasher = hashlib.md5()
+    with open(file_path, "rb") as f:
+        while True:
+            block = f.read(buffer_size)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def manifest_config_key(**options: Any) -> str:
+    """
+    Fingerprint the options that shape a file's chunk output.
+
+    Manifest rows written under a different fingerprint are treated as misses,
+    so changing e.g. the chunk size or tokenizer reprocesses every file.
+    MANIFEST_SCHEMA_VERSION is part of the fingerprint.
+    """
+    normalized = {
+        k: sorted(v) if isinstance(v, (set, frozenset)) else v
+        for k, v in options.items()
+    }
+    normalized["schema_version"] = MANIFEST_SCHEMA_VERSION
+    return hashlib.md5(json.dumps(normalized, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ProcessingManifest:
+    """
+    Persistent SQLite manifest of previously processed files.
+
+    Each row is keyed by file path and stores the file's size, mtime, content
+    hash, the fingerprint of the processing options (see manifest_config_key)
+    and the compressed chunk output of the last run. On the next run a file
+    whose size and mtime are unchanged is reused without being opened; a file
+    whose stat changed is hashed, and reused if its bytes did not. Rows written
+    with different options are never reused.
+    """
+    def __init__(self, db_path: str, config_key: str = ""):
+        self.db_path = db_path
+        self.config_key = config_key
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                content_hash TEXT NOT NULL,
+                config_key TEXT NOT NULL,
+                library TEXT NOT NULL,
+                docs BLOB NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                last_processed TEXT NOT NULL
+            )"""
+        )
+        self.conn.commit()
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, file_path: str, size: int, mtime: float) -> Optional[Tuple[str, List[Dict[str, Any]], int]]:
+        """
+        Return the previous run's output if the file and the options are unchanged.
+
+        Args:
+            file_path: Path to the file
+            size: Current file size in bytes
+            mtime: Current modification time
+
+        Returns:
+            Tuple of (primary_library, list_of_doc_dicts, chunk_count) or None if the file must be processed
+        """
+        row = self.conn.execute(
+            "SELECT size, mtime, content_hash, config_key, library, docs, chunk_count FROM files WHERE path = ?",
+            (file_path,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        old_size, old_mtime, old_hash, old_config, library, docs_blob, chunk_count = row
+        if old_size != size or old_config != self.config_key:
+            self.misses += 1
+            return None
+
+        if old_mtime != mtime:
+            # Touched but possibly unchanged (checkout, copy, sync) - compare bytes
+            try:
+                if hash_file_contents(file_path) != old_hash:
+                    self.misses += 1
+                    return None
+            except OSError as e:
+                logger.debug(f"Manifest hash check failed for {file_path}: {e}")
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE files SET mtime = ? WHERE path = ?", (mtime, file_path))
+            self._maybe_commit()
+
+        try:
+            docs = json.loads(zlib.decompress(docs_blob).decode("utf-8"))
+        except (zlib.error, ValueError) as e:
+            logger.warning(f"Corrupt manifest entry for {file_path}, reprocessing: {e}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return library, docs, chunk_count
+
+    def record(self, file_path: str, library: str, docs: List[Dict[str, Any]], chunk_count: int,
+               size: int, mtime: float, content_hash: Optional[str] = None) -> None:
+        """
+        Store the chunk output of a freshly processed file.
+
+        The fingerprint must describe the bytes the documents were built from:
+        size and mtime as stat'ed before the file was read, and the hash of
+        the bytes the worker read. Without a hash (PDFs, streamed text files)
+        the file is hashed here, and only if its stat has not changed since,
+        so output of older content is never stored under a newer fingerprint.
+
+        Args:
+            file_path: Path to the file
+            library: Primary library the file belongs to
+            docs: List of DocData dictionaries produced for the file
+            chunk_count: Chunks the file added to FileStats.total_chunks
+            size: File size when it was picked for processing
+            mtime: Modification time when it was picked for processing
+            content_hash: hash_file_contents() digest of the bytes that were processed
+        """
+        if content_hash is None:
+            try:
+                st = os.stat(file_path)
+                if st.st_size != size or st.st_mtime != mtime:
+                    logger.debug(f"Not recording {file_path} in manifest: changed while it was processed")
+                    return
+                content_hash = hash_file_contents(file_path)
+            except OSError as e:
+                logger.debug(f"Not recording {file_path} in manifest: {e}")
+                return
+
+        payload = encode_json(docs).encode("utf-8")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files "
+            "(path, size, mtime, content_hash, config_key, library, docs, chunk_count, last_processed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                file_path,
+                size,
+                mtime,
+                content_hash,
+                self.config_key,
+                library,
+                zlib.compress(payload),
+                chunk_count,
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            )
+        )
+        self._maybe_commit()
+
+    def prune(self, root_directory: str, seen_paths: Set[str]) -> int:
+        """
+        Remove entries under root_directory for files that no longer exist.
+
+        Returns:
+            Number of entries removed
+        """
+        prefix = os.path.join(str(root_directory), "")
+        stale = [
+            (path,) for (path,) in self.conn.execute(
+                "SELECT path FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+            )
+            if path not in seen_paths
+        ]
+        if stale:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", stale)
+            self.conn.commit()
+        return len(stale)
+
+    def _maybe_commit(self) -> None:
+        self._pending += 1
+        if self._pending >= MANIFEST_COMMIT_INTERVAL:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        """Commit outstanding writes and close the database."""
+        try:
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+
+# -----------------------------------------------------------------------------
+# STREAMING OUTPUT
+# -----------------------------------------------------------------------------
+class StreamingOutputWriter:
+    """
+    Write processed documents to a JSONL file as soon as they are produced.
+
+    Each line holds one DocData dictionary plus its "library" name. Library
+    metadata is only known at the end of the run, so it is written to a
+    sidecar file (<output_file>.meta.json) by close().
+    """
+    def __init__(self, output_file: str, flush_interval: int = 100):
+        self.output_file = output_file
+        self.metadata_file = f"{output_file}.meta.json"
+        self.flush_interval = flush_interval
+        self.documents_written = 0
+        self.bytes_written = 0
+        outdir = os.path.dirname(output_file)
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+        self._fh = open(output_file, "w", encoding="utf-8")
+
+    def write_docs(self, library: str, doc_dicts: List[Dict[str, Any]]) -> None:
+        """Append one JSON line per document."""
+        for doc in doc_dicts:
+            line = encode_json({"library": library, **doc})
+            self._fh.write(line)
+            self._fh.write("\n")
+            self.bytes_written += len(line) + 1
+            self.documents_written += 1
+            if self.documents_written % self.flush_interval == 0:
+                self._fh.flush()
+
+    def close(self, library_metadata: Dict[str, Any], stats: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Close the JSONL stream and write the metadata sidecar.
+
+        Args:
+            library_metadata: Mapping of library name to its metadata dictionary
+            stats: Optional final statistics to include in the sidecar
+
+        Returns:
+            True if the sidecar was written successfully
+        """
+        self._fh.close()
+        trailer = {
+            "format": "jsonl",
+            "data_file": os.path.basename(self.output_file),
+            "document_count": self.documents_written,
+            "libraries": library_metadata,
+        }
+        if stats is not None:
+            trailer["stats"] = stats
+        try:
+            with open(self.metadata_file, "w", encoding="utf-8") as f:
+                f.write(encode_json(trailer, indent=2))
+            return True
+        except Exception as e:
+            logger.error(f"Error writing metadata sidecar {self.metadata_file}: {e}")
+            return False
+
+
+def iter_jsonl_documents(jsonl_path: str):
+    """
+    Yield document dictionaries from a JSONL file written by StreamingOutputWriter.
+
+    Args:
+        jsonl_path: Path to the JSONL output file
+
+    Yields:
+        One document dictionary per non-empty line
+    """
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def process_all_files(
+    root_directory: str,
+    output_file: str,
+    max_chunk_size: int = DEFAULT_MAX_CHUNK_SIZE,
+    executor_type: str = "thread",
+    max_workers: Optional[int] = None,
+    stop_words: Set[str] = DEFAULT_STOP_WORDS,
+    use_cache: bool = False,
+    valid_extensions: List[str] = DEFAULT_VALID_EXTENSIONS,
+    ignore_dirs: str = "venv,node_modules,.git,__pycache__,dist,build",
+    stats_only: bool = False,
+    include_binary_detection: bool = True,
+    overlap: int = DEFAULT_CHUNK_OVERLAP,
+    max_file_size: int = MAX_FILE_SIZE,
+    timeout: int = DEFAULT_PROCESS_TIMEOUT,
+    memory_limit: int = DEFAULT_MEMORY_LIMIT,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    stats_obj = None,  # Remove the type annotation to avoid circular import
+    file_filter: Optional[Callable[[str], bool]] = None,
+    log_level: int = logging.INFO,
+    log_file: Optional[str] = None,
+    error_on_empty: bool = False,
+    include_failed_files: bool = False,
+    incremental: bool = False,
+    manifest_path: Optional[str] = None,
+    stream_output: bool = False,
+    stream_discovery: bool = False,
+    tag_cache_path: Optional[str] = None,
+    max_chunk_tokens: int = 0,
+    overlap_tokens: int = 0,
+    tokenizer_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Process all files in the root_directory with enhanced PDF handling and error recovery.
+    
+    Args:
+        root_directory: Base directory to process
+        output_file: Path to output JSON file
+        max_chunk_size: Maximum size of text chunks
+        executor_type: Type of executor ("thread", "process", or "none")
+        max_workers: Maximum number of worker threads/processes
+        stop_words: Set of words to ignore in tag generation
+        use_cache: Whether to use file caching
+        valid_extensions: List of file extensions to process
+        ignore_dirs: Comma-separated list of directories to ignore
+        stats_only: Whether to only generate statistics
+        include_binary_detection: Whether to detect and skip binary files
+        overlap: Number of characters to overlap between chunks
+        max_file_size: Maximum file size to process
+        timeout: Maximum processing time per file in seconds
+        memory_limit: Maximum memory usage before forcing garbage collection
+        progress_callback: Optional callback for progress reporting
+        stats_obj: Optional statistics object to use
+        file_filter: Optional function to filter files
+        log_level: Logging level
+        log_file: Optional log file path
+        error_on_empty: Whether to error if no files are found
+        include_failed_files: Whether to include details of failed files in output
+        incremental: Reuse chunk output of unchanged files from the previous run's manifest
+        manifest_path: Optional manifest database path (defaults to MANIFEST_FILE next to output_file)
+        stream_output: Write documents to output_file as JSONL as each file completes instead of
+            building the whole corpus in memory; library metadata goes to <output_file>.meta.json
+        stream_discovery: Start processing files while the directory walk is still running
+        tag_cache_path: Optional SQLite file that persists the tag cache across runs
+        max_chunk_tokens: Chunk to this many tokens instead of max_chunk_size characters
+        overlap_tokens: Token overlap between chunks when max_chunk_tokens is set
+        tokenizer_name: Tokenizer used for token chunking: tiktoken encoding name,
+            "hf:<model>", or None for an approximate count
+        
+    Returns:
+        Dictionary with statistics and processed data
+    """
+    # Setup logging with specified options
+    global logger
+    # Safely use setup_logging function
+    if 'setup_logging' in globals():
+        logger = setup_logging(log_level, log_file)
+    else:
+        # Fallback if setup_logging not available
+        logger = logging.getLogger("file_processor")
+        logger.setLevel(log_level)
+        # Add a handler if necessary
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+            logger.addHandler(handler)
+            # Add file handler if specified
+            if log_file:
+                file_handler = logging.FileHandler(log_file)
+                file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+                logger.addHandler(file_handler)
+    
+    start_time = time.time()
     stats = stats_obj if stats_obj else FileStats()
+
+    # Tag cache: optional disk backing, and a baseline for this run's hit/miss counts
+    if tag_cache_path:
+        try:
+            configure_tag_cache(db_path=tag_cache_path)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Could not open tag cache {tag_cache_path}, using memory only: {e}")
+            tag_cache_path = None
+    tag_hits_start, tag_misses_start = TAG_CACHE.counters()
     
     # Create list of directories to ignore
     ig_list = [d.strip() for d in ignore_dirs.split(",") if d.strip()]
@@ -7266,57 +8322,12 @@ def process_all_files(
     # Find all files matching extensions
     all_files = []
     skipped_during_discovery = []
-    try:
-        for p in rroot.rglob("*"):
-            # Skip ignored directories
-            if any(ig in p.parts for ig in ig_list):
-                continue
-                
-            # Only process files that match extensions
-            if p.is_file() and any(p.suffix.lower() == ext.lower() for ext in valid_extensions):
-                # Apply custom filter if provided
-                if file_filter and not file_filter(str(p)):
-                    continue
-                
-                # Skip files that are too large (except PDFs)
-                try:
-                    size = p.stat().st_size
-                    if size > max_file_size and not p.suffix.lower() == '.pdf':
-                        logger.info(f"Skipping large file during discovery: {p} ({size} bytes)")
-                        skipped_during_discovery.append({
-                            "file_path": str(p),
-                            "size": size,
-                            "reason": "file_too_large"
-                        })
-                        continue
-                except OSError as e:
-                    # Log error but continue processing other files
-                    logger.warning(f"Error accessing file {p}: {e}")
-                    skipped_during_discovery.append({
-                        "file_path": str(p),
-                        "reason": f"access_error: {str(e)}"
-                    })
-                    continue
-                
-                all_files.append(p)
-    except Exception as e:
-        logger.error(f"Error during file discovery: {e}", exc_info=True)
-        return {
-            "stats": stats.to_dict(),
-            "data": {},
-            "error": str(e),
-            "skipped_files": skipped_during_discovery,
-            "status": "failed"
-        }
+    discovered = discover_files(
+        root_directory, valid_extensions, ig_list, max_file_size, file_filter, skipped_during_discovery
+    )
 
-    discovery_time = time.time() - discovery_start
-    logger.info(f"Found {len(all_files)} valid files in {root_directory} ({discovery_time:.2f}s)")
-    
-    # Set total_files to the actual discovered count
-    stats.total_files = len(all_files)
-    
-    # Check if any files were found
-    if not all_files:
+    def empty_result() -> Dict[str, Any]:
+        """Result returned when discovery finds nothing to process."""
         message = f"No files found in {root_directory} matching the provided criteria"
         if error_on_empty:
             logger.error(message)
@@ -7336,9 +8347,36 @@ def process_all_files(
                 "skipped_files": skipped_during_discovery,
                 "status": "completed"
             }
+
+    if stream_discovery:
+        # Walk the tree in a background thread; files are processed as they are found
+        discovered = iter_in_background(discovered)
+        discovery_time = 0.0
+    else:
+        try:
+            discovered = list(discovered)
+        except Exception as e:
+            logger.error(f"Error during file discovery: {e}", exc_info=True)
+            return {
+                "stats": stats.to_dict(),
+                "data": {},
+                "error": str(e),
+                "skipped_files": skipped_during_discovery,
+                "status": "failed"
+            }
+
+        discovery_time = time.time() - discovery_start
+        logger.info(f"Found {len(discovered)} valid files in {root_directory} ({discovery_time:.2f}s)")
+        
+        # Set total_files to the actual discovered count
+        stats.total_files = len(discovered)
+        
+        # Check if any files were found
+        if not discovered:
+            return empty_result()
     
-    if progress_callback:
-        progress_callback(0, len(all_files), "discovery")
+    if progress_callback and not stream_discovery:
+        progress_callback(0, stats.total_files, "discovery")
 
     # Load cache if enabled
     processed_cache = {}
@@ -7362,35 +8400,157 @@ def process_all_files(
             except Exception as e:
                 logger.warning(f"Cache load error: {e}")
 
-    # Filter files that need processing
-    to_process = []
-    for fpath in all_files:
-        sp = str(fpath)
-        
-        # Skip unchanged files if they're in cache
-        if use_cache and sp in processed_cache:
+    # Enhanced data structure with additional metadata
+    all_data = {}
+
+    # In streaming mode documents go straight to disk and all_data only keeps metadata
+    writer = None
+    if stream_output and not stats_only:
+        try:
+            writer = StreamingOutputWriter(output_file)
+            logger.info(f"Streaming JSONL output to {output_file}")
+        except OSError as e:
+            logger.error(f"Could not open streaming output {output_file}, buffering in memory: {e}")
+
+    # Streamed large files reach add_library_docs from worker threads too
+    output_lock = threading.Lock()
+
+    def add_library_docs(lib: str, doc_dicts: List[Dict[str, Any]]) -> None:
+        """Append document dictionaries to the output entry for a library."""
+        with output_lock:
+            if lib not in all_data:
+                all_data[lib] = {
+                    "docs_data": [],
+                    "metadata": {
+                        "library_name": lib,
+                        "processed_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "source": "Derived from file structure",
+                        "processor_version": "claude.beta.py 3.0" 
+                    }
+                }
+            if writer is not None:
+                writer.write_docs(lib, doc_dicts)
+                meta = all_data[lib]["metadata"]
+                meta["document_count"] = meta.get("document_count", 0) + len(doc_dicts)
+            else:
+                all_data[lib]["docs_data"].extend(doc_dicts)
+
+    def handle_result(pth: Path, lib: str, docs: List[Union[DocData, Dict[str, Any]]],
+                      chunk_count: Optional[int] = None, content_hash: Optional[str] = None) -> None:
+        """Emit the output of one processed file as soon as it is available."""
+        if chunk_count is None:
+            chunk_count = count_output_chunks(docs)
+        doc_dicts = [d.to_dict() if isinstance(d, DocData) else d for d in docs]
+        add_library_docs(lib, doc_dicts)
+
+        # Record the output so the next incremental run can reuse it; files whose
+        # documents were streamed through doc_sink return none and are not kept
+        picked_stat = picked_stats.pop(str(pth), None)
+        if manifest is not None and doc_dicts and picked_stat is not None:
+            try:
+                manifest.record(str(pth), lib, doc_dicts, chunk_count, *picked_stat, content_hash)
+            except sqlite3.Error as e:
+                logger.warning(f"Manifest write failed for {pth}: {e}")
+
+        # Update cache if enabled
+        if use_cache:
             try:
-                mtime = fpath.stat().st_mtime
+                pst = pth.stat()
+                processed_cache[str(pth)] = {
+                    "mod_time": pst.st_mtime,
+                    "size": pst.st_size,
+                    "chunks": len(docs),
+                    "last_processed": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                }
+            except OSError:
+                # If stat fails, skip caching this file
+                pass
+
+    # Open the incremental manifest if enabled
+    manifest = None
+    # (size, mtime) of files handed to processing, as stat'ed at discovery
+    picked_stats: Dict[str, Tuple[int, float]] = {}
+    if incremental:
+        manifest_db = manifest_path or os.path.join(output_dir, MANIFEST_FILE)
+        try:
+            os.makedirs(os.path.dirname(manifest_db) or ".", exist_ok=True)
+            config_key = manifest_config_key(
+                max_chunk_size=max_chunk_size,
+                overlap=overlap,
+                stop_words=stop_words,
+                max_chunk_tokens=max_chunk_tokens,
+                overlap_tokens=overlap_tokens,
+                tokenizer=get_token_counter(tokenizer_name).name if max_chunk_tokens else None
+            )
+            manifest = ProcessingManifest(manifest_db, config_key)
+            logger.info(f"Using incremental manifest at {manifest_db}")
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Could not open manifest {manifest_db}, processing all files: {e}")
+
+    def select_files(candidates):
+        """Yield the discovered files that actually need processing."""
+        nonlocal discovery_time
+        for fpath, st in candidates:
+            all_files.append(fpath)
+            if stream_discovery:
+                stats.total_files += 1
+            sp = str(fpath)
+            
+            # Splice unchanged files from the manifest without reading them
+            if manifest is not None:
+                try:
+                    previous = manifest.lookup(sp, st.st_size, st.st_mtime)
+                except sqlite3.Error as e:
+                    logger.debug(f"Manifest lookup failed for {sp}: {e}")
+                    previous = None
+                if previous is not None:
+                    lib, doc_dicts, chunk_count = previous
+                    add_library_docs(lib, doc_dicts)
+                    stats.reused_files += 1
+                    stats.total_chunks += chunk_count
+                    continue
+                picked_stats[sp] = (st.st_size, st.st_mtime)
+
+            # Skip unchanged files if they're in cache
+            if use_cache and sp in processed_cache:
                 old = processed_cache[sp].get("mod_time", 0)
-                if old >= mtime:
+                if old >= st.st_mtime:
                     stats.skipped_files += 1
                     logger.debug(f"Skipping unchanged file: {sp}")
                     continue
-            except OSError:
-                # If stat fails, process the file anyway
-                pass
-                
-        to_process.append(fpath)
+                    
+            yield fpath
 
-    if not to_process:
-        logger.info("No new or modified files to process.")
-        return {
-            "stats": stats.to_dict(),
-            "data": {},
-            "message": "No new or modified files to process",
-            "skipped_files": skipped_during_discovery,
-            "status": "completed"
-        }
+        if stream_discovery:
+            discovery_time = time.time() - discovery_start
+            logger.info(f"Found {len(all_files)} valid files in {root_directory} ({discovery_time:.2f}s)")
+
+    # Filter files that need processing
+    if stream_discovery:
+        to_process = select_files(discovered)
+        expected_files = None
+    else:
+        to_process = list(select_files(discovered))
+        expected_files = len(to_process)
+        del discovered
+
+        if manifest is not None:
+            logger.info(f"Incremental mode: reused {stats.reused_files} unchanged files, "
+                        f"{len(to_process)} files to process")
+
+        if not to_process and not all_data:
+            if manifest is not None:
+                manifest.close()
+            if writer is not None:
+                writer.close({})
+            logger.info("No new or modified files to process.")
+            return {
+                "stats": stats.to_dict(),
+                "data": {},
+                "message": "No new or modified files to process",
+                "skipped_files": skipped_during_discovery,
+                "status": "completed"
+            }
 
     # Determine optimal number of workers
     if max_workers is None:
@@ -7403,168 +8563,124 @@ def process_all_files(
 
     logger.info(f"Using {executor_type} executor with max_workers={max_workers}")
 
+    # Picklable options for process workers (no FileStats or callbacks)
+    worker_config = {
+        "root_directory": root_directory,
+        "max_chunk_size": max_chunk_size,
+        "stop_words": set(stop_words),
+        "include_binary_detection": include_binary_detection,
+        "overlap": overlap,
+        "max_file_size": max_file_size,
+        "timeout": timeout,
+        "tag_cache_path": tag_cache_path,
+        "max_chunk_tokens": max_chunk_tokens,
+        "overlap_tokens": overlap_tokens,
+        "tokenizer_name": tokenizer_name,
+        "spool_dir": output_dir if writer is not None else None
+    }
+
+    # With a streaming writer, very large text files hand their documents to the
+    # output in batches instead of returning them all at once
+    doc_sink = None
+    if writer is not None:
+        def doc_sink(lib: str, docs: List[DocData]) -> None:
+            add_library_docs(lib, [d.to_dict() for d in docs])
+
+    def copy_spool(lib: str, spool_path: str) -> None:
+        """Move a process worker's spooled documents into the output."""
+        try:
+            batch = []
+            for doc in iter_jsonl_documents(spool_path):
+                batch.append(doc)
+                if len(batch) >= STREAM_DOC_BATCH:
+                    add_library_docs(lib, batch)
+                    batch = []
+            if batch:
+                add_library_docs(lib, batch)
+        finally:
+            os.remove(spool_path)
+
     # Track errors and processing failures
     processing_failures = []
 
-    # Process files in batches
+    # Process files through a single long-lived executor
     processing_start = time.time()
     
-    # Determine batch size based on file count
+    # Determine checkpoint interval (cache saves, memory checks) based on file count
     batch_size = 100
-    if len(to_process) <= 100:
+    if expected_files is None:
+        batch_size = 100  # Total unknown while discovery is still running
+    elif expected_files <= 100:
         batch_size = 20
-    elif len(to_process) <= 500:
+    elif expected_files <= 500:
         batch_size = 50
-    elif len(to_process) <= 2000:
+    elif expected_files <= 2000:
         batch_size = 100
     else:
         batch_size = 200
-    
-    # Enhanced data structure with additional metadata
-    all_data = {}
-    
-    # Process in batches to manage memory usage
-    for i in range(0, len(to_process), batch_size):
-        batch = to_process[i:i+batch_size]
-        batch_num = i // batch_size + 1
-        total_batches = (len(to_process) + batch_size - 1) // batch_size
-        logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} files)")
-        
-        results = []
-        
-        # Different processing strategies based on executor type
-        if executor_type == "none":
-            # Sequential processing
-            for p in batch:
-                # Special handling for PDFs
-                if str(p).lower().endswith('.pdf'):
-                    result = process_pdf_safely(str(p), root_directory, stats, max_chunk_size)
-                    if result:
-                        results.append((p, result))
-                    else:
-                        # Track processing failure
-                        processing_failures.append({
-                            "file_path": str(p),
-                            "reason": "pdf_processing_failed"
-                        })
-                else:
-                    # Standard processing for non-PDF files
-                    r = safe_process(
-                        p, root_directory, max_chunk_size, stop_words, 
-                        include_binary_detection, stats, overlap, max_file_size, 
-                        timeout, progress_callback
-                    )
-                    if r:
-                        results.append((p, r))
-                    else:
-                        # Track processing failure
-                        processing_failures.append({
-                            "file_path": str(p),
-                            "reason": "processing_failed"
-                        })
-                
-                # Check memory usage and trigger garbage collection if needed
-                try:
-                    import psutil
-                    process = psutil.Process()
-                    memory_info = process.memory_info()
-                    if memory_info.rss > memory_limit:
-                        logger.warning(f"Memory usage ({memory_info.rss / 1024 / 1024:.1f} MB) exceeded limit. Triggering GC.")
-                        gc.collect()
-                except ImportError:
-                    pass  # psutil not available
+
+    # Number of files allowed in flight at once: enough to keep every worker busy
+    # while finished results are consumed, small enough to bound memory
+    max_in_flight = max(max_workers * PIPELINE_QUEUE_FACTOR, 1)
+
+    def submit_file(ex, p: Path):
+        """Submit one file to the executor; returns the future and the file's fingerprint dict."""
+        if executor_type == "process":
+            # Workers only get the path and a plain config; stats come back with the result
+            return ex.submit(process_file_in_worker, str(p), worker_config), None
+        if str(p).lower().endswith('.pdf'):
+            return ex.submit(
+                process_pdf_safely, str(p), root_directory, stats, max_chunk_size,
+                max_chunk_tokens, overlap_tokens, tokenizer_name
+            ), None
+        fingerprint = {}
+        return ex.submit(
+            safe_process,
+            p,
+            root_directory,
+            max_chunk_size,
+            stop_words,
+            include_binary_detection,
+            stats,
+            overlap,
+            max_file_size,
+            timeout,
+            progress_callback,
+            max_chunk_tokens,
+            overlap_tokens,
+            tokenizer_name,
+            doc_sink,
+            fingerprint
+        ), fingerprint
+
+    def consume_output(pth: Path, out, failure_reason: str = "processing_failed",
+                       chunk_count: Optional[int] = None, content_hash: Optional[str] = None) -> None:
+        """Hand a finished file's output to the writer or record the failure."""
+        if out:
+            handle_result(pth, *out, chunk_count=chunk_count, content_hash=content_hash)
         else:
-            # Parallel processing
-            Exec = ThreadPoolExecutor if executor_type == "thread" else ProcessPoolExecutor
-            with Exec(max_workers=max_workers) as ex:
-                # Submit all tasks with special handling for PDFs
-                fut_map = {}
-                for p in batch:
-                    if str(p).lower().endswith('.pdf'):
-                        # Submit PDF processing task
-                        fut = ex.submit(
-                            process_pdf_safely,
-                            str(p),
-                            root_directory,
-                            stats,
-                            max_chunk_size
-                        )
-                    else:
-                        # Submit standard file processing task
-                        fut = ex.submit(
-                            safe_process, 
-                            p, 
-                            root_directory, 
-                            max_chunk_size, 
-                            stop_words, 
-                            include_binary_detection, 
-                            stats,
-                            overlap,
-                            max_file_size,
-                            timeout,
-                            progress_callback
-                        )
-                    fut_map[fut] = p
-                
-                # Process results as they complete
-                for fut in as_completed(fut_map):
-                    pth = fut_map[fut]
-                    try:
-                        out = fut.result()
-                        if out:
-                            results.append((pth, out))
-                        else:
-                            # Track processing failure
-                            processing_failures.append({
-                                "file_path": str(pth),
-                                "reason": "processing_failed"
-                            })
-                    except Exception as fut_err:
-                        # Handle exceptions from future
-                        logger.error(f"Error in future for {pth}: {fut_err}")
-                        processing_failures.append({
-                            "file_path": str(pth),
-                            "reason": f"future_error: {str(fut_err)}"
-                        })
+            picked_stats.pop(str(pth), None)
+            # Track processing failure
+            processing_failures.append({
+                "file_path": str(pth),
+                "reason": failure_reason
+            })
 
-        # Aggregate results into the output data structure
-        for pth, (lib, docs) in results:
-            if lib not in all_data:
-                all_data[lib] = {
-                    "docs_data": [],
-                    "metadata": {
-                        "library_name": lib,
-                        "processed_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "source": "Derived from file structure",
-                        "processor_version": "claude.beta.py 3.0" 
-                    }
-                }
-            
-            # Add document data
-            all_data[lib]["docs_data"].extend(d.to_dict() for d in docs)
-            
-            # Update cache if enabled
-            if use_cache:
-                try:
-                    processed_cache[str(pth)] = {
-                        "mod_time": pth.stat().st_mtime,
-                        "size": pth.stat().st_size,
-                        "chunks": len(docs),
-                        "last_processed": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                except OSError:
-                    # If stat fails, skip caching this file
-                    pass
+    def checkpoint(completed: int) -> None:
+        """Periodically save the cache and keep memory usage in check."""
+        if completed % batch_size != 0:
+            return
+        logger.info(f"Processed {completed}/{expected_files or stats.total_files} files")
 
-        # Periodically save cache for large batches
-        if use_cache and (i + batch_size) % (batch_size * 5) == 0:
+        # Periodically save cache for large runs
+        if use_cache and completed % (batch_size * 5) == 0:
             try:
                 with open(cache_path, "w", encoding="utf-8") as c:
                     json.dump(processed_cache, c, indent=2)
-                logger.info(f"Saved cache after processing {i+batch_size} files.")
+                logger.info(f"Saved cache after processing {completed} files.")
             except Exception as e:
                 logger.warning(f"Cache save error: {e}")
-                
+
         # Check memory usage and trigger garbage collection if needed
         try:
             import psutil
@@ -7576,6 +8692,101 @@ def process_all_files(
         except ImportError:
             pass  # psutil not available
 
+    completed = 0
+    files_iter = iter(to_process)
+
+    # Different processing strategies based on executor type
+    if executor_type == "none":
+        # Sequential processing
+        for p in files_iter:
+            # Special handling for PDFs
+            if str(p).lower().endswith('.pdf'):
+                result = process_pdf_safely(
+                    str(p), root_directory, stats, max_chunk_size,
+                    max_chunk_tokens, overlap_tokens, tokenizer_name
+                )
+                consume_output(p, result, "pdf_processing_failed")
+            else:
+                # Standard processing for non-PDF files
+                fingerprint = {}
+                r = safe_process(
+                    p, root_directory, max_chunk_size, stop_words, 
+                    include_binary_detection, stats, overlap, max_file_size, 
+                    timeout, progress_callback,
+                    max_chunk_tokens, overlap_tokens, tokenizer_name, doc_sink, fingerprint
+                )
+                consume_output(p, r, content_hash=fingerprint.get("content_hash"))
+            completed += 1
+            checkpoint(completed)
+    else:
+        # Parallel processing: one executor for the whole run, fed through a sliding window
+        Exec = ThreadPoolExecutor if executor_type == "thread" else ProcessPoolExecutor
+        logger.info(f"Pipelining {expected_files if expected_files is not None else 'streamed'} files "
+                    f"with up to {max_in_flight} in flight")
+        with Exec(max_workers=max_workers) as ex:
+            in_flight = {}
+            for p in files_iter:
+                fut, fingerprint = submit_file(ex, p)
+                in_flight[fut] = (p, fingerprint)
+                if len(in_flight) >= max_in_flight:
+                    break
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    pth, fingerprint = in_flight.pop(fut)
+
+                    # Refill the window before handling the result so workers never idle
+                    nxt = next(files_iter, None)
+                    if nxt is not None:
+                        nxt_fut, nxt_fingerprint = submit_file(ex, nxt)
+                        in_flight[nxt_fut] = (nxt, nxt_fingerprint)
+
+                    try:
+                        out = fut.result()
+                        chunk_count = None
+                        content_hash = fingerprint.get("content_hash") if fingerprint else None
+                        if executor_type == "process":
+                            _, lib, doc_dicts, stats_delta, spool_path, content_hash = out
+                            stats.merge(stats_delta)
+                            if spool_path:
+                                copy_spool(lib, spool_path)
+                            out = (lib, doc_dicts) if lib is not None else None
+                            chunk_count = stats_delta.get("total_chunks", 0)
+                        consume_output(pth, out, chunk_count=chunk_count, content_hash=content_hash)
+                    except Exception as fut_err:
+                        # Handle exceptions from future
+                        logger.error(f"Error in future for {pth}: {fut_err}")
+                        picked_stats.pop(str(pth), None)
+                        processing_failures.append({
+                            "file_path": str(pth),
+                            "reason": f"future_error: {str(fut_err)}"
+                        })
+
+                    # Child processes cannot call back into the parent, so report progress here
+                    if executor_type == "process" and progress_callback:
+                        progress_callback(stats.processed_files, stats.total_files, "processing")
+
+                    completed += 1
+                    checkpoint(completed)
+
+    # Tag cache activity in this process (process workers report theirs via stats deltas)
+    tag_hits_end, tag_misses_end = TAG_CACHE.counters()
+    stats.tag_cache_hits += tag_hits_end - tag_hits_start
+    stats.tag_cache_misses += tag_misses_end - tag_misses_start
+    TAG_CACHE.flush()
+
+    if stream_discovery:
+        if manifest is not None:
+            logger.info(f"Incremental mode: reused {stats.reused_files} unchanged files, "
+                        f"processed {completed}")
+        if not all_files:
+            if manifest is not None:
+                manifest.close()
+            if writer is not None:
+                writer.close({})
+            return empty_result()
+
     # Add overall processing metadata
     processing_time = time.time() - processing_start
     total_time = time.time() - start_time
@@ -7592,6 +8803,7 @@ def process_all_files(
                 "total_files_processed": stats.processed_files,
                 "total_files_skipped": stats.skipped_files,
                 "total_files_error": stats.error_files,
+                "total_files_reused": stats.reused_files,
                 "total_chunks": stats.total_chunks,
                 "max_chunk_size": max_chunk_size,
                 "chunk_overlap": overlap,
@@ -7617,7 +8829,15 @@ def process_all_files(
                 all_data[lib][metakey]["skipped_during_discovery"] = skipped_during_discovery
 
     # Write output JSON unless stats_only mode
-    if not stats_only:
+    if writer is not None:
+        # Documents are already on disk; finish with the metadata sidecar
+        library_metadata = {lib: entry["metadata"] for lib, entry in all_data.items()}
+        if writer.close(library_metadata, stats.to_dict()):
+            logger.info(f"Streamed {writer.documents_written} documents to {output_file} "
+                        f"(metadata: {writer.metadata_file})")
+        if progress_callback:
+            progress_callback(100, 100, "completed")
+    elif not stats_only:
         try:
             # FIX: Make sure output directory exists, but properly handle drive letters
             # Get just the directory part of the output_file path
@@ -7705,6 +8925,16 @@ def process_all_files(
             if progress_callback:
                 progress_callback(0, 0, "error")
 
+    # Drop manifest entries for deleted files and flush it
+    if manifest is not None:
+        try:
+            removed = manifest.prune(str(rroot), {str(p) for p in all_files})
+            if removed:
+                logger.info(f"Removed {removed} deleted files from manifest")
+            manifest.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Manifest finalization error: {e}")
+
     # Save final cache state
     if use_cache:
         try:
@@ -7743,6 +8973,10 @@ def process_all_files(
         "message": f"Successfully processed {stats.processed_files} files",
         "output_file": output_file  # Return the potentially updated output file path
     }
+
+    if writer is not None:
+        result["output_format"] = "jsonl"
+        result["metadata_file"] = writer.metadata_file
     
     # Include failure information if requested
     if include_failed_files:
@@ -7779,8 +9013,10 @@ class CustomJSONEncoder(json.JSONEncoder):
     2. Handles byte arrays with proper encoding detection
     3. Has special handling for DocData objects
     4. Provides fallbacks for non-serializable objects
-    5. Can handle very large string content with memory efficiency
-    6. Handles sets, tuples, and other Python-specific types
+    5. Handles sets, tuples, and other Python-specific types
+
+    Used where the fast backends in json_output are not installed; see
+    encode_json().
     """
     def default(self, obj):
         # Handle datetime objects
@@ -7829,80 +9065,7 @@ class CustomJSONEncoder(json.JSONEncoder):
         except TypeError:
             # Fallback for non-serializable objects
             return str(obj)
-            
-    def iterencode(self, obj, _one_shot=False):
-        """
-        Overriden iterencode to handle large string content more efficiently.
-        Special handling for DocData objects to process content fields in chunks.
-        """
-        # Special handling for very large strings
-        if isinstance(obj, str) and len(obj) > 50000:
-            # For large strings, handle them in chunks
-            yield '"'
-            # Process string in chunks to avoid memory issues
-            chunk_size = 16384  # 16KB chunks
-            for i in range(0, len(obj), chunk_size):
-                chunk = obj[i:i+chunk_size]
-                # Escape backslashes and quotes
-                chunk = chunk.replace('\\', '\\\\').replace('"', '\\"')
-                # Replace newlines and carriage returns
-                chunk = chunk.replace('\n', '\\n').replace('\r', '\\r')
-                # Replace control characters
-                chunk = re.sub(r'[\x00-\x1f]', lambda m: f'\\u{ord(m.group(0)):04x}', chunk)
-                yield chunk
-            yield '"'
-        # Special handling for dictionaries that contain large content fields
-        elif isinstance(obj, dict) and "content" in obj and isinstance(obj["content"], str) and len(obj["content"]) > 50000:
-            # Start the object
-            yield '{'
-            
-            first = True
-            # Process all fields except content first
-            for key, value in obj.items():
-                if key != "content":
-                    if first:
-                        first = False
-                    else:
-                        yield ','
-                    
-                    # Handle the key
-                    yield f'"{key}":'
-                    
-                    # Handle the value using the parent class implementation
-                    for chunk in super().iterencode(value, _one_shot):
-                        yield chunk
-            
-            # Now handle the content field
-            if not first:
-                yield ','
-                
-            yield '"content":'
-            
-            # Large content handling
-            content = obj["content"]
-            yield '"'
-            
-            # Process content in chunks for memory efficiency
-            chunk_size = 16384  # 16KB chunks
-            for i in range(0, len(content), chunk_size):
-                chunk = content[i:i+chunk_size]
-                # Escape backslashes and quotes
-                chunk = chunk.replace('\\', '\\\\').replace('"', '\\"')
-                # Replace newlines and carriage returns
-                chunk = chunk.replace('\n', '\\n').replace('\r', '\\r')
-                # Replace control characters
-                chunk = re.sub(r'[\x00-\x1f]', lambda m: f'\\u{ord(m.group(0)):04x}', chunk)
-                yield chunk
-                
-            yield '"'
-            
-            # Close the object
-            yield '}'
-        else:
-            # For all other objects, use standard encoding
-            for chunk in super().iterencode(obj, _one_shot):
-                yield chunk
-                
+
 class ProcessingTask:
     """
     Task object for file processing with enhanced monitoring,
@@ -8184,7 +9347,11 @@ def read_file_text(file_path: str, memory_limit: int = DEFAULT_MEMORY_LIMIT) ->
 
 def read_large_file(file_path: str) -> str:
     """
-    Read a large text file in chunks to avoid memory issues.
+    Read a large text file in blocks with a single pass over the bytes.
+
+    The encoding is detected once from a prefix sample and the blocks are
+    decoded incrementally, so the file is never re-read per candidate encoding.
+    Prefer iter_file_chunks when the text is only needed chunk by chunk.
     
     Args:
         file_path: Path to the file
@@ -8192,28 +9359,173 @@ def read_large_file(file_path: str) -> str:
     Returns:
         File content as text
     """
-    possible_encs = ["utf-8", "latin-1", "cp1252", "utf-16"]
-    buffer_size = 1024 * 1024  # 1MB buffer
-    content_parts = []
-    
-    for enc in possible_encs:
-        try:
-            content_parts = []
-            with open(file_path, "r", encoding=enc, errors="replace") as f:
-                while True:
-                    chunk = f.read(buffer_size)
-                    if not chunk:
-                        break
-                    content_parts.append(chunk)
-            # Successfully read the file with this encoding
-            return "".join(content_parts)
-        except Exception:
-            continue
+    try:
+        return "".join(iter_file_text(file_path))
+    except (OSError, LookupError) as e:
+        logger.error(f"Failed reading {file_path}: {e}")
+        return ""
+
+# -----------------------------------------------------------------------------
+# TAG GENERATION
+# -----------------------------------------------------------------------------
+# PDF indicator patterns: (compiled pattern, tag, minimum matches required)
+PDF_INDICATOR_PATTERNS = [
+    (re.compile(r'\(\w+\s+et\s+al\.,?\s+\d{4}\)|\[\d+\]'), "citations", 4),
+    (re.compile(r'[\$\\\[\]\(\)\{\}]+|\b[a-z]_[a-z0-9]|\b\d+\.\d+e[+-]\d+'), "mathematics", 11),
+    (re.compile(r'\balgorithm\b|\bprocedure\b|\bfunction\b|\binput\b|\boutput\b|\breturn\b'), "algorithm", 6),
+    (re.compile(r'```|def\s+\w+\(|class\s+\w+[\(:]|\bfunction\s+\w+\('), "code", 4),
+]
+RESEARCH_TERMS = ('methodology', 'hypothesis', 'experiment', 'statistical', 'significance', 'p-value')
+
+TAG_CACHE_SIZE = 50_000  # Content-derived tag sets kept in memory
+
+
+@lru_cache(maxsize=32)
+def _hash_stop_words(stop_words: frozenset) -> str:
+    return hashlib.md5(str(sorted(stop_words)).encode()).hexdigest()
+
+
+def get_stop_words_hash(stop_words: Set[str]) -> str:
+    """Hash a stop word set for tag cache keys; memoized so it is computed once per run."""
+    return _hash_stop_words(frozenset(stop_words))
+
+
+class TagCache:
+    """
+    Size-bounded LRU cache for the content-derived part of generate_smart_tags.
+
+    Keys are (content hash, stop-word hash, extension, doc type, language), so
+    identical content in different files (vendored copies, boilerplate,
+    re-downloaded PDFs) is only analysed once. With a db_path the cache is also
+    persisted in SQLite and survives between runs.
+    """
+    def __init__(self, max_entries: int = TAG_CACHE_SIZE, db_path: Optional[str] = None):
+        from collections import OrderedDict
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._pending = 0
+        self.db_path = None
+        self.hits = 0
+        self.misses = 0
+        if db_path:
+            self.attach_disk(db_path)
+
+    def attach_disk(self, db_path: str) -> None:
+        """Back the cache with an SQLite database at db_path."""
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+            self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS tags (key TEXT PRIMARY KEY, tags TEXT NOT NULL)")
+            self._db.commit()
+            self.db_path = db_path
+
+    def get(self, key: Tuple[str, ...]) -> Optional[Tuple[str, ...]]:
+        with self._lock:
+            tags = self._entries.get(key)
+            if tags is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return tags
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT tags FROM tags WHERE key = ?", ("|".join(key),)).fetchone()
+                except sqlite3.Error as e:
+                    logger.debug(f"Tag cache read failed: {e}")
+                    row = None
+                if row is not None:
+                    tags = tuple(json.loads(row[0]))
+                    self._store(key, tags)
+                    self.hits += 1
+                    return tags
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple[str, ...], tags: Tuple[str, ...]) -> None:
+        with self._lock:
+            self._store(key, tags)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO tags (key, tags) VALUES (?, ?)",
+                        ("|".join(key), json.dumps(tags))
+                    )
+                    self._pending += 1
+                    if self._pending >= 100:
+                        self._db.commit()
+                        self._pending = 0
+                except sqlite3.Error as e:
+                    logger.debug(f"Tag cache write failed: {e}")
+
+    def flush(self) -> None:
+        """Commit pending writes to the disk cache, if any."""
+        with self._lock:
+            if self._db is not None and self._pending:
+                try:
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.debug(f"Tag cache commit failed: {e}")
+                self._pending = 0
+
+    def _store(self, key: Tuple[str, ...], tags: Tuple[str, ...]) -> None:
+        self._entries[key] = tags
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def counters(self) -> Tuple[int, int]:
+        """Return (hits, misses) so callers can report per-run deltas."""
+        return self.hits, self.misses
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        """Commit and detach the disk backing, keeping the in-memory entries."""
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+                self.db_path = None
+
+
+TAG_CACHE = TagCache()
+
+
+def configure_tag_cache(max_entries: Optional[int] = None, db_path: Optional[str] = None) -> TagCache:
+    """
+    Adjust the process-wide tag cache.
+
+    Args:
+        max_entries: New in-memory capacity
+        db_path: Optional SQLite file to persist tags across runs
+
+    Returns:
+        The shared TagCache instance
+    """
+    if max_entries is not None:
+        TAG_CACHE.max_entries = max_entries
+    if db_path and TAG_CACHE.db_path != db_path:
+        TAG_CACHE.attach_disk(db_path)
+    return TAG_CACHE
+
+
+def has_min_matches(pattern: "re.Pattern", text: str, minimum: int) -> bool:
+    """Check whether pattern matches text at least minimum times, stopping as soon as it does."""
+    count = 0
+    for _ in pattern.finditer(text):
+        count += 1
+        if count >= minimum:
+            return True
+    return False
 
-    logger.error(f"Failed reading {file_path} with encodings {possible_encs}")
-    return ""
 
-@lru_cache(maxsize=256)
 def generate_smart_tags(
     section_name: str,
     content: str,
@@ -8224,6 +9536,9 @@ def generate_smart_tags(
 ) -> Tuple[str, ...]:
     """
     Generate smart tags based on content analysis with enhanced PDF support.
+
+    The content-derived tags are memoized in TAG_CACHE by content hash, so
+    repeated content is only analysed once regardless of which file it is in.
     
     Args:
         section_name: Name of the document section
@@ -8249,65 +9564,72 @@ def generate_smart_tags(
     if language != "en":
         base_tags.append(f"lang:{language}")
 
-    # Get keywords specific to this file type
-    file_specific_kw = FILE_TYPE_KEYWORDS.get(ext, DEFAULT_KEYWORDS)
-
     # For very large content, sample from beginning, middle, and end
     if len(content) > 50_000:
         chunk = content[:15_000] + content[len(content)//2 - 7_500 : len(content)//2 + 7_500] + content[-15_000:]
     else:
         chunk = content
-        
+
+    cache_key = (
+        hashlib.md5(chunk.encode("utf-8", errors="surrogatepass")).hexdigest(),
+        stop_words_hash, ext, doc_type, language
+    )
+    content_tags = TAG_CACHE.get(cache_key)
+    if content_tags is None:
+        content_tags = generate_content_tags(chunk, ext)
+        TAG_CACHE.put(cache_key, content_tags)
+
+    # Combine all tag sources and sort for consistent output
+    return tuple(sorted(set(base_tags).union(content_tags)))
+
+
+def generate_content_tags(chunk: str, ext: str) -> Tuple[str, ...]:
+    """
+    Derive keyword, frequency and PDF indicator tags from (sampled) content.
+
+    Args:
+        chunk: Text to analyze
+        ext: Lower-case file extension of the source file
+
+    Returns:
+        Sorted tuple of content tags
+    """
     lowered = chunk.lower()
 
-    # Extract domain-specific keywords that appear in the content
-    found_kws = {kw for kw in file_specific_kw if f" {kw} " in f" {lowered} " or f"\n{kw} " in f"\n{lowered} "}
-    
-    # Extract word frequency
-    tokens = WORD_PATTERN.findall(lowered)
-    freq = Counter(tokens)
-    
-    # Extend stop words with programming keywords
-    all_stop = PROGRAMMING_STOP_WORDS.copy()
+    # Extract domain-specific keywords that appear in the content. A keyword must be
+    # preceded by start/space/newline and followed by space/end; the padded copies
+    # are built once and each lookup is a C-level substring search
+    space_padded = f" {lowered} "
+    newline_padded = f"\n{lowered} "
+    found_kws = {
+        kw for kw in FILE_TYPE_KEYWORDS.get(ext, DEFAULT_KEYWORDS)
+        if f" {kw} " in space_padded or f"\n{kw} " in newline_padded
+    }
     
     # Extract most frequent meaningful terms
+    freq = Counter(WORD_PATTERN.findall(lowered))
     freq_tags = set()
     for w, c in freq.most_common(30):  # Consider more terms for better coverage
-        if len(w) > 2 and c > 1 and not w.isdigit() and w not in found_kws and w not in all_stop:
+        if c < 2:
+            break  # most_common is sorted, nothing after this can qualify
+        if len(w) > 2 and not w.isdigit() and w not in found_kws and w not in PROGRAMMING_STOP_WORDS:
             freq_tags.add(w)
             if len(freq_tags) >= 15:  # Keep more tags for better context
                 break
 
     # Special processing for PDF files - look for key indicators
     if ext == ".pdf":
-        # Look for citation patterns
-        citations = re.findall(r'\(\w+\s+et\s+al\.,?\s+\d{4}\)|\[\d+\]', lowered)
-        if len(citations) > 3:
-            found_kws.add("citations")
-            
-        # Look for mathematical content
-        math_patterns = re.findall(r'[\$\\\[\]\(\)\{\}]+|\b[a-z]_[a-z0-9]|\b\d+\.\d+e[+-]\d+', lowered)
-        if len(math_patterns) > 10:
-            found_kws.add("mathematics")
-            
-        # Look for algorithm descriptions
-        algo_patterns = re.findall(r'\balgorithm\b|\bprocedure\b|\bfunction\b|\binput\b|\boutput\b|\breturn\b', lowered)
-        if len(algo_patterns) > 5:
-            found_kws.add("algorithm")
-            
-        # Look for code listings
-        code_patterns = re.findall(r'```|def\s+\w+\(|class\s+\w+[\(:]|\bfunction\s+\w+\(', lowered)
-        if len(code_patterns) > 3:
-            found_kws.add("code")
+        # Citations, mathematical content, algorithm descriptions and code listings;
+        # each scan stops as soon as its threshold is reached
+        for pattern, tag, minimum in PDF_INDICATOR_PATTERNS:
+            if has_min_matches(pattern, lowered, minimum):
+                found_kws.add(tag)
             
         # Check for research-specific terms
-        research_patterns = ['methodology', 'hypothesis', 'experiment', 'statistical', 'significance', 'p-value']
-        if sum(1 for term in research_patterns if term in lowered) >= 3:
+        if sum(1 for term in RESEARCH_TERMS if term in lowered) >= 3:
             found_kws.add("research")
 
-    # Combine all tag sources and sort for consistent output
-    combined = set(base_tags) | found_kws | freq_tags
-    return tuple(sorted(combined))
+    return tuple(sorted(found_kws | freq_tags))
 
 
 # -----------------------------------------------------------------------------
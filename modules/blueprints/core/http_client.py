@@ -46,8 +46,15 @@ def create_session(max_retries: int = 3, backoff_factor: float = 0.3,
             allowed_methods=["HEAD", "GET", "OPTIONS", "POST"]
         )
         
-        # Create and mount adapter
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Create and mount adapter; GETs are revalidated against the on-disk cache when available
+        try:
+            from http_cache import CachingHTTPAdapter, get_http_cache
+        except ImportError:
+            CachingHTTPAdapter = None
+        if CachingHTTPAdapter is not None and get_http_cache() is not None:
+            adapter = CachingHTTPAdapter(max_retries=retry_strategy)
+        else:
+            adapter = HTTPAdapter(max_retries=retry_strategy)
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
@@ -23,6 +23,12 @@ from blueprints.core.services import ProcessingTask, add_task, emit_progress_upd
 
 logger = logging.getLogger(__name__)
 
+# Fast JSON encoder (orjson/msgspec when installed)
+try:
+    from json_output import dumps as encode_json
+except ImportError:
+    encode_json = None
+
 # Constants - fallback values in case import from structify fails
 DEFAULT_MAX_CHUNK_SIZE = 4096
 DEFAULT_CHUNK_OVERLAP = 200
@@ -138,61 +144,63 @@ def write_optimized_json(all_data, output_file):
             for lib_name, lib_data in all_data.items():
                 logger.error(f"Library '{lib_name}' structure: {list(lib_data.keys())}")
         
-        training_data = {
-            "training_corpus": {
-                "document_count": total_docs,
-                "created": datetime.now().strftime("%Y-%m-%d"),
-                "documents": []
-            }
-        }
+        # Stream documents straight to disk instead of building a second copy of the corpus
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write('{"training_corpus":{"document_count":%d,"created":%s,"documents":[' % (
+                total_docs, json.dumps(datetime.now().strftime("%Y-%m-%d"))))
+            final_doc_count = 0
         
-        # Process all documents into a flat, clean structure
-        for lib_name, lib_data in all_data.items():
-            docs = lib_data.get("docs_data", [])
-            logger.info(f"Processing library '{lib_name}' with {len(docs)} documents")
+            # Process all documents into a flat, clean structure
+            for lib_name, lib_data in all_data.items():
+                docs = lib_data.get("docs_data", [])
+                logger.info(f"Processing library '{lib_name}' with {len(docs)} documents")
             
-            for i, doc in enumerate(docs):
-                logger.debug(f"Processing document {i}: {list(doc.keys())}")
+                for i, doc in enumerate(docs):
+                    logger.debug(f"Processing document {i}: {list(doc.keys())}")
                 
-                # Only keep essential training data
-                clean_doc = {
-                    "content": doc.get("content", ""),
-                    "source": doc.get("file_path", "unknown")
-                }
+                    # Only keep essential training data
+                    clean_doc = {
+                        "content": doc.get("content", ""),
+                        "source": doc.get("file_path", "unknown")
+                    }
                 
-                # Debug: Check if content is actually empty
-                content = doc.get("content", "")
-                if not content:
-                    logger.warning(f"Document {i} in library '{lib_name}' has empty content. Available fields: {list(doc.keys())}")
-                    logger.debug(f"Doc data sample: {str(doc)[:200]}...")
+                    # Debug: Check if content is actually empty
+                    content = doc.get("content", "")
+                    if not content:
+                        logger.warning(f"Document {i} in library '{lib_name}' has empty content. Available fields: {list(doc.keys())}")
+                        logger.debug(f"Doc data sample: {str(doc)[:200]}...")
                 
-                # Only add section name if it provides meaningful context
-                section_name = doc.get("section_name", "")
-                if section_name and section_name.strip() and len(section_name) < 200:
-                    clean_doc["title"] = section_name.strip()
+                    # Only add section name if it provides meaningful context
+                    section_name = doc.get("section_name", "")
+                    if section_name and section_name.strip() and len(section_name) < 200:
+                        clean_doc["title"] = section_name.strip()
                 
-                # Only add language if detected and useful
-                language = doc.get("language", "")
-                if language and language not in ["", "unknown", "auto"]:
-                    clean_doc["language"] = language
+                    # Only add language if detected and useful
+                    language = doc.get("language", "")
+                    if language and language not in ["", "unknown", "auto"]:
+                        clean_doc["language"] = language
                 
-                # Only add tables if they exist and contain useful data
-                tables = doc.get("tables", [])
-                if tables and len(tables) > 0:
-                    # Simplified table representation
-                    clean_doc["tables"] = [str(table) for table in tables if table]
+                    # Only add tables if they exist and contain useful data
+                    tables = doc.get("tables", [])
+                    if tables and len(tables) > 0:
+                        # Simplified table representation
+                        clean_doc["tables"] = [str(table) for table in tables if table]
                 
-                # Skip empty content
-                if clean_doc["content"] and clean_doc["content"].strip():
-                    training_data["training_corpus"]["documents"].append(clean_doc)
-                else:
-                    logger.warning(f"Skipping document {i} in library '{lib_name}' due to empty content")
+                    # Skip empty content
+                    if clean_doc["content"] and clean_doc["content"].strip():
+                        # Write with maximum compression settings for training efficiency
+                        if final_doc_count:
+                            f.write(",")
+                        if encode_json is not None:
+                            f.write(encode_json(clean_doc))
+                        else:
+                            f.write(json.dumps(clean_doc, ensure_ascii=False, separators=(',', ':')))
+                        final_doc_count += 1
+                    else:
+                        logger.warning(f"Skipping document {i} in library '{lib_name}' due to empty content")
         
-        # Write with maximum compression settings for training efficiency
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(training_data, f, ensure_ascii=False, separators=(',', ':'))
+            f.write("]}}")
         
-        final_doc_count = len(training_data['training_corpus']['documents'])
         logger.info(f"Created training-optimized JSON with {final_doc_count} documents")
         
         if final_doc_count == 0:
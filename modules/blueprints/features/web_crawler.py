@@ -3,20 +3,496 @@ Web Crawler Module
 Implements recursive web crawling functionality for the Web Scraper blueprint
 """
 
+import os
+import json
 import logging
+import sqlite3
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, urlunparse
 from urllib.robotparser import RobotFileParser
 import time
-from typing import Set, List, Dict, Optional, Callable
+import heapq
+from typing import Set, List, Dict, Optional, Callable, Tuple
 from collections import deque
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import hashlib
+import asyncio
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# Process-wide robots.txt cache shared with the scraper
+try:
+    from robots_cache import get_robots_cache
+except ImportError:
+    get_robots_cache = None
 
 logger = logging.getLogger(__name__)
 
+CRAWL_ENGINES = ("thread", "async")
+
+# CrawlFrontier URL states
+URL_PENDING, URL_IN_FLIGHT, URL_DONE = 0, 1, 2
+# Pending URLs read from disk per host at a time
+FRONTIER_BATCH_SIZE = 64
+# Frontier writes between commits
+FRONTIER_COMMIT_INTERVAL = 500
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for de-duplication.
+
+    Lowercases scheme and host, drops the default port and the fragment, and
+    uses "/" for an empty path. Query strings are kept as they are.
+    """
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    default_port = DEFAULT_PORTS.get(scheme)
+    if default_port and netloc.endswith(default_port):
+        netloc = netloc[:-len(default_port)]
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, parsed.query, ""))
+
+
+def url_hash(url: str) -> int:
+    """64-bit key of a URL for the visited index; lookups compare the URL too, so collisions are harmless."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+class HostScheduler:
+    """
+    Crawl frontier that enforces politeness per host.
+
+    URLs wait in one queue per host. Hosts with pending URLs sit in a heap
+    ordered by the earliest time they may be contacted again, so a worker
+    always receives a URL from a host that is ready, and workers are never
+    put to sleep by a host other than the one they are waiting for. A host
+    with max_per_host requests in flight leaves the heap until one of them
+    finishes. The delay counts from the moment a request is sent: a host
+    stays out of the heap from the time a URL is handed out until the worker
+    calls mark_sent() (or task_done() without sending). The scheduler has
+    its own lock, and waiting releases it.
+    """
+
+    def __init__(self, request_delay: float = 0.5, max_per_host: Optional[int] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            request_delay: Minimum seconds between requests to the same host
+            max_per_host: Maximum concurrent requests to one host (None for no limit)
+        """
+        self.request_delay = request_delay
+        self.max_per_host = max_per_host
+        self._host_queues: Dict[str, deque] = {}
+        self._host_in_flight: Dict[str, int] = {}
+        self._next_ready: Dict[str, float] = {}
+        self._ready_heap: List[Tuple[float, str]] = []
+        self._scheduled: Set[str] = set()
+        # Host -> URL handed out but not yet sent
+        self._sending: Dict[str, str] = {}
+        self._seen: Set[str] = set()
+        self._pending = 0
+        self._in_flight = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    # Storage hooks (called with the lock held); CrawlFrontier keeps them in SQLite
+    def _enqueue(self, host: str, url: str, depth: int) -> bool:
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        self._host_queues.setdefault(host, deque()).append((url, depth))
+        return True
+
+    def _enqueue_many(self, urls: List[str], depth: int) -> List[str]:
+        hosts = []
+        for url in urls:
+            # Most links on a page were seen before; skip parsing those
+            if url not in self._seen:
+                host = urlparse(url).netloc
+                self._enqueue(host, url, depth)
+                hosts.append(host)
+        return hosts
+
+    def _has_pending(self, host: str) -> bool:
+        return bool(self._host_queues.get(host))
+
+    def _dequeue(self, host: str) -> Tuple[str, int]:
+        queue = self._host_queues[host]
+        item = queue.popleft()
+        if not queue:
+            del self._host_queues[host]
+        return item
+
+    def _finish(self, url: str) -> None:
+        pass
+
+    def _requeue(self, host: str, url: str, depth: int) -> None:
+        self._host_queues.setdefault(host, deque()).appendleft((url, depth))
+
+    def _schedule(self, host: str) -> None:
+        # Caller holds the lock
+        if host in self._scheduled or host in self._sending or not self._has_pending(host):
+            return
+        if self.max_per_host and self._host_in_flight.get(host, 0) >= self.max_per_host:
+            return
+        self._scheduled.add(host)
+        heapq.heappush(self._ready_heap, (self._next_ready.get(host, 0.0), host))
+
+    def add(self, url: str, depth: int) -> bool:
+        """
+        Queue a URL unless it was queued before.
+
+        Args:
+            url: URL to crawl
+            depth: Crawling depth of the URL
+
+        Returns:
+            True if the URL was queued
+        """
+        host = urlparse(url).netloc
+        with self._cond:
+            if self._closed or not self._enqueue(host, url, depth):
+                return False
+            self._pending += 1
+            self._schedule(host)
+            self._cond.notify()
+            return True
+
+    def add_many(self, urls: List[str], depth: int) -> int:
+        """
+        Queue several URLs found on one page, skipping those queued before.
+
+        Args:
+            urls: URLs to crawl
+            depth: Crawling depth of the URLs
+
+        Returns:
+            Number of URLs queued
+        """
+        with self._cond:
+            if self._closed:
+                return 0
+            hosts = self._enqueue_many(urls, depth)
+            self._pending += len(hosts)
+            for host in set(hosts):
+                self._schedule(host)
+            if hosts:
+                self._cond.notify_all()
+            return len(hosts)
+
+    def poll(self) -> Tuple[Optional[Tuple[str, int]], Optional[float]]:
+        """
+        Take the next URL without waiting.
+
+        Returns:
+            ((url, depth), None) if a host is ready; (None, seconds) until the
+            next host becomes ready; (None, None) if no host is waiting, or
+            the scheduler is closed
+        """
+        with self._cond:
+            if self._closed or not self._ready_heap:
+                return None, None
+            ready_at, host = self._ready_heap[0]
+            now = time.monotonic()
+            if ready_at > now:
+                return None, ready_at - now
+            heapq.heappop(self._ready_heap)
+            self._scheduled.discard(host)
+            url, depth = self._dequeue(host)
+            self._pending -= 1
+            self._in_flight += 1
+            self._host_in_flight[host] = self._host_in_flight.get(host, 0) + 1
+            self._sending[host] = url
+            return (url, depth), None
+
+    def mark_sent(self, url: str) -> None:
+        """
+        Record that the request for a URL from poll() or next_url() is being sent now.
+
+        The host's next request may go out request_delay seconds from here.
+        """
+        host = urlparse(url).netloc
+        with self._cond:
+            if self._sending.get(host) != url:
+                return
+            del self._sending[host]
+            self._next_ready[host] = time.monotonic() + self.request_delay
+            self._schedule(host)
+            self._cond.notify_all()
+
+    def next_url(self) -> Optional[Tuple[str, int]]:
+        """
+        Wait for a URL whose host may be contacted now.
+
+        Returns:
+            (url, depth), or None once the scheduler is closed or the crawl is
+            finished (nothing pending and no request in flight)
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                item, wait = self.poll()
+                if item is not None:
+                    return item
+                if wait is None and self._in_flight == 0:
+                    # Nobody can add more URLs
+                    self._cond.notify_all()
+                    return None
+                self._cond.wait(wait)
+
+    def task_done(self, url: str) -> None:
+        """Mark a URL returned by next_url() or poll() as finished."""
+        host = urlparse(url).netloc
+        with self._cond:
+            self._finish(url)
+            self._release(host, url)
+
+    def requeue(self, url: str, depth: int) -> None:
+        """Put a URL returned by next_url() or poll() back as pending, without fetching it."""
+        host = urlparse(url).netloc
+        with self._cond:
+            self._requeue(host, url, depth)
+            self._pending += 1
+            self._release(host, url)
+
+    def _release(self, host: str, url: str) -> None:
+        # Caller holds the lock
+        if self._sending.get(host) == url:
+            # Skipped without a request (robots.txt, already visited)
+            del self._sending[host]
+        self._in_flight -= 1
+        remaining = self._host_in_flight.get(host, 1) - 1
+        if remaining:
+            self._host_in_flight[host] = remaining
+        else:
+            self._host_in_flight.pop(host, None)
+        self._schedule(host)
+        self._cond.notify_all()
+
+    def close(self) -> None:
+        """Stop handing out URLs and wake every waiting worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def in_flight(self) -> int:
+        """URLs handed out and not yet marked done."""
+        return self._in_flight
+
+    def __len__(self) -> int:
+        return self._pending
+
+
+class CrawlFrontier(HostScheduler):
+    """
+    HostScheduler whose queue, visited index and crawl output live in SQLite.
+
+    Pending URLs are read back in small batches per host, and URLs are
+    indexed by a 64-bit hash of their normalized form (a hash match is
+    confirmed against the stored URL), so memory holds only per-host
+    bookkeeping however large the crawl grows. Scraped pages, PDF
+    links and statistics are written as the crawl goes. Opening the same file
+    again resumes a cancelled or crashed crawl; URLs that were in flight when
+    it stopped are crawled again.
+    """
+
+    def __init__(self, path: str, request_delay: float = 0.5, max_per_host: Optional[int] = None):
+        """
+        Open or create a frontier.
+
+        Args:
+            path: SQLite file holding the crawl state
+            request_delay: Minimum seconds between requests to the same host
+            max_per_host: Maximum concurrent requests to one host (None for no limit)
+        """
+        super().__init__(request_delay, max_per_host)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "seq INTEGER PRIMARY KEY, hash INTEGER NOT NULL, url TEXT NOT NULL, host TEXT NOT NULL, "
+            "depth INTEGER NOT NULL, state INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS urls_hash ON urls (hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS urls_pending ON urls (host, state, seq)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS pdf_links (id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        # Requests in flight when the last run stopped are crawled again
+        self._db.execute("UPDATE urls SET state = ? WHERE state = ?", (URL_PENDING, URL_IN_FLIGHT))
+        self._db.commit()
+        self._seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM urls").fetchone()[0]
+        self._host_counts: Dict[str, int] = dict(self._db.execute(
+            "SELECT host, COUNT(*) FROM urls WHERE state = ? GROUP BY host", (URL_PENDING,)
+        ).fetchall())
+        self._pending = sum(self._host_counts.values())
+        self._writes = 0
+        with self._cond:
+            for host in self._host_counts:
+                self._schedule(host)
+        if self._pending:
+            logger.info(f"Resuming crawl from {path}: {self._pending} URLs pending")
+
+    def _wrote(self, count: int = 1) -> None:
+        self._writes += count
+        if self._writes >= FRONTIER_COMMIT_INTERVAL:
+            self._db.commit()
+            self._writes = 0
+
+    def _enqueue(self, host: str, url: str, depth: int) -> bool:
+        key = url_hash(url)
+        if self._db.execute("SELECT 1 FROM urls WHERE hash = ? AND url = ?", (key, url)).fetchone():
+            return False
+        self._db.execute(
+            "INSERT INTO urls (seq, hash, url, host, depth, state) VALUES (?, ?, ?, ?, ?, ?)",
+            (self._seq, key, url, host, depth, URL_PENDING)
+        )
+        self._seq += 1
+        self._host_counts[host] = self._host_counts.get(host, 0) + 1
+        self._wrote()
+        return True
+
+    def _enqueue_many(self, urls: List[str], depth: int) -> List[str]:
+        # One lookup and one insert per page instead of one statement per link
+        candidates = {url: url_hash(url) for url in urls}
+        keys = list(set(candidates.values()))
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            # A hash match only counts if the stored URL is the same one
+            for (url,) in self._db.execute(f"SELECT url FROM urls WHERE hash IN ({placeholders})", chunk):
+                candidates.pop(url, None)
+        rows = []
+        for url, key in candidates.items():
+            host = urlparse(url).netloc
+            rows.append((self._seq, key, url, host, depth, URL_PENDING))
+            self._seq += 1
+            self._host_counts[host] = self._host_counts.get(host, 0) + 1
+        self._db.executemany(
+            "INSERT INTO urls (seq, hash, url, host, depth, state) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        self._wrote(len(rows))
+        return [row[3] for row in rows]
+
+    def _has_pending(self, host: str) -> bool:
+        return self._host_counts.get(host, 0) > 0
+
+    def _dequeue(self, host: str) -> Tuple[str, int]:
+        buffer = self._host_queues.get(host)
+        if not buffer:
+            rows = self._db.execute(
+                "SELECT seq, url, depth FROM urls WHERE host = ? AND state = ? ORDER BY seq LIMIT ?",
+                (host, URL_PENDING, FRONTIER_BATCH_SIZE)
+            ).fetchall()
+            self._db.executemany("UPDATE urls SET state = ? WHERE seq = ?",
+                                 [(URL_IN_FLIGHT, row[0]) for row in rows])
+            self._wrote(len(rows))
+            buffer = self._host_queues[host] = deque((url, depth) for _, url, depth in rows)
+        url, depth = buffer.popleft()
+        if not buffer:
+            del self._host_queues[host]
+        remaining = self._host_counts[host] - 1
+        if remaining:
+            self._host_counts[host] = remaining
+        else:
+            del self._host_counts[host]
+        return url, depth
+
+    def _finish(self, url: str) -> None:
+        self._db.execute("UPDATE urls SET state = ? WHERE hash = ? AND url = ?", (URL_DONE, url_hash(url), url))
+        self._wrote()
+
+    def _requeue(self, host: str, url: str, depth: int) -> None:
+        # Back to pending on disk; the next batch read for the host picks it up
+        self._db.execute("UPDATE urls SET state = ? WHERE hash = ? AND url = ?", (URL_PENDING, url_hash(url), url))
+        self._wrote()
+        self._host_counts[host] = self._host_counts.get(host, 0) + 1
+
+    def save_page(self, url: str, data: Dict) -> None:
+        """Store the extracted data of a crawled page."""
+        with self._cond:
+            self._db.execute("INSERT OR REPLACE INTO pages (url, data) VALUES (?, ?)", (url, json.dumps(data)))
+            self._wrote()
+
+    def save_pdf_link(self, pdf_info: Dict) -> None:
+        """Store a discovered PDF link."""
+        with self._cond:
+            self._db.execute("INSERT INTO pdf_links (data) VALUES (?)", (json.dumps(pdf_info),))
+            self._wrote()
+
+    def save_stats(self, stats: Dict) -> None:
+        """Store crawl statistics and commit everything written so far."""
+        with self._cond:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('stats', ?)", (json.dumps(stats),))
+            self.flush()
+
+    def load_stats(self) -> Dict:
+        """Statistics saved by a previous run, or an empty dict."""
+        with self._cond:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'stats'").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def pages(self):
+        """Iterate over (url, page data) of every crawled page, reading a batch at a time."""
+        last = 0
+        while True:
+            with self._cond:
+                rows = self._db.execute(
+                    "SELECT rowid, url, data FROM pages WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, FRONTIER_COMMIT_INTERVAL)
+                ).fetchall()
+            if not rows:
+                return
+            for last, url, data in rows:
+                yield url, json.loads(data)
+
+    def pdf_links(self) -> List[Dict]:
+        """Every PDF link found, in discovery order."""
+        with self._cond:
+            rows = self._db.execute("SELECT data FROM pdf_links ORDER BY id").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def page_count(self) -> int:
+        """Pages stored so far, including previous runs."""
+        with self._cond:
+            return self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def visited_count(self) -> int:
+        """URLs taken from the frontier so far, including previous runs."""
+        with self._cond:
+            return self._db.execute("SELECT COUNT(*) FROM urls WHERE state != ?", (URL_PENDING,)).fetchone()[0]
+
+    def flush(self) -> None:
+        """Commit pending writes."""
+        with self._cond:
+            self._db.commit()
+            self._writes = 0
+
+    def close_store(self) -> None:
+        """Commit and close the database."""
+        with self._cond:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
 
 class WebCrawler:
     """
@@ -26,7 +502,7 @@ class WebCrawler:
     - Depth-first and breadth-first crawling
     - Robots.txt compliance
     - Domain restriction options
-    - Rate limiting and throttling
+    - Per-host rate limiting that never blocks other hosts
     - Duplicate URL detection
     - PDF link extraction
     - Progress tracking
@@ -39,7 +515,11 @@ class WebCrawler:
                  follow_redirects: bool = True,
                  request_delay: float = 0.5,
                  timeout: int = 30,
-                 max_workers: int = 5):
+                 max_workers: int = 5,
+                 engine: str = "thread",
+                 max_concurrency: int = 64,
+                 max_per_host: int = 4,
+                 state_path: Optional[str] = None):
         """
         Initialize the web crawler.
         
@@ -50,8 +530,19 @@ class WebCrawler:
             follow_redirects: Whether to follow HTTP redirects
             request_delay: Delay between requests to same domain (seconds)
             timeout: Request timeout in seconds
-            max_workers: Maximum concurrent workers
+            max_workers: Maximum concurrent workers (thread engine)
+            engine: "thread" (requests + worker threads) or "async" (aiohttp)
+            max_concurrency: Maximum concurrent requests overall (async engine)
+            max_per_host: Maximum concurrent requests to one host
+            state_path: SQLite file for a resumable crawl; the frontier, visited
+                URLs and scraped pages are kept there instead of in memory, and
+                crawling again with the same file continues where it stopped
         """
+        if engine not in CRAWL_ENGINES:
+            raise ValueError(f"Unknown crawl engine {engine!r}, expected one of {CRAWL_ENGINES}")
+        if engine == "async" and not AIOHTTP_AVAILABLE:
+            logger.warning("aiohttp not available, using the thread crawl engine")
+            engine = "thread"
         self.max_depth = max_depth
         self.max_pages = max_pages
         self.respect_robots = respect_robots
@@ -59,13 +550,19 @@ class WebCrawler:
         self.request_delay = request_delay
         self.timeout = timeout
         self.max_workers = max_workers
+        self.engine = engine
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self.state_path = state_path
         
         # Crawling state
         self.visited_urls: Set[str] = set()
-        self.url_queue: deque = deque()
+        if state_path:
+            self.url_queue = CrawlFrontier(state_path, request_delay, max_per_host)
+        else:
+            self.url_queue = HostScheduler(request_delay, max_per_host)
         self.pdf_links: List[Dict[str, str]] = []
         self.scraped_data: Dict[str, Dict] = {}
-        self.domain_last_access: Dict[str, float] = {}
         self.robots_cache: Dict[str, RobotFileParser] = {}
         
         # Statistics
@@ -77,6 +574,11 @@ class WebCrawler:
             'start_time': None,
             'end_time': None
         }
+        if state_path:
+            # Counters carry over from earlier runs of a resumed crawl
+            saved = self.url_queue.load_stats()
+            for key in ('pages_crawled', 'pdfs_found', 'errors', 'total_bytes'):
+                self.stats[key] = saved.get(key, 0)
         
         # Control flags
         self.is_cancelled = False
@@ -106,58 +608,25 @@ class WebCrawler:
             Dictionary with crawling results
         """
         self.stats['start_time'] = time.time()
-        start_domain = urlparse(start_url).netloc
         
-        # Initialize queue with start URL
-        self.url_queue.append((start_url, 0))  # (url, depth)
+        # Initialize queue with start URL (ignored when resuming, as it was seen before).
+        # Links are compared in normalized form, so the start domain must be too.
+        start_url = normalize_url(start_url)
+        start_domain = urlparse(start_url).netloc
+        self.url_queue.add(start_url, 0)
         
         try:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = []
-                
-                while self.url_queue and not self.is_cancelled:
-                    if self.stats['pages_crawled'] >= self.max_pages:
-                        logger.info(f"Reached maximum pages limit: {self.max_pages}")
-                        break
-                    
-                    # Get next URL to crawl
-                    url, depth = self._get_next_url()
-                    if not url:
-                        continue
-                    
-                    # Check domain restriction
-                    if stay_in_domain and urlparse(url).netloc != start_domain:
-                        continue
-                    
-                    # Submit crawling task
-                    future = executor.submit(
-                        self._crawl_page, 
-                        url, 
-                        depth, 
-                        stay_in_domain, 
-                        start_domain,
-                        progress_callback,
-                        pdf_callback
-                    )
-                    futures.append(future)
-                    
-                    # Process completed futures
-                    for completed in list(futures):
-                        if completed.done():
-                            try:
-                                completed.result()
-                            except Exception as e:
-                                logger.error(f"Crawling error: {e}")
-                                self.stats['errors'] += 1
-                            futures.remove(completed)
-                
-                # Wait for remaining futures
-                for future in as_completed(futures):
-                    try:
+            if self.engine == "async":
+                asyncio.run(self._crawl_async(stay_in_domain, start_domain, progress_callback, pdf_callback))
+            else:
+                # Each worker pulls URLs from the per-host scheduler until the crawl is done
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = [
+                        executor.submit(self._worker, stay_in_domain, start_domain, progress_callback, pdf_callback)
+                        for _ in range(self.max_workers)
+                    ]
+                    for future in as_completed(futures):
                         future.result()
-                    except Exception as e:
-                        logger.error(f"Crawling error: {e}")
-                        self.stats['errors'] += 1
                         
         except Exception as e:
             logger.error(f"Critical crawling error: {e}")
@@ -166,14 +635,38 @@ class WebCrawler:
             self.stats['end_time'] = time.time()
             self.session.close()
         
-        return self._get_results()
+        results = self._get_results()
+        if self.state_path:
+            stats = {key: value for key, value in self.stats.items() if key not in ('start_time', 'end_time')}
+            self.url_queue.save_stats(stats)
+            self.url_queue.close_store()
+        return results
     
-    def _get_next_url(self) -> Optional[tuple]:
-        """Get next URL from queue with thread safety."""
-        with self.lock:
-            if self.url_queue:
-                return self.url_queue.popleft()
-            return None, None
+    def _worker(self,
+                stay_in_domain: bool,
+                start_domain: str,
+                progress_callback: Optional[Callable],
+                pdf_callback: Optional[Callable]) -> None:
+        """Crawl URLs handed out by the scheduler until it runs dry or is closed."""
+        while not self.is_cancelled:
+            item = self.url_queue.next_url()
+            if item is None:
+                return
+            url, depth = item
+            if self.stats['pages_crawled'] >= self.max_pages:
+                logger.info(f"Reached maximum pages limit: {self.max_pages}")
+                # Not fetched: keep it pending so a resumed crawl still gets to it
+                self.url_queue.requeue(url, depth)
+                self.url_queue.close()
+                return
+            try:
+                self._crawl_page(url, depth, stay_in_domain, start_domain, progress_callback, pdf_callback)
+            except Exception as e:
+                logger.error(f"Crawling error: {e}")
+                with self.lock:
+                    self.stats['errors'] += 1
+            finally:
+                self.url_queue.task_done(url)
     
     def _crawl_page(self, 
                     url: str, 
@@ -193,22 +686,17 @@ class WebCrawler:
             progress_callback: Progress callback function
             pdf_callback: PDF discovery callback function
         """
-        # Check if already visited
-        with self.lock:
-            if url in self.visited_urls:
-                return
-            self.visited_urls.add(url)
+        if not self._claim_url(url):
+            return
         
         # Check robots.txt
         if self.respect_robots and not self._can_fetch(url):
             logger.info(f"Robots.txt disallows: {url}")
             return
         
-        # Rate limiting
-        self._apply_rate_limit(url)
-        
         try:
             # Fetch the page
+            self.url_queue.mark_sent(url)
             response = self.session.get(
                 url, 
                 timeout=self.timeout,
@@ -216,64 +704,201 @@ class WebCrawler:
             )
             response.raise_for_status()
             
-            # Update statistics
+            self._process_page(
+                url, depth, response.text, response.status_code,
+                response.headers.get('Content-Type', ''), len(response.content),
+                stay_in_domain, start_domain, progress_callback, pdf_callback
+            )
+                
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error crawling {url}: {e}")
             with self.lock:
-                self.stats['pages_crawled'] += 1
-                self.stats['total_bytes'] += len(response.content)
-            
-            # Parse the page
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract page data
-            page_data = self._extract_page_data(url, soup, response)
+                self.stats['errors'] += 1
+    
+    def _claim_url(self, url: str) -> bool:
+        """Mark a URL as visited; False if it already was."""
+        if self.state_path:
+            # The frontier's visited index already hands out each URL once
+            return True
+        with self.lock:
+            if url in self.visited_urls:
+                return False
+            self.visited_urls.add(url)
+            return True
+    
+    def _process_page(self,
+                      url: str,
+                      depth: int,
+                      html: str,
+                      status_code: int,
+                      content_type: str,
+                      size: int,
+                      stay_in_domain: bool,
+                      start_domain: str,
+                      progress_callback: Optional[Callable],
+                      pdf_callback: Optional[Callable]) -> None:
+        """Record a fetched page, queue its links and report PDFs and progress."""
+        # Update statistics
+        with self.lock:
+            self.stats['pages_crawled'] += 1
+            self.stats['total_bytes'] += size
+        
+        # Parse the page
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Extract page data
+        page_data = self._extract_page_data(url, soup, status_code, content_type, size)
+        if self.state_path:
+            self.url_queue.save_page(url, page_data)
+        else:
             with self.lock:
                 self.scraped_data[url] = page_data
+        
+        # Find and process links
+        if depth < self.max_depth:
+            links = self._extract_links(soup, url)
+            new_links = []
             
-            # Find and process links
-            if depth < self.max_depth:
-                links = self._extract_links(soup, url)
-                
-                for link in links:
-                    # Check if it's a PDF
-                    if self._is_pdf_link(link):
-                        pdf_info = {
-                            'url': link,
-                            'source_page': url,
-                            'title': self._extract_link_title(soup, link),
-                            'depth': depth
-                        }
-                        
-                        with self.lock:
+            for link in links:
+                # Check if it's a PDF
+                if self._is_pdf_link(link):
+                    pdf_info = {
+                        'url': link,
+                        'source_page': url,
+                        'title': self._extract_link_title(soup, link),
+                        'depth': depth
+                    }
+                    
+                    with self.lock:
+                        if self.state_path:
+                            self.url_queue.save_pdf_link(pdf_info)
+                        else:
                             self.pdf_links.append(pdf_info)
-                            self.stats['pdfs_found'] += 1
-                        
-                        if pdf_callback:
-                            pdf_callback(pdf_info)
-                    else:
-                        # Add to crawl queue if not visited
-                        with self.lock:
-                            if link not in self.visited_urls:
-                                # Check domain restriction
-                                if not stay_in_domain or urlparse(link).netloc == start_domain:
-                                    self.url_queue.append((link, depth + 1))
+                        self.stats['pdfs_found'] += 1
+                    
+                    if pdf_callback:
+                        pdf_callback(pdf_info)
+                elif not stay_in_domain or urlparse(link).netloc == start_domain:
+                    new_links.append(link)
             
-            # Progress callback
-            if progress_callback:
-                progress_callback({
-                    'url': url,
-                    'depth': depth,
-                    'pages_crawled': self.stats['pages_crawled'],
-                    'pdfs_found': self.stats['pdfs_found'],
-                    'queue_size': len(self.url_queue)
-                })
-                
-        except requests.exceptions.RequestException as e:
+            # Add to crawl queue (the scheduler drops URLs it has seen)
+            self.url_queue.add_many(new_links, depth + 1)
+        
+        # Progress callback
+        if progress_callback:
+            progress_callback({
+                'url': url,
+                'depth': depth,
+                'pages_crawled': self.stats['pages_crawled'],
+                'pdfs_found': self.stats['pdfs_found'],
+                'queue_size': len(self.url_queue)
+            })
+    
+    async def _crawl_async(self,
+                           stay_in_domain: bool,
+                           start_domain: str,
+                           progress_callback: Optional[Callable],
+                           pdf_callback: Optional[Callable]) -> None:
+        """
+        Crawl with aiohttp: one task per page, up to max_concurrency at a time.
+        
+        The scheduler decides which host may be contacted next (delay and
+        max_per_host), so tasks never wait on a busy host while holding one of
+        the global slots. One ClientSession keeps connections alive per host.
+        Parsing runs in worker threads so the event loop keeps fetching.
+        """
+        tasks: Dict[asyncio.Task, str] = {}
+        # Set by tasks as they send, since that frees their host for the next URL
+        self._request_sent = asyncio.Event()
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.max_per_host or 0,
+            ttl_dns_cache=300
+        )
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'User-Agent': self.session.headers['User-Agent']}
+        ) as session:
+            while not self.is_cancelled:
+                if self.stats['pages_crawled'] >= self.max_pages:
+                    logger.info(f"Reached maximum pages limit: {self.max_pages}")
+                    self.url_queue.close()
+                    break
+                if len(tasks) < self.max_concurrency and self.stats['pages_crawled'] + len(tasks) < self.max_pages:
+                    item, wait = self.url_queue.poll()
+                    if item is not None:
+                        url, depth = item
+                        task = asyncio.create_task(self._crawl_page_async(
+                            session, url, depth, stay_in_domain, start_domain, progress_callback, pdf_callback))
+                        tasks[task] = url
+                        continue
+                    if wait is None and not tasks:
+                        break
+                else:
+                    wait = None
+                if tasks:
+                    self._request_sent.clear()
+                    sent = asyncio.ensure_future(self._request_sent.wait())
+                    done, _ = await asyncio.wait([*tasks, sent], timeout=wait,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    sent.cancel()
+                    for task in done:
+                        if task is sent:
+                            continue
+                        self.url_queue.task_done(tasks.pop(task))
+                        if not task.cancelled() and task.exception() is not None:
+                            logger.error(f"Crawling error: {task.exception()}")
+                            with self.lock:
+                                self.stats['errors'] += 1
+                else:
+                    await asyncio.sleep(wait)
+            
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for url in tasks.values():
+                    self.url_queue.task_done(url)
+    
+    async def _crawl_page_async(self,
+                                session: "aiohttp.ClientSession",
+                                url: str,
+                                depth: int,
+                                stay_in_domain: bool,
+                                start_domain: str,
+                                progress_callback: Optional[Callable],
+                                pdf_callback: Optional[Callable]) -> None:
+        """Async counterpart of _crawl_page."""
+        if not self._claim_url(url):
+            return
+        
+        if self.respect_robots and not await self._can_fetch_async(url):
+            logger.info(f"Robots.txt disallows: {url}")
+            return
+        
+        try:
+            self.url_queue.mark_sent(url)
+            self._request_sent.set()
+            async with session.get(url, allow_redirects=self.follow_redirects) as response:
+                response.raise_for_status()
+                body = await response.read()
+                html = body.decode(response.get_encoding(), errors='replace')
+                status_code = response.status
+                content_type = response.headers.get('Content-Type', '')
+        except (aiohttp.ClientError, asyncio.TimeoutError, LookupError) as e:
             logger.error(f"Error crawling {url}: {e}")
             with self.lock:
                 self.stats['errors'] += 1
+            return
+        
+        await asyncio.to_thread(
+            self._process_page, url, depth, html, status_code, content_type, len(body),
+            stay_in_domain, start_domain, progress_callback, pdf_callback
+        )
     
     def _can_fetch(self, url: str) -> bool:
         """Check if URL can be fetched according to robots.txt."""
+        if get_robots_cache is not None:
+            return get_robots_cache().can_fetch(url, self.session.headers['User-Agent'], session=self.session)
         try:
             parsed = urlparse(url)
             robot_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
@@ -294,19 +919,15 @@ class WebCrawler:
             logger.warning(f"Error checking robots.txt for {url}: {e}")
             return True  # Allow if can't check
     
-    def _apply_rate_limit(self, url: str) -> None:
-        """Apply rate limiting for the domain."""
-        domain = urlparse(url).netloc
-        
-        with self.lock:
-            if domain in self.domain_last_access:
-                elapsed = time.time() - self.domain_last_access[domain]
-                if elapsed < self.request_delay:
-                    time.sleep(self.request_delay - elapsed)
-            
-            self.domain_last_access[domain] = time.time()
+    async def _can_fetch_async(self, url: str) -> bool:
+        """_can_fetch() without blocking the event loop."""
+        if get_robots_cache is not None:
+            return await get_robots_cache().can_fetch_async(
+                url, self.session.headers['User-Agent'], session=self.session)
+        return await asyncio.to_thread(self._can_fetch, url)
     
-    def _extract_page_data(self, url: str, soup: BeautifulSoup, response: requests.Response) -> Dict:
+    def _extract_page_data(self, url: str, soup: BeautifulSoup, status_code: int,
+                           content_type: str, size: int) -> Dict:
         """Extract relevant data from the page."""
         # Extract title
         title = ""
@@ -327,9 +948,9 @@ class WebCrawler:
             'title': title,
             'description': description,
             'content_preview': text_content,
-            'content_type': response.headers.get('Content-Type', ''),
-            'status_code': response.status_code,
-            'size': len(response.content),
+            'content_type': content_type,
+            'status_code': status_code,
+            'size': size,
             'timestamp': time.time()
         }
     
@@ -343,13 +964,10 @@ class WebCrawler:
                 # Make absolute URL
                 absolute_url = urljoin(base_url, href)
                 
-                # Clean URL (remove fragments)
-                parsed = urlparse(absolute_url)
-                clean_url = urlunparse(parsed._replace(fragment=''))
-                
                 # Filter out non-HTTP(S) URLs
-                if parsed.scheme in ['http', 'https']:
-                    links.append(clean_url)
+                if urlparse(absolute_url).scheme in ['http', 'https']:
+                    # Clean URL (remove fragments, default ports, host case)
+                    links.append(normalize_url(absolute_url))
         
         return list(set(links))  # Remove duplicates
     
@@ -395,20 +1013,30 @@ class WebCrawler:
         """Get crawling results."""
         duration = self.stats['end_time'] - self.stats['start_time'] if self.stats['end_time'] else 0
         
+        if self.state_path:
+            pdf_links = self.url_queue.pdf_links()
+            scraped_pages = self.url_queue.page_count()
+            total_links_found = self.url_queue.visited_count()
+        else:
+            pdf_links = self.pdf_links
+            scraped_pages = len(self.scraped_data)
+            total_links_found = len(self.visited_urls)
+        
         return {
             'stats': {
                 **self.stats,
                 'duration': duration,
                 'pages_per_second': self.stats['pages_crawled'] / max(duration, 1)
             },
-            'pdf_links': self.pdf_links,
-            'scraped_pages': len(self.scraped_data),
-            'total_links_found': len(self.visited_urls)
+            'pdf_links': pdf_links,
+            'scraped_pages': scraped_pages,
+            'total_links_found': total_links_found
         }
     
     def cancel(self) -> None:
-        """Cancel the crawling operation."""
+        """Cancel the crawling operation (a crawl with state_path can be resumed later)."""
         self.is_cancelled = True
+        self.url_queue.close()
         logger.info("Crawling cancelled by user")
 
 
@@ -427,7 +1055,7 @@ def crawl_website(url: str,
         max_pages: Maximum pages to crawl
         progress_callback: Progress callback function
         pdf_callback: PDF discovery callback function
-        **kwargs: Additional crawler parameters
+        **kwargs: Additional crawler parameters (e.g. engine="async")
         
     Returns:
         Crawling results dictionary
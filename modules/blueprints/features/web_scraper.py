@@ -36,6 +36,7 @@ from blueprints.core.services import (
 )
 from blueprints.core.utils import get_output_filepath, sanitize_filename
 from blueprints.core.structify_integration import structify_module
+from blueprints.core.http_client import get_session
 from blueprints.features.pdf_processor import download_pdf, analyze_pdf_structure
 
 # Try to import web_scraper module
@@ -45,6 +46,12 @@ try:
 except ImportError:
     web_scraper_available = False
 
+# Process-wide robots.txt cache shared with the crawler
+try:
+    from robots_cache import get_robots_cache
+except ImportError:
+    get_robots_cache = None
+
 # Try to import python-magic for file type detection
 try:
     import magic
@@ -303,6 +310,8 @@ class EnhancedWebScraper:
 
     def check_robots_txt(self, base_url: str) -> bool:
         """Check if robots.txt allows crawling"""
+        if get_robots_cache is not None:
+            return get_robots_cache().can_fetch(base_url, '*', session=get_session())
         try:
             parsed_url = urlparse(base_url)
             robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
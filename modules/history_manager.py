@@ -7,6 +7,11 @@ from typing import Dict, List, Any, Optional
 
 logger = logging.getLogger(__name__)
 
+try:
+    from json_output import write_json
+except ImportError:
+    write_json = None
+
 # Configuration
 HISTORY_FILE = "history.json"
 MAX_HISTORY_ENTRIES = 100
@@ -34,7 +39,7 @@ def load_history() -> List[Dict[str, Any]]:
         return []
     
     try:
-        with open(HISTORY_FILE, 'r') as f:
+        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
             history_cache = json.load(f)
         return history_cache
     except Exception as e:
@@ -46,8 +51,11 @@ def save_history(history: List[Dict[str, Any]]) -> bool:
     global history_cache
     
     try:
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(history, f, indent=2)
+        if write_json is not None:
+            write_json(history, HISTORY_FILE, indent=2)
+        else:
+            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
+                json.dump(history, f, indent=2)
         history_cache = history
         return True
     except Exception as e:
@@ -0,0 +1,528 @@
+"""
+On-disk HTTP cache with conditional revalidation.
+
+Re-running a scrape used to download every page and PDF in full again, even
+when nothing had changed. Responses that carry an ETag or Last-Modified
+validator are stored here (body on disk, validators and headers in SQLite),
+and the next GET for the same URL is sent with If-None-Match /
+If-Modified-Since. A 304 answer is turned back into a normal 200 response
+whose body is read from disk, so callers (including streaming downloads)
+need no changes.
+
+The cache plugs into requests sessions as a transport adapter:
+
+    session.mount("http://", CachingHTTPAdapter(max_retries=retry))
+    session.mount("https://", CachingHTTPAdapter(max_retries=retry))
+
+Bodies are written while the caller reads the response and are only kept
+when the download completed. Requests with Range, Authorization, their own
+conditional headers or "Cache-Control: no-store" bypass the cache. Stored
+bodies are bounded by total size; least recently used entries are evicted
+first.
+
+Bytes saved are counted per process and per task; wrap a task's requests in
+task_scope(task_id) and read them back with task_stats(task_id).
+"""
+
+import os
+import io
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    from requests.adapters import HTTPAdapter
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    HTTPAdapter = object
+    REQUESTS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HTTP_CACHE_PATH = os.environ.get(
+    "HTTP_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp", "http_cache")
+)
+DEFAULT_HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_MB", "2048")) * 1024 * 1024
+# After eviction the cache is trimmed to this fraction of max_bytes
+EVICTION_TARGET_RATIO = 0.9
+# Responses larger than this fraction of max_bytes are passed through without storing
+MAX_ENTRY_RATIO = 0.25
+# Finished tasks whose counters are kept for task_stats()
+MAX_TRACKED_TASKS = 1000
+# Response headers that are not replayed from the cache
+_UNSTORED_HEADERS = ("content-encoding", "transfer-encoding", "content-length", "connection", "keep-alive",
+                     "set-cookie")
+# Headers a 304 may update on the stored response
+_REVALIDATED_HEADERS = ("etag", "last-modified", "date", "expires", "cache-control")
+
+
+def http_cache_key(url: str) -> str:
+    """Cache key for a request URL."""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _empty_counters() -> Dict[str, int]:
+    return {"requests": 0, "revalidated": 0, "downloaded": 0, "stored": 0,
+            "bytes_saved": 0, "bytes_downloaded": 0}
+
+
+class _CachedBody(io.FileIO):
+    """Stored body used as Response.raw; closes itself once read to the end."""
+
+    def read(self, size: int = -1) -> bytes:
+        if self.closed:
+            return b""
+        data = super().read(size)
+        if not data or size is None or size < 0:
+            self.close()
+        return data
+
+
+class _CachingReader:
+    """
+    Wraps a urllib3 response and copies the decoded body into the cache as it is read.
+
+    The entry is committed when the body has been read to the end and dropped
+    if the response is closed early or grows past the entry size limit.
+    """
+
+    def __init__(self, raw: Any, cache: "HttpCache", url: str, headers: Dict[str, str]):
+        self._raw = raw
+        self._cache = cache
+        self._url = url
+        self._headers = headers
+        self._size = 0
+        # The entry is counted for the task that made the request, not the one reading it
+        self._task_id = getattr(cache._local, "task_id", None)
+        self._file = None
+        self._temp_path = None
+        try:
+            fd, self._temp_path = tempfile.mkstemp(dir=cache.body_dir(url), suffix=".tmp")
+            self._file = os.fdopen(fd, "wb")
+        except OSError as e:
+            logger.debug(f"HTTP cache cannot store {url}: {e}")
+
+    def _write(self, data: bytes) -> None:
+        if self._file is None or not data:
+            return
+        self._size += len(data)
+        if self._size > self._cache.max_entry_bytes:
+            self._abort()
+            return
+        try:
+            self._file.write(data)
+        except OSError as e:
+            logger.debug(f"HTTP cache write failed for {self._url}: {e}")
+            self._abort()
+
+    def _finish(self) -> None:
+        if self._file is None:
+            return
+        temp_path, self._temp_path = self._temp_path, None
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+        with self._cache.task_scope(self._task_id):
+            self._cache.store(self._url, self._headers, temp_path, self._size)
+
+    def _abort(self) -> None:
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+            os.remove(self._temp_path)
+        except OSError:
+            pass
+        self._file = self._temp_path = None
+
+    def stream(self, amt: int = 2 ** 16, decode_content: Optional[bool] = None) -> Iterator[bytes]:
+        for chunk in self._raw.stream(amt, decode_content=True):
+            self._write(chunk)
+            yield chunk
+        self._finish()
+
+    def read(self, amt: Optional[int] = None, *args, **kwargs) -> bytes:
+        kwargs["decode_content"] = True
+        data = self._raw.read(amt, *args, **kwargs)
+        self._write(data)
+        if amt is None or not data:
+            self._finish()
+        return data
+
+    def close(self) -> None:
+        self._abort()
+        self._raw.close()
+
+    def __del__(self) -> None:
+        # Responses that are dropped without close() must not leave partial bodies behind
+        self._abort()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._raw, name)
+
+
+class HttpCache:
+    """
+    Response bodies on disk plus validators in SQLite, with size-based LRU eviction and byte counters.
+    """
+
+    def __init__(self, root: str = DEFAULT_HTTP_CACHE_PATH, max_bytes: int = DEFAULT_HTTP_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = int(max_bytes * MAX_ENTRY_RATIO)
+        self.evictions = 0
+        self._counters = _empty_counters()
+        self._tasks: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(root, "bodies"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.db"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, url TEXT NOT NULL, etag TEXT, last_modified TEXT, headers TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+    def body_dir(self, url: str) -> str:
+        directory = os.path.join(self.root, "bodies", http_cache_key(url)[:2])
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.root, "bodies", key[:2], f"{key}.body")
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Stored validators, headers and body path for url, or None."""
+        key = http_cache_key(url)
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT etag, last_modified, headers, size FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.debug(f"HTTP cache read failed: {e}")
+                row = None
+        if row is None:
+            return None
+        path = self._body_path(key)
+        if not os.path.exists(path):
+            return None
+        return {"etag": row[0], "last_modified": row[1], "headers": json.loads(row[2]),
+                "size": row[3], "path": path}
+
+    def store(self, url: str, headers: Dict[str, str], temp_path: str, size: int) -> None:
+        """Move a completely downloaded body into the cache and record its validators."""
+        key = http_cache_key(url)
+        stored = {k: v for k, v in headers.items() if k.lower() not in _UNSTORED_HEADERS}
+        lowered = {k.lower(): v for k, v in stored.items()}
+        with self._lock:
+            try:
+                os.replace(temp_path, self._body_path(key))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, url, etag, last_modified, headers, size, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, lowered.get("etag"), lowered.get("last-modified"), json.dumps(stored), size,
+                     time.time())
+                )
+                self._db.commit()
+                self._count("stored", 1)
+                self._evict()
+            except (OSError, sqlite3.Error) as e:
+                logger.debug(f"HTTP cache store failed for {url}: {e}")
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def revalidated(self, url: str, entry: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, str]:
+        """
+        Record a 304 for url and return the stored headers updated from it.
+
+        Args:
+            url: Request URL
+            entry: lookup() result the conditional request was built from
+            headers: Headers of the 304 response
+
+        Returns:
+            Dict[str, str]: Headers to serve with the stored body
+        """
+        merged = CaseInsensitiveDict(entry["headers"])
+        for name in _REVALIDATED_HEADERS:
+            if name in headers:
+                merged[name] = headers[name]
+        with self._lock:
+            try:
+                self._db.execute(
+                    "UPDATE responses SET etag = ?, last_modified = ?, headers = ?, last_used = ? WHERE key = ?",
+                    (merged.get("etag"), merged.get("last-modified"), json.dumps(dict(merged)), time.time(),
+                     http_cache_key(url))
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.debug(f"HTTP cache update failed for {url}: {e}")
+            self._count("revalidated", 1)
+            self._count("bytes_saved", entry["size"])
+        return merged
+
+    def discard(self, url: str) -> None:
+        """Forget url, e.g. when it is now served without validators."""
+        key = http_cache_key(url)
+        with self._lock:
+            try:
+                if self._db.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount:
+                    self._db.commit()
+                    os.remove(self._body_path(key))
+            except (OSError, sqlite3.Error) as e:
+                logger.debug(f"HTTP cache discard failed for {url}: {e}")
+
+    def _evict(self) -> None:
+        # Caller holds the lock
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICTION_TARGET_RATIO
+        while total > target:
+            rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 100").fetchall()
+            if not rows:
+                break
+            doomed = []
+            for key, size in rows:
+                doomed.append((key,))
+                total -= size
+                try:
+                    os.remove(self._body_path(key))
+                except OSError:
+                    pass
+                if total <= target:
+                    break
+            self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self.evictions += len(doomed)
+        self._db.commit()
+
+    # Byte accounting
+
+    def _count(self, name: str, amount: int) -> None:
+        # Caller holds the lock
+        self._counters[name] += amount
+        task_id = getattr(self._local, "task_id", None)
+        if task_id is not None:
+            counters = self._tasks.get(task_id)
+            if counters is None:
+                counters = self._tasks[task_id] = _empty_counters()
+                while len(self._tasks) > MAX_TRACKED_TASKS:
+                    self._tasks.popitem(last=False)
+            counters[name] += amount
+
+    def record(self, name: str, amount: int = 1) -> None:
+        """Add to a counter for this process and the current task."""
+        with self._lock:
+            self._count(name, amount)
+
+    @contextmanager
+    def task_scope(self, task_id: Optional[str]) -> Iterator[None]:
+        """Attribute requests made by this thread inside the block to task_id."""
+        previous = getattr(self._local, "task_id", None)
+        self._local.task_id = task_id if task_id is not None else previous
+        try:
+            yield
+        finally:
+            self._local.task_id = previous
+
+    def task_stats(self, task_id: str) -> Dict[str, int]:
+        """Counters for requests made inside task_scope(task_id)."""
+        with self._lock:
+            return dict(self._tasks.get(task_id) or _empty_counters())
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for this process plus the current size of the cache."""
+        with self._lock:
+            try:
+                entries, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+            except sqlite3.Error:
+                entries, size = 0, 0
+            stats = dict(self._counters)
+        stats.update(evictions=self.evictions, entries=entries, bytes=size, max_bytes=self.max_bytes)
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class CachingHTTPAdapter(HTTPAdapter):
+    """
+    requests transport adapter that revalidates stored GET responses and serves 304s from disk.
+
+    Args:
+        cache: HttpCache to use; the shared get_http_cache() instance when None
+        **kwargs: Passed to HTTPAdapter (max_retries, pool sizes)
+    """
+
+    def __init__(self, cache: Optional[HttpCache] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def _cache(self) -> Optional[HttpCache]:
+        # Unpickled adapters only carry HTTPAdapter's attributes
+        cache = getattr(self, "cache", None)
+        return cache if cache is not None else get_http_cache()
+
+    @staticmethod
+    def _cacheable_request(request: Any) -> bool:
+        if request.method != "GET":
+            return False
+        headers = request.headers
+        if any(name in headers for name in ("Range", "Authorization", "If-None-Match", "If-Modified-Since")):
+            return False
+        return "no-store" not in headers.get("Cache-Control", "").lower()
+
+    @staticmethod
+    def _cacheable_response(response: Any) -> bool:
+        headers = response.headers
+        if response.status_code != 200 or not ("ETag" in headers or "Last-Modified" in headers):
+            return False
+        if "no-store" in headers.get("Cache-Control", "").lower():
+            return False
+        vary = {v.strip().lower() for v in headers.get("Vary", "").split(",") if v.strip()}
+        return vary <= {"accept-encoding"}
+
+    def send(self, request: Any, **kwargs) -> Any:
+        cache = self._cache()
+        if cache is None or not self._cacheable_request(request):
+            return super().send(request, **kwargs)
+
+        url = request.url
+        entry = cache.lookup(url)
+        if entry is not None:
+            request = request.copy()
+            if entry["etag"]:
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = super().send(request, **kwargs)
+        cache.record("requests")
+
+        if response.status_code == 304 and entry is not None:
+            try:
+                body = _CachedBody(entry["path"], "r")
+            except OSError:
+                # Body evicted since the lookup; fetch it again without validators
+                response.close()
+                cache.discard(url)
+                request.headers.pop("If-None-Match", None)
+                request.headers.pop("If-Modified-Since", None)
+                return self.send(request, **kwargs)
+            headers = cache.revalidated(url, entry, response.headers)
+            headers["Content-Length"] = str(entry["size"])
+            response.close()
+            return self._cached_response(request, response, headers, body)
+
+        cache.record("downloaded")
+        # Chunked responses announce no length and are not counted here
+        length = response.headers.get("Content-Length", "")
+        if length.isdigit():
+            cache.record("bytes_downloaded", int(length))
+        if self._cacheable_response(response):
+            response.raw = _CachingReader(response.raw, cache, url, dict(response.headers))
+        elif entry is not None and response.status_code == 200:
+            cache.discard(url)
+        return response
+
+    def _cached_response(self, request: Any, revalidation: Any, headers: Any, body: _CachedBody) -> Any:
+        response = Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = headers
+        response.encoding = get_encoding_from_headers(headers)
+        response.raw = body
+        response.url = revalidation.url
+        response.cookies = revalidation.cookies
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+
+# Per-process cache instance (connections are not shared across processes)
+_cache_settings = {"root": DEFAULT_HTTP_CACHE_PATH, "max_bytes": DEFAULT_HTTP_CACHE_MAX_BYTES,
+                   "enabled": os.environ.get("HTTP_CACHE_ENABLED", "1") != "0"}
+_cache_instance: Dict[str, Any] = {"pid": None, "cache": None}
+_cache_lock = threading.Lock()
+
+
+def configure_http_cache(root: Optional[str] = None, max_bytes: Optional[int] = None,
+                         enabled: Optional[bool] = None) -> None:
+    """
+    Change the location, size limit or availability of the shared HTTP cache.
+
+    The cache is opened lazily on the next get_http_cache() call.
+
+    Args:
+        root: Directory for the index and stored bodies
+        max_bytes: Size limit for stored bodies
+        enabled: False sends every request unconditionally
+    """
+    if root is not None:
+        _cache_settings["root"] = root
+    if max_bytes is not None:
+        _cache_settings["max_bytes"] = max_bytes
+    if enabled is not None:
+        _cache_settings["enabled"] = enabled
+    with _cache_lock:
+        if _cache_instance["cache"] is not None:
+            _cache_instance["cache"].close()
+        _cache_instance.update(pid=None, cache=None)
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    """Return this process's shared HttpCache, or None if disabled or unavailable."""
+    if not _cache_settings["enabled"]:
+        return None
+    with _cache_lock:
+        if _cache_instance["pid"] != os.getpid():
+            try:
+                cache = HttpCache(_cache_settings["root"], _cache_settings["max_bytes"])
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"HTTP cache unavailable at {_cache_settings['root']}: {e}")
+                cache = None
+            _cache_instance.update(pid=os.getpid(), cache=cache)
+        return _cache_instance["cache"]
+
+
+@contextmanager
+def http_cache_task(task_id: Optional[str]) -> Iterator[None]:
+    """task_scope() on the shared cache; does nothing when the cache is disabled."""
+    cache = get_http_cache()
+    if cache is None:
+        yield
+        return
+    with cache.task_scope(task_id):
+        yield
+
+
+def http_cache_task_stats(task_id: str) -> Dict[str, int]:
+    """task_stats() on the shared cache (all zeros when it is disabled)."""
+    cache = get_http_cache()
+    return cache.task_stats(task_id) if cache is not None else _empty_counters()
@@ -0,0 +1,472 @@
+"""
+JSON serialization layer and streaming output for large extraction results.
+
+dumps()/dump() encode through the fastest installed backend: orjson, then
+msgspec, then the standard library. All backends handle the same extra types
+(datetime, Path, sets, bytes, numpy arrays, objects with to_dict()) through
+json_default(), and produce UTF-8 text with the requested indentation.
+
+json.dump(indent=2) of a 1,000-page result encodes the whole tree through the
+pure-Python encoder and holds every fragment of it in flight. The writer here
+walks the top levels of the result itself and encodes each chunk, page or
+table as one piece, so only one element is ever materialized as text.
+
+Output can be compact (no indentation), gzip or zstd compressed (zstd needs
+the optional zstandard package), and can leave out full_text when the
+chunks already contain the whole text; load_json_output() reverses all of
+that.
+"""
+
+import io
+import os
+import re
+import sys
+import gzip
+import json
+import logging
+from datetime import date, datetime
+from pathlib import PurePath
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Native encoders, fastest first
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    zstandard = None
+    HAS_ZSTD = False
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# Containers nested deeper than this are encoded as one piece
+STREAM_DEPTH = 3
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Defaults for writers that don't pass their own options
+_output_settings = {"compact": False, "compression": None, "omit_full_text": False}
+
+
+# -----------------------------------------------------------------------------
+# Encoder backends
+# -----------------------------------------------------------------------------
+def available_json_backends() -> List[str]:
+    """Installed backends, fastest first; "json" (the standard library) is always available."""
+    return [name for name, module in (("orjson", orjson), ("msgspec", msgspec)) if module is not None] + ["json"]
+
+
+_backend = {"name": available_json_backends()[0]}
+
+
+def configure_json_backend(name: Optional[str] = None) -> str:
+    """
+    Select the encoder used by dumps() and the output writers.
+
+    Args:
+        name: "orjson", "msgspec" or "json"; None picks the fastest installed one
+
+    Returns:
+        str: The selected backend
+    """
+    available = available_json_backends()
+    if name is None:
+        name = available[0]
+    elif name not in available:
+        raise ValueError(f"JSON backend {name!r} is not installed (available: {', '.join(available)})")
+    _backend["name"] = name
+    return name
+
+
+def json_backend() -> str:
+    """Name of the encoder currently in use."""
+    return _backend["name"]
+
+
+def _decode_bytes(value: bytes) -> str:
+    for encoding in ("utf-8", "latin-1", "cp1252", "utf-16"):
+        try:
+            return value.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return "".join(chr(c) if 32 <= c < 127 else f"\\x{c:02x}" for c in value)
+
+
+def json_default(obj: Any) -> Any:
+    """
+    Convert a value no backend encodes natively into one they do.
+
+    Mirrors Structify's CustomJSONEncoder: datetimes become ISO strings,
+    bytes are decoded, objects with to_dict() (DocData) become dicts, sets
+    and tuples become lists, numpy arrays become lists, and paths and
+    anything else become strings.
+    """
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (bytes, bytearray)):
+        return _decode_bytes(bytes(obj))
+    if hasattr(obj, "to_dict") and callable(obj.to_dict):
+        return obj.to_dict()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        if isinstance(obj, numpy.ndarray):
+            return obj.tolist()
+        if isinstance(obj, numpy.generic):
+            return obj.item()
+    if isinstance(obj, PurePath):
+        return str(obj)
+    return str(obj)
+
+
+_LEADING_INDENT = re.compile(rb"^((?:  )+)", re.MULTILINE)
+
+
+def _reindent(data: bytes, indent: int) -> bytes:
+    """Turn 2-space indented JSON into indent-space indented JSON (strings never hold raw newlines)."""
+    if indent == 2:
+        return data
+    return _LEADING_INDENT.sub(lambda m: b" " * (indent * (len(m.group(1)) // 2)), data)
+
+
+def _stdlib_dumps(obj: Any, indent: Optional[int]) -> bytes:
+    separators = (",", ": ") if indent is not None else (",", ":")
+    return json.dumps(obj, ensure_ascii=False, indent=indent, separators=separators,
+                      default=json_default).encode("utf-8")
+
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+_msgspec_encoder = msgspec.json.Encoder(enc_hook=json_default) if msgspec is not None else None
+
+_JSON_SCALARS = (str, int, float, type(None))
+
+
+def _json_key(key: Any) -> str:
+    """Spell a dict key the way json.dumps does (None -> "null", True -> "true", 2.5 -> "2.5")."""
+    if isinstance(key, str):
+        return key
+    if key is None or isinstance(key, (int, float)):
+        return json.dumps(key)
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def _msgspec_ready(obj: Any) -> Any:
+    """
+    Rewrite the parts of obj msgspec would encode differently from the other backends.
+
+    msgspec encodes bytes natively (as base64, so json_default is never
+    called for them), writes a None key as "None", and has its own spelling
+    for datetimes. Non-string keys are normalized and every non-JSON value
+    goes through json_default here; containers are only copied when
+    something inside them changes.
+    """
+    if isinstance(obj, _JSON_SCALARS):
+        return obj
+    if isinstance(obj, dict):
+        changed = False
+        items = []
+        for key, value in obj.items():
+            new_key = _json_key(key)
+            new_value = _msgspec_ready(value)
+            changed = changed or new_key is not key or new_value is not value
+            items.append((new_key, new_value))
+        return dict(items) if changed else obj
+    if isinstance(obj, list):
+        values = [_msgspec_ready(value) for value in obj]
+        return values if any(new is not old for new, old in zip(values, obj)) else obj
+    if isinstance(obj, (tuple, set, frozenset)):
+        return [_msgspec_ready(value) for value in obj]
+    return _msgspec_ready(json_default(obj))
+
+
+def dumps_bytes(obj: Any, indent: Optional[int] = None) -> bytes:
+    """
+    Encode obj as UTF-8 JSON with the selected backend.
+
+    Args:
+        obj: Value to encode
+        indent: Indentation width, or None for compact output
+
+    Returns:
+        bytes: Encoded JSON
+    """
+    backend = _backend["name"]
+    try:
+        if backend == "orjson":
+            if indent is None:
+                return orjson.dumps(obj, default=json_default, option=_ORJSON_OPTIONS)
+            data = orjson.dumps(obj, default=json_default, option=_ORJSON_OPTIONS | orjson.OPT_INDENT_2)
+            return _reindent(data, indent)
+        if backend == "msgspec":
+            data = _msgspec_encoder.encode(_msgspec_ready(obj))
+            return msgspec.json.format(data, indent=indent) if indent is not None else data
+    except (TypeError, ValueError, OverflowError) as e:
+        # Integers beyond 64 bits, unusual dict keys: the standard library copes
+        logger.debug(f"{backend} could not encode value, using the standard library: {e}")
+    return _stdlib_dumps(obj, indent)
+
+
+def dumps(obj: Any, indent: Optional[int] = None) -> str:
+    """Encode obj as a JSON string with the selected backend (see dumps_bytes)."""
+    if _backend["name"] == "json":
+        separators = (",", ": ") if indent is not None else (",", ":")
+        return json.dumps(obj, ensure_ascii=False, indent=indent, separators=separators, default=json_default)
+    return dumps_bytes(obj, indent).decode("utf-8")
+
+
+def dump(obj: Any, fp, indent: Optional[int] = None) -> None:
+    """Write obj as JSON to a text or binary file object."""
+    if isinstance(fp, io.TextIOBase):
+        fp.write(dumps(obj, indent))
+    else:
+        fp.write(dumps_bytes(obj, indent))
+
+
+def write_json(obj: Any, path: str, indent: Optional[int] = 2) -> None:
+    """Write obj to path through a temporary file and an atomic rename."""
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(dumps_bytes(obj, indent))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def configure_json_output(compact: Optional[bool] = None, compression: Optional[str] = None,
+                          omit_full_text: Optional[bool] = None) -> None:
+    """
+    Change the default output options of write_json_file().
+
+    Args:
+        compact: Write without indentation
+        compression: "gzip", "zstd", or "none"
+        omit_full_text: Drop full_text when the chunks reproduce it
+    """
+    if compact is not None:
+        _output_settings["compact"] = compact
+    if compression is not None:
+        if compression == "none":
+            compression = None
+        elif compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        _output_settings["compression"] = compression
+    if omit_full_text is not None:
+        _output_settings["omit_full_text"] = omit_full_text
+
+
+def json_output_settings() -> Dict[str, Any]:
+    """Current default output options."""
+    return dict(_output_settings)
+
+
+def compression_for_path(path: str) -> Optional[str]:
+    """Compression implied by a file name's suffix."""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def output_path_for(path: str, compression: Optional[str] = None) -> str:
+    """Append the compression suffix to path if it is missing (compression defaults to the configured one)."""
+    if compression is None:
+        compression = _output_settings["compression"]
+    suffix = COMPRESSION_SUFFIXES.get(compression, "")
+    if suffix and not path.endswith(suffix):
+        return path + suffix
+    return path
+
+
+def open_output(path: str, write: bool = True, compression: Optional[str] = None):
+    """
+    Open a text stream for a plain, gzip or zstd JSON file.
+
+    Args:
+        path: File path
+        write: Open for writing instead of reading
+        compression: "gzip", "zstd" or None; guessed from the suffix if None
+
+    Returns:
+        A text file object
+    """
+    if compression is None:
+        compression = compression_for_path(path)
+    if compression == "gzip":
+        return gzip.open(path, "wt" if write else "rt", encoding="utf-8", compresslevel=GZIP_LEVEL)
+    if compression == "zstd":
+        if not HAS_ZSTD:
+            raise ImportError("zstandard is required for zstd output. Install with: pip install zstandard")
+        raw = open(path, "wb" if write else "rb")
+        if write:
+            stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, "w" if write else "r", encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+
+
+def iter_json(obj: Any, indent: Optional[int] = None, depth: int = STREAM_DEPTH,
+              _level: int = 0) -> Iterator[str]:
+    """
+    Encode obj as JSON text fragments.
+
+    The concatenated fragments are identical to json.dumps(obj, indent=indent,
+    ensure_ascii=False), or to separators=(",", ":") when indent is None.
+
+    Args:
+        obj: JSON-serializable value
+        indent: Indentation width, or None for compact output
+        depth: Levels of dicts/lists walked here; deeper values are encoded in one piece
+
+    Yields:
+        str: JSON fragments
+    """
+    separators = (",", ": ") if indent is not None else (",", ":")
+    if _level >= depth or not isinstance(obj, (dict, list, tuple)) or not obj:
+        text = dumps(obj, indent)
+        if indent is not None and _level and "\n" in text:
+            # Encoded strings never contain raw newlines, so this only re-indents structure
+            text = text.replace("\n", "\n" + " " * (indent * _level))
+        yield text
+        return
+
+    if indent is not None:
+        item_sep = ",\n" + " " * (indent * (_level + 1))
+        opening = "\n" + " " * (indent * (_level + 1))
+        closing = "\n" + " " * (indent * _level)
+    else:
+        item_sep, opening, closing = ",", "", ""
+
+    if isinstance(obj, dict):
+        yield "{" + opening
+        for i, (key, value) in enumerate(obj.items()):
+            if not isinstance(key, str):
+                key = json.dumps(key)
+            yield (item_sep if i else "") + json.dumps(key, ensure_ascii=False) + separators[1]
+            yield from iter_json(value, indent, depth, _level + 1)
+        yield closing + "}"
+    else:
+        yield "[" + opening
+        for i, value in enumerate(obj):
+            if i:
+                yield item_sep
+            yield from iter_json(value, indent, depth, _level + 1)
+        yield closing + "]"
+
+
+def _full_text_source(result: Dict[str, Any]) -> Optional[str]:
+    """Name of the chunk selection that reproduces full_text exactly, if any."""
+    full_text = result.get("full_text")
+    chunks = result.get("chunks")
+    if not full_text or not isinstance(full_text, str) or not chunks:
+        return None
+    for source in ("full_content", "full_content_part", "all"):
+        if _join_chunks(chunks, source) == full_text:
+            return source
+    return None
+
+
+def _join_chunks(chunks: List[Any], source: str) -> Optional[str]:
+    def chunk_type(chunk):
+        return chunk.get("metadata", {}).get("chunk_type") if isinstance(chunk, dict) else None
+
+    def content(chunk):
+        return chunk.get("content", "") if isinstance(chunk, dict) else str(chunk)
+
+    if source == "full_content":
+        return next((content(c) for c in chunks if chunk_type(c) == "full_content"), None)
+    if source == "full_content_part":
+        parts = [c for c in chunks if chunk_type(c) == "full_content_part"]
+        if not parts:
+            return None
+        parts.sort(key=lambda c: c.get("metadata", {}).get("part_index", 0))
+        return "".join(content(c) for c in parts)
+    return "".join(content(c) for c in chunks)
+
+
+def chunks_cover_full_text(result: Dict[str, Any]) -> bool:
+    """True if full_text can be rebuilt exactly from the result's chunks."""
+    return _full_text_source(result) is not None
+
+
+def write_json_stream(obj: Any, fp, indent: Optional[int] = None, depth: int = STREAM_DEPTH) -> None:
+    """Write obj to an open text file as streamed JSON."""
+    write = fp.write
+    for fragment in iter_json(obj, indent, depth):
+        write(fragment)
+
+
+def write_json_file(obj: Any, output_path: str, indent: Optional[int] = 2, compact: Optional[bool] = None,
+                    compression: Optional[str] = None, omit_full_text: Optional[bool] = None) -> str:
+    """
+    Stream obj to output_path through a temporary file and an atomic rename.
+
+    Options left as None use configure_json_output()'s defaults.
+
+    Args:
+        obj: Data to write
+        output_path: Target path; the compression suffix is appended if missing
+        indent: Indentation for non-compact output
+        compact: Write without indentation
+        compression: "gzip", "zstd" or None
+        omit_full_text: Drop a dict's full_text when its chunks reproduce it
+
+    Returns:
+        str: Path actually written
+    """
+    if compact is None:
+        compact = _output_settings["compact"]
+    if compression is None:
+        compression = _output_settings["compression"]
+    if omit_full_text is None:
+        omit_full_text = _output_settings["omit_full_text"]
+
+    if omit_full_text and isinstance(obj, dict):
+        source = _full_text_source(obj)
+        if source:
+            obj = {k: v for k, v in obj.items() if k != "full_text"}
+            obj["full_text_in_chunks"] = source
+
+    output_path = output_path_for(output_path, compression) if compression else output_path
+    temp_path = f"{output_path}.tmp"
+    try:
+        with open_output(temp_path, write=True, compression=compression) as f:
+            write_json_stream(obj, f, None if compact else indent)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return output_path
+
+
+def load_json_output(path: str) -> Any:
+    """
+    Load a file written by write_json_file(), decompressing it and restoring full_text.
+
+    Args:
+        path: Plain, .gz or .zst JSON file
+
+    Returns:
+        The decoded data
+    """
+    with open_output(path, write=False) as f:
+        data = json.load(f)
+    if isinstance(data, dict) and data.get("full_text_in_chunks"):
+        data["full_text"] = _join_chunks(data.get("chunks", []), data.pop("full_text_in_chunks")) or ""
+    return data
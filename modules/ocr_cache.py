@@ -0,0 +1,207 @@
+"""
+Persistent OCR result cache.
+
+Tesseract output for a page depends only on the rendered pixels, the OCR
+language and the tesseract options, so results are stored in SQLite under a
+hash of exactly those. Re-processing an unchanged scanned PDF (re-downloads,
+re-runs after unrelated config changes) turns every page into a lookup.
+
+The cache is bounded by the total size of the stored results; least recently
+used entries are evicted first. Each process opens its own connection, so it
+is safe to use from OCR pool workers.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OCR_CACHE_PATH = os.environ.get(
+    "OCR_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp", "ocr_cache.db")
+)
+DEFAULT_OCR_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# After eviction the cache is trimmed to this fraction of max_bytes
+EVICTION_TARGET_RATIO = 0.9
+
+
+def ocr_cache_key(pixels, width: int, height: int, language: str, config: str = "") -> str:
+    """
+    Cache key for an OCR run.
+
+    Args:
+        pixels: Raw pixel buffer (bytes, PyMuPDF samples or a contiguous numpy array)
+        width: Image width in pixels
+        height: Image height in pixels
+        language: Tesseract language code
+        config: Tesseract options and any preprocessing that changes the result
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256(f"{width}x{height}|{language}|{config}|".encode("utf-8"))
+    digest.update(pixels)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """
+    SQLite-backed OCR result store with size-based LRU eviction and hit metrics.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_OCR_CACHE_PATH,
+                 max_bytes: int = DEFAULT_OCR_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ocr_results_last_used ON ocr_results (last_used)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for key, or None."""
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT result FROM ocr_results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE ocr_results SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+            except sqlite3.Error as e:
+                logger.debug(f"OCR cache read failed: {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store an OCR result and evict old entries if the cache grew too large."""
+        payload = json.dumps(result)
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO ocr_results (key, result, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, payload, len(payload), time.time())
+                )
+                self._db.commit()
+                self._evict()
+            except sqlite3.Error as e:
+                logger.debug(f"OCR cache write failed: {e}")
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICTION_TARGET_RATIO
+        while total > target:
+            rows = self._db.execute(
+                "SELECT key, size FROM ocr_results ORDER BY last_used LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            doomed = []
+            for key, size in rows:
+                doomed.append((key,))
+                total -= size
+                if total <= target:
+                    break
+            self._db.executemany("DELETE FROM ocr_results WHERE key = ?", doomed)
+            self.evictions += len(doomed)
+        self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current size of the cache."""
+        with self._lock:
+            try:
+                entries, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_results"
+                ).fetchone()
+            except sqlite3.Error:
+                entries, size = 0, 0
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM ocr_results")
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Per-process cache instance (connections are not shared across processes)
+_cache_settings = {"db_path": DEFAULT_OCR_CACHE_PATH, "max_bytes": DEFAULT_OCR_CACHE_MAX_BYTES, "enabled": True}
+_cache_instance: Dict[str, Any] = {"pid": None, "cache": None}
+
+
+def configure_ocr_cache(db_path: Optional[str] = None, max_bytes: Optional[int] = None,
+                        enabled: Optional[bool] = None) -> None:
+    """
+    Change the location, size limit or availability of the shared OCR cache.
+
+    The database is opened lazily on the next get_ocr_cache() call.
+
+    Args:
+        db_path: SQLite file for cached results
+        max_bytes: Size limit for stored results
+        enabled: False turns caching off
+    """
+    if db_path is not None:
+        _cache_settings["db_path"] = db_path
+    if max_bytes is not None:
+        _cache_settings["max_bytes"] = max_bytes
+    if enabled is not None:
+        _cache_settings["enabled"] = enabled
+    if _cache_instance["cache"] is not None:
+        _cache_instance["cache"].close()
+    _cache_instance.update(pid=None, cache=None)
+
+
+def ocr_cache_settings() -> Dict[str, Any]:
+    """Current cache settings, for handing to worker processes that may not inherit them."""
+    return dict(_cache_settings)
+
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """Return this process's shared OCRCache, or None if caching is disabled or unavailable."""
+    if not _cache_settings["enabled"]:
+        return None
+    if _cache_instance["pid"] != os.getpid():
+        try:
+            cache = OCRCache(_cache_settings["db_path"], _cache_settings["max_bytes"])
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"OCR cache unavailable at {_cache_settings['db_path']}: {e}")
+            cache = None
+        _cache_instance.update(pid=os.getpid(), cache=cache)
+    return _cache_instance["cache"]
@@ -0,0 +1,44 @@
+"""
+Text reconstruction from tesseract word data.
+
+Shared by the Structify OCR engine and pdf_extractor so that both build OCR
+text the same way from a single pytesseract.image_to_data run.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+
+def tesseract_data_to_text(data: Dict[str, List[Any]]) -> Tuple[str, float]:
+    """
+    Rebuild page text and mean word confidence from pytesseract.image_to_data output.
+
+    Words are joined per line, lines per paragraph and paragraphs are separated
+    by a blank line, the same layout image_to_string produces, so one tesseract
+    run gives both the text and the confidences.
+
+    Args:
+        data: Output of image_to_data(..., output_type=Output.DICT)
+
+    Returns:
+        Tuple of (text, average confidence of recognised words)
+    """
+    paragraphs: Dict[Tuple[int, int, int], Dict[int, List[str]]] = {}
+    confidences = []
+    for i, word in enumerate(data.get("text", [])):
+        try:
+            conf = float(data["conf"][i])
+        except (TypeError, ValueError):
+            conf = -1.0
+        if conf >= 0:
+            confidences.append(conf)
+        if not word or not str(word).strip():
+            continue
+        para_key = (data["page_num"][i], data["block_num"][i], data["par_num"][i])
+        paragraphs.setdefault(para_key, {}).setdefault(data["line_num"][i], []).append(str(word))
+
+    text = "\n\n".join(
+        "\n".join(" ".join(words) for words in lines.values())
+        for lines in paragraphs.values()
+    )
+    avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return text, avg_confidence
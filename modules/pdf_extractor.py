@@ -12,8 +12,14 @@ import tempfile
 import hashlib
 import json
 import traceback
+import contextlib
+import atexit
+import threading
+import multiprocessing
+import concurrent.futures
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any, Union, Set, Callable
+from collections import Counter, defaultdict, deque
+from typing import Dict, List, Optional, Tuple, Any, Union, Set, Callable, Iterator
 from datetime import datetime
 from functools import lru_cache
 
@@ -103,6 +109,33 @@ except ImportError:
     logger.warning("Pytesseract not available. Install with: pip install pytesseract")
     pytesseract = None
 
+# OCR text layout shared with Structify
+try:
+    from ocr_text import tesseract_data_to_text
+except ImportError:
+    tesseract_data_to_text = None
+
+# Persistent OCR result cache shared with Structify and pdf_processing
+try:
+    from ocr_cache import ocr_cache_key, get_ocr_cache
+except ImportError:
+    get_ocr_cache = None
+
+# Results stored by PDF content hash, reused when the same bytes come back
+try:
+    from pdf_result_store import get_pdf_result_store, pdf_result_key
+except ImportError:
+    get_pdf_result_store = None
+# Part of every stored result's key; bump when process_pdf's output changes so
+# results produced by an older extractor are not served again
+PDF_RESULT_VERSION = 1
+
+# Streaming, compact and compressed JSON output
+try:
+    from json_output import write_json_file, output_path_for, load_json_output, configure_json_output
+except ImportError:
+    write_json_file = None
+
 # Library availability flags - will be set during initialization
 PDF_MODULE_INITIALIZED = False
 
@@ -329,159 +362,517 @@ def has_images(page) -> bool:
     except Exception:
         return False
 
-def extract_text_with_pymupdf(file_path: str, page_range: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+# A page is classified as scanned when it has less native text than this...
+SCANNED_PAGE_MAX_CHARS = 100
+# ...and placed images cover at least this fraction of its area
+SCANNED_PAGE_MIN_IMAGE_COVERAGE = 0.3
+
+def image_coverage(page) -> float:
     """
-    Extract text from PDF using PyMuPDF (fitz) with enhanced structure preservation.
+    Fraction of a PyMuPDF page's area covered by placed images.
     
     Args:
-        file_path: Path to the PDF file
-        page_range: Optional tuple of (start_page, end_page) for partial extraction
+        page: PyMuPDF page object
         
     Returns:
-        Dict[str, Any]: Extracted text and metadata
+        float: Coverage between 0.0 and 1.0
     """
-    if not USE_FITZ:
-        raise ImportError("PyMuPDF not available")
-    
-    # Validate the file path
-    file_path = validate_path(file_path)
+    try:
+        page_area = page.rect.get_area()
+        if not page_area:
+            return 0.0
+        covered = sum(
+            fitz.Rect(info["bbox"]).intersect(page.rect).get_area()
+            for info in page.get_image_info()
+        )
+        return min(1.0, covered / page_area)
+    except Exception:
+        # Older PyMuPDF without get_image_info: any image counts as full coverage
+        return 1.0 if has_images(page) else 0.0
+
+def classify_scanned_page(page, page_text: str) -> bool:
+    """
+    Per-page text-density classifier: True for pages that need OCR.
     
-    result = {
-        "full_text": "",
-        "text_content": [],
-        "structure": {
-            "title": None,
-            "headings": [],
-            "pages": []
-        },
-        "metadata": {},
-        "page_count": 0,
-        "has_scanned_content": False
-    }
+    A page is scanned when it carries almost no native text and is mostly
+    image, so a born-digital page with a logo or a figure is not OCR'd.
     
-    try:
-        with fitz.open(file_path) as doc:
-            # Extract document metadata
-            result["metadata"] = {
-                "title": doc.metadata.get("title", ""),
-                "author": doc.metadata.get("author", ""),
-                "subject": doc.metadata.get("subject", ""),
-                "keywords": doc.metadata.get("keywords", ""),
-                "creator": doc.metadata.get("creator", ""),
-                "producer": doc.metadata.get("producer", ""),
-                "creation_date": doc.metadata.get("creationDate", ""),
-                "modification_date": doc.metadata.get("modDate", ""),
-                "page_count": len(doc)
-            }
-            
-            result["page_count"] = len(doc)
-            
-            # Apply page range if specified
-            if page_range:
-                start_page, end_page = page_range
-                page_range_to_process = range(
-                    max(0, start_page),
-                    min(len(doc), end_page + 1)
-                )
+    Args:
+        page: PyMuPDF page object
+        page_text: Native text already extracted from the page
+        
+    Returns:
+        bool: True if the page should be OCR'd
+    """
+    if len(page_text.strip()) >= SCANNED_PAGE_MAX_CHARS:
+        return False
+    return image_coverage(page) >= SCANNED_PAGE_MIN_IMAGE_COVERAGE
+
+# Table pre-screen: a page needs at least this many horizontal/vertical ruling
+# edges (one ruled cell) for the line-based detectors to find a grid...
+TABLE_MIN_RULING_EDGES = 4
+# ...or text rows of 3+ cells, split by gaps of at least TABLE_COLUMN_GAP points,
+# whose cells line up in TABLE_MIN_ALIGNED_COLUMNS columns over TABLE_MIN_ALIGNED_ROWS rows
+TABLE_COLUMN_GAP = 12
+TABLE_MIN_ALIGNED_ROWS = 3
+TABLE_MIN_ALIGNED_COLUMNS = 3
+
+def count_ruling_edges(page, enough: int = TABLE_MIN_RULING_EDGES) -> int:
+    """
+    Count horizontal and vertical vector edges on a PyMuPDF page.
+
+    Rectangles count as four edges. Counting stops once enough edges are found.
+
+    Args:
+        page: PyMuPDF page object
+        enough: Stop counting at this many edges
+
+    Returns:
+        int: Number of ruling edges (at most about enough)
+    """
+    edges = 0
+    for path in page.get_drawings():
+        for item in path["items"]:
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) < 1 or abs(p1.x - p2.x) < 1:
+                    edges += 1
+            elif item[0] in ("re", "qu"):
+                edges += 4
+        if edges >= enough:
+            break
+    return edges
+
+def has_aligned_text_columns(text_blocks: List[Dict[str, Any]]) -> bool:
+    """
+    Detect whitespace-separated columns in a page's text blocks.
+
+    Spans are grouped into rows by baseline and split into cells at wide gaps.
+    Ordinary (even two-column) body text never has three cells per row, while
+    rule-less tables have several rows whose cells start at the same x.
+
+    Args:
+        text_blocks: Blocks from page.get_text("dict")["blocks"]
+
+    Returns:
+        bool: True if the text looks like a table
+    """
+    rows = defaultdict(list)
+    for block in text_blocks:
+        for line in block.get("lines", ()):
+            for span in line["spans"]:
+                if span["text"].strip():
+                    x0, _, x1, y1 = span["bbox"]
+                    rows[round(y1)].append((x0, x1))
+
+    column_rows = Counter()
+    for spans in rows.values():
+        spans.sort()
+        cells = []
+        for x0, x1 in spans:
+            if cells and x0 - cells[-1][1] < TABLE_COLUMN_GAP:
+                cells[-1][1] = max(cells[-1][1], x1)
             else:
-                page_range_to_process = range(len(doc))
-            
-            # Try to extract document title from first page if not in metadata
-            if not result["metadata"]["title"] and len(doc) > 0:
-                first_page = doc[0]
-                # Get text from top of first page
-                top_text = first_page.get_text("text", clip=(0, 0, first_page.rect.width, first_page.rect.height * 0.2))
-                # Use first line as potential title
-                if top_text:
-                    first_lines = top_text.strip().split('\n')
-                    if first_lines:
-                        candidate_title = first_lines[0].strip()
-                        if 3 < len(candidate_title) < 200:  # Reasonable title length
-                            result["structure"]["title"] = candidate_title
-            
-            # Process each page in the range
-            scanned_page_count = 0
-            
-            for page_idx in page_range_to_process:
-                page = doc[page_idx]
-                page_text = page.get_text()
-                
-                # Check if page might be scanned (very little text content)
-                is_scanned_page = len(page_text.strip()) < 100 and has_images(page)
-                if is_scanned_page:
-                    scanned_page_count += 1
-                    
-                page_dict = {
-                    "page_num": page_idx + 1,
-                    "text": page_text,
-                    "blocks": [],
-                    "is_scanned": is_scanned_page
-                }
-                
-                # Extract text blocks with position data
+                cells.append([x0, x1])
+        if len(cells) >= 3:
+            # Cell starts within a few points count as the same column
+            column_rows.update({round(cell[0] / 3) for cell in cells})
+
+    aligned = sum(1 for count in column_rows.values() if count >= TABLE_MIN_ALIGNED_ROWS)
+    return aligned >= TABLE_MIN_ALIGNED_COLUMNS
+
+def page_may_contain_table(page, text_blocks: Optional[List[Dict[str, Any]]] = None) -> bool:
+    """
+    Cheap pre-screen deciding whether a page is worth the table detectors.
+
+    find_tables() and pdfplumber's extract_tables() cost orders of magnitude
+    more than this check, and text-only pages are the common case.
+
+    Args:
+        page: PyMuPDF page object
+        text_blocks: Blocks from page.get_text("dict"), if already extracted
+
+    Returns:
+        bool: False only for pages that cannot hold a detectable table
+    """
+    try:
+        if count_ruling_edges(page) >= TABLE_MIN_RULING_EDGES:
+            return True
+        if text_blocks is None:
+            text_blocks = page.get_text("dict")["blocks"]
+        return has_aligned_text_columns(text_blocks)
+    except Exception as e:
+        logger.debug(f"Table pre-screen failed, treating page as a candidate: {e}")
+        return True
+
+# Documents with at least this many pages are extracted in page shards on a
+# process pool (0 disables sharding)
+PAGE_SHARD_THRESHOLD = 300
+# Upper bound on pages per shard; smaller shards balance better across workers
+PAGE_SHARD_SIZE = 50
+
+
+def _extract_page_shard(file_path: str, page_range: Tuple[int, int], find_tables: bool, screen_tables: bool):
+    """Process pool worker: extract one page range and return its result and page caches."""
+    with PDFExtractionContext(file_path, find_tables=find_tables, screen_tables=screen_tables) as ctx:
+        return ctx.extract(page_range), ctx._page_texts, ctx._page_tables, ctx._table_candidates
+
+
+class PDFExtractionContext:
+    """
+    One open PyMuPDF document shared by every extraction step for a file.
+
+    process_pdf used to open and parse the same PDF separately for document
+    type detection, text extraction, table extraction and scan detection. A
+    context opens it once; extract() walks the pages once and collects text,
+    text blocks, headings, tables and scanned-page flags from the same page
+    objects, and page text and tables are cached for the other consumers.
+
+    With shard_threshold set, documents of at least that many pages are split
+    into page ranges that are extracted on a process pool and merged back in
+    page order.
+
+    With screen_tables (the default), pages go to the table detector only if
+    page_may_contain_table() accepts them; table_stats reports how many were
+    skipped.
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, file_path: str, find_tables: bool = True,
+                 shard_threshold: int = 0, max_workers: Optional[int] = None,
+                 screen_tables: bool = True):
+        if not USE_FITZ:
+            raise ImportError("PyMuPDF not available")
+        self.file_path = file_path
+        self.find_tables = find_tables
+        self.shard_threshold = shard_threshold
+        self.max_workers = max_workers
+        self.screen_tables = screen_tables
+        self.doc = fitz.open(file_path)
+        self.page_count = len(self.doc)
+        self._page_texts: Dict[int, str] = {}
+        self._page_tables: Dict[int, List[List[List[Any]]]] = {}
+        self._table_candidates: Dict[int, bool] = {}
+        self._extractions: Dict[Optional[Tuple[int, int]], Dict[str, Any]] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self) -> None:
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        meta = self.doc.metadata or {}
+        return {
+            "title": meta.get("title", ""),
+            "author": meta.get("author", ""),
+            "subject": meta.get("subject", ""),
+            "keywords": meta.get("keywords", ""),
+            "creator": meta.get("creator", ""),
+            "producer": meta.get("producer", ""),
+            "creation_date": meta.get("creationDate", ""),
+            "modification_date": meta.get("modDate", ""),
+            "page_count": self.page_count
+        }
+
+    def page_indices(self, page_range: Optional[Tuple[int, int]] = None) -> range:
+        """Clamp an inclusive (start_page, end_page) range to the document."""
+        if page_range:
+            start_page, end_page = page_range
+            return range(max(0, start_page), min(self.page_count, end_page + 1))
+        return range(self.page_count)
+
+    def page_text(self, page_idx: int) -> str:
+        """Plain text of a page, extracted at most once."""
+        text = self._page_texts.get(page_idx)
+        if text is None:
+            text = self.doc[page_idx].get_text()
+            self._page_texts[page_idx] = text
+        return text
+
+    @property
+    def table_stats(self) -> Dict[str, int]:
+        """Pages checked by the table pre-screen and pages it kept from the detectors."""
+        return {
+            "pages_screened": len(self._table_candidates),
+            "pages_skipped": sum(1 for candidate in self._table_candidates.values() if not candidate)
+        }
+
+    def is_table_candidate(self, page_idx: int, text_blocks: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """Run the table pre-screen on a page at most once."""
+        if not self.screen_tables:
+            return True
+        candidate = self._table_candidates.get(page_idx)
+        if candidate is None:
+            candidate = page_may_contain_table(self.doc[page_idx], text_blocks)
+            self._table_candidates[page_idx] = candidate
+        return candidate
+
+    def _find_page_tables(self, page, page_idx: int,
+                          text_blocks: Optional[List[Dict[str, Any]]] = None) -> List[List[List[Any]]]:
+        """Cell grids of the tables on a page, detected at most once."""
+        if page_idx not in self._page_tables:
+            grids = []
+            # find_tables() needs PyMuPDF v1.19.0+
+            if hasattr(page, 'find_tables') and self.is_table_candidate(page_idx, text_blocks):
                 try:
-                    blocks = page.get_text("dict")["blocks"]
-                    for block in blocks:
-                        if "lines" in block:
-                            block_text = ""
-                            for line in block["lines"]:
-                                for span in line["spans"]:
-                                    # Detect if text is a potential heading (based on font size)
-                                    if span["size"] > 12:  # Adjust threshold as needed
-                                        if len(span["text"].strip()) > 3:  # Avoid single characters
-                                            heading = {
-                                                "text": span["text"],
-                                                "page": page_idx + 1,
-                                                "font_size": span["size"],
-                                                "bold": span["font"].lower().find("bold") >= 0
-                                            }
-                                            result["structure"]["headings"].append(heading)
-                                    
-                                    block_text += span["text"] + " "
-                            
-                            if block_text.strip():
-                                page_dict["blocks"].append({
-                                    "text": block_text.strip(),
-                                    "bbox": block["bbox"],
-                                    "type": "text"
-                                })
+                    grids = [(table.bbox, table.extract()) for table in page.find_tables()]
                 except Exception as e:
-                    # If block extraction fails, continue with whole-page text
-                    logger.debug(f"Error extracting blocks from page {page_idx+1}: {e}")
-                    page_dict["blocks"].append({
-                        "text": page_text,
-                        "type": "text"
-                    })
-                
-                # Attempt to identify tables (simplified approach)
-                tables = []
-                if hasattr(page, 'find_tables'):  # PyMuPDF v1.19.0+
-                    try:
-                        tables = page.find_tables()
-                        for table in tables:
-                            cells = table.extract()
+                    logger.debug(f"Error extracting tables from page {page_idx+1}: {e}")
+            self._page_tables[page_idx] = grids
+        return self._page_tables[page_idx]
+
+    def extract(self, page_range: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """
+        Walk the pages once and return text, structure and scan information.
+
+        Args:
+            page_range: Optional tuple of (start_page, end_page) for partial extraction
+
+        Returns:
+            Dict[str, Any]: Same shape as extract_text_with_pymupdf's result
+        """
+        key = tuple(page_range) if page_range else None
+        if key in self._extractions:
+            return self._extractions[key]
+
+        pages = self.page_indices(page_range)
+        if self.shard_threshold and len(pages) >= self.shard_threshold:
+            try:
+                result = self._extract_sharded(pages)
+                if result is not None:
+                    self._extractions[key] = result
+                    return result
+            except Exception as e:
+                logger.warning(f"Sharded extraction failed for {self.file_path}, extracting sequentially: {e}")
+
+        result = {
+            "full_text": "",
+            "text_content": [],
+            "structure": {
+                "title": None,
+                "headings": [],
+                "pages": []
+            },
+            "metadata": self.metadata,
+            "page_count": self.page_count,
+            "has_scanned_content": False
+        }
+
+        # Try to extract document title from first page if not in metadata
+        if not result["metadata"]["title"] and self.page_count > 0:
+            first_page = self.doc[0]
+            # Get text from top of first page
+            top_text = first_page.get_text("text", clip=(0, 0, first_page.rect.width, first_page.rect.height * 0.2))
+            # Use first line as potential title
+            if top_text:
+                first_lines = top_text.strip().split('\n')
+                if first_lines:
+                    candidate_title = first_lines[0].strip()
+                    if 3 < len(candidate_title) < 200:  # Reasonable title length
+                        result["structure"]["title"] = candidate_title
+
+        scanned_page_count = 0
+        for page_idx in self.page_indices(page_range):
+            page = self.doc[page_idx]
+            page_text = self.page_text(page_idx)
+
+            # Check if page might be scanned (very little text content)
+            is_scanned_page = classify_scanned_page(page, page_text)
+            if is_scanned_page:
+                scanned_page_count += 1
+
+            page_dict = {
+                "page_num": page_idx + 1,
+                "text": page_text,
+                "blocks": [],
+                "is_scanned": is_scanned_page
+            }
+
+            # Extract text blocks with position data
+            blocks = None
+            try:
+                blocks = page.get_text("dict")["blocks"]
+                for block in blocks:
+                    if "lines" in block:
+                        block_text = ""
+                        for line in block["lines"]:
+                            for span in line["spans"]:
+                                # Detect if text is a potential heading (based on font size)
+                                if span["size"] > 12:  # Adjust threshold as needed
+                                    if len(span["text"].strip()) > 3:  # Avoid single characters
+                                        heading = {
+                                            "text": span["text"],
+                                            "page": page_idx + 1,
+                                            "font_size": span["size"],
+                                            "bold": span["font"].lower().find("bold") >= 0
+                                        }
+                                        result["structure"]["headings"].append(heading)
+
+                                block_text += span["text"] + " "
+
+                        if block_text.strip():
                             page_dict["blocks"].append({
-                                "type": "table",
-                                "bbox": table.bbox,
-                                "rows": len(cells),
-                                "cols": len(cells[0]) if cells else 0,
-                                "data": cells
+                                "text": block_text.strip(),
+                                "bbox": block["bbox"],
+                                "type": "text"
                             })
-                    except Exception as e:
-                        logger.debug(f"Error extracting tables from page {page_idx+1}: {e}")
-                
-                result["structure"]["pages"].append(page_dict)
-                result["text_content"].append(page_text)
-            
-            # Update scanned content flag
-            result["has_scanned_content"] = scanned_page_count > 0
-            if scanned_page_count > 0:
-                logger.info(f"Detected {scanned_page_count} potentially scanned pages in {file_path}")
-            
-            # Join all text content
-            result["full_text"] = "\n".join(result["text_content"])
-            
+            except Exception as e:
+                # If block extraction fails, continue with whole-page text
+                logger.debug(f"Error extracting blocks from page {page_idx+1}: {e}")
+                page_dict["blocks"].append({
+                    "text": page_text,
+                    "type": "text"
+                })
+
+            # Tables, detected on the same page object; scanned pages have no
+            # vector text for find_tables to work with
+            if is_scanned_page:
+                self._page_tables.setdefault(page_idx, [])
+            elif self.find_tables:
+                for bbox, cells in self._find_page_tables(page, page_idx, blocks):
+                    page_dict["blocks"].append({
+                        "type": "table",
+                        "bbox": bbox,
+                        "rows": len(cells),
+                        "cols": len(cells[0]) if cells else 0,
+                        "data": cells
+                    })
+
+            result["structure"]["pages"].append(page_dict)
+            result["text_content"].append(page_text)
+
+        # Update scanned content flag
+        result["has_scanned_content"] = scanned_page_count > 0
+        if scanned_page_count > 0:
+            logger.info(f"Detected {scanned_page_count} potentially scanned pages in {self.file_path}")
+
+        # Join all text content
+        result["full_text"] = "\n".join(result["text_content"])
+        self._extractions[key] = result
         return result
+
+    def _extract_sharded(self, pages: range) -> Optional[Dict[str, Any]]:
+        """
+        Extract a page range in shards on a process pool and merge them in order.
+
+        The merged result is identical to a sequential extract() of the same
+        pages. Page text and table grids found by the workers are copied into
+        this context's caches so later steps do not redo them.
+
+        Args:
+            pages: Page indices to extract
+
+        Returns:
+            Optional[Dict[str, Any]]: Same shape as extract(), or None when a pool
+            would not help (single CPU, or already inside a pool worker)
+        """
+        workers = self.max_workers or os.cpu_count() or 1
+        if workers < 2 or multiprocessing.parent_process() is not None:
+            # Don't nest pools inside process_all_files workers
+            return None
+
+        shard_size = max(1, min(PAGE_SHARD_SIZE, -(-len(pages) // workers)))
+        shards = [(start, min(start + shard_size, pages.stop) - 1)
+                  for start in range(pages.start, pages.stop, shard_size)]
+        workers = min(workers, len(shards))
+        logger.info(f"Extracting {len(pages)} pages of {self.file_path} in {len(shards)} shards "
+                    f"on {workers} processes")
+
+        result = None
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            # map() yields shard results in submission (page) order
+            for shard, page_texts, page_tables, table_candidates in executor.map(
+                    _extract_page_shard,
+                    [self.file_path] * len(shards), shards,
+                    [self.find_tables] * len(shards), [self.screen_tables] * len(shards)):
+                self._page_texts.update(page_texts)
+                self._page_tables.update(page_tables)
+                self._table_candidates.update(table_candidates)
+                if result is None:
+                    result = shard
+                    continue
+                result["text_content"].extend(shard["text_content"])
+                result["structure"]["headings"].extend(shard["structure"]["headings"])
+                result["structure"]["pages"].extend(shard["structure"]["pages"])
+                result["has_scanned_content"] = result["has_scanned_content"] or shard["has_scanned_content"]
+
+        result["full_text"] = "\n".join(result["text_content"])
+        result["shards"] = len(shards)
+        return result
+
+    def tables(self, page_range: Optional[Tuple[int, int]] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Tables in the format of extract_tables_from_pdf, reusing pages already walked.
+
+        Args:
+            page_range: Optional tuple of (start_page, end_page)
+            limit: Maximum number of tables to return
+
+        Returns:
+            List[Dict[str, Any]]: Extracted tables
+        """
+        tables = []
+        for page_num in self.page_indices(page_range):
+            grids = self._page_tables.get(page_num)
+            if grids is None:
+                grids = self._find_page_tables(self.doc[page_num], page_num)
+            for _, cells in grids:
+                if len(tables) >= limit:
+                    return tables
+                # Convert cells to a more useful format
+                data = []
+                for row in cells:
+                    data.append({f"col_{j}": cell for j, cell in enumerate(row)})
+                tables.append({
+                    "table_id": len(tables) + 1,
+                    "page": page_num + 1,
+                    "rows": len(cells),
+                    "columns": [f"col_{j}" for j in range(len(cells[0]) if cells else 0)],
+                    "data": data,
+                    "extraction_method": "pymupdf"
+                })
+        return tables
+
+
+def open_extraction_context(file_path: str, context: Optional[PDFExtractionContext] = None, **kwargs):
+    """Return context unchanged (caller keeps ownership) or open a new one to use in a with block."""
+    if context is not None:
+        return contextlib.nullcontext(context)
+    return PDFExtractionContext(file_path, **kwargs)
+
+
+def extract_text_with_pymupdf(file_path: str, page_range: Optional[Tuple[int, int]] = None,
+                              context: Optional[PDFExtractionContext] = None) -> Dict[str, Any]:
+    """
+    Extract text from PDF using PyMuPDF (fitz) with enhanced structure preservation.
+    
+    Args:
+        file_path: Path to the PDF file
+        page_range: Optional tuple of (start_page, end_page) for partial extraction
+        context: Optional open PDFExtractionContext to reuse instead of opening the file
+        
+    Returns:
+        Dict[str, Any]: Extracted text and metadata
+    """
+    if not USE_FITZ:
+        raise ImportError("PyMuPDF not available")
+    
+    try:
+        if context is not None:
+            return context.extract(page_range)
+        
+        # Validate the file path
+        file_path = validate_path(file_path)
+        with PDFExtractionContext(file_path) as ctx:
+            return ctx.extract(page_range)
     except Exception as e:
         logger.error(f"PyMuPDF extraction error: {e}")
         raise
@@ -687,7 +1078,8 @@ def extract_text_with_pdfplumber(file_path: str, page_range: Optional[Tuple[int,
     
     return result
 
-def extract_text_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+def extract_text_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]] = None,
+                          context: Optional[PDFExtractionContext] = None) -> Dict[str, Any]:
     """
     Enhanced text extraction from PDF files with structure preservation and fallback mechanisms.
     Tries multiple extraction methods until successful.
@@ -695,6 +1087,7 @@ def extract_text_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]]
     Args:
         file_path: Path to the PDF file
         page_range: Optional tuple of (start_page, end_page) for partial extraction
+        context: Optional open PDFExtractionContext shared with other extraction steps
         
     Returns:
         Dict[str, Any]: Extracted text and metadata
@@ -729,7 +1122,9 @@ def extract_text_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]]
     
     # 1. Try PyMuPDF (primary method)
     if USE_FITZ:
-        extraction_methods.append(("pymupdf", extract_text_with_pymupdf))
+        extraction_methods.append(
+            ("pymupdf", lambda path, pages: extract_text_with_pymupdf(path, pages, context=context))
+        )
     
     # 2. Try PyPDF2 (fallback)
     if USE_PYPDF2:
@@ -898,13 +1293,113 @@ def extract_basic_text_from_pdf(file_path: str) -> str:
 # SECTION 5: OCR AND SCAN PROCESSING FUNCTIONS
 # =============================================================================
 
-def process_scanned_pdf(file_path: str, max_pages: int = None) -> Dict[str, Any]:
+def ocr_page(page, dpi: int = 300, language: str = "eng") -> Dict[str, Any]:
+    """
+    OCR one PyMuPDF page in memory with a single tesseract run.
+    
+    Args:
+        page: PyMuPDF page object
+        dpi: Rasterization resolution
+        language: Tesseract language code
+        
+    Returns:
+        Dict[str, Any]: text, confidence, ocr_time in seconds and whether the
+        result came from the OCR cache
+    """
+    start = time.time()
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csGRAY, alpha=False)
+    
+    # Unchanged pages are served from the persistent OCR cache
+    cache = get_ocr_cache() if get_ocr_cache else None
+    key = ocr_cache_key(pix.samples, pix.width, pix.height, language) if cache else None
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        return {"text": cached["text"], "confidence": cached["confidence"],
+                "ocr_time": time.time() - start, "cached": True}
+    
+    img = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    ocr_data = pytesseract.image_to_data(img, lang=language, output_type=pytesseract.Output.DICT)
+    if tesseract_data_to_text:
+        text, confidence = tesseract_data_to_text(ocr_data)
+    else:
+        text = pytesseract.image_to_string(img, lang=language)
+        confidences = [float(c) for c in ocr_data["conf"] if float(c) >= 0]
+        confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    if cache:
+        cache.put(key, {"text": text, "confidence": confidence})
+    return {"text": text, "confidence": confidence, "ocr_time": time.time() - start, "cached": False}
+
+def ocr_scanned_pages(file_path: str, extracted_data: Dict[str, Any],
+                      context: Optional[PDFExtractionContext] = None,
+                      dpi: int = 300, language: str = "eng") -> List[Dict[str, Any]]:
+    """
+    OCR only the pages flagged as scanned and merge the text back in place.
+    
+    Native text of born-digital pages is kept. For each scanned page, the OCR
+    text replaces that page's entry in text_content and structure["pages"], so
+    full_text keeps the original page order.
+    
+    Args:
+        file_path: Path to the PDF file
+        extracted_data: Result of extract_text_from_pdf (PyMuPDF structure with is_scanned flags)
+        context: Optional open PDFExtractionContext
+        dpi: Rasterization resolution
+        language: Tesseract language code
+        
+    Returns:
+        List[Dict[str, Any]]: Per-page OCR report (page, ocr_time, confidence, chars)
+    """
+    pages = extracted_data.get("structure", {}).get("pages", [])
+    scanned = [(pos, page) for pos, page in enumerate(pages) if page.get("is_scanned")]
+    if not scanned or not USE_OCR or not USE_FITZ:
+        return []
+    
+    logger.info(f"OCR on {len(scanned)} of {len(pages)} pages flagged as scanned in {file_path}")
+    report = []
+    text_content = extracted_data.get("text_content", [])
+    with open_extraction_context(file_path, context, find_tables=False) as ctx:
+        for pos, page_dict in scanned:
+            page_num = page_dict["page_num"]
+            try:
+                ocr_result = ocr_page(ctx.doc[page_num - 1], dpi, language)
+            except Exception as ocr_err:
+                logger.error(f"OCR error on page {page_num}: {ocr_err}")
+                report.append({"page": page_num, "error": str(ocr_err)})
+                continue
+            
+            report.append({
+                "page": page_num,
+                "ocr_time": round(ocr_result["ocr_time"], 3),
+                "confidence": ocr_result["confidence"],
+                "chars": len(ocr_result["text"]),
+                "cached": ocr_result["cached"]
+            })
+            if not ocr_result["text"].strip():
+                continue
+            
+            # Merge into the native text stream at the page's position
+            page_dict["text"] = ocr_result["text"]
+            page_dict["blocks"] = [{"text": ocr_result["text"], "type": "ocr"}] + [
+                block for block in page_dict.get("blocks", []) if block.get("type") == "table"
+            ]
+            page_dict["ocr_applied"] = True
+            page_dict["ocr_confidence"] = ocr_result["confidence"]
+            if pos < len(text_content):
+                text_content[pos] = ocr_result["text"]
+    
+    if text_content:
+        extracted_data["full_text"] = "\n".join(text_content)
+    return report
+
+def process_scanned_pdf(file_path: str, max_pages: int = None,
+                        context: Optional[PDFExtractionContext] = None) -> Dict[str, Any]:
     """
     Process a scanned PDF using OCR to extract text.
     
     Args:
         file_path: Path to the PDF file
         max_pages: Maximum number of pages to process
+        context: Optional open PDFExtractionContext to reuse instead of opening the file
         
     Returns:
         Dict[str, Any]: OCR results
@@ -928,7 +1423,8 @@ def process_scanned_pdf(file_path: str, max_pages: int = None) -> Dict[str, Any]
         "text": "",
         "confidence": 0.0,
         "pages_processed": 0,
-        "success": False
+        "success": False,
+        "page_times": []
     }
         
     try:
@@ -936,64 +1432,34 @@ def process_scanned_pdf(file_path: str, max_pages: int = None) -> Dict[str, Any]
         total_confidence = 0.0
         pages_processed = 0
         
-        with fitz.open(file_path) as doc:
+        with open_extraction_context(file_path, context, find_tables=False) as ctx:
+            doc = ctx.doc
             # Limit page processing if requested
             total_pages = len(doc)
             pages_to_process = min(total_pages, max_pages) if max_pages else total_pages
             
             for page_num in range(pages_to_process):
                 page = doc[page_num]
-                # First try normal text extraction
-                text = page.get_text()
+                # First try normal text extraction (cached if the page was already walked)
+                text = ctx.page_text(page_num)
                 
                 # If page has very little text, it might be scanned/image-based
-                if len(text.strip()) < 100:
+                if len(text.strip()) < SCANNED_PAGE_MAX_CHARS:
                     logger.info(f"Page {page_num+1} appears to be scanned. Applying OCR.")
-                    # Convert page to image
-                    pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-                    
-                    # Save to temporary file
-                    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
-                        pix.save(tmp_file.name)
-                        tmp_path = tmp_file.name
-                    
                     try:
-                        # Apply OCR
-                        img = Image.open(tmp_path)
-                        
-                        # Use confidence if supported by Tesseract version
-                        ocr_data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
-                        
-                        # Extract text and calculate confidence
-                        page_text = []
-                        page_confidence = []
-                        
-                        for i, word_text in enumerate(ocr_data['text']):
-                            if word_text.strip():
-                                page_text.append(word_text)
-                                if 'conf' in ocr_data:
-                                    conf = float(ocr_data['conf'][i])
-                                    if conf > 0:  # -1 means no confidence available
-                                        page_confidence.append(conf)
-                        
-                        # Join the text and calculate average confidence
-                        ocr_text = " ".join(page_text)
-                        avg_confidence = sum(page_confidence) / len(page_confidence) if page_confidence else 0
-                        
-                        text_content.append(ocr_text)
-                        total_confidence += avg_confidence
+                        ocr_result = ocr_page(page)
+                        text_content.append(ocr_result["text"])
+                        total_confidence += ocr_result["confidence"]
                         pages_processed += 1
-                        
+                        result["page_times"].append({
+                            "page": page_num + 1,
+                            "ocr_time": round(ocr_result["ocr_time"], 3),
+                            "cached": ocr_result["cached"]
+                        })
                     except Exception as ocr_err:
                         logger.error(f"OCR error on page {page_num+1}: {ocr_err}")
                         # Use whatever text we got from normal extraction as fallback
                         text_content.append(text)
-                    finally:
-                        # Clean up temp file
-                        try:
-                            os.unlink(tmp_path)
-                        except:
-                            pass
                 else:
                     text_content.append(text)
                     
@@ -1013,14 +1479,303 @@ def process_scanned_pdf(file_path: str, max_pages: int = None) -> Dict[str, Any]
 # SECTION 6: TABLE EXTRACTION FUNCTIONS
 # =============================================================================
 
-def extract_tables_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]] = None, limit: int = 50) -> List[Dict[str, Any]]:
+# Seconds to wait for one tabula request before giving up on the worker
+TABULA_REQUEST_TIMEOUT = 300
+# Seconds to wait for the worker's JVM to come up
+TABULA_STARTUP_TIMEOUT = 120
+
+def tesseract_available() -> bool:
+    """True if pytesseract is installed and its tesseract executable can be found."""
+    if not USE_OCR or pytesseract is None:
+        return False
+    import shutil
+    return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+def result_environment() -> Dict[str, Any]:
+    """
+    Extractor version and the backends that shape process_pdf's output.
+    
+    Included in the result store key so that a result produced without
+    tesseract or Java (no OCR text, no tabula tables) is not reused once they
+    are installed, and vice versa.
+    """
+    return {
+        "extractor_version": PDF_RESULT_VERSION,
+        "pymupdf": USE_FITZ,
+        "pdfplumber": USE_PDFPLUMBER,
+        "pypdf2": USE_PYPDF2,
+        "ocr": tesseract_available(),
+        "tabula": USE_TABULA and java_available()
+    }
+
+def java_available() -> bool:
+    """True if a java executable can be found via JAVA_HOME or PATH."""
+    import shutil
+    java_home = os.environ.get("JAVA_HOME")
+    if java_home:
+        for candidate in ("java", "java.exe"):
+            if os.path.exists(os.path.join(java_home, "bin", candidate)) or \
+               os.path.exists(os.path.join(java_home, candidate)):
+                return True
+    return shutil.which("java") is not None
+
+def _tabula_frames_to_tables(frames) -> List[Dict[str, Any]]:
+    """Convert tabula DataFrames to plain columns/records so they can cross processes."""
+    return [
+        {"columns": [str(c) for c in frame.columns], "data": frame.fillna('').to_dict(orient='records')}
+        for frame in frames
+    ]
+
+def _tabula_read_pdf(file_path: str, pages: str):
+    try:
+        return tabula.read_pdf(file_path, pages=pages, multiple_tables=True)
+    except AttributeError as attr_err:
+        if "'module' object has no attribute '_parse_pages'" in str(attr_err):
+            # Use alternative approach for newer tabula-py versions
+            return tabula.io.read_pdf(file_path, pages=pages, multiple_tables=True)
+        raise
+
+def _start_tabula_jvm() -> None:
+    """
+    Start this process's JVM with tabula-java on the classpath.
+    
+    tabula-py only runs in-process when it can import technology.tabula from a
+    running JVM; otherwise it silently launches java for every call. The jar
+    therefore has to be on the classpath before the JVM starts, and the import
+    is checked here so a broken setup fails the worker's startup instead.
+    """
+    import jpype
+    import jpype.imports  # noqa: F401 - enables importing Java packages
+    from tabula.backend import jar_path
+    if not jpype.isJVMStarted():
+        jpype.addClassPath(jar_path())
+        jpype.startJVM("-Djava.awt.headless=true", "-Dfile.encoding=UTF8", convertStrings=False)
+    import technology.tabula  # noqa: F401
+
+def _tabula_worker_main(requests, responses) -> None:
+    """
+    Body of the table worker process: start the JVM once, then serve requests.
+    
+    Requests are (request_id, file_path, pages) tuples, None stops the worker.
+    Responses are (request_id, tables, error); request_id None reports readiness.
+    """
+    try:
+        if tabula is None:
+            raise ImportError("tabula-py not installed")
+        # tabula-py then runs inside this process's JVM instead of launching
+        # java for every call, which is what keeps it warm
+        _start_tabula_jvm()
+        responses.put((None, None, None))
+    except Exception as e:
+        responses.put((None, None, f"{type(e).__name__}: {e}"))
+        return
+    
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, file_path, pages = request
+        try:
+            responses.put((request_id, _tabula_frames_to_tables(_tabula_read_pdf(file_path, pages)), None))
+        except Exception as e:
+            responses.put((request_id, None, f"{type(e).__name__}: {e}"))
+
+class TabulaWorker:
+    """
+    A long-lived process holding one warm JVM for tabula table extraction.
+    
+    tabula.read_pdf pays for a JVM start on every call when used directly.
+    The worker starts the JVM once and serves (file, pages) requests from a
+    queue, so all callers in a process (batch_process_pdfs threads, the
+    Structify pipeline) share it. The process is spawned rather than forked
+    because a JVM does not survive fork. worker_main is the process body
+    (a picklable module-level function speaking the same queue protocol).
+    """
+    
+    def __init__(self, startup_timeout: float = TABULA_STARTUP_TIMEOUT,
+                 worker_main: Callable[[Any, Any], None] = _tabula_worker_main):
+        import itertools
+        ctx = multiprocessing.get_context("spawn")
+        self._requests = ctx.Queue()
+        self._responses = ctx.Queue()
+        self._process = ctx.Process(target=worker_main, args=(self._requests, self._responses),
+                                    name="tabula-worker", daemon=True)
+        self._process.start()
+        
+        # Wait for the JVM to come up before accepting work
+        import queue
+        error = "timed out starting JVM"
+        deadline = time.time() + startup_timeout
+        while time.time() < deadline:
+            try:
+                _, _, error = self._responses.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if not self._process.is_alive():
+                    error = f"worker exited with code {self._process.exitcode}"
+                    break
+        if error:
+            self._process.kill()
+            raise RuntimeError(f"Tabula worker failed to start: {error}")
+        
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._reader = threading.Thread(target=self._read_responses, name="tabula-responses", daemon=True)
+        self._reader.start()
+        logger.info(f"Tabula worker started (pid {self._process.pid})")
+    
+    def _read_responses(self) -> None:
+        while True:
+            try:
+                request_id, tables, error = self._responses.get()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                slot = self._pending.pop(request_id, None)
+            if slot is not None:
+                slot["tables"], slot["error"] = tables, error
+                slot["done"].set()
+    
+    @property
+    def alive(self) -> bool:
+        return self._process.is_alive()
+    
+    def read_pdf(self, file_path: str, pages: str = "all",
+                 timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Extract tables with the warm JVM.
+        
+        The worker serves one request at a time, so a request that times out
+        would hold up every later one: the worker is killed instead, and the
+        TimeoutError tells the caller to start a new one.
+        
+        Args:
+            file_path: Path to the PDF file
+            pages: tabula page specification ("all", "1-3", ...)
+            timeout: Seconds to wait for the result (default TABULA_REQUEST_TIMEOUT)
+            
+        Returns:
+            List[Dict[str, Any]]: One {"columns", "data"} dict per table
+        """
+        if timeout is None:
+            timeout = TABULA_REQUEST_TIMEOUT
+        slot = {"done": threading.Event(), "tables": None, "error": None}
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = slot
+        self._requests.put((request_id, os.path.abspath(file_path), pages))
+        
+        deadline = time.time() + timeout
+        while not slot["done"].wait(1.0):
+            if not self.alive or time.time() > deadline:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                if not self.alive:
+                    raise RuntimeError("Tabula worker died")
+                self._process.kill()
+                self._process.join(5)
+                raise TimeoutError(f"Tabula request timed out after {timeout}s")
+        if slot["error"]:
+            raise RuntimeError(slot["error"])
+        return slot["tables"]
+    
+    def close(self) -> None:
+        if self.alive:
+            try:
+                self._requests.put(None)
+                self._process.join(5)
+            except Exception:
+                pass
+            if self._process.is_alive():
+                self._process.kill()
+
+# Process-wide worker shared by every table extraction call
+_tabula_worker: Dict[str, Any] = {"worker": None, "failed": False}
+_tabula_worker_lock = threading.Lock()
+
+def get_tabula_worker() -> Optional[TabulaWorker]:
+    """
+    Return the shared TabulaWorker, starting it on first use.
+    
+    Returns None when tabula, jpype or Java is missing, or the worker could not
+    start; callers then fall back to calling tabula directly.
+    """
+    if not USE_TABULA:
+        return None
+    with _tabula_worker_lock:
+        worker = _tabula_worker["worker"]
+        if worker is not None and worker.alive:
+            return worker
+        if _tabula_worker["failed"] or not java_available():
+            return None
+        try:
+            import jpype  # noqa: F401 - without it tabula cannot keep a JVM in-process
+            _tabula_worker["worker"] = TabulaWorker()
+        except Exception as e:
+            logger.warning(f"Persistent tabula worker unavailable, using per-call tabula: {e}")
+            _tabula_worker.update(worker=None, failed=True)
+        return _tabula_worker["worker"]
+
+def shutdown_tabula_worker() -> None:
+    """Stop the shared tabula worker, if one is running."""
+    with _tabula_worker_lock:
+        if _tabula_worker["worker"] is not None:
+            _tabula_worker["worker"].close()
+            _tabula_worker["worker"] = None
+
+atexit.register(shutdown_tabula_worker)
+
+def read_tables_with_tabula(file_path: str, pages: str = "all") -> List[Dict[str, Any]]:
+    """
+    Extract tables with tabula, preferring the shared warm-JVM worker.
+    
+    Args:
+        file_path: Path to the PDF file
+        pages: tabula page specification ("all", "1-3", ...)
+        
+    Returns:
+        List[Dict[str, Any]]: One {"columns", "data"} dict per table; empty
+        when Java is not installed
+    """
+    worker = get_tabula_worker()
+    if worker is not None:
+        try:
+            return worker.read_pdf(file_path, pages)
+        except TimeoutError as e:
+            # The hung worker was killed; the next call starts a fresh one
+            logger.warning(f"Tabula worker request failed for {file_path}: {e}")
+            with _tabula_worker_lock:
+                if _tabula_worker["worker"] is worker:
+                    _tabula_worker["worker"] = None
+            return []
+        except RuntimeError as e:
+            logger.warning(f"Tabula worker request failed for {file_path}: {e}")
+            if worker.alive:
+                return []
+    
+    if not java_available():
+        logger.info("Java not found; skipping tabula table extraction")
+        return []
+    
+    # Per-call fallback: tabula launches java for this request
+    return _tabula_frames_to_tables(_tabula_read_pdf(file_path, pages))
+
+def extract_tables_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]] = None, limit: int = 50,
+                            context: Optional[PDFExtractionContext] = None,
+                            screen_pages: bool = True) -> List[Dict[str, Any]]:
     """
     Extract tables from a PDF using multiple available libraries with fallbacks.
     
+    Pages rejected by the page_may_contain_table() pre-screen are not given to
+    PyMuPDF's or pdfplumber's table detectors.
+    
     Args:
         file_path: Path to the PDF file
         page_range: Optional tuple of (start_page, end_page) for partial extraction
         limit: Maximum number of tables to extract
+        context: Optional open PDFExtractionContext; tables found while walking pages are reused
+        screen_pages: Pre-screen pages when opening a new context (a given context keeps its setting)
         
     Returns:
         List[Dict[str, Any]]: List of extracted tables with page numbers and data
@@ -1035,46 +1790,18 @@ def extract_tables_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]
         return []
     
     # 1. First try using PyMuPDF (more reliable)
+    candidate_pages = None
     if USE_FITZ:
         try:
             logger.info(f"Attempting table extraction with PyMuPDF for {file_path}")
-            pymupdf_tables = []
-            with fitz.open(file_path) as doc:
-                # Apply page range if specified
-                if page_range:
-                    start_page, end_page = page_range
-                    pages_to_process = range(
-                        max(0, start_page),
-                        min(len(doc), end_page + 1)
-                    )
-                else:
-                    pages_to_process = range(len(doc))
-                    
-                for page_num in pages_to_process:
-                    page = doc[page_num]
-                    if hasattr(page, 'find_tables'):  # PyMuPDF v1.19.0+
-                        try:
-                            for i, table in enumerate(page.find_tables()):
-                                if len(pymupdf_tables) >= limit:
-                                    break
-                                    
-                                cells = table.extract()
-                                # Convert cells to a more useful format
-                                data = []
-                                for row in cells:
-                                    data.append({f"col_{j}": cell for j, cell in enumerate(row)})
-                                
-                                table_dict = {
-                                    "table_id": len(pymupdf_tables) + 1,
-                                    "page": page_num + 1,
-                                    "rows": len(cells),
-                                    "columns": [f"col_{j}" for j in range(len(cells[0]) if cells else 0)],
-                                    "data": data,
-                                    "extraction_method": "pymupdf"
-                                }
-                                pymupdf_tables.append(table_dict)
-                        except Exception as e:
-                            logger.debug(f"PyMuPDF table extraction failed for page {page_num+1}: {e}")
+            with open_extraction_context(file_path, context, screen_tables=screen_pages) as ctx:
+                pymupdf_tables = ctx.tables(page_range, limit)
+                candidate_pages = {page_idx for page_idx in ctx.page_indices(page_range)
+                                   if ctx.is_table_candidate(page_idx)}
+                stats = ctx.table_stats
+                if stats["pages_skipped"]:
+                    logger.info(f"Table pre-screen skipped {stats['pages_skipped']} of "
+                                f"{stats['pages_screened']} pages in {file_path}")
             
             if pymupdf_tables:
                 logger.info(f"Extracted {len(pymupdf_tables)} tables from {file_path} using PyMuPDF")
@@ -1100,6 +1827,8 @@ def extract_tables_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]
                     pages_to_process = range(len(pdf.pages))
                     
                 for page_idx in pages_to_process:
+                    if candidate_pages is not None and page_idx not in candidate_pages:
+                        continue
                     try:
                         page = pdf.pages[page_idx]
                         extracted_tables = page.extract_tables()
@@ -1141,18 +1870,9 @@ def extract_tables_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]
         except Exception as e:
             logger.warning(f"pdfplumber table extraction failed for {file_path}: {e}")
     
-    # 3. Try using tabula-py if available
+    # 3. Try using tabula-py if available (shared warm-JVM worker when possible)
     if USE_TABULA:
         try:
-            # Check Java integration
-            try:
-                import jpype
-                if not jpype.isJVMStarted():
-                    logger.info("Starting JVM for tabula")
-                    jpype.startJVM()
-            except Exception as jvm_err:
-                logger.warning(f"Failed to start JVM: {jvm_err}")
-            
             # Extract all tables from the PDF
             logger.info(f"Attempting table extraction with tabula for {file_path}")
             
@@ -1163,14 +1883,7 @@ def extract_tables_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]
                 # Note: tabula uses 1-based page numbering
                 pages_str = f"{start_page+1}-{end_page+1}"
             
-            try:
-                tabula_tables = tabula.read_pdf(file_path, pages=pages_str, multiple_tables=True)
-            except AttributeError as attr_err:
-                if "'module' object has no attribute '_parse_pages'" in str(attr_err):
-                    # Use alternative approach for newer tabula-py versions
-                    tabula_tables = tabula.io.read_pdf(file_path, pages=pages_str, multiple_tables=True)
-                else:
-                    raise
+            tabula_tables = read_tables_with_tabula(file_path, pages_str)
             
             # Process each table
             tabula_processed = []
@@ -1179,13 +1892,12 @@ def extract_tables_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]
                     logger.info(f"Reached table limit ({limit}). Skipping remaining tables.")
                     break
                     
-                # Convert DataFrame to dict
                 table_dict = {
                     "table_id": i + 1,
                     "page": 1,  # Default if page info not available
-                    "rows": len(table),
-                    "columns": list(table.columns),
-                    "data": table.fillna('').to_dict(orient='records'),
+                    "rows": len(table["data"]),
+                    "columns": table["columns"],
+                    "data": table["data"],
                     "extraction_method": "tabula"
                 }
                 tabula_processed.append(table_dict)
@@ -1204,12 +1916,13 @@ def extract_tables_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]
 # SECTION 7: DOCUMENT TYPE DETECTION FUNCTIONS
 # =============================================================================
 
-def detect_document_type(file_path: str) -> str:
+def detect_document_type(file_path: str, context: Optional[PDFExtractionContext] = None) -> str:
     """
     Detect the type of PDF document to apply appropriate processing.
     
     Args:
         file_path: Path to the PDF file
+        context: Optional open PDFExtractionContext; sampled page text is cached for later steps
         
     Returns:
         str: Document type: "academic_paper", "report", "scan", "book", or "general"
@@ -1218,9 +1931,9 @@ def detect_document_type(file_path: str) -> str:
         try:
             # Extract a sample of text to analyze
             doc_text = ""
-            with fitz.open(file_path) as doc:
+            with open_extraction_context(file_path, context, find_tables=False) as ctx:
                 # Get page count and check overall structure
-                page_count = len(doc)
+                page_count = ctx.page_count
                 
                 # Check first few pages for content (possible scan detection)
                 pages_to_check = min(3, page_count)
@@ -1228,7 +1941,7 @@ def detect_document_type(file_path: str) -> str:
                 text_samples = []
                 
                 for i in range(pages_to_check):
-                    page_text = doc[i].get_text().strip()
+                    page_text = ctx.page_text(i).strip()
                     total_text_len += len(page_text)
                     text_samples.append(page_text)
                     
@@ -2368,198 +3081,116 @@ def chunk_document_by_structure(text: str, structure: Dict[str, Any], max_chunk_
     logger.info(f"Created {len(chunks)} chunks from document structure")
     return chunks
 
-def chunk_text_by_paragraphs(text: str, max_size: int, overlap: int = 200) -> List[str]:
+SENTENCE_BREAKS = (". ", "? ", "! ", ".\n", "?\n", "!\n")
+
+
+def _find_chunk_break(text: str, start: int, limit: int, max_size: int) -> int:
+    """
+    Pick the end offset for a chunk starting at start whose hard limit is limit.
+
+    Breaks are searched right-to-left inside the window only, preferring a
+    paragraph break, then a line break, a sentence end and finally whitespace.
+    Each candidate must leave the chunk reasonably full so that progress per
+    chunk stays proportional to max_size.
+    """
+    floor = start + max_size // 2
+    pos = text.rfind("\n\n", floor, limit)
+    if pos != -1:
+        return pos
+    pos = text.rfind("\n", floor, limit)
+    if pos != -1:
+        return pos
+
+    floor = start + max_size // 3
+    pos = max(text.rfind(mark, floor, limit) for mark in SENTENCE_BREAKS)
+    if pos != -1:
+        return pos + 1
+
+    floor = start + max_size // 4
+    pos = max(text.rfind(" ", floor, limit), text.rfind("\t", floor, limit))
+    if pos != -1:
+        return pos
+
+    # No boundary at all (minified text, base64, OCR noise): hard cut
+    return limit
+
+
+def iter_chunk_spans(text: str, max_size: int, overlap: int = 0) -> Iterator[Tuple[int, int]]:
+    """
+    Lazily split text into (start, end) character spans of at most max_size.
+
+    The text is scanned once, left to right, and nothing is copied: each cut is
+    found with bounded rfind calls inside the current window, and the overlap
+    with the previous chunk is expressed as an earlier start offset (moved up
+    to a word boundary) instead of re-joining chunk text.
+
+    Same algorithm as Structify.claude.iter_chunk_spans; duplicated so this
+    module keeps working without Structify installed.
+
+    Args:
+        text: Text to chunk
+        max_size: Maximum chunk size in characters
+        overlap: Number of characters to overlap between consecutive chunks
+
+    Yields:
+        (start, end) offsets such that text[start:end] is a chunk
     """
-    Chunk text into segments by paragraph boundaries with optimized memory usage.
-    Enhanced to handle very large documents efficiently with improved overlap handling.
-    
+    n = len(text)
+    if n == 0:
+        return
+    max_size = max(1, max_size)
+    if n <= max_size:
+        yield 0, n
+        return
+    overlap = max(0, min(overlap, max_size // 2))
+
+    start = 0
+    while start < n:
+        limit = start + max_size
+        end = n if limit >= n else _find_chunk_break(text, start, limit, max_size)
+
+        # Don't carry trailing whitespace into the chunk
+        stop = end
+        while stop > start and text[stop - 1].isspace():
+            stop -= 1
+        if stop > start:
+            yield start, stop
+        if end >= n:
+            break
+
+        next_start = end
+        if overlap and stop > start:
+            # Never overlap more than half the chunk so each step makes real progress
+            next_start = max(stop - min(overlap, (stop - start) // 2), start + 1)
+            space = text.find(" ", next_start, stop)
+            if space != -1:
+                next_start = space + 1
+        while next_start < n and text[next_start].isspace():
+            next_start += 1
+        start = next_start
+
+
+def iter_text_chunks(text: str, max_size: int, overlap: int = 0) -> Iterator[str]:
+    """
+    Yield chunk strings for text, see iter_chunk_spans.
+
     Args:
         text: Text to chunk
         max_size: Maximum chunk size
         overlap: Number of characters to overlap between chunks
-        
-    Returns:
-        List[str]: List of text chunks
+
+    Yields:
+        Text chunks
     """
-    # If text fits in a single chunk, return it
-    if len(text) <= max_size:
-        return [text]
-    
-    # For very large texts, use a more memory-efficient approach
-    if len(text) > 10_000_000:  # 10MB+
-        return chunk_large_text(text, max_size, overlap)
-    
-    # Split text into paragraphs
-    paragraphs = re.split(r'\n\s*\n', text)
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    
-    # Track the content of the last created chunk for overlap
-    last_chunk_content = ""
-    
-    for para in paragraphs:
-        para_size = len(para) + 2  # +2 for newlines between paragraphs
-        
-        # If adding this paragraph would exceed the max size
-        if current_size + para_size > max_size:
-            # Only save non-empty chunks
-            if current_chunk:
-                chunk_text = "\n\n".join(current_chunk)
-                chunks.append(chunk_text)
-                last_chunk_content = chunk_text
-                
-                # Start a new chunk with overlap from previous chunk if requested
-                if overlap > 0:
-                    # Calculate overlap from the end of the last chunk
-                    overlap_text = last_chunk_content[-min(overlap, len(last_chunk_content)):]
-                    
-                    # Start new chunk with the overlap text as a preface
-                    if overlap_text:
-                        current_chunk = [overlap_text]
-                        current_size = len(overlap_text)
-                    else:
-                        current_chunk = []
-                        current_size = 0
-                else:
-                    current_chunk = []
-                    current_size = 0
-            
-            # If the paragraph itself is too large, split it by sentences with overlap
-            if para_size > max_size:
-                logger.debug(f"Splitting large paragraph of {para_size} chars")
-                # Try splitting by sentences first
-                sentences = re.split(r'(?<=[.!?])\s+', para)
-                
-                # If any single sentence is too large, need to split by words
-                if any(len(s) > max_size for s in sentences):
-                    # Handle very large paragraphs by words
-                    words = para.split()
-                    word_chunk = []
-                    word_size = 0
-                    chunk_start_index = 0
-                    
-                    for i, word in enumerate(words):
-                        word_with_space = word + " "
-                        if word_size + len(word_with_space) > max_size:
-                            # Save current word chunk if it exists
-                            if word_chunk:
-                                word_text = " ".join(word_chunk)
-                                chunks.append(word_text)
-                                last_chunk_content = word_text
-                                
-                                # Calculate word-based overlap for next chunk
-                                if overlap > 0:
-                                    # Find overlap words from end of last chunk
-                                    overlap_size = 0
-                                    overlap_word_count = 0
-                                    
-                                    # Count back words until we reach desired overlap size
-                                    for j in range(len(word_chunk) - 1, -1, -1):
-                                        overlap_size += len(word_chunk[j]) + 1  # +1 for space
-                                        overlap_word_count += 1
-                                        if overlap_size >= overlap:
-                                            break
-                                    
-                                    # Determine start index for next chunk with overlap
-                                    chunk_start_index = max(0, i - overlap_word_count)
-                                    # Reset word chunk with overlap words
-                                    word_chunk = words[chunk_start_index:i]
-                                    word_size = sum(len(w) + 1 for w in word_chunk)
-                                else:
-                                    word_chunk = []
-                                    word_size = 0
-                            else:
-                                # A single word is too large, forcefully split it
-                                if len(word) > max_size:
-                                    # This handles extremely long words by splitting them
-                                    for k in range(0, len(word), max_size):
-                                        word_segment = word[k:k+max_size]
-                                        chunks.append(word_segment)
-                                        last_chunk_content = word_segment
-                                    
-                                    word_chunk = []
-                                    word_size = 0
-                                else:
-                                    # Start with this single word
-                                    word_chunk = [word]
-                                    word_size = len(word_with_space)
-                        else:
-                            word_chunk.append(word)
-                            word_size += len(word_with_space)
-                    
-                    # Add any remaining words as the final chunk
-                    if word_chunk:
-                        word_text = " ".join(word_chunk)
-                        chunks.append(word_text)
-                        last_chunk_content = word_text
-                else:
-                    # Process sentence by sentence
-                    sentence_chunk = []
-                    sentence_size = 0
-                    
-                    for sentence in sentences:
-                        sentence_with_space = sentence + " "
-                        if sentence_size + len(sentence_with_space) > max_size:
-                            # Save current sentence chunk
-                            if sentence_chunk:
-                                sentence_text = " ".join(sentence_chunk)
-                                chunks.append(sentence_text)
-                                last_chunk_content = sentence_text
-                                
-                                # Add overlap for next chunk if needed
-                                if overlap > 0 and len(sentence_text) > 0:
-                                    overlap_text = sentence_text[-min(overlap, len(sentence_text)):]
-                                    # Start with overlap text if it exists
-                                    sentence_chunk = [overlap_text, sentence]
-                                    sentence_size = len(overlap_text) + len(sentence_with_space)
-                                else:
-                                    # Start fresh with current sentence
-                                    sentence_chunk = [sentence]
-                                    sentence_size = len(sentence_with_space)
-                            else:
-                                # Start with just this sentence
-                                sentence_chunk = [sentence]
-                                sentence_size = len(sentence_with_space)
-                        else:
-                            sentence_chunk.append(sentence)
-                            sentence_size += len(sentence_with_space)
-                    
-                    # Add any remaining sentences
-                    if sentence_chunk:
-                        sentence_text = " ".join(sentence_chunk)
-                        chunks.append(sentence_text)
-                        last_chunk_content = sentence_text
-            else:
-                # Add paragraph to current chunk or start a new one
-                # At this point we've already handled the previous chunk
-                current_chunk = [para]
-                current_size = para_size
-        else:
-            # Add paragraph to current chunk
-            current_chunk.append(para)
-            current_size += para_size
-    
-    # Add the final chunk if there's anything left
-    if current_chunk:
-        chunk_text = "\n\n".join(current_chunk)
-        chunks.append(chunk_text)
-    
-    # Log chunk statistics for monitoring
-    avg_chunk_size = sum(len(c) for c in chunks) / max(1, len(chunks))
-    logger.debug(f"Created {len(chunks)} chunks, average size: {avg_chunk_size:.0f} chars")
-    
-    # Validate that we're not missing content
-    total_chunk_size = sum(len(chunk) for chunk in chunks)
-    if total_chunk_size < len(text) * 0.9:  # Allow for some loss due to whitespace normalization
-        logger.warning(f"Potential content loss! Original: {len(text)} chars, Chunked: {total_chunk_size} chars")
-    
-    return chunks
+    for start, end in iter_chunk_spans(text, max_size, overlap):
+        yield text[start:end]
 
-def chunk_large_text(text: str, max_size: int, overlap: int = 0) -> List[str]:
+
+def chunk_text_by_paragraphs(text: str, max_size: int, overlap: int = 200) -> List[str]:
     """
-    Efficiently chunk very large texts (multi-MB) into segments of size max_size.
-    Uses minimal memory by processing text in a streaming fashion with improved boundary detection.
+    Chunk text into segments by paragraph boundaries.
+    Cuts prefer paragraph breaks, then line breaks, sentences and words, and the
+    text is scanned once regardless of its size (see iter_chunk_spans).
     
     Args:
         text: Text to chunk
@@ -2569,188 +3200,15 @@ def chunk_large_text(text: str, max_size: int, overlap: int = 0) -> List[str]:
     Returns:
         List[str]: List of text chunks
     """
-    logger.info(f"Using large text chunking for {len(text)} character text")
-    chunks = []
-    start = 0
-    overlap_text = ""
-    
-    total_chars_processed = 0
-    
-    while start < len(text):
-        # For progress tracking with large texts
-        if len(text) > 100_000_000 and total_chars_processed % 10_000_000 < max_size:  # Log every ~10MB
-            logger.info(f"Large text chunking progress: {total_chars_processed/len(text)*100:.1f}% complete")
-        
-        # If remaining text fits in chunk, add it all
-        if start + max_size - len(overlap_text) >= len(text):
-            chunk_text = overlap_text + text[start:]
-            chunks.append(chunk_text)
-            total_chars_processed = len(text)  # Mark as complete
-            break
-            
-        end = start + max_size - len(overlap_text)
-        
-        # Try to find natural break points in descending order of preference
-        
-        # 1. Try to find a paragraph break (most preferred)
-        par_breaks = [
-            text.rfind("\n\n\n", start, end),  # Triple newline
-            text.rfind("\n\n", start, end),    # Double newline
-            text.rfind("\r\n\r\n", start, end) # Windows style paragraph
-        ]
-        best_par_break = max(par_breaks)
-        
-        if best_par_break != -1 and best_par_break > start + (max_size // 3):
-            # We found a good paragraph break
-            chunk_text = overlap_text + text[start:best_par_break]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = best_par_break
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
-            else:
-                overlap_text = ""
-                
-            # Move start pointer past the paragraph break
-            start = best_par_break
-            # Skip the paragraph break characters
-            if text.startswith("\r\n\r\n", start):
-                start += 4
-            elif text.startswith("\n\n\n", start):
-                start += 3
-            elif text.startswith("\n\n", start):
-                start += 2
-            else:
-                start += 1  # Safeguard
-                
-            continue
-            
-        # 2. Try to find a line break
-        line_breaks = [
-            text.rfind("\r\n", start, end),  # Windows style
-            text.rfind("\n", start, end)     # Unix style
-        ]
-        best_line_break = max(line_breaks)
-        
-        if best_line_break != -1 and best_line_break > start + (max_size // 2):
-            chunk_text = overlap_text + text[start:best_line_break]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = best_line_break
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
-            else:
-                overlap_text = ""
-                
-            # Move start pointer past the line break
-            start = best_line_break
-            # Skip the newline characters
-            if text.startswith("\r\n", start):
-                start += 2
-            elif text.startswith("\n", start):
-                start += 1
-            else:
-                start += 1  # Safeguard
-                
-            continue
-            
-        # 3. Try to find sentence boundaries
-        sent_breaks = [
-            text.rfind(". ", start, end),
-            text.rfind("? ", start, end),
-            text.rfind("! ", start, end),
-            text.rfind(".\n", start, end),
-            text.rfind("?\n", start, end),
-            text.rfind("!\n", start, end),
-            text.rfind("...", start, end),
-            text.rfind(": ", start, end),
-            text.rfind("; ", start, end)
-        ]
-        
-        best_break = max(sent_breaks)
-        if best_break != -1 and best_break > start + (max_size // 3):
-            # Found a good sentence break
-            # Include the punctuation in the current chunk
-            punctuation_len = 1
-            if text.startswith("...", best_break):
-                punctuation_len = 3
-                
-            chunk_text = overlap_text + text[start:best_break + punctuation_len]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = best_break + punctuation_len
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
-            else:
-                overlap_text = ""
-                
-            # Move start pointer past the punctuation
-            start = best_break + punctuation_len
-            # Skip any whitespace
-            while start < len(text) and text[start].isspace():
-                start += 1
-            continue
-            
-        # 4. Last resort: break on word boundary
-        # Start from end and work backwards to find a space
-        word_break = end
-        while word_break > start and not text[word_break-1].isspace():
-            word_break -= 1
-            
-        if word_break > start + (max_size // 4):  # Ensure we have a reasonable chunk size
-            chunk_text = overlap_text + text[start:word_break]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = word_break
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
-            else:
-                overlap_text = ""
-                
-            # Move start pointer to the next word
-            start = word_break
-            # Skip any whitespace
-            while start < len(text) and text[start].isspace():
-                start += 1
-        else:
-            # Absolute fallback: hard break at max_size (minus overlap)
-            logger.warning(f"Forced to use hard break at position {start + max_size - len(overlap_text)}")
-            chunk_text = overlap_text + text[start:start + max_size - len(overlap_text)]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = start + max_size - len(overlap_text)
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
-            else:
-                overlap_text = ""
-                
-            start += max_size - len(overlap_text)
-    
-    # Verification step
-    total_output_size = sum(len(chunk) for chunk in chunks)
-    expected_size = len(text) + (len(chunks) - 1) * overlap  # Account for overlap
-    
-    logger.info(f"Large text chunking complete. Created {len(chunks)} chunks with total size: {total_output_size} chars")
+    # If text fits in a single chunk, return it
+    if len(text) <= max_size:
+        return [text]
     
-    # Warn if there's significant content loss
-    if total_output_size < len(text) * 0.9:  # Allow for some minor loss due to boundary adjustments
-        logger.warning(f"Potential content loss! Original: {len(text)} chars, Chunked: {total_output_size} chars")
+    chunks = list(iter_text_chunks(text, max_size, overlap))
     
+    # Log chunk statistics for monitoring
+    avg_chunk_size = sum(len(c) for c in chunks) / max(1, len(chunks))
+    logger.debug(f"Created {len(chunks)} chunks, average size: {avg_chunk_size:.0f} chars")
     return chunks
 
 def prepare_output_data(result: Dict[str, Any]) -> Dict[str, Any]:
@@ -2764,9 +3222,12 @@ def prepare_output_data(result: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: Filtered output data ready for writing
     """
-    # Create a deep copy to avoid modifying the original
+    # Copy only what is replaced below; chunk and page contents are shared
+    # with the original (a deep copy of a large result costs as much as writing it)
     import copy
-    output_data = copy.deepcopy(result)
+    output_data = dict(result)
+    if isinstance(output_data.get("processing_info"), dict):
+        output_data["processing_info"] = dict(output_data["processing_info"])
     
     # Keep only essential chunk data for the full content
     if "chunks" in output_data:
@@ -2899,8 +3360,8 @@ def prepare_output_data(result: Dict[str, Any]) -> Dict[str, Any]:
 
 def chunk_large_text(text: str, max_size: int, overlap: int = 0) -> List[str]:
     """
-    Efficiently chunk very large texts (multi-MB) into segments of size max_size.
-    Uses minimal memory by processing text in a streaming fashion with improved boundary detection.
+    Chunk very large texts (multi-MB) into segments of size max_size.
+    Kept for existing callers; chunk_text_by_paragraphs is linear for any size.
     
     Args:
         text: Text to chunk
@@ -2911,463 +3372,202 @@ def chunk_large_text(text: str, max_size: int, overlap: int = 0) -> List[str]:
         List[str]: List of text chunks
     """
     logger.info(f"Using large text chunking for {len(text)} character text")
-    chunks = []
-    start = 0
-    overlap_text = ""
-    
-    total_chars_processed = 0
-    
-    while start < len(text):
-        # For progress tracking with large texts
-        if len(text) > 100_000_000 and total_chars_processed % 10_000_000 < max_size:  # Log every ~10MB
-            logger.info(f"Large text chunking progress: {total_chars_processed/len(text)*100:.1f}% complete")
-        
-        # If remaining text fits in chunk, add it all
-        if start + max_size - len(overlap_text) >= len(text):
-            chunk_text = overlap_text + text[start:]
-            chunks.append(chunk_text)
-            total_chars_processed = len(text)  # Mark as complete
-            break
-            
-        end = start + max_size - len(overlap_text)
-        
-        # Try to find natural break points in descending order of preference
-        
-        # 1. Try to find a paragraph break (most preferred)
-        par_breaks = [
-            text.rfind("\n\n\n", start, end),  # Triple newline
-            text.rfind("\n\n", start, end),    # Double newline
-            text.rfind("\r\n\r\n", start, end) # Windows style paragraph
-        ]
-        best_par_break = max(par_breaks)
-        
-        if best_par_break != -1 and best_par_break > start + (max_size // 3):
-            # We found a good paragraph break
-            chunk_text = overlap_text + text[start:best_par_break]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = best_par_break
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
-            else:
-                overlap_text = ""
-                
-            # Move start pointer past the paragraph break
-            start = best_par_break
-            # Skip the paragraph break characters
-            if text.startswith("\r\n\r\n", start):
-                start += 4
-            elif text.startswith("\n\n\n", start):
-                start += 3
-            elif text.startswith("\n\n", start):
-                start += 2
-            else:
-                start += 1  # Safeguard
-                
-            continue
-            
-        # 2. Try to find a line break
-        line_breaks = [
-            text.rfind("\r\n", start, end),  # Windows style
-            text.rfind("\n", start, end)     # Unix style
-        ]
-        best_line_break = max(line_breaks)
-        
-        if best_line_break != -1 and best_line_break > start + (max_size // 2):
-            chunk_text = overlap_text + text[start:best_line_break]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = best_line_break
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
-            else:
-                overlap_text = ""
-                
-            # Move start pointer past the line break
-            start = best_line_break
-            # Skip the newline characters
-            if text.startswith("\r\n", start):
-                start += 2
-            elif text.startswith("\n", start):
-                start += 1
-            else:
-                start += 1  # Safeguard
-                
-            continue
-            
-        # 3. Try to find sentence boundaries
-        sent_breaks = [
-            text.rfind(". ", start, end),
-            text.rfind("? ", start, end),
-            text.rfind("! ", start, end),
-            text.rfind(".\n", start, end),
-            text.rfind("?\n", start, end),
-            text.rfind("!\n", start, end),
-            text.rfind("...", start, end),
-            text.rfind(": ", start, end),
-            text.rfind("; ", start, end)
-        ]
-        
-        best_break = max(sent_breaks)
-        if best_break != -1 and best_break > start + (max_size // 3):
-            # Found a good sentence break
-            # Include the punctuation in the current chunk
-            punctuation_len = 1
-            if text.startswith("...", best_break):
-                punctuation_len = 3
-                
-            chunk_text = overlap_text + text[start:best_break + punctuation_len]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = best_break + punctuation_len
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
-            else:
-                overlap_text = ""
-                
-            # Move start pointer past the punctuation
-            start = best_break + punctuation_len
-            # Skip any whitespace
-            while start < len(text) and text[start].isspace():
-                start += 1
-            continue
-            
-        # 4. Last resort: break on word boundary
-        # Start from end and work backwards to find a space
-        word_break = end
-        while word_break > start and not text[word_break-1].isspace():
-            word_break -= 1
-            
-        if word_break > start + (max_size // 4):  # Ensure we have a reasonable chunk size
-            chunk_text = overlap_text + text[start:word_break]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = word_break
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
-            else:
-                overlap_text = ""
-                
-            # Move start pointer to the next word
-            start = word_break
-            # Skip any whitespace
-            while start < len(text) and text[start].isspace():
-                start += 1
-        else:
-            # Absolute fallback: hard break at max_size (minus overlap)
-            logger.warning(f"Forced to use hard break at position {start + max_size - len(overlap_text)}")
-            chunk_text = overlap_text + text[start:start + max_size - len(overlap_text)]
-            chunks.append(chunk_text)
-            
-            # Update progress tracking
-            total_chars_processed = start + max_size - len(overlap_text)
-            
-            # Prepare overlap for next chunk
-            if overlap > 0:
-                overlap_text = chunk_text[-min(overlap, len(chunk_text)):]
+    return chunk_text_by_paragraphs(text, max_size, overlap)
+
+
+# Token-budget chunking
+TOKEN_COUNT_BATCH = 256
+APPROX_TOKEN_PUNCTUATION = re.compile(r'[.,;:!?\-+=()\[\]{}"/\\@#$%^&*<>~`|]')
+
+
+def approximate_token_count(text: str) -> int:
+    """
+    Estimate tokens from words, punctuation and newlines (no tokenizer needed).
+
+    Half-tokens round up, so the estimate for a text never exceeds the sum of
+    the estimates for its pieces and packed chunks stay within budget.
+    """
+    return len(text.split()) + (len(APPROX_TOKEN_PUNCTUATION.findall(text)) + 1) // 2 + text.count('\n')
+
+
+class TokenCounter:
+    """
+    Counts tokens for one tokenizer, loaded once and reused for every call.
+
+    name selects the tokenizer: None or "approx" for approximate_token_count,
+    a tiktoken encoding name (e.g. "cl100k_base"), or "hf:<model>" for a
+    Hugging Face tokenizer. If the library or model is unavailable the counter
+    falls back to the approximation and logs a warning.
+    """
+
+    def __init__(self, name: Optional[str] = None, count_fn: Optional[Callable[[str], int]] = None):
+        self.name = name or "approx"
+        self._count_batch = None
+        if count_fn is not None:
+            self.name = getattr(count_fn, "__name__", "custom")
+            self._count_batch = lambda texts: [count_fn(t) for t in texts]
+        elif self.name != "approx":
+            try:
+                if self.name.startswith("hf:"):
+                    from transformers import AutoTokenizer
+                    hf_tokenizer = AutoTokenizer.from_pretrained(self.name[3:])
+                    self._count_batch = lambda texts: [
+                        len(ids) for ids in hf_tokenizer(texts, add_special_tokens=False)["input_ids"]
+                    ]
+                else:
+                    import tiktoken
+                    encoding = tiktoken.get_encoding(self.name)
+                    self._count_batch = lambda texts: [len(ids) for ids in encoding.encode_ordinary_batch(texts)]
+            except Exception as e:
+                logger.warning(f"Tokenizer {self.name} unavailable ({e}); using approximate token counts")
+                self.name = "approx"
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for several texts with one tokenizer call."""
+        if self._count_batch is None:
+            return [approximate_token_count(t) for t in texts]
+        return self._count_batch(texts)
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+
+@lru_cache(maxsize=8)
+def get_token_counter(name: Optional[str] = None) -> TokenCounter:
+    """Return the TokenCounter for name; each process loads a tokenizer only once."""
+    return TokenCounter(name)
+
+
+def iter_token_chunk_spans(
+    text: str,
+    max_tokens: int,
+    counter: Optional[TokenCounter] = None,
+    overlap_tokens: int = 0
+) -> Iterator[Tuple[int, int]]:
+    """
+    Lazily split text into (start, end) spans of at most max_tokens tokens.
+
+    The text is cut into small boundary-aligned units with iter_chunk_spans and
+    the units are counted in batches of TOKEN_COUNT_BATCH, so every character
+    is encoded once. Units are then packed greedily by their counts; candidate
+    chunks are never re-encoded. Each unit carries the whitespace before it, so
+    units tile the text and their counts add up to the chunk's token count
+    (give or take merges a tokenizer would make across a unit boundary).
+
+    Same algorithm as Structify.claude.iter_token_chunk_spans.
+
+    Args:
+        text: Text to chunk
+        max_tokens: Token budget per chunk
+        counter: TokenCounter to use (defaults to the approximate counter)
+        overlap_tokens: Tokens to repeat from the end of the previous chunk
+
+    Yields:
+        (start, end) offsets such that text[start:end] is a chunk
+    """
+    n = len(text)
+    if n == 0:
+        return
+    counter = counter or get_token_counter()
+    max_tokens = max(1, max_tokens)
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    # Tokens are rarely shorter than a character, so units this size fit the budget
+    unit_chars = max(16, min(max_tokens, 1024))
+
+    def count_units(spans):
+        counts = counter.count_batch([text[s:e] for s, e in spans])
+        for (s, e), c in zip(spans, counts):
+            if c > max_tokens and e - s > 1:
+                mid = (s + e) // 2
+                yield from count_units([(s, mid), (mid, e)])
             else:
-                overlap_text = ""
-                
-            start += max_size - len(overlap_text)
-    
-    # Verification step
-    total_output_size = sum(len(chunk) for chunk in chunks)
-    expected_size = len(text) + (len(chunks) - 1) * overlap  # Account for overlap
-    
-    logger.info(f"Large text chunking complete. Created {len(chunks)} chunks with total size: {total_output_size} chars")
-    
-    # Warn if there's significant content loss
-    if total_output_size < len(text) * 0.9:  # Allow for some minor loss due to boundary adjustments
-        logger.warning(f"Potential content loss! Original: {len(text)} chars, Chunked: {total_output_size} chars")
-    
-    return chunks
+                yield s, e, c
+
+    def iter_units():
+        pending = []
+        prev_end = 0
+        for _, end in iter_chunk_spans(text, unit_chars):
+            pending.append((prev_end, end))
+            prev_end = end
+            if len(pending) >= TOKEN_COUNT_BATCH:
+                yield from count_units(pending)
+                pending = []
+        if prev_end < n:
+            pending.append((prev_end, n))
+        if pending:
+            yield from count_units(pending)
+
+    def span_of(units):
+        start, end = units[0][0], units[-1][1]
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    window = deque()
+    window_tokens = 0
+    for unit in iter_units():
+        if window and window_tokens + unit[2] > max_tokens:
+            start, end = span_of(window)
+            if end > start:
+                yield start, end
+            # Keep trailing units as overlap, but always drop at least one
+            kept = deque()
+            kept_tokens = 0
+            while len(window) > 1 and kept_tokens + window[-1][2] <= overlap_tokens:
+                last = window.pop()
+                kept.appendleft(last)
+                kept_tokens += last[2]
+            while kept and kept_tokens + unit[2] > max_tokens:
+                kept_tokens -= kept.popleft()[2]
+            window, window_tokens = kept, kept_tokens
+        window.append(unit)
+        window_tokens += unit[2]
+
+    if window:
+        start, end = span_of(window)
+        if end > start:
+            yield start, end
+
 
 def chunk_text_by_tokens(text: str, max_tokens: int, tokenizer=None, overlap_tokens: int = 0) -> List[str]:
     """
-    Chunk text by approximate token count, useful for LLM context windows.
-    Enhanced with better tokenizer estimation and improved overlap handling.
-    
+    Chunk text so that each chunk fits a token budget.
+
     Args:
         text: Text to chunk
         max_tokens: Maximum number of tokens per chunk
-        tokenizer: Optional tokenizer function, defaults to approximate count
+        tokenizer: Tokenizer name (see TokenCounter), a TokenCounter, or a
+            function returning the token count of a string
         overlap_tokens: Number of tokens to overlap between chunks
-        
+
     Returns:
-        List[str]: List of text chunks by token count
+        List of text chunks
     """
-    # Default approximate tokenizer with improved heuristics
-    if tokenizer is None:
-        def default_tokenizer(text):
-            # More accurate approximate tokenization:
-            # 1. Count words
-            words = len(text.split())
-            # 2. Count punctuation and special characters
-            punctuation = sum(1 for c in text if c in '.,;:!?-+=()[]{}"/\\@#$%^&*<>~`|')
-            # 3. Count newlines (each counts as ~1 token)
-            newlines = text.count('\n')
-            # 4. Estimate based on these factors
-            return int(words + punctuation * 0.5 + newlines)
-        tokenizer = default_tokenizer
-    
-    # If text is small enough, return it whole
-    token_count = tokenizer(text)
-    if token_count <= max_tokens:
-        return [text]
-    
-    # For extremely large texts, use a character-based approach first
-    if token_count > max_tokens * 100:  # Arbitrary threshold for very large texts
-        logger.info(f"Very large text detected ({token_count} tokens), pre-chunking by characters first")
-        # Estimate chars per token for this text
-        chars_per_token = len(text) / token_count
-        # Pre-chunk by characters to manageable pieces, then process by tokens
-        char_chunks = chunk_text_by_paragraphs(text, int(max_tokens * chars_per_token * 1.5))
-        
-        # Process each character chunk separately
-        final_chunks = []
-        for char_chunk in char_chunks:
-            # Process recursively, but now with a manageable size
-            token_chunks = chunk_text_by_tokens(char_chunk, max_tokens, tokenizer, overlap_tokens)
-            final_chunks.extend(token_chunks)
-        return final_chunks
-        
-    # Split into paragraphs first for more semantic chunking
-    paragraphs = re.split(r'\n\s*\n', text)
-    chunks = []
-    current_chunk = []
-    current_tokens = 0
-    last_chunk_text = ""  # For overlap calculation
-    
-    for para in paragraphs:
-        para_tokens = tokenizer(para)
-        
-        # If a single paragraph is too large, we need to split it further
-        if para_tokens > max_tokens:
-            # If we have content in the current chunk, add it first
-            if current_chunk:
-                chunk_text = "\n\n".join(current_chunk)
-                chunks.append(chunk_text)
-                last_chunk_text = chunk_text
-                current_chunk = []
-                current_tokens = 0
-            
-            # Split paragraph by sentences
-            sentences = re.split(r'(?<=[.!?])\s+', para)
-            sent_chunk = []
-            sent_tokens = 0
-            
-            # To track overlap between sentence chunks
-            last_sentence_chunk = ""
-            
-            for sentence in sentences:
-                sentence_tokens = tokenizer(sentence)
-                
-                # If a single sentence is too large, split by words
-                if sentence_tokens > max_tokens:
-                    # Add any accumulated sentences first
-                    if sent_chunk:
-                        sent_text = " ".join(sent_chunk)
-                        chunks.append(sent_text)
-                        last_sentence_chunk = sent_text
-                        sent_chunk = []
-                        sent_tokens = 0
-                    
-                    # Split sentence by spaces (words)
-                    words = sentence.split()
-                    word_chunk = []
-                    word_tokens = 0
-                    
-                    # For overlap between word chunks
-                    last_word_chunk = ""
-                    
-                    for word in words:
-                        word_with_space = word + " "
-                        word_token_count = tokenizer(word_with_space)
-                        
-                        if word_tokens + word_token_count > max_tokens:
-                            # Add current word chunk
-                            if word_chunk:
-                                word_text = " ".join(word_chunk)
-                                chunks.append(word_text)
-                                last_word_chunk = word_text
-                                
-                                # Add overlap for next chunk if requested
-                                if overlap_tokens > 0:
-                                    # Calculate word-based overlap
-                                    overlap_words = []
-                                    overlap_token_count = 0
-                                    
-                                    # Add words from the end until we reach desired overlap
-                                    for w in reversed(word_chunk):
-                                        w_tokens = tokenizer(w + " ")
-                                        if overlap_token_count + w_tokens <= overlap_tokens:
-                                            overlap_words.insert(0, w)
-                                            overlap_token_count += w_tokens
-                                        else:
-                                            break
-                                    
-                                    # Start new chunk with these overlap words
-                                    word_chunk = overlap_words + [word]
-                                    word_tokens = overlap_token_count + word_token_count
-                                else:
-                                    # Start fresh with this word
-                                    word_chunk = [word]
-                                    word_tokens = word_token_count
-                            else:
-                                # A single word exceeds max_tokens, handle specially
-                                if len(word) > max_tokens * 4:  # Assuming 4 chars per token average
-                                    # For extremely long words, split by characters
-                                    logger.warning(f"Extremely long word found ({len(word)} chars), splitting by characters")
-                                    char_chunks = [word[i:i+max_tokens*4] for i in range(0, len(word), max_tokens*4)]
-                                    for i, char_chunk in enumerate(char_chunks):
-                                        chunks.append(char_chunk)
-                                        if i < len(char_chunks) - 1 and overlap_tokens > 0:
-                                            # Add character-based overlap
-                                            overlap_chars = min(len(char_chunk), int(overlap_tokens * 4))
-                                            last_word_chunk = char_chunk[-overlap_chars:]
-                                else:
-                                    # For normal long words, keep them whole even if they exceed limit
-                                    chunks.append(word)
-                                    last_word_chunk = word
-                                
-                                word_chunk = []
-                                word_tokens = 0
-                        else:
-                            word_chunk.append(word)
-                            word_tokens += word_token_count
-                    
-                    # Add any remaining words
-                    if word_chunk:
-                        word_text = " ".join(word_chunk)
-                        chunks.append(word_text)
-                        last_word_chunk = word_text
-                
-                # If adding this sentence would exceed max tokens
-                elif sent_tokens + sentence_tokens > max_tokens:
-                    # Add the current sentence chunk
-                    sent_text = " ".join(sent_chunk)
-                    chunks.append(sent_text)
-                    last_sentence_chunk = sent_text
-                    
-                    # Add overlap for next chunk if requested
-                    if overlap_tokens > 0 and sent_chunk:
-                        # Calculate sentence-based overlap
-                        overlap_sentences = []
-                        overlap_token_count = 0
-                        
-                        # Add sentences from the end until we reach desired overlap
-                        for s in reversed(sent_chunk):
-                            s_tokens = tokenizer(s + " ")
-                            if overlap_token_count + s_tokens <= overlap_tokens:
-                                overlap_sentences.insert(0, s)
-                                overlap_token_count += s_tokens
-                            else:
-                                break
-                        
-                        # Start new chunk with these overlap sentences and the current sentence
-                        sent_chunk = overlap_sentences + [sentence]
-                        sent_tokens = overlap_token_count + sentence_tokens
-                    else:
-                        # Start fresh with this sentence
-                        sent_chunk = [sentence]
-                        sent_tokens = sentence_tokens
-                else:
-                    # Add sentence to current chunk
-                    sent_chunk.append(sentence)
-                    sent_tokens += sentence_tokens
-            
-            # Add any remaining sentences
-            if sent_chunk:
-                sent_text = " ".join(sent_chunk)
-                chunks.append(sent_text)
-                last_sentence_chunk = sent_text
-                
-        # If adding this paragraph would exceed max tokens
-        elif current_tokens + para_tokens > max_tokens:
-            # Add the current chunk
-            chunk_text = "\n\n".join(current_chunk)
-            chunks.append(chunk_text)
-            last_chunk_text = chunk_text
-            
-            # Start a new chunk with overlap if requested
-            if overlap_tokens > 0 and current_chunk:
-                # Calculate paragraph-based overlap
-                overlap_paragraphs = []
-                overlap_token_count = 0
-                
-                # Add paragraphs from the end until we reach desired overlap
-                for p in reversed(current_chunk):
-                    p_tokens = tokenizer(p)
-                    if overlap_token_count + p_tokens <= overlap_tokens:
-                        overlap_paragraphs.insert(0, p)
-                        overlap_token_count += p_tokens
-                    else:
-                        # If a paragraph is too large for complete overlap,
-                        # split it and take the end portion
-                        remaining_tokens = overlap_tokens - overlap_token_count
-                        if remaining_tokens > 0:
-                            # Estimate characters based on tokens
-                            char_ratio = len(p) / p_tokens
-                            char_count = int(remaining_tokens * char_ratio)
-                            # Take the end portion of the paragraph
-                            partial_p = p[-min(char_count, len(p)):]
-                            overlap_paragraphs.insert(0, partial_p)
-                            overlap_token_count += remaining_tokens
-                        break
-                
-                # Start new chunk with overlap material and the current paragraph
-                current_chunk = overlap_paragraphs + [para]
-                current_tokens = overlap_token_count + para_tokens
-            else:
-                # Start fresh with this paragraph
-                current_chunk = [para]
-                current_tokens = para_tokens
-        else:
-            # Add paragraph to current chunk
-            current_chunk.append(para)
-            current_tokens += para_tokens
-    
-    # Add the final chunk if there's anything left
-    if current_chunk:
-        chunk_text = "\n\n".join(current_chunk)
-        chunks.append(chunk_text)
-    
-    # Verify chunk sizes are within limits
-    for i, chunk in enumerate(chunks):
-        chunk_tokens = tokenizer(chunk)
-        if chunk_tokens > max_tokens * 1.1:  # Allow 10% overflow
-            logger.warning(f"Chunk {i} exceeds token limit: {chunk_tokens} > {max_tokens} tokens")
-    
-    # Log statistics
-    if chunks:
-        avg_tokens = sum(tokenizer(c) for c in chunks) / len(chunks)
-        logger.debug(f"Created {len(chunks)} token-based chunks, average tokens per chunk: {avg_tokens:.0f}")
-    
-    return chunks
-
-# -----------------------------------------------------------------------------
-# SECTION 11: MAIN PDF PROCESSING FUNCTIONS
-# -----------------------------------------------------------------------------
+    if isinstance(tokenizer, TokenCounter):
+        counter = tokenizer
+    elif callable(tokenizer):
+        counter = TokenCounter(count_fn=tokenizer)
+    else:
+        counter = get_token_counter(tokenizer)
+    return [text[s:e] for s, e in iter_token_chunk_spans(text, max_tokens, counter, overlap_tokens)]
 
 def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 4096, 
                 extract_tables: bool = True, use_ocr: bool = True, 
-                return_data: bool = False, timeout: int = 300) -> Optional[Dict[str, Any]]:
+                return_data: bool = False, timeout: int = 300,
+                max_chunk_tokens: int = 0, overlap_tokens: int = 0,
+                tokenizer_name: Optional[str] = None,
+                shard_threshold: int = PAGE_SHARD_THRESHOLD,
+                max_workers: Optional[int] = None,
+                reuse_results: bool = True) -> Optional[Dict[str, Any]]:
     """
     Process a PDF file with comprehensive extraction capabilities and robust error handling.
     Enhanced to ensure all content is properly chunked and preserved.
     
+    If a PDF with the same bytes was processed before with the same options,
+    the stored result is reused instead of extracting the file again.
+    
     Args:
         pdf_path: Path to the PDF file
         output_path: Path to output JSON file (if None, derives from input filename)
@@ -3376,6 +3576,14 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
         use_ocr: Whether to use OCR for scanned content
         return_data: Whether to return processed data
         timeout: Processing timeout in seconds (0 for no timeout)
+        max_chunk_tokens: If set, chunk to this token budget instead of by structure/characters
+        overlap_tokens: Token overlap between chunks when max_chunk_tokens is set
+        tokenizer_name: Tokenizer for token chunking (tiktoken encoding, "hf:<model>", or None
+            for an approximate count); loaded once per process
+        shard_threshold: Page count from which text extraction is split into page shards
+            on a process pool (0 disables sharding)
+        max_workers: Processes for sharded extraction (None = CPU count)
+        reuse_results: Look up and store results in the content-addressed result store
         
     Returns:
         Dictionary with processed data if return_data=True, otherwise None
@@ -3405,6 +3613,39 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
         output_dir = os.path.dirname(output_path)
         if output_dir:
             ensure_directory_exists(output_dir)
+    if write_json_file is not None:
+        # Compressed output gets its .gz/.zst suffix
+        output_path = output_path_for(output_path)
+    
+    # Identical bytes processed with the same options: reuse the stored result
+    store = get_pdf_result_store() if reuse_results and get_pdf_result_store else None
+    content_hash = result_key = None
+    if store is not None:
+        try:
+            content_hash = store.file_hash(pdf_path)
+            result_key = pdf_result_key(content_hash, {
+                "max_chunk_size": max_chunk_size,
+                "extract_tables": extract_tables,
+                "use_ocr": use_ocr,
+                "max_chunk_tokens": max_chunk_tokens,
+                "overlap_tokens": overlap_tokens,
+                "tokenizer_name": tokenizer_name,
+                **result_environment()
+            })
+            stored = store.get_result(result_key)
+        except Exception as e:
+            logger.warning(f"Result store lookup failed for {pdf_path}: {e}")
+            store = None
+            stored = None
+        if stored is not None:
+            logger.info(f"Reusing stored result for {pdf_path} (content hash {content_hash[:12]})")
+            stored["source_file"] = pdf_path
+            stored["output_file"] = output_path
+            stored["processing_info"]["reused_result"] = True
+            stored["processing_info"]["elapsed_seconds"] = time.time() - start_time
+            if output_path:
+                save_results(stored, output_path)
+            return stored if return_data else None
     
     # Initialize result structure with enhanced metadata
     result = {
@@ -3415,6 +3656,7 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
             "extract_tables": extract_tables,
             "use_ocr": use_ocr,
             "max_chunk_size": max_chunk_size,
+            "max_chunk_tokens": max_chunk_tokens,
             "libraries": {
                 "pymupdf": USE_FITZ,
                 "pypdf2": USE_PYPDF2,
@@ -3465,10 +3707,19 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
         timeout_thread = threading.Thread(target=check_timeout, daemon=True)
         timeout_thread.start()
     
+    # Open the PDF once and share it between detection, text, OCR and table steps
+    context = None
+    if USE_FITZ:
+        try:
+            context = PDFExtractionContext(pdf_path, find_tables=extract_tables,
+                                           shard_threshold=shard_threshold, max_workers=max_workers)
+        except Exception as e:
+            logger.warning(f"Could not open shared extraction context for {pdf_path}: {e}")
+    
     try:
         # Step 1: Detect document type for specialized processing
         try:
-            doc_type = detect_document_type(pdf_path)
+            doc_type = detect_document_type(pdf_path, context=context)
             result["document_type"] = doc_type
             logger.info(f"Detected document type: {doc_type} for {pdf_path}")
         except Exception as e:
@@ -3482,15 +3733,31 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
         
         # Step 2: Extract text and basic structure
         logger.info(f"Extracting text from {pdf_path}")
-        extracted_data = extract_text_from_pdf(pdf_path)
+        extracted_data = extract_text_from_pdf(pdf_path, context=context)
+        
+        # OCR only the pages classified as scanned, merging their text in page order
+        if use_ocr and extracted_data and extracted_data.get("has_scanned_content"):
+            ocr_report = ocr_scanned_pages(pdf_path, extracted_data, context=context)
+            if ocr_report:
+                ocr_times = [page["ocr_time"] for page in ocr_report if "ocr_time" in page]
+                confidences = [page["confidence"] for page in ocr_report if page.get("chars")]
+                result["processing_info"]["ocr_pages"] = ocr_report
+                result["processing_info"]["ocr_time"] = round(sum(ocr_times), 3)
+                result["processing_info"]["ocr_cache_hits"] = sum(1 for page in ocr_report if page.get("cached"))
+                if confidences:
+                    extracted_data["ocr_confidence"] = sum(confidences) / len(confidences)
+                    extracted_data["extraction_method"] = f"{extracted_data.get('extraction_method', 'unknown')}+ocr"
         
         # Check if extraction succeeded
         if not extracted_data or not extracted_data.get("full_text") or len(extracted_data.get("full_text", "").strip()) < 100:
             # If standard extraction failed and the document might be scanned
-            if use_ocr and (not extracted_data or extracted_data.get("has_scanned_content") or 
+            # (and per-page OCR has not already been applied)
+            if use_ocr and "ocr_pages" not in result["processing_info"] and (not extracted_data or extracted_data.get("has_scanned_content") or 
                            (extracted_data.get("full_text") and len(extracted_data.get("full_text", "").strip()) < 100)):
                 logger.info(f"Attempting OCR on {pdf_path}")
-                ocr_result = process_scanned_pdf(pdf_path)
+                ocr_result = process_scanned_pdf(pdf_path, context=context)
+                if ocr_result and ocr_result.get("page_times"):
+                    result["processing_info"].setdefault("ocr_pages", ocr_result["page_times"])
                 if ocr_result and ocr_result.get("text") and len(ocr_result["text"].strip()) > 100:
                     # Replace or supplement extracted text with OCR result
                     if not extracted_data:
@@ -3530,6 +3797,8 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
             
             # Record extraction time
             result["processing_info"]["extraction_time"] = extracted_data.get("extraction_time", 0)
+            if extracted_data.get("shards"):
+                result["processing_info"]["page_shards"] = extracted_data["shards"]
             
             # Check for cancellation
             if processing_cancelled.is_set():
@@ -3549,8 +3818,10 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
         if extract_tables and doc_type not in ["scan"]:  # Don't waste time on scanned docs
             try:
                 logger.info(f"Extracting tables from {pdf_path}")
-                tables = extract_tables_from_pdf(pdf_path)
+                tables = extract_tables_from_pdf(pdf_path, context=context)
                 result["tables"] = tables
+                if context is not None:
+                    result["processing_info"]["table_pages_skipped"] = context.table_stats["pages_skipped"]
                 logger.info(f"Extracted {len(tables)} tables from {pdf_path}")
             except Exception as e:
                 logger.warning(f"Table extraction failed: {e}")
@@ -3597,7 +3868,23 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
             # Step 6: Create chunks based on structure using enhanced chunking
             try:
                 logger.info(f"Creating chunks for {pdf_path}")
-                if structure and structure.get("sections"):
+                if max_chunk_tokens:
+                    # Token-budget chunks, ready for embedding without re-chunking
+                    counter = get_token_counter(tokenizer_name)
+                    result["processing_info"]["tokenizer"] = counter.name
+                    chunks = []
+                    for start, end in iter_token_chunk_spans(full_text, max_chunk_tokens, counter, overlap_tokens):
+                        chunks.append({
+                            "content": full_text[start:end],
+                            "metadata": {
+                                "chunk_type": "token_based",
+                                "chunk_index": len(chunks),
+                                "char_span": [start, end]
+                            }
+                        })
+                    for chunk in chunks:
+                        chunk["metadata"]["total_chunks"] = len(chunks)
+                elif structure and structure.get("sections"):
                     chunks = chunk_document_by_structure(full_text, structure, max_chunk_size)
                 else:
                     # Use paragraph-based chunking as fallback
@@ -3619,7 +3906,7 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
                     for chunk in chunks
                 )
                 
-                if not has_full_content and len(full_text) <= max_chunk_size * 2:
+                if not has_full_content and not max_chunk_tokens and len(full_text) <= max_chunk_size * 2:
                     # Add a full content chunk if it's not too large
                     chunks.insert(0, {
                         "content": full_text,
@@ -3663,7 +3950,7 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
                 if len(full_text) > 0 and total_content_size < len(full_text) * 0.9:
                     logger.warning(f"Possible content loss during chunking: original={len(full_text)}, chunked={total_content_size}")
                     # Add a backup full content chunk if needed
-                    if len(full_text) <= max_chunk_size * 3:  # Only if manageable
+                    if not max_chunk_tokens and len(full_text) <= max_chunk_size * 3:  # Only if manageable
                         logger.info("Adding backup full content chunk")
                         result["chunks"].append({
                             "content": full_text,
@@ -3711,6 +3998,10 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
         result["processing_info"]["end_time"] = datetime.now().isoformat()
         result["processing_info"]["elapsed_seconds"] = time.time() - start_time
         result["processing_info"]["success"] = True
+        if content_hash:
+            result["processing_info"]["content_hash"] = content_hash
+            if store is not None and result["status"] == "success":
+                store.put_result(result_key, content_hash, result)
         
         # Save results to output file - include error handling
         if output_path:
@@ -3804,6 +4095,10 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
                 if timeout_thread.is_alive():
                     logger.warning(f"Timeout thread for {pdf_path} did not terminate gracefully")
             
+            # Release the shared document handle
+            if context is not None:
+                context.close()
+            
             # Record final processing duration regardless of success/failure
             total_duration = time.time() - start_time
             if "processing_info" in result:
@@ -3848,14 +4143,24 @@ def process_pdf(pdf_path: str, output_path: str = None, max_chunk_size: int = 40
             # Even if cleanup fails, don't affect the main flow
             logger.warning(f"Error during cleanup: {cleanup_err}")
 
-def save_results(result: Dict[str, Any], output_path: str) -> None:
+def save_results(result: Dict[str, Any], output_path: str, compact: Optional[bool] = None,
+                 compression: Optional[str] = None, omit_full_text: Optional[bool] = None) -> Optional[str]:
     """
     Save processing results to a JSON file with robust error handling.
     Uses output preparation to filter chunking metadata for cleaner output.
     
+    The JSON is streamed element by element (see json_output). Options left
+    as None use the defaults set with json_output.configure_json_output().
+    
     Args:
         result: Raw processing result with all data
         output_path: Path where to save the output JSON
+        compact: Write without indentation
+        compression: "gzip" or "zstd" (the suffix is appended to output_path)
+        omit_full_text: Leave out full_text when the saved chunks reproduce it
+        
+    Returns:
+        Optional[str]: Path of the written file, None if nothing could be saved
     """
     try:
         # Ensure output directory exists
@@ -3876,6 +4181,13 @@ def save_results(result: Dict[str, Any], output_path: str) -> None:
             except Exception as backup_err:
                 logger.debug(f"Could not create backup: {backup_err}")
         
+        if write_json_file is not None:
+            # Streamed through a temporary file and renamed atomically
+            written_path = write_json_file(output_data, output_path, compact=compact,
+                                           compression=compression, omit_full_text=omit_full_text)
+            logger.info(f"Successfully saved results to {written_path}")
+            return written_path
+        
         # Save to temporary file first, then rename for atomicity
         temp_path = f"{output_path}.tmp"
         with open(temp_path, 'w', encoding='utf-8') as f:
@@ -3889,6 +4201,7 @@ def save_results(result: Dict[str, Any], output_path: str) -> None:
             else:
                 os.rename(temp_path, output_path)
             logger.info(f"Successfully saved results to {output_path}")
+            return output_path
         else:
             logger.error(f"Failed to write complete data to temporary file: {temp_path}")
             raise IOError(f"Failed to write data to {temp_path}")
@@ -3925,6 +4238,7 @@ def save_results(result: Dict[str, Any], output_path: str) -> None:
             with open(temp_path, 'w', encoding='utf-8') as f:
                 json.dump(emergency_data, f, indent=2, ensure_ascii=False)
             logger.info(f"Emergency results saved to temporary location: {temp_path}")
+            return temp_path
             
         except Exception as temp_err:
             logger.error(f"Failed to save emergency results to temp location: {temp_err}")
@@ -3953,6 +4267,9 @@ def batch_process_pdfs(pdf_files: List[str], output_folder: str, extract_tables:
     # Ensure output folder exists
     ensure_directory_exists(output_folder)
     
+    # Start the shared tabula JVM once, before the worker threads need it
+    tabula_worker = get_tabula_worker() if extract_tables else None
+    
     # Initialize batch results
     batch_results = {
         "start_time": datetime.now().isoformat(),
@@ -3960,7 +4277,8 @@ def batch_process_pdfs(pdf_files: List[str], output_folder: str, extract_tables:
         "processed_files": 0,
         "failed_files": 0,
         "results": [],
-        "output_folder": output_folder
+        "output_folder": output_folder,
+        "tabula_worker": tabula_worker is not None
     }
     
     # Determine number of workers
@@ -4308,8 +4626,11 @@ def create_pdf_viewer_data(pdf_path: str, json_path: str = None) -> Dict[str, An
         # Check if processed JSON exists
         if json_path and os.path.exists(json_path):
             try:
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    processed_data = json.load(f)
+                if write_json_file is not None:
+                    processed_data = load_json_output(json_path)
+                else:
+                    with open(json_path, 'r', encoding='utf-8') as f:
+                        processed_data = json.load(f)
                     
                 # Enhance summary with processed data
                 if processed_data:
@@ -4417,8 +4738,11 @@ def get_pdf_extraction_status(pdf_path: str, json_path: str = None) -> Dict[str,
         
         try:
             # Check json for completeness
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if write_json_file is not None:
+                data = load_json_output(json_path)
+            else:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
             
             if data:
                 status["processing_complete"] = data.get("status") == "success"
@@ -4818,6 +5142,13 @@ def run_command_line():
     batch_parser.add_argument("--timeout", type=int, default=300, help="Processing timeout per file")
     batch_parser.add_argument("--verbose", action="store_true", help="Enable verbose logging")
     
+    # Output format options shared by process and batch
+    for output_parser in (process_parser, batch_parser):
+        output_parser.add_argument("--compact", action="store_true", help="Write JSON without indentation")
+        output_parser.add_argument("--compress", choices=["gzip", "zstd"], help="Compress the JSON output")
+        output_parser.add_argument("--omit-full-text", action="store_true",
+                                   help="Leave out full_text when the saved chunks contain it")
+    
     # Table extraction command
     tables_parser = subparsers.add_parser('tables', help='Extract tables from a PDF file')
     tables_parser.add_argument("pdf_file", help="Path to PDF file to process")
@@ -4843,6 +5174,10 @@ def run_command_line():
         parser.print_help()
         return 1
     
+    if args.command in ('process', 'batch') and write_json_file is not None:
+        configure_json_output(compact=args.compact, compression=args.compress or "none",
+                              omit_full_text=args.omit_full_text)
+    
     # Process command
     if args.command == 'process':
         print(f"Processing PDF: {args.pdf_file}")
@@ -10,6 +10,12 @@ import logging
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Fast JSON encoder (orjson/msgspec when installed)
+try:
+    from json_output import dumps_bytes
+except ImportError:
+    dumps_bytes = None
+
 # -----------------------------------------------------------------------------
 # DOCUMENT STRUCTURE ENHANCEMENT FUNCTIONS
 # -----------------------------------------------------------------------------
@@ -804,8 +810,12 @@ def write_improved_output(
     
     try:
         # Write to temporary file first
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=indent)
+        if dumps_bytes is not None:
+            with open(temp_file, 'wb') as f:
+                f.write(dumps_bytes(data, indent))
+        else:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
         
         # Verify the file exists and has content
         if not os.path.exists(temp_file) or os.path.getsize(temp_file) < 10:
@@ -1036,8 +1046,12 @@ def safely_write_json(data, output_path, indent=2):
         temp_file = f"{output_path}.tmp"
         
         # Write to temporary file first
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=indent)
+        if dumps_bytes is not None:
+            with open(temp_file, 'wb') as f:
+                f.write(dumps_bytes(data, indent))
+        else:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
         
         # Verify the file exists and has content
         if not os.path.exists(temp_file) or os.path.getsize(temp_file) < 10:
@@ -9,6 +9,12 @@ import time
 
 logger = logging.getLogger(__name__)
 
+# Persistent OCR result cache (optional)
+try:
+    from ocr_cache import ocr_cache_key, get_ocr_cache
+except ImportError:
+    get_ocr_cache = None
+
 class MemoryEfficientPDFProcessor:
     """
     A memory-efficient PDF processor that uses temp files and streaming
@@ -217,18 +223,26 @@ class MemoryEfficientPDFProcessor:
             # Convert page to image
             pix = page.get_pixmap()
             
-            # Save to temporary file
-            img_temp = self._create_temp_file("ocr_img_")
-            pix.save(img_temp)
+            # Re-runs of unchanged pages are answered from the OCR cache
+            cache = get_ocr_cache() if get_ocr_cache else None
+            key = ocr_cache_key(pix.samples, pix.width, pix.height, "eng", f"image_to_string|n={pix.n}") if cache else None
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                return cached["text"]
             
             # Use OCR to extract text (simplified example)
             try:
                 import pytesseract
                 from PIL import Image
                 
-                with Image.open(img_temp) as img:
-                    text = pytesseract.image_to_string(img)
-                    return text
+                # Build the image from the pixmap in memory; the .tmp files from
+                # _create_temp_file are not a format pix.save() accepts
+                mode = {1: "L", 3: "RGB", 4: "RGBA"}[pix.n]
+                img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+                text = pytesseract.image_to_string(img)
+                if cache:
+                    cache.put(key, {"text": text})
+                return text
             except ImportError:
                 logger.warning("pytesseract not available, returning empty text")
                 return ""
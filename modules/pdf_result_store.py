@@ -0,0 +1,328 @@
+"""
+Content-addressed store for PDF processing results.
+
+The same PDF often arrives under several URLs or file names (mirrors, arXiv
+abs/pdf links, re-downloads), and each copy used to be extracted, OCR'd and
+chunked from scratch. Files are identified here by a SHA-256 of their raw
+bytes, computed through mmap so the file is never read into Python memory,
+and process_pdf results are stored under that hash plus the options that
+change the output. A later run on identical bytes loads the stored result
+instead of processing the file again.
+
+Hashes are indexed by (path, size, mtime), so a file registered at download
+time is not hashed a second time when it is processed. Stored results are
+bounded by total size; least recently used results are evicted first.
+"""
+
+import os
+import json
+import mmap
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULT_STORE_PATH = os.environ.get(
+    "PDF_RESULT_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp", "pdf_results")
+)
+DEFAULT_RESULT_STORE_MAX_BYTES = 1024 * 1024 * 1024
+# After eviction the store is trimmed to this fraction of max_bytes
+EVICTION_TARGET_RATIO = 0.9
+# Read size for the fallback when a file cannot be memory-mapped
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_pdf_file(file_path: str) -> str:
+    """
+    SHA-256 of a file's raw bytes.
+
+    The file is memory-mapped and the mapping is handed to hashlib directly,
+    so no copy of the content is made in Python memory.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        except ValueError:
+            # Empty files cannot be mapped and hash as b""
+            pass
+        except OSError:
+            # Mapping not possible (special files, address space): stream instead
+            f.seek(0)
+            buffer = bytearray(HASH_BLOCK_SIZE)
+            view = memoryview(buffer)
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def pdf_result_key(content_hash: str, options: Dict[str, Any]) -> str:
+    """
+    Store key for a processing result.
+
+    Args:
+        content_hash: hash_pdf_file() of the PDF
+        options: Processing options that change the result
+
+    Returns:
+        str: Hex digest
+    """
+    encoded = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.sha256(f"{content_hash}|{encoded}".encode("utf-8")).hexdigest()
+
+
+class PDFResultStore:
+    """
+    PDF content hashes plus processing results stored by content, with size-based LRU eviction.
+    """
+
+    def __init__(self, root: str = DEFAULT_RESULT_STORE_PATH,
+                 max_bytes: int = DEFAULT_RESULT_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(root, "results"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.db"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pdf_files ("
+            "path TEXT PRIMARY KEY, content_hash TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pdf_files_hash ON pdf_files (content_hash)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, content_hash TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self._db.commit()
+
+    def _result_path(self, key: str) -> str:
+        return os.path.join(self.root, "results", key[:2], f"{key}.json")
+
+    def file_hash(self, file_path: str) -> str:
+        """Content hash of a file, recomputed only when its size or mtime changed."""
+        path = os.path.abspath(file_path)
+        st = os.stat(path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content_hash FROM pdf_files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, st.st_size, st.st_mtime_ns)
+            ).fetchone()
+        if row is not None:
+            return row[0]
+
+        content_hash = hash_pdf_file(path)
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pdf_files (path, content_hash, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                    (path, content_hash, st.st_size, st.st_mtime_ns)
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.debug(f"PDF hash index write failed: {e}")
+        return content_hash
+
+    def find_duplicate(self, file_path: str) -> Optional[str]:
+        """
+        Hash a file and return another known, unchanged file with the same bytes.
+
+        Args:
+            file_path: Newly downloaded or discovered PDF
+
+        Returns:
+            Optional[str]: Path of an identical file, or None
+        """
+        path = os.path.abspath(file_path)
+        content_hash = self.file_hash(path)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, size, mtime_ns FROM pdf_files WHERE content_hash = ? AND path != ?",
+                (content_hash, path)
+            ).fetchall()
+        for other, size, mtime_ns in rows:
+            try:
+                st = os.stat(other)
+            except OSError:
+                continue
+            if st.st_size == size and st.st_mtime_ns == mtime_ns:
+                return other
+        return None
+
+    def get_result(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored result for key, or None."""
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone()
+                result = None
+                if row is not None:
+                    with open(self._result_path(key), "r", encoding="utf-8") as f:
+                        result = json.load(f)
+                    self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+            except (OSError, ValueError, sqlite3.Error) as e:
+                logger.debug(f"PDF result store read failed: {e}")
+                result = None
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return result
+
+    def put_result(self, key: str, content_hash: str, result: Dict[str, Any]) -> None:
+        """Store a processing result and evict old results if the store grew too large."""
+        payload = json.dumps(
+            {k: v for k, v in result.items() if not k.startswith("_")},
+            ensure_ascii=False, default=str
+        )
+        path = self._result_path(key)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                os.replace(temp_path, path)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, content_hash, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, content_hash, len(payload), time.time())
+                )
+                self._db.commit()
+                self._evict()
+            except (OSError, sqlite3.Error) as e:
+                logger.debug(f"PDF result store write failed: {e}")
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICTION_TARGET_RATIO
+        while total > target:
+            rows = self._db.execute("SELECT key, size FROM results ORDER BY last_used LIMIT 100").fetchall()
+            if not rows:
+                break
+            doomed = []
+            for key, size in rows:
+                doomed.append((key,))
+                total -= size
+                try:
+                    os.remove(self._result_path(key))
+                except OSError:
+                    pass
+                if total <= target:
+                    break
+            self._db.executemany("DELETE FROM results WHERE key = ?", doomed)
+            self.evictions += len(doomed)
+        self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current size of the store."""
+        with self._lock:
+            try:
+                entries, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+                ).fetchone()
+                files = self._db.execute("SELECT COUNT(*) FROM pdf_files").fetchone()[0]
+            except sqlite3.Error:
+                entries, size, files = 0, 0, 0
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "files_indexed": files
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Per-process store instance (connections are not shared across processes)
+_store_settings = {"root": DEFAULT_RESULT_STORE_PATH, "max_bytes": DEFAULT_RESULT_STORE_MAX_BYTES, "enabled": True}
+_store_instance: Dict[str, Any] = {"pid": None, "store": None}
+
+
+def configure_pdf_result_store(root: Optional[str] = None, max_bytes: Optional[int] = None,
+                               enabled: Optional[bool] = None) -> None:
+    """
+    Change the location, size limit or availability of the shared result store.
+
+    The store is opened lazily on the next get_pdf_result_store() call.
+
+    Args:
+        root: Directory for the index and stored results
+        max_bytes: Size limit for stored results
+        enabled: False turns result reuse off
+    """
+    if root is not None:
+        _store_settings["root"] = root
+    if max_bytes is not None:
+        _store_settings["max_bytes"] = max_bytes
+    if enabled is not None:
+        _store_settings["enabled"] = enabled
+    if _store_instance["store"] is not None:
+        _store_instance["store"].close()
+    _store_instance.update(pid=None, store=None)
+
+
+def get_pdf_result_store() -> Optional[PDFResultStore]:
+    """Return this process's shared PDFResultStore, or None if disabled or unavailable."""
+    if not _store_settings["enabled"]:
+        return None
+    if _store_instance["pid"] != os.getpid():
+        try:
+            store = PDFResultStore(_store_settings["root"], _store_settings["max_bytes"])
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"PDF result store unavailable at {_store_settings['root']}: {e}")
+            store = None
+        _store_instance.update(pid=os.getpid(), store=store)
+    return _store_instance["store"]
+
+
+def register_pdf_file(file_path: str) -> Optional[str]:
+    """
+    Hash a downloaded or discovered PDF into the shared store.
+
+    Args:
+        file_path: Path to the PDF
+
+    Returns:
+        Optional[str]: Path of an identical file seen before, or None
+    """
+    store = get_pdf_result_store()
+    if store is None:
+        return None
+    try:
+        duplicate = store.find_duplicate(file_path)
+    except (OSError, sqlite3.Error) as e:
+        logger.debug(f"Could not hash {file_path}: {e}")
+        return None
+    if duplicate:
+        logger.info(f"{file_path} has the same content as {duplicate}; its processing results will be reused")
+    return duplicate
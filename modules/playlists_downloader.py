@@ -14,6 +14,12 @@ from youtube_transcript_api import YouTubeTranscriptApi
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Fast JSON encoder (orjson/msgspec when installed)
+try:
+    from json_output import dump as dump_json
+except ImportError:
+    dump_json = None
+
 # Constants
 BATCH_SIZE = 50  # Max number of video IDs to request in one batch
 
@@ -197,7 +203,10 @@ def download_transcript(video_id, title, download_path, progress_callback=None):
             progress_callback('download', 0.8, 1, f"Saving transcript for '{title}'")
 
         with open(file_path, 'w', encoding='utf-8') as file:
-            json.dump(structured_data, file, ensure_ascii=False, indent=4)
+            if dump_json is not None:
+                dump_json(structured_data, file, indent=4)
+            else:
+                json.dump(structured_data, file, ensure_ascii=False, indent=4)
             
         # Final progress update
         if progress_callback:
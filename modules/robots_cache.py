@@ -0,0 +1,273 @@
+"""
+Process-wide robots.txt cache.
+
+The crawler and the scraper each used to fetch robots.txt with
+RobotFileParser.read(), which goes through urllib without a timeout and is
+cached per crawler instance at best. Here every host's rules are fetched
+once per TTL through the caller's pooled HTTP session with a timeout, and
+threads asking for the same host while it is being fetched wait for that one
+fetch. Rules can also be kept in SQLite so they survive between tasks and
+restarts.
+
+Status handling follows RobotFileParser: 401/403 disallow everything, other
+4xx allow everything. Network errors and 5xx responses allow crawling and
+are retried after a short TTL.
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROBOTS_TTL = 24 * 3600
+# Failed fetches are retried after this many seconds
+DEFAULT_ROBOTS_ERROR_TTL = 300
+DEFAULT_ROBOTS_TIMEOUT = 10
+DEFAULT_ROBOTS_MAX_ENTRIES = 10000
+# SQLite file for keeping rules between runs; unset keeps them in memory only
+DEFAULT_ROBOTS_CACHE_PATH = os.environ.get("ROBOTS_CACHE_PATH")
+ROBOTS_USER_AGENT = "NeuroGenBot/1.0 (+https://neurogen.ai/bot)"
+
+
+def robots_origin(url: str) -> str:
+    """scheme://host[:port] whose robots.txt governs url."""
+    parsed = urlparse(url)
+    return f"{parsed.scheme.lower()}://{parsed.netloc.lower()}"
+
+
+def build_robots_parser(kind: str, body: str) -> RobotFileParser:
+    """RobotFileParser for stored rules ("text", "allow" or "disallow")."""
+    parser = RobotFileParser()
+    if kind == "disallow":
+        parser.disallow_all = True
+    elif kind == "allow":
+        parser.allow_all = True
+    else:
+        parser.parse(body.splitlines())
+    parser.modified()
+    return parser
+
+
+class RobotsCache:
+    """
+    robots.txt rules per host with TTL, fetch de-duplication and optional SQLite persistence.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_ROBOTS_TTL, timeout: float = DEFAULT_ROBOTS_TIMEOUT,
+                 db_path: Optional[str] = DEFAULT_ROBOTS_CACHE_PATH,
+                 max_entries: int = DEFAULT_ROBOTS_MAX_ENTRIES,
+                 error_ttl: float = DEFAULT_ROBOTS_ERROR_TTL):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.fetches = 0
+        self.waits = 0
+        self._entries: "OrderedDict[str, Tuple[RobotFileParser, float]]" = OrderedDict()
+        self._fetching: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS robots ("
+                "origin TEXT PRIMARY KEY, kind TEXT NOT NULL, body TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _cached(self, origin: str) -> Optional[RobotFileParser]:
+        # Caller holds the lock
+        entry = self._entries.get(origin)
+        if entry is not None:
+            parser, expires = entry
+            if expires > time.time():
+                self._entries.move_to_end(origin)
+                return parser
+            del self._entries[origin]
+        if self._db is not None:
+            try:
+                row = self._db.execute(
+                    "SELECT kind, body, expires FROM robots WHERE origin = ? AND expires > ?",
+                    (origin, time.time())
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.debug(f"robots.txt cache read failed: {e}")
+                row = None
+            if row is not None:
+                parser = build_robots_parser(row[0], row[1])
+                self._remember(origin, parser, row[2])
+                return parser
+        return None
+
+    def _remember(self, origin: str, parser: RobotFileParser, expires: float) -> None:
+        # Caller holds the lock
+        self._entries[origin] = (parser, expires)
+        self._entries.move_to_end(origin)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _fetch(self, origin: str, session: Any) -> Tuple[str, str, float]:
+        """Download robots.txt; returns (kind, body, ttl)."""
+        robots_url = f"{origin}/robots.txt"
+        try:
+            if session is not None:
+                response = session.get(robots_url, timeout=self.timeout)
+                status, body = response.status_code, response.text
+            else:
+                request = urllib.request.Request(robots_url, headers={"User-Agent": ROBOTS_USER_AGENT})
+                try:
+                    with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                        status, body = response.status, response.read().decode("utf-8", errors="replace")
+                except urllib.error.HTTPError as e:
+                    status, body = e.code, ""
+        except Exception as e:
+            logger.debug(f"Could not fetch {robots_url}: {e}")
+            return "allow", "", self.error_ttl
+
+        if status in (401, 403):
+            return "disallow", "", self.ttl
+        if status >= 500:
+            return "allow", "", self.error_ttl
+        if status >= 400:
+            return "allow", "", self.ttl
+        return "text", body, self.ttl
+
+    def get_parser(self, url: str, session: Any = None) -> RobotFileParser:
+        """
+        Rules for the host of url, fetched at most once per TTL.
+
+        Args:
+            url: Any URL on the host
+            session: requests-compatible session to fetch with (pooled
+                connections, retries); urllib is used when None
+
+        Returns:
+            RobotFileParser: Parsed rules
+        """
+        origin = robots_origin(url)
+        while True:
+            with self._lock:
+                parser = self._cached(origin)
+                if parser is not None:
+                    self.hits += 1
+                    return parser
+                event = self._fetching.get(origin)
+                owner = event is None
+                if owner:
+                    event = self._fetching[origin] = threading.Event()
+                else:
+                    self.waits += 1
+            if not owner:
+                # Another thread is fetching this host; use its result
+                event.wait(self.timeout * 2)
+                continue
+
+            kind, body, ttl = "allow", "", self.error_ttl
+            try:
+                kind, body, ttl = self._fetch(origin, session)
+            finally:
+                parser = build_robots_parser(kind, body)
+                expires = time.time() + ttl
+                with self._lock:
+                    self.fetches += 1
+                    self._remember(origin, parser, expires)
+                    if self._db is not None:
+                        try:
+                            self._db.execute(
+                                "INSERT OR REPLACE INTO robots (origin, kind, body, expires) VALUES (?, ?, ?, ?)",
+                                (origin, kind, body, expires)
+                            )
+                            self._db.commit()
+                        except sqlite3.Error as e:
+                            logger.debug(f"robots.txt cache write failed: {e}")
+                    del self._fetching[origin]
+                event.set()
+            return parser
+
+    def can_fetch(self, url: str, user_agent: str = "*", session: Any = None) -> bool:
+        """Whether robots.txt allows user_agent to fetch url."""
+        return self.get_parser(url, session).can_fetch(user_agent, url)
+
+    async def can_fetch_async(self, url: str, user_agent: str = "*", session: Any = None) -> bool:
+        """can_fetch() for event loops: cached rules are answered inline, fetches run in a thread."""
+        with self._lock:
+            parser = self._cached(robots_origin(url))
+            if parser is not None:
+                self.hits += 1
+        if parser is not None:
+            return parser.can_fetch(user_agent, url)
+        return await asyncio.to_thread(self.can_fetch, url, user_agent, session)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookup counters for this process."""
+        with self._lock:
+            return {"hits": self.hits, "fetches": self.fetches, "waits": self.waits, "entries": len(self._entries)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Per-process cache instance (connections are not shared across processes)
+_robots_settings: Dict[str, Any] = {
+    "ttl": DEFAULT_ROBOTS_TTL, "timeout": DEFAULT_ROBOTS_TIMEOUT, "db_path": DEFAULT_ROBOTS_CACHE_PATH
+}
+_robots_instance: Dict[str, Any] = {"pid": None, "cache": None}
+_robots_lock = threading.Lock()
+
+
+def configure_robots_cache(ttl: Optional[float] = None, timeout: Optional[float] = None,
+                           db_path: Optional[str] = None) -> None:
+    """
+    Change the TTL, fetch timeout or storage of the shared robots.txt cache.
+
+    The cache is recreated on the next get_robots_cache() call.
+
+    Args:
+        ttl: Seconds before a host's rules are fetched again
+        timeout: Fetch timeout in seconds
+        db_path: SQLite file for keeping rules between runs ("" for memory only)
+    """
+    if ttl is not None:
+        _robots_settings["ttl"] = ttl
+    if timeout is not None:
+        _robots_settings["timeout"] = timeout
+    if db_path is not None:
+        _robots_settings["db_path"] = db_path or None
+    with _robots_lock:
+        if _robots_instance["cache"] is not None:
+            _robots_instance["cache"].close()
+        _robots_instance.update(pid=None, cache=None)
+
+
+def get_robots_cache() -> RobotsCache:
+    """Return this process's shared RobotsCache."""
+    with _robots_lock:
+        if _robots_instance["pid"] != os.getpid():
+            settings = dict(_robots_settings)
+            try:
+                cache = RobotsCache(settings["ttl"], settings["timeout"], settings["db_path"])
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"robots.txt cache storage unavailable at {settings['db_path']}: {e}")
+                cache = RobotsCache(settings["ttl"], settings["timeout"], None)
+            _robots_instance.update(pid=os.getpid(), cache=cache)
+        return _robots_instance["cache"]
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Tests and benchmark for the offset-based chunker (iter_chunk_spans).
+
+Run with pytest for the invariant checks, or directly to benchmark:
+
+    python tests/test_chunk_spans.py --sizes 1 10 100 --chunk-size 4096 --overlap 200
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+# Add modules directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+from Structify import claude
+import pdf_extractor
+
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit",
+         "sed", "do", "eiusmod", "tempor", "incididunt", "labore", "magna", "aliqua"]
+
+
+def make_text(size, shape="prose", seed=7):
+    """Build roughly size characters of text of a given shape."""
+    rng = random.Random(seed)
+    if shape == "minified":
+        # One enormous line without whitespace
+        return "".join(rng.choice("abcdefghij{}();,=") for _ in range(size))
+    if shape == "ocr":
+        # One huge paragraph of short sentences, no line breaks
+        parts, total = [], 0
+        while total < size:
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14))) + ". "
+            parts.append(sentence)
+            total += len(sentence)
+        return "".join(parts)[:size]
+    parts, total = [], 0
+    while total < size:
+        para = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 200)))
+        parts.append(para + rng.choice([".\n\n", ".\n", ". "]))
+        total += len(parts[-1])
+    return "".join(parts)[:size]
+
+
+def check_spans(text, max_size, overlap):
+    spans = list(claude.iter_chunk_spans(text, max_size, overlap))
+    assert spans == list(pdf_extractor.iter_chunk_spans(text, max_size, overlap))
+    covered = 0
+    prev_start = -1
+    for start, end in spans:
+        assert 0 <= start < end <= len(text)
+        assert end - start <= max_size
+        assert start > prev_start
+        # Everything up to this chunk is covered, apart from whitespace we skipped
+        assert start <= covered or not text[covered:start].strip()
+        covered = max(covered, end)
+        prev_start = start
+    assert not text[covered:].strip()
+    return spans
+
+
+def test_small_text_is_single_span():
+    assert list(claude.iter_chunk_spans("", 10)) == []
+    assert list(claude.iter_chunk_spans("short", 10)) == [(0, 5)]
+    assert claude.chunk_text_by_paragraphs("short", 10) == ["short"]
+
+
+def test_spans_cover_text_within_limits():
+    for shape in ["prose", "ocr", "minified"]:
+        text = make_text(200_000, shape)
+        for max_size, overlap in [(500, 0), (1000, 200), (4096, 200), (64, 60)]:
+            check_spans(text, max_size, overlap)
+
+
+def test_prefers_paragraph_breaks():
+    text = ("a" * 60 + "\n\n") * 10
+    chunks = claude.chunk_text_by_paragraphs(text, 130)
+    assert all(set(c) <= {"a", "\n"} for c in chunks)
+    assert all(not c.startswith("\n") and not c.endswith("\n") for c in chunks)
+
+
+def test_overlap_repeats_tail_of_previous_chunk():
+    text = make_text(20_000, "ocr")
+    spans = check_spans(text, 1000, 100)
+    for (s1, e1), (s2, e2) in zip(spans, spans[1:]):
+        assert s2 < e1  # overlapping
+        assert e1 - s2 <= 100
+
+
+def test_is_lazy():
+    text = make_text(2_000_000, "prose")
+    gen = claude.iter_chunk_spans(text, 1000, 100)
+    start = time.perf_counter()
+    next(gen)
+    assert time.perf_counter() - start < 0.05
+
+
+def test_token_chunks_fit_budget():
+    counter = claude.get_token_counter()
+    assert claude.get_token_counter() is counter  # loaded once
+    for shape in ["prose", "ocr", "minified"]:
+        text = make_text(300_000, shape)
+        spans = list(claude.iter_token_chunk_spans(text, 256, counter, 32))
+        assert spans == list(pdf_extractor.iter_token_chunk_spans(text, 256, None, 32))
+        assert all(counter.count(text[s:e]) <= 256 for s, e in spans)
+        assert all(s2 > s1 for (s1, _), (s2, _) in zip(spans, spans[1:]))
+        assert not text[spans[-1][1]:].strip()
+
+
+def test_token_chunking_batches_tokenizer_calls():
+    calls = []
+
+    class CountingTokenizer(claude.TokenCounter):
+        def count_batch(self, texts):
+            calls.append(len(texts))
+            return [len(t.split()) for t in texts]
+
+    text = make_text(200_000, "prose")
+    chunks = claude.chunk_text_by_tokens(text, 100, CountingTokenizer())
+    assert all(len(c.split()) <= 100 for c in chunks)
+    assert max(calls) == claude.TOKEN_COUNT_BATCH
+    # Every unit is counted once: far fewer calls than chunks
+    assert len(calls) < len(chunks)
+
+
+def test_token_chunking_accepts_plain_function():
+    text = "alpha beta gamma delta " * 50
+    chunks = pdf_extractor.chunk_text_by_tokens(text, 10, lambda t: len(t.split()), 2)
+    assert all(len(c.split()) <= 10 for c in chunks)
+    assert chunks[1].split()[:2] == chunks[0].split()[-2:]
+
+
+def test_streamed_file_chunks_match_in_memory_chunks(tmp_path):
+    text = " caf\u00e9 na\u00efve \u2013 start " * 50 + make_text(300_000, "prose") + "\n\n   \n"
+    for encoding in ["utf-8", "utf-8-sig", "utf-16", "cp1252"]:
+        path = tmp_path / f"sample-{encoding}.txt"
+        path.write_bytes(text.encode(encoding))
+        assert claude.detect_text_encoding(str(path)) == encoding
+        assert claude.read_large_file(str(path)) == text
+        expected = list(claude.iter_text_chunks(text, 1000, 120))
+        # Tiny blocks force many carry-overs and split multi-byte characters
+        for buffer_size in [333, 4096, 1 << 20]:
+            streamed = list(claude.iter_file_chunks(str(path), 1000, 120, buffer_size=buffer_size))
+            assert streamed == expected, (encoding, buffer_size)
+
+
+def test_non_utf8_bytes_past_sample_switch_decoder(tmp_path):
+    prefix = "plain ascii " * 10_000
+    path = tmp_path / "mixed.txt"
+    path.write_bytes(prefix.encode("ascii") + "caf\u00e9 \u2013 end".encode("cp1252"))
+    assert claude.detect_text_encoding(str(path)) == "utf-8"
+    decoded = claude.read_large_file(str(path))
+    assert decoded.startswith(prefix)
+    assert decoded.endswith("caf\u00e9 \u2013 end")
+
+
+def test_decoder_switch_keeps_utf8_before_the_bad_byte(tmp_path):
+    prefix = "plain ascii " * 10_000
+    path = tmp_path / "mixed.txt"
+    path.write_bytes(prefix.encode("ascii") + "caf\u00e9 ".encode("utf-8") + "\u2013 end".encode("cp1252"))
+    for buffer_size in [1 << 20, 4096]:
+        decoded = "".join(claude.iter_file_text(str(path), buffer_size=buffer_size))
+        assert decoded == prefix + "caf\u00e9 \u2013 end"
+
+
+def check_token_stream(text, chunks, max_tokens, counter):
+    """Chunks fit the budget, appear in order, overlap their predecessor and cover the text."""
+    assert all(counter.count(c) <= max_tokens for c in chunks)
+    position, prev_end = 0, 0
+    for i, chunk in enumerate(chunks):
+        start = text.find(chunk, max(0, position - len(chunk)))
+        assert start >= 0, i
+        assert not text[position:start].strip(), i
+        if i:
+            assert start < prev_end, i  # repeats the tail of the previous chunk
+        prev_end = start + len(chunk)
+        position = max(position, prev_end)
+    assert not text[position:].strip()
+
+
+def test_streamed_token_chunks_overlap_across_blocks(tmp_path):
+    counter = claude.get_token_counter()
+    text = make_text(200_000, "prose")
+    path = tmp_path / "big.txt"
+    path.write_text(text, encoding="utf-8")
+    for buffer_size in [2000, 7919, 1 << 20]:
+        chunks = list(claude.iter_file_token_chunks(str(path), 150, counter, 30, buffer_size=buffer_size))
+        assert len(chunks) > 100
+        check_token_stream(text, chunks, 150, counter)
+
+
+def run_benchmark(sizes_mb, chunk_size, overlap):
+    print(f"{'input':>8} {'shape':>9} {'chunks':>9} {'seconds':>9} {'MB/s':>9}")
+    for size_mb in sizes_mb:
+        for shape in ["prose", "ocr", "minified"]:
+            text = make_text(int(size_mb * 1_000_000), shape)
+            start = time.perf_counter()
+            count = sum(1 for _ in claude.iter_chunk_spans(text, chunk_size, overlap))
+            elapsed = time.perf_counter() - start
+            print(f"{size_mb:>6}MB {shape:>9} {count:>9} {elapsed:>9.3f} {size_mb / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark iter_chunk_spans")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 10, 100], help="Input sizes in MB")
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--overlap", type=int, default=200)
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.chunk_size, args.overlap)
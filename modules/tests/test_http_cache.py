@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for the conditional-request HTTP cache (http_cache.py) against a local server.
+"""
+
+import sys
+import gzip
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+# Add modules directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+import http_cache
+
+PDF_BODY = b"%PDF-1.4\n" + b"0123456789abcdef" * 4096
+PAGE_BODY = b"<html><head><title>Index</title></head><body>" + b"<p>text</p>" * 500 + b"</body></html>"
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+@pytest.fixture
+def server():
+    """Serves /doc.pdf with an ETag, /page with Last-Modified (gzipped) and /plain without validators."""
+    state = {"pdf_version": "1", "requests": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"].append((self.path, dict(self.headers)))
+            path = self.path.split("?")[0]
+            if path == "/doc.pdf":
+                etag = f'"v{state["pdf_version"]}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                body = PDF_BODY + state["pdf_version"].encode()
+                headers = {"ETag": etag, "Content-Type": "application/pdf"}
+            elif path == "/page":
+                if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = gzip.compress(PAGE_BODY)
+                headers = {"Last-Modified": LAST_MODIFIED, "Content-Encoding": "gzip",
+                           "Content-Type": "text/html; charset=utf-8"}
+            else:
+                body = PAGE_BODY
+                headers = {"Content-Type": "text/html"}
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def cached_session(tmp_path):
+    cache = http_cache.HttpCache(str(tmp_path / "http_cache"))
+    session = requests.Session()
+    session.mount("http://", http_cache.CachingHTTPAdapter(cache=cache))
+    yield session, cache
+    session.close()
+    cache.close()
+
+
+def stream_to_bytes(response):
+    return b"".join(response.iter_content(chunk_size=8192))
+
+
+def test_unchanged_pdf_is_served_from_disk(server, cached_session):
+    base, state = server
+    session, cache = cached_session
+
+    with cache.task_scope("task-1"):
+        first = session.get(f"{base}/doc.pdf", stream=True)
+        assert stream_to_bytes(first) == PDF_BODY + b"1"
+        second = session.get(f"{base}/doc.pdf", stream=True)
+        assert second.status_code == 200
+        assert getattr(second, "from_cache", False)
+        assert second.headers["ETag"] == '"v1"'
+        assert stream_to_bytes(second) == PDF_BODY + b"1"
+
+    assert state["requests"][1][1]["If-None-Match"] == '"v1"'
+    stats = cache.task_stats("task-1")
+    assert stats["revalidated"] == 1
+    assert stats["bytes_saved"] == len(PDF_BODY) + 1
+    assert cache.task_stats("other-task")["requests"] == 0
+
+    # A changed file is downloaded again and replaces the stored copy
+    state["pdf_version"] = "2"
+    third = session.get(f"{base}/doc.pdf")
+    assert third.content == PDF_BODY + b"2"
+    assert not getattr(third, "from_cache", False)
+    assert session.get(f"{base}/doc.pdf").content == PDF_BODY + b"2"
+    assert cache.stats()["revalidated"] == 2
+
+
+def test_last_modified_page_is_stored_decoded(server, cached_session):
+    base, state = server
+    session, cache = cached_session
+
+    assert session.get(f"{base}/page").text == PAGE_BODY.decode()
+    again = session.get(f"{base}/page")
+    assert again.from_cache
+    assert "Content-Encoding" not in again.headers
+    assert again.encoding == "utf-8"
+    assert again.text == PAGE_BODY.decode()
+    assert state["requests"][1][1]["If-Modified-Since"] == LAST_MODIFIED
+
+
+def test_uncacheable_requests_are_passed_through(server, cached_session):
+    base, state = server
+    session, cache = cached_session
+
+    session.get(f"{base}/plain")
+    session.get(f"{base}/plain")
+    # Incomplete reads are not kept
+    partial = session.get(f"{base}/doc.pdf", stream=True)
+    next(partial.iter_content(256))
+    partial.close()
+    session.get(f"{base}/doc.pdf", headers={"Cache-Control": "no-store"})
+
+    assert all("If-None-Match" not in headers and "If-Modified-Since" not in headers
+               for _, headers in state["requests"])
+    assert cache.stats()["entries"] == 0
+    assert not list((Path(cache.root) / "bodies").rglob("*.tmp"))
+
+
+def test_missing_body_falls_back_to_full_download(server, cached_session):
+    base, _ = server
+    session, cache = cached_session
+
+    session.get(f"{base}/doc.pdf")
+    body_path = Path(cache.lookup(f"{base}/doc.pdf")["path"])
+    body_path.unlink()
+    response = session.get(f"{base}/doc.pdf")
+    assert response.content == PDF_BODY + b"1"
+    assert not getattr(response, "from_cache", False)
+    assert body_path.exists()
+
+
+def test_stored_bodies_are_evicted_by_size(server, tmp_path):
+    base, _ = server
+    cache = http_cache.HttpCache(str(tmp_path / "small"), max_bytes=len(PDF_BODY) * 5)
+    session = requests.Session()
+    session.mount("http://", http_cache.CachingHTTPAdapter(cache=cache))
+    try:
+        for copy in range(6):
+            session.get(f"{base}/doc.pdf?copy={copy}")
+        stats = cache.stats()
+        assert cache.lookup(f"{base}/doc.pdf?copy=0") is None
+        assert cache.lookup(f"{base}/doc.pdf?copy=5") is not None
+    finally:
+        session.close()
+        cache.close()
+    assert stats["evictions"] >= 2
+    assert stats["bytes"] <= len(PDF_BODY) * 5
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Tests and benchmark for the JSON serialization layer (json_output.py).
+
+Run with pytest for the equivalence checks, or directly to benchmark writing a
+synthetic large-PDF result and encoding typical outputs with each backend:
+
+    python tests/test_json_output.py --pages 1000
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# Add modules directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+import json_output
+import pdf_extractor
+from Structify import claude
+
+
+def random_value(rng, depth=0):
+    r = rng.random()
+    if depth < 5 and r < 0.3:
+        return {f"k{i}" if rng.random() < 0.8 else rng.choice([1, 2.5, True, None, "é\n\"x\""]): random_value(rng, depth + 1)
+                for i in range(rng.randint(0, 4))}
+    if depth < 5 and r < 0.55:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return rng.choice(["x", "line\nbreak\t\"quoted\" ü \U0001f600", 1, -2.5e-9, True, False, None, (1, 2), [], {}])
+
+
+def make_result(pages=50, seed=5):
+    """process_pdf-shaped result with per-page blocks and a full_content chunk."""
+    rng = random.Random(seed)
+    page_texts = [" ".join(rng.choice(["alpha", "beta", "gamma\n", "délta"]) for _ in range(300))
+                  for _ in range(pages)]
+    full_text = "\n".join(page_texts)
+    return {
+        "source_file": "doc.pdf",
+        "processing_info": {"extract_tables": True},
+        "metadata": {"title": "Doc", "page_count": pages},
+        "structure": {
+            "sections": [{"title": f"S{i}", "start": i} for i in range(pages)],
+            "pages": [{"page_num": i + 1, "text": text,
+                       "blocks": [{"text": text[j:j + 80], "bbox": [72.0, 90.5 + j / 10, 540.0, 102.25 + j / 10],
+                                   "type": "text"} for j in range(0, len(text), 80)]}
+                      for i, text in enumerate(page_texts)]
+        },
+        "chunks": [{"content": full_text, "metadata": {"chunk_type": "full_content"}}] +
+                  [{"content": text, "metadata": {"chunk_type": "section", "chunk_index": i}}
+                   for i, text in enumerate(page_texts)],
+        "tables": [{"table_id": 1, "page": 2, "rows": 2, "data": [{"col_0": "a"}, {"col_0": None}]}],
+        "status": "success",
+        "full_text": full_text
+    }
+
+
+@pytest.fixture(params=json_output.available_json_backends())
+def backend(request):
+    previous = json_output.json_backend()
+    json_output.configure_json_backend(request.param)
+    yield request.param
+    json_output.configure_json_backend(previous)
+
+
+def test_fragments_match_json_dumps(backend):
+    rng = random.Random(3)
+    for _ in range(2000):
+        value = random_value(rng)
+        for indent in [None, 2, 4]:
+            separators = (",", ": ") if indent is not None else (",", ":")
+            expected = json.dumps(value, ensure_ascii=False, indent=indent, separators=separators)
+            for depth in [0, 1, 3, 10]:
+                text = "".join(json_output.iter_json(value, indent, depth))
+                if backend == "json":
+                    assert text == expected
+                else:
+                    # Native encoders spell some floats differently (1e-9 vs 1e-09)
+                    assert json.loads(text) == json.loads(expected)
+                    if indent is not None:
+                        assert [len(l) - len(l.lstrip(" ")) for l in text.splitlines()] == \
+                               [len(l) - len(l.lstrip(" ")) for l in expected.splitlines()]
+
+
+def test_backends_encode_custom_types_like_custom_json_encoder(backend):
+    class Doc:
+        def to_dict(self):
+            return {"content": "x"}
+
+    value = {
+        "when": datetime(2024, 5, 1, 12, 30),
+        "path": Path("/tmp/a.pdf"),
+        "tags": {"pdf"},
+        "raw": "caf\u00e9".encode("utf-8"),
+        "latin": b"\xe9t\xe9",
+        "doc": Doc(),
+        "pair": (1, 2),
+        "big": 2 ** 70,
+        3: "int key"
+    }
+    expected = json.loads(json.dumps(value, cls=claude.CustomJSONEncoder))
+    assert json.loads(json_output.dumps(value)) == expected
+    assert json.loads(json_output.dumps_bytes(value, indent=2)) == expected
+    assert json.loads(claude.encode_json(value, indent=2)) == expected
+
+
+def test_save_results_output_is_unchanged_by_default(tmp_path, backend):
+    result = make_result()
+    path = pdf_extractor.save_results(result, str(tmp_path / "out.json"))
+    assert path == str(tmp_path / "out.json")
+    expected = json.dumps(pdf_extractor.prepare_output_data(result), indent=2, ensure_ascii=False)
+    assert Path(path).read_text(encoding="utf-8") == expected
+    assert "chunks_in_output" not in result["processing_info"]  # original left untouched
+
+    assert claude.write_json_safely(result, str(tmp_path / "claude.json"))
+    assert (tmp_path / "claude.json").read_text(encoding="utf-8") == json.dumps(result, indent=2, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compact_compressed_output_without_full_text_round_trips(tmp_path, compression):
+    if compression == "zstd" and not json_output.HAS_ZSTD:
+        pytest.skip("zstandard not installed")
+    result = make_result()
+    plain = pdf_extractor.save_results(result, str(tmp_path / "plain.json"))
+    small = pdf_extractor.save_results(result, str(tmp_path / "small.json"), compact=True,
+                                       compression=compression, omit_full_text=True)
+    assert small.endswith(json_output.COMPRESSION_SUFFIXES[compression])
+    assert Path(small).stat().st_size * 10 < Path(plain).stat().st_size
+    assert json_output.load_json_output(small) == json_output.load_json_output(plain)
+
+
+def test_full_text_kept_unless_chunks_reproduce_it(tmp_path):
+    result = make_result(pages=3)
+    result["chunks"] = result["chunks"][1:]  # sections joined without separators
+    path = json_output.write_json_file(result, str(tmp_path / "out.json"), omit_full_text=True)
+    assert json.loads(Path(path).read_text(encoding="utf-8"))["full_text"] == result["full_text"]
+
+    result["chunks"] = [{"content": result["full_text"][:100], "metadata": {"chunk_type": "full_content_part", "part_index": 0}},
+                        {"content": result["full_text"][100:], "metadata": {"chunk_type": "full_content_part", "part_index": 1}}]
+    path = json_output.write_json_file(result, str(tmp_path / "parts.json"), omit_full_text=True)
+    saved = json.loads(Path(path).read_text(encoding="utf-8"))
+    assert "full_text" not in saved
+    assert json_output.load_json_output(path)["full_text"] == result["full_text"]
+
+
+def make_structify_docs(count=2000, seed=7):
+    """Structify all_data: DocData-like dicts with datetimes and tag sets."""
+    rng = random.Random(seed)
+    return {"default": {"docs_data": [
+        {"content": " ".join(rng.choice(["def", "return", "class", "import"]) for _ in range(200)),
+         "file_path": Path(f"/src/module_{i}.py"), "section_name": f"module_{i}", "language": "python",
+         "tags": {"code", f"m{i % 10}"}, "modified": datetime(2024, 1, 1 + i % 28), "tables": []}
+        for i in range(count)
+    ]}}
+
+
+def make_history(count=100):
+    return [{"task_id": f"task-{i}", "type": "file", "status": "completed", "timestamp": 1714560000 + i,
+             "output_file": f"/out/result_{i}.json", "stats": {"files": i, "bytes": i * 1000}}
+            for i in range(count)]
+
+
+def run_backend_benchmark(pages):
+    workloads = [
+        ("pdf result", make_result(pages), 2),
+        ("structify docs", make_structify_docs(), None),
+        ("history", make_history(), 2),
+    ]
+    previous = json_output.json_backend()
+    print(f"\n{'workload':>16} {'backend':>9} {'seconds':>9} {'peak MB':>9}")
+    for name, value, indent in workloads:
+        # The pre-existing path: json.dump through CustomJSONEncoder
+        cases = [("custom", lambda v: json.dumps(v, ensure_ascii=False, indent=indent,
+                                                cls=claude.CustomJSONEncoder).encode("utf-8"))]
+        cases += [(b, lambda v, b=b: (json_output.configure_json_backend(b), json_output.dumps_bytes(v, indent))[1])
+                  for b in json_output.available_json_backends()]
+        for backend, encode in cases:
+            encode(value)  # warm up
+            tracemalloc.start()
+            start = time.perf_counter()
+            encode(value)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:>16} {backend:>9} {elapsed:>9.3f} {peak / 1e6:>9.1f}")
+    json_output.configure_json_backend(previous)
+
+
+def run_benchmark(pages):
+    result = make_result(pages)
+    output = Path(__file__).parent / "_json_output_benchmark.json"
+    cases = [
+        ("json.dump indent=2", None),
+        ("streamed indent=2", {}),
+        ("streamed compact", {"compact": True}),
+        ("compact, no full_text", {"compact": True, "omit_full_text": True}),
+        ("compact + gzip", {"compact": True, "compression": "gzip", "omit_full_text": True}),
+    ]
+    if json_output.HAS_ZSTD:
+        cases.append(("compact + zstd", {"compact": True, "compression": "zstd", "omit_full_text": True}))
+    print(f"{'mode':>24} {'seconds':>9} {'MB':>9}")
+    for name, options in cases:
+        start = time.perf_counter()
+        if options is None:
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+            path = output
+        else:
+            path = Path(json_output.write_json_file(result, str(output), **options))
+        elapsed = time.perf_counter() - start
+        print(f"{name:>24} {elapsed:>9.3f} {path.stat().st_size / 1e6:>9.1f}")
+        path.unlink()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the JSON writers and encoder backends")
+    parser.add_argument("--pages", type=int, default=1000, help="Pages in the synthetic result")
+    args = parser.parse_args()
+    run_benchmark(args.pages)
+    run_backend_benchmark(args.pages)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory OCR engine in Structify/claude.py
+
+Tesseract itself is replaced by a recording fake, so these tests only need
+PyMuPDF, numpy and Pillow.
+"""
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+# Add modules directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+fitz = pytest.importorskip("fitz")
+np = pytest.importorskip("numpy")
+pytesseract = pytest.importorskip("pytesseract")
+
+from Structify import claude
+import ocr_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_ocr_cache(tmp_path):
+    ocr_cache.configure_ocr_cache(db_path=str(tmp_path / "ocr_cache.db"))
+    yield ocr_cache.get_ocr_cache()
+    ocr_cache.configure_ocr_cache(db_path=ocr_cache.DEFAULT_OCR_CACHE_PATH)
+
+
+def fake_data(words):
+    """image_to_data-style dict for (block, par, line, word, conf) tuples."""
+    data = {key: [] for key in ["page_num", "block_num", "par_num", "line_num", "word_num", "conf", "text"]}
+    for block, par, line, word, conf in words:
+        for key, value in zip(data, [1, block, par, line, len(data["text"]), conf, word]):
+            data[key].append(value)
+    return data
+
+
+def test_text_layout_matches_image_to_string():
+    data = fake_data([
+        (0, 0, 0, "", -1),  # page/block level rows carry no text
+        (1, 1, 1, "Hello", 90), (1, 1, 1, "world", 80),
+        (1, 1, 2, "again", "70"),
+        (1, 2, 1, "Second", 60.5), (1, 2, 1, " ", -1),
+        (2, 1, 1, "Next", 40),
+    ])
+    text, confidence = claude.tesseract_data_to_text(data)
+    assert text == "Hello world\nagain\n\nSecond\n\nNext"
+    assert confidence == pytest.approx((90 + 80 + 70 + 60.5 + 40) / 5)
+    assert claude.tesseract_data_to_text(fake_data([])) == ("", 0.0)
+
+
+def test_module_imports_without_modules_on_the_path():
+    # Run as a plain module from its own directory, ocr_text is out of reach
+    # and claude.py falls back to its own formatter
+    script = (
+        "import claude, json\n"
+        "data = {'page_num': [1, 1, 1], 'block_num': [1, 1, 1], 'par_num': [1, 1, 1],\n"
+        "        'line_num': [1, 1, 2], 'conf': [90, '70', -1], 'text': ['Hello', 'world', 'again']}\n"
+        "print(json.dumps([claude.tesseract_data_to_text.__module__, claude.tesseract_data_to_text(data)]))\n"
+    )
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONPATH"}
+    result = subprocess.run([sys.executable, "-c", script], cwd=Path(claude.__file__).parent,
+                            env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == ["claude", ["Hello world\nagain", 80.0]]
+
+
+def test_pages_are_ocred_in_memory_with_one_tesseract_call(tmp_path, monkeypatch):
+    doc = fitz.open()
+    for i in range(3):
+        doc.new_page(width=200, height=100).insert_text((20, 50), f"page {i}")
+    path = str(tmp_path / "scan.pdf")
+    doc.save(path)
+    doc.close()
+
+    calls = []
+
+    def fake_image_to_data(image, lang=None, config=None, output_type=None):
+        calls.append(image.size)
+        return fake_data([(1, 1, 1, f"word{len(calls)}", 88)])
+
+    monkeypatch.setattr(pytesseract, "image_to_data", fake_image_to_data)
+    monkeypatch.setattr(pytesseract, "image_to_string", lambda *a, **k: pytest.fail("second tesseract run"))
+    before = set(os.listdir(claude.TEMP_OCR_DIR))
+
+    results = claude.ocr_pdf_pages(path, [0, 2], zoom=2.0, preprocess=None, max_workers=1)
+
+    assert sorted(results) == [0, 2]
+    assert len(calls) == 2
+    assert calls[0] == (400, 200)  # rendered at 2x zoom
+    assert results[0]["confidence"] == 88
+    assert results[2]["text"].startswith("word")
+    assert set(os.listdir(claude.TEMP_OCR_DIR)) == before  # nothing written to disk
+
+
+def test_render_page_array_is_grayscale():
+    doc = fitz.open()
+    page = doc.new_page(width=123, height=45)
+    array = claude.render_page_array(page, zoom=1.0)
+    assert array.shape == (45, 123)
+    assert array.dtype == np.uint8
+    assert array.min() == 255  # blank page
+    doc.close()
+
+
+def test_repeat_ocr_is_served_from_cache(tmp_path, monkeypatch, isolated_ocr_cache):
+    doc = fitz.open()
+    doc.new_page(width=200, height=100).insert_text((20, 50), "cached")
+    path = str(tmp_path / "scan.pdf")
+    doc.save(path)
+    doc.close()
+
+    calls = []
+
+    def fake_image_to_data(image, lang=None, config=None, output_type=None):
+        calls.append(lang)
+        return fake_data([(1, 1, 1, "cached", 75)])
+
+    monkeypatch.setattr(pytesseract, "image_to_data", fake_image_to_data)
+    first = claude.ocr_pdf_pages(path, [0], preprocess=None, max_workers=1)[0]
+    second = claude.ocr_pdf_pages(path, [0], preprocess=None, max_workers=1)[0]
+    assert len(calls) == 1
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["text"] == first["text"] and second["confidence"] == first["confidence"]
+
+    # Language and options are part of the key
+    claude.ocr_pdf_pages(path, [0], language="deu", preprocess=None, max_workers=1)
+    assert calls == ["eng", "deu"]
+    stats = isolated_ocr_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = ocr_cache.OCRCache(str(tmp_path / "small.db"), max_bytes=1000)
+    payload = {"text": "x" * 180}
+    for i in range(4):
+        cache.put(f"k{i}", payload)
+    assert cache.get("k0") == payload  # k0 is now the most recently used
+    for i in range(4, 6):
+        cache.put(f"k{i}", payload)
+    stats = cache.stats()
+    assert stats["bytes"] <= 1000
+    assert stats["evictions"] == 2
+    assert cache.get("k0") == payload
+    assert cache.get("k1") is None and cache.get("k2") is None
+    cache.close()
+
+
+def test_pages_are_ocred_in_the_process_pool(tmp_path, monkeypatch):
+    # Pool workers pickle _ocr_pdf_page by reference, which needs the module to be
+    # importable under its own name (Structify.claude) as in the app
+    doc = fitz.open()
+    for i in range(4):
+        doc.new_page(width=200, height=100).insert_text((20, 50), f"page {i}")
+    path = str(tmp_path / "scan.pdf")
+    doc.save(path)
+    doc.close()
+
+    def fake_image_to_data(image, lang=None, config=None, output_type=None):
+        return fake_data([(1, 1, 1, f"pid{os.getpid()}", 90)])
+
+    monkeypatch.setattr(pytesseract, "image_to_data", fake_image_to_data)
+    results = claude.ocr_pdf_pages(path, [0, 1, 2, 3], preprocess=None, max_workers=2)
+
+    assert sorted(results) == [0, 1, 2, 3]
+    assert not any("error" in r for r in results.values())
+    # Every page came from a worker, none from the in-process retry
+    assert all(r["text"] != f"pid{os.getpid()}" for r in results.values())
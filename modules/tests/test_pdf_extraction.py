@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Tests for the PyMuPDF extraction path in pdf_extractor.py
+
+A small PDF with headings, body text and one ruled table is generated on the
+fly, so the tests only need PyMuPDF.
+"""
+
+import sys
+import shutil
+import hashlib
+from pathlib import Path
+
+import pytest
+
+# Add modules directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+fitz = pytest.importorskip("fitz")
+
+import pdf_extractor
+import pdf_result_store
+
+
+@pytest.fixture(autouse=True)
+def isolated_result_store(tmp_path):
+    pdf_result_store.configure_pdf_result_store(root=str(tmp_path / "pdf_results"))
+    yield pdf_result_store.get_pdf_result_store()
+    pdf_result_store.configure_pdf_result_store(root=pdf_result_store.DEFAULT_RESULT_STORE_PATH)
+
+
+def make_pdf(path, pages=6, table_page=2):
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        y = 72
+        page.insert_text((72, y), f"CHAPTER {p + 1}", fontsize=18)
+        y += 30
+        for i in range(25):
+            page.insert_text((72, y), f"Line {i} of page {p}: the quick brown fox jumps over dog {i * p}.",
+                             fontsize=10)
+            y += 14
+        if p == table_page:
+            for r in range(4):
+                for c in range(3):
+                    rect = fitz.Rect(72 + c * 120, y + 10 + r * 20, 72 + (c + 1) * 120, y + 10 + (r + 1) * 20)
+                    page.draw_rect(rect, color=(0, 0, 0))
+                    page.insert_text((rect.x0 + 4, rect.y0 + 14), f"r{r}c{c}", fontsize=9)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    return make_pdf(tmp_path / "sample.pdf")
+
+
+def test_context_reuses_page_walk_for_tables(sample_pdf):
+    with pdf_extractor.PDFExtractionContext(sample_pdf) as ctx:
+        data = ctx.extract()
+        assert data["page_count"] == 6
+        assert len(data["structure"]["headings"]) >= 6
+        tables = ctx.tables()
+    assert len(tables) == 1
+    assert tables[0]["page"] == 3
+    assert tables[0]["rows"] == 4
+    # Same answer as opening the file separately
+    assert pdf_extractor.extract_tables_from_pdf(sample_pdf) == tables
+
+
+def test_process_pdf_opens_file_once(sample_pdf, monkeypatch):
+    opens = []
+    real_open = pdf_extractor.fitz.open
+
+    def counting_open(*args, **kwargs):
+        opens.append(args)
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(pdf_extractor.fitz, "open", counting_open)
+    result = pdf_extractor.process_pdf(sample_pdf, None, return_data=True, timeout=0)
+    assert result["status"] == "success"
+    assert len(result["tables"]) == 1
+    assert len(opens) == 1
+
+
+def test_sharded_extraction_matches_sequential(tmp_path):
+    path = make_pdf(tmp_path / "long.pdf", pages=23, table_page=17)
+    with pdf_extractor.PDFExtractionContext(path) as ctx:
+        expected = ctx.extract()
+        expected_tables = ctx.tables()
+    with pdf_extractor.PDFExtractionContext(path, shard_threshold=10, max_workers=3) as ctx:
+        sharded = ctx.extract()
+        assert sharded.pop("shards") == 3
+        assert sharded == expected
+        # Table grids found by the workers are reused
+        assert ctx.tables() == expected_tables
+    # Page ranges are sharded too
+    with pdf_extractor.PDFExtractionContext(path, shard_threshold=5, max_workers=2) as ctx:
+        ranged = ctx.extract((4, 15))
+        ranged.pop("shards")
+    with pdf_extractor.PDFExtractionContext(path) as ctx:
+        assert ranged == ctx.extract((4, 15))
+
+
+MODULES_DIR = Path(__file__).parent.parent
+SAMPLE_CORPUS = [
+    MODULES_DIR / "downloads" / "2301.00001_34d3754dfd.pdf",
+    MODULES_DIR / "test_enhanced_output" / "full_website" / "pdfs" / "copy-and-patch.pdf_c29d79f7ae.pdf",
+]
+
+
+def add_rule_less_table(page, y=500):
+    """Booktabs-style table: three horizontal rules and whitespace-aligned cells."""
+    for rule_y in (y, y + 20, y + 110):
+        page.draw_line((72, rule_y), (400, rule_y))
+    for r in range(5):
+        for c in range(4):
+            page.insert_text((76 + c * 80, y + 15 + r * 16 + (8 if r else 0)), f"v{r}{c}", fontsize=9)
+
+
+@pytest.mark.parametrize("path", SAMPLE_CORPUS + ["generated"], ids=lambda p: Path(p).name)
+def test_table_prescreen_keeps_every_detected_table(path, tmp_path):
+    if path == "generated":
+        path = make_pdf(tmp_path / "generated.pdf", pages=5, table_page=1)
+        doc = fitz.open(path)
+        add_rule_less_table(doc[3])
+        doc.saveIncr()
+        doc.close()
+    elif not path.exists():
+        pytest.skip(f"{path.name} not in this checkout")
+
+    with pdf_extractor.PDFExtractionContext(str(path), screen_tables=False) as ctx:
+        expected = ctx.tables()
+    with pdf_extractor.PDFExtractionContext(str(path)) as ctx:
+        assert ctx.extract()["page_count"] == ctx.table_stats["pages_screened"]
+        assert ctx.tables() == expected
+        stats = ctx.table_stats
+        skipped = {idx for idx, candidate in ctx._table_candidates.items() if not candidate}
+
+    assert stats["pages_skipped"] > 0
+    assert not skipped & {table["page"] - 1 for table in expected}
+    if Path(path).name == "generated.pdf":
+        # Text-only pages are skipped; the ruled and the rule-less table are kept
+        assert skipped == {0, 2, 4}
+
+
+def test_process_pdf_reports_skipped_table_pages(sample_pdf):
+    result = pdf_extractor.process_pdf(sample_pdf, None, return_data=True, timeout=0)
+    assert len(result["tables"]) == 1
+    assert result["processing_info"]["table_pages_skipped"] == 5
+
+
+def test_identical_bytes_reuse_stored_result(sample_pdf, tmp_path, monkeypatch, isolated_result_store):
+    content = Path(sample_pdf).read_bytes()
+    assert pdf_result_store.hash_pdf_file(sample_pdf) == hashlib.sha256(content).hexdigest()
+    empty = tmp_path / "empty.pdf"
+    empty.write_bytes(b"")
+    assert pdf_result_store.hash_pdf_file(str(empty)) == hashlib.sha256(b"").hexdigest()
+
+    first = pdf_extractor.process_pdf(sample_pdf, str(tmp_path / "first.json"), return_data=True, timeout=0)
+    assert "reused_result" not in first["processing_info"]
+
+    # Same bytes under another name (e.g. downloaded from a mirror URL)
+    mirror = str(tmp_path / "mirror.pdf")
+    shutil.copyfile(sample_pdf, mirror)
+    assert pdf_result_store.register_pdf_file(mirror) == str(Path(sample_pdf).resolve())
+    monkeypatch.setattr(pdf_extractor.fitz, "open", lambda *a, **k: pytest.fail("PDF opened again"))
+    second = pdf_extractor.process_pdf(mirror, str(tmp_path / "second.json"), return_data=True, timeout=0)
+    assert second["processing_info"]["reused_result"] is True
+    assert second["source_file"] == mirror
+    assert second["chunks"] == first["chunks"]
+    assert second["full_text"] == first["full_text"] and len(second["tables"]) == 1
+    assert (tmp_path / "second.json").exists()
+    monkeypatch.undo()
+
+    # Options that change the output are part of the key
+    third = pdf_extractor.process_pdf(mirror, None, return_data=True, timeout=0, max_chunk_size=1000)
+    assert "reused_result" not in third["processing_info"]
+    stats = isolated_result_store.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+
+
+def test_stored_results_are_keyed_on_extractor_version_and_backends(sample_pdf, monkeypatch,
+                                                                     isolated_result_store):
+    def run():
+        result = pdf_extractor.process_pdf(sample_pdf, None, return_data=True, timeout=0)
+        return result["processing_info"].get("reused_result", False)
+
+    monkeypatch.setattr(pdf_extractor, "tesseract_available", lambda: False)
+    monkeypatch.setattr(pdf_extractor, "java_available", lambda: False)
+    assert (run(), run()) == (False, True)
+
+    # OCR became available: the result stored without it is not reused
+    monkeypatch.setattr(pdf_extractor, "tesseract_available", lambda: True)
+    assert (run(), run()) == (False, True)
+
+    monkeypatch.setattr(pdf_extractor, "USE_TABULA", True)
+    monkeypatch.setattr(pdf_extractor, "java_available", lambda: True)
+    assert run() is False
+
+    monkeypatch.setattr(pdf_extractor, "PDF_RESULT_VERSION", pdf_extractor.PDF_RESULT_VERSION + 1)
+    assert run() is False
+
+
+def make_mixed_pdf(path, scanned_pages=(3, 5), pages=6):
+    """Born-digital pages plus image-only pages standing in for scans."""
+    src = fitz.open(make_pdf(str(path) + ".src.pdf", pages=1))
+    scan_png = src[0].get_pixmap(matrix=fitz.Matrix(0.5, 0.5)).tobytes("png")
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        if p in scanned_pages:
+            # Distinct scans per page
+            zoom = 0.5 + p / 100
+            page.insert_image(page.rect, stream=src[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png"))
+        else:
+            page.insert_text((72, 72), f"Native page {p}. " * 20, fontsize=8)
+            # A small logo must not make a page count as scanned
+            page.insert_image(fitz.Rect(500, 20, 540, 60), stream=scan_png)
+    doc.save(str(path))
+    doc.close()
+    src.close()
+    return str(path)
+
+
+def test_only_scanned_pages_are_ocred_and_merged_in_place(tmp_path, monkeypatch):
+    pytesseract = pytest.importorskip("pytesseract")
+    if not pdf_extractor.USE_OCR:
+        pytest.skip("OCR libraries not available")
+    path = make_mixed_pdf(tmp_path / "mixed.pdf")
+
+    ocr_calls = []
+
+    def fake_image_to_data(image, lang=None, config=None, output_type=None):
+        ocr_calls.append(image.size)
+        n = len(ocr_calls)
+        return {"page_num": [1, 1], "block_num": [1, 1], "par_num": [1, 1], "line_num": [1, 1],
+                "conf": [90, 80], "text": ["OCR", f"text{n}"]}
+
+    monkeypatch.setattr(pdf_extractor.pytesseract, "image_to_data", fake_image_to_data)
+    ocr_cache = pytest.importorskip("ocr_cache")
+    ocr_cache.configure_ocr_cache(db_path=str(tmp_path / "ocr_cache.db"))
+    result = pdf_extractor.process_pdf(path, None, return_data=True, timeout=0, extract_tables=False)
+
+    assert len(ocr_calls) == 2
+    assert [p["page"] for p in result["processing_info"]["ocr_pages"]] == [4, 6]
+    assert all(p["ocr_time"] >= 0 for p in result["processing_info"]["ocr_pages"])
+    # OCR text sits between the native pages, in page order
+    text = result["full_text"]
+    assert text.index("Native page 2") < text.index("OCR text1") < text.index("Native page 4") \
+        < text.index("OCR text2")
+
+    # A re-run is answered by the OCR cache
+    extracted = pdf_extractor.extract_text_from_pdf(path)
+    report = pdf_extractor.ocr_scanned_pages(path, extracted)
+    ocr_cache.configure_ocr_cache(db_path=ocr_cache.DEFAULT_OCR_CACHE_PATH)
+    assert len(ocr_calls) == 2
+    assert [(p["page"], p["cached"]) for p in report] == [(4, True), (6, True)]
+    pages = extracted["structure"]["pages"]
+    assert [p["is_scanned"] for p in pages] == [False, False, False, True, False, True]
+    assert pages[3]["text"] == extracted["text_content"][3] == "OCR text1"
+
+
+if __name__ == "__main__":
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_pdf(Path(tmp) / "sample.pdf")
+        test_context_reuses_page_walk_for_tables(path)
+        print("✅ test_context_reuses_page_walk_for_tables")
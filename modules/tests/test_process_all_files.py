@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+End-to-end tests for Structify process_all_files.
+
+Everything goes through the production import (``from Structify import claude``)
+so process pools have to pickle the module's functions exactly as they do in
+the app.
+"""
+
+import sys
+import json
+import time
+import random
+import threading
+from pathlib import Path
+
+# Add modules directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+from Structify import claude
+
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit",
+         "sed", "do", "eiusmod", "tempor", "incididunt", "labore", "magna", "aliqua"]
+
+
+def make_text(size, seed=7):
+    """Roughly size characters of prose with paragraph breaks."""
+    rng = random.Random(seed)
+    parts, total = [], 0
+    while total < size:
+        para = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))) + ".\n\n"
+        parts.append(para)
+        total += len(para)
+    return "".join(parts)[:size]
+
+
+def make_tree(root, count=6, size=3000):
+    """Create a small library of text files under root/src."""
+    src = root / "src"
+    (src / "lib").mkdir(parents=True)
+    for i in range(count):
+        sub = src / "lib" if i % 2 else src
+        (sub / f"file{i}.txt").write_text(make_text(size, seed=i), encoding="utf-8")
+    return src
+
+
+def run(src, out, **kwargs):
+    kwargs.setdefault("executor_type", "none")
+    kwargs.setdefault("max_chunk_size", 1000)
+    kwargs.setdefault("overlap", 100)
+    return claude.process_all_files(str(src), str(out), **kwargs)
+
+
+def docs_by_file(result):
+    """Map file path -> list of (section_name, content) across all libraries."""
+    docs = {}
+    for entry in result["data"].values():
+        for d in entry["docs_data"]:
+            docs.setdefault(d["metadata"]["file_path"], []).append((d["section_name"], d["content"]))
+    return docs
+
+
+def test_package_import_registers_module():
+    assert claude.__name__ == "Structify.claude"
+    assert sys.modules["Structify.claude"] is claude
+    assert claude.process_file_in_worker.__module__ == "Structify.claude"
+
+
+def test_process_executor_matches_sequential(tmp_path):
+    src = make_tree(tmp_path)
+    sequential = run(src, tmp_path / "seq.json")
+    parallel = run(src, tmp_path / "proc.json", executor_type="process", max_workers=2)
+
+    assert parallel["status"] == "completed"
+    assert parallel["stats"]["processed_files"] == 6
+    assert parallel["stats"]["error_files"] == 0
+    assert parallel["stats"]["total_chunks"] == sequential["stats"]["total_chunks"]
+    assert docs_by_file(parallel) == docs_by_file(sequential)
+    with open(tmp_path / "proc.json", encoding="utf-8") as f:
+        written = json.load(f)
+    assert sum(len(e["docs_data"]) for e in written.values()) == 6
+
+
+def test_incremental_reuses_unchanged_files(tmp_path):
+    src = make_tree(tmp_path)
+    first = run(src, tmp_path / "out.json", incremental=True)
+    second = run(src, tmp_path / "out.json", incremental=True)
+
+    assert second["stats"]["reused_files"] == 6
+    assert second["stats"]["processed_files"] == 0
+    # Reused files count their chunks, not their documents
+    assert second["stats"]["total_chunks"] == first["stats"]["total_chunks"] > 6
+    assert docs_by_file(second) == docs_by_file(first)
+
+
+def test_incremental_reprocesses_changed_content(tmp_path):
+    src = make_tree(tmp_path)
+    run(src, tmp_path / "out.json", incremental=True)
+    changed = src / "file0.txt"
+    changed.write_text(make_text(3000, seed=99), encoding="utf-8")
+
+    second = run(src, tmp_path / "out.json", incremental=True)
+    assert second["stats"]["reused_files"] == 5
+    assert second["stats"]["processed_files"] == 1
+    assert docs_by_file(second)[str(changed)][0][1] == changed.read_text(encoding="utf-8")
+
+
+def test_incremental_reprocesses_on_config_change(tmp_path):
+    src = make_tree(tmp_path)
+    run(src, tmp_path / "out.json", incremental=True)
+
+    for options in [{"max_chunk_size": 500}, {"overlap": 50}, {"stop_words": {"lorem"}},
+                    {"max_chunk_tokens": 200}, {"max_chunk_tokens": 200, "overlap_tokens": 20}]:
+        result = run(src, tmp_path / "out.json", incremental=True, **options)
+        assert result["stats"]["reused_files"] == 0, options
+        assert result["stats"]["processed_files"] == 6, options
+
+
+def test_manifest_fingerprints_the_bytes_that_were_processed(tmp_path, monkeypatch):
+    src = make_tree(tmp_path)
+    changed = src / "file0.txt"
+    original = changed.read_text(encoding="utf-8")
+    real_safe_process = claude.safe_process
+
+    def edited_while_processing(path, *args, **kwargs):
+        out = real_safe_process(path, *args, **kwargs)
+        if path == changed:
+            changed.write_text(make_text(4000, seed=99), encoding="utf-8")
+        return out
+
+    def no_second_read(file_path, *args, **kwargs):
+        raise AssertionError(f"{file_path} read again to record it")
+
+    monkeypatch.setattr(claude, "safe_process", edited_while_processing)
+    monkeypatch.setattr(claude, "hash_file_contents", no_second_read)
+    first = run(src, tmp_path / "out.json", incremental=True)
+    assert docs_by_file(first)[str(changed)][0][1] == original
+    monkeypatch.undo()
+
+    # The row describes the content that was chunked, so the edit is picked up
+    second = run(src, tmp_path / "out.json", incremental=True)
+    assert second["stats"]["reused_files"] == 5
+    assert second["stats"]["processed_files"] == 1
+    assert docs_by_file(second)[str(changed)][0][1] == changed.read_text(encoding="utf-8")
+
+
+def test_streamed_jsonl_matches_buffered_json(tmp_path):
+    src = make_tree(tmp_path)
+    (src / "pkg").mkdir()
+    (src / "pkg" / "module.py").write_text("def f():\n    return 1\n" * 200, encoding="utf-8")
+
+    buffered = run(src, tmp_path / "all.json")
+    streamed = run(src, tmp_path / "all.jsonl", stream_output=True)
+    assert streamed["output_format"] == "jsonl"
+
+    with open(tmp_path / "all.json", encoding="utf-8") as f:
+        expected = json.load(f)
+    actual = {}
+    for doc in claude.iter_jsonl_documents(str(tmp_path / "all.jsonl")):
+        actual.setdefault(doc.pop("library"), []).append(doc)
+
+    assert sorted(actual) == sorted(expected)
+    for lib, entry in expected.items():
+        key = lambda d: (d["file_path"], d["chunk_index"])
+        assert sorted(actual[lib], key=key) == sorted(entry["docs_data"], key=key)
+
+    with open(streamed["metadata_file"], encoding="utf-8") as f:
+        sidecar = json.load(f)
+    assert sidecar["document_count"] == sum(len(e["docs_data"]) for e in expected.values())
+    assert sorted(sidecar["libraries"]) == sorted(expected)
+    for lib, entry in expected.items():
+        assert sidecar["libraries"][lib]["document_count"] == len(entry["docs_data"])
+        assert sidecar["libraries"][lib]["library_name"] == entry["metadata"]["library_name"]
+    assert sidecar["stats"]["processed_files"] == buffered["stats"]["processed_files"] == 7
+    # Streaming keeps no documents in memory
+    assert all(not e["docs_data"] for e in streamed["data"].values())
+
+
+def test_pipeline_bounds_files_in_flight(tmp_path, monkeypatch):
+    src = make_tree(tmp_path, count=40, size=200)
+    lock = threading.Lock()
+    counts = {"submitted": 0, "finished": 0, "peak": 0}
+
+    class CountingExecutor(claude.ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            with lock:
+                counts["submitted"] += 1
+                counts["peak"] = max(counts["peak"], counts["submitted"] - counts["finished"])
+            return super().submit(fn, *args, **kwargs)
+
+    real_safe_process = claude.safe_process
+
+    def slow_safe_process(*args, **kwargs):
+        time.sleep(0.01)
+        try:
+            return real_safe_process(*args, **kwargs)
+        finally:
+            with lock:
+                counts["finished"] += 1
+
+    monkeypatch.setattr(claude, "ThreadPoolExecutor", CountingExecutor)
+    monkeypatch.setattr(claude, "safe_process", slow_safe_process)
+    result = run(src, tmp_path / "out.json", executor_type="thread", max_workers=2)
+
+    assert result["stats"]["processed_files"] == 40
+    assert counts["submitted"] == 40
+    window = 2 * claude.PIPELINE_QUEUE_FACTOR
+    assert 2 <= counts["peak"] <= window
+
+
+def test_pipeline_records_worker_errors_and_continues(tmp_path, monkeypatch):
+    src = make_tree(tmp_path, count=10, size=500)
+    real_safe_process = claude.safe_process
+
+    def failing_safe_process(path, *args, **kwargs):
+        if path.name == "file3.txt":
+            raise RuntimeError("worker exploded")
+        return real_safe_process(path, *args, **kwargs)
+
+    monkeypatch.setattr(claude, "safe_process", failing_safe_process)
+    result = run(src, tmp_path / "out.json", executor_type="thread", max_workers=2,
+                 include_failed_files=True)
+
+    assert result["status"] == "completed"
+    assert result["stats"]["processed_files"] == 9
+    failures = result["processing_failures"]
+    assert [f["file_path"] for f in failures] == [str(src / "lib" / "file3.txt")]
+    assert "worker exploded" in failures[0]["reason"]
+    assert str(src / "lib" / "file3.txt") not in docs_by_file(result)
+
+
+def reference_discover(root, valid_extensions, ignore_dirs, max_file_size, file_filter=None):
+    """The rglob-based discovery that discover_files replaced, kept as the oracle."""
+    found, skipped = [], []
+    for p in Path(root).rglob("*"):
+        if any(ig in p.parts for ig in ignore_dirs):
+            continue
+        if p.is_file() and any(p.suffix.lower() == ext.lower() for ext in valid_extensions):
+            if file_filter and not file_filter(str(p)):
+                continue
+            size = p.stat().st_size
+            if size > max_file_size and not p.suffix.lower() == ".pdf":
+                skipped.append(str(p))
+                continue
+            found.append(str(p))
+    return sorted(found), sorted(skipped)
+
+
+def make_discovery_tree(root):
+    src = root / "src"
+    files = {
+        "a.txt": "x", "B.TXT": "x", "c.md": "x", "ignored.bin": "x",
+        ".hidden.txt": "x", ".hiddendir/inner.txt": "x",
+        "deep/er/still/file.py": "x", "node_modules/pkg/index.js": "x",
+        "deep/.git/config.txt": "x", "deep/build/out.txt": "x", "rebuild/keep.txt": "x",
+        "big.txt": "x" * 5000, "big.pdf": "x" * 5000, "noext": "x",
+    }
+    for rel, content in files.items():
+        path = src / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    outside = root / "outside"
+    outside.mkdir()
+    (outside / "linked.txt").write_text("x", encoding="utf-8")
+    (src / "link_to_file.txt").symlink_to(outside / "linked.txt")
+    (src / "link_to_dir").symlink_to(outside, target_is_directory=True)
+    (src / "dangling.txt").symlink_to(root / "missing.txt")
+    return src
+
+
+def test_discovery_matches_rglob_filtering(tmp_path):
+    src = make_discovery_tree(tmp_path)
+    extensions = [".txt", ".md", ".py", ".js", ".pdf"]
+    ignore = ["node_modules", ".git", "build"]
+
+    for file_filter in [None, lambda p: "deep" not in p]:
+        skipped = []
+        found = sorted(str(p) for p, _ in claude.discover_files(
+            str(src), extensions, ignore, 1000, file_filter, skipped
+        ))
+        expected, expected_skipped = reference_discover(src, extensions, ignore, 1000, file_filter)
+        assert found == expected
+        assert sorted(s["file_path"] for s in skipped if s["reason"] == "file_too_large") == expected_skipped
+
+    # Hidden files and directories are included, symlinked files are followed,
+    # symlinked directories are not descended into
+    assert str(src / ".hiddendir" / "inner.txt") in found
+    assert str(src / "link_to_file.txt") in found
+    assert not any("link_to_dir" in p for p in found)
+
+
+def test_discovery_yields_stat_results(tmp_path):
+    src = make_discovery_tree(tmp_path)
+    for path, st in claude.discover_files(str(src), [".txt"], [], 10_000):
+        assert st.st_size == path.stat().st_size
+
+
+def test_iter_in_background_yields_all_items_then_reraises():
+    def produce():
+        yield from range(50)
+        raise OSError("walk failed")
+
+    seen = []
+    try:
+        for item in claude.iter_in_background(produce(), max_queued=4):
+            seen.append(item)
+    except OSError as e:
+        assert str(e) == "walk failed"
+    else:
+        raise AssertionError("producer error was swallowed")
+    assert seen == list(range(50))
+
+
+def test_stream_discovery_matches_eager_discovery(tmp_path):
+    src = make_tree(tmp_path, count=12)
+    eager = run(src, tmp_path / "eager.json", executor_type="thread", max_workers=2)
+    streamed = run(src, tmp_path / "streamed.json", executor_type="thread", max_workers=2,
+                   stream_discovery=True)
+    assert streamed["stats"]["total_files"] == eager["stats"]["total_files"] == 12
+    assert docs_by_file(streamed) == docs_by_file(eager)
+
+
+def test_token_chunking_emits_one_document_per_chunk(tmp_path):
+    src = make_tree(tmp_path, size=15_000)
+    result = run(src, tmp_path / "out.json", max_chunk_tokens=200, overlap_tokens=20)
+    counter = claude.get_token_counter(None)
+
+    with open(tmp_path / "out.json", encoding="utf-8") as f:
+        written = json.load(f)
+    docs = [d for entry in written.values() for d in entry["docs_data"]]
+    assert len(docs) == result["stats"]["total_chunks"]
+
+    by_file = {}
+    for d in docs:
+        by_file.setdefault(d["file_path"], []).append(d)
+    assert len(by_file) == 6
+    for file_path, file_docs in by_file.items():
+        file_docs.sort(key=lambda d: d["chunk_index"])
+        text = Path(file_path).read_text(encoding="utf-8")
+        assert len(file_docs) > 10
+        assert [d["chunk_index"] for d in file_docs] == list(range(len(file_docs)))
+        assert all(d["total_chunks"] == len(file_docs) and d["is_chunked"] for d in file_docs)
+        assert all(counter.count(d["content"]) <= 200 for d in file_docs)
+        assert all(d["metadata"]["chunking"]["max_tokens"] == 200 for d in file_docs)
+        # Chunks appear in order and together cover the whole file
+        position = 0
+        for d in file_docs:
+            found = text.find(d["content"], max(0, position - len(d["content"])))
+            assert found >= 0
+            assert not text[position:found].strip()
+            position = max(position, found + len(d["content"]))
+        assert not text[position:].strip()
+
+
+def test_large_text_files_stream_documents_to_the_writer(tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    big = src / "big.txt"
+    big.write_text(make_text(120_000, seed=3), encoding="utf-8")
+    # Treat anything over 10 KB as large and read it in 4 KB blocks
+    monkeypatch.setattr(claude, "STREAM_READ_THRESHOLD", 10_000)
+    monkeypatch.setattr(claude, "STREAM_BUFFER_SIZE", 4096)
+    monkeypatch.setattr(claude, "STREAM_DOC_BATCH", 16)
+
+    batches = []
+    lib, docs = claude.process_large_text_file(
+        big, "big.txt", claude.FileStats(), 1000, 100, doc_sink=lambda lib, docs: batches.append(len(docs))
+    )
+    assert docs == [] and len(batches) > 3 and max(batches) == 16
+
+    expected = list(claude.iter_text_chunks(big.read_text(encoding="utf-8"), 1000, 100))
+    for executor_type in ["thread", "process"]:
+        out = tmp_path / f"{executor_type}.jsonl"
+        result = run(src, out, executor_type=executor_type, max_workers=2, stream_output=True)
+        assert result["stats"]["total_chunks"] == len(expected)
+        streamed = sorted(claude.iter_jsonl_documents(str(out)), key=lambda d: d["chunk_index"])
+        assert [d["content"] for d in streamed] == expected
+        assert [d["chunk_index"] for d in streamed] == list(range(len(expected)))
+        # Process workers spool to the output directory; nothing is left behind
+        assert not list(tmp_path.glob("tmp*.jsonl"))
+
+
+def test_text_files_above_max_file_size_are_streamed(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    line = b"2024-05-01 12:00:00 INFO request handled in 12 ms path=/api/items\n"
+    log = src / "app.log"
+    lines = claude.MAX_FILE_SIZE // len(line) + 1000
+    with open(log, "wb") as f:
+        f.write(line * lines)
+    # Sparse, so all NUL bytes: binary, and still too large
+    with open(src / "core.log", "wb") as f:
+        f.truncate(claude.MAX_FILE_SIZE + 1)
+    assert log.stat().st_size > claude.MAX_FILE_SIZE > claude.STREAM_READ_THRESHOLD
+
+    out = tmp_path / "out.jsonl"
+    result = run(src, out, valid_extensions=[".log"], max_chunk_size=1_000_000, overlap=0, stream_output=True)
+    streamed = list(claude.iter_jsonl_documents(str(out)))
+    assert {d["metadata"]["file_name"] for d in streamed} == {"app.log"}
+    assert result["stats"]["total_chunks"] == len(streamed) > 100
+    # Chunks end on line breaks, so every record arrives whole
+    assert sum(d["content"].count("path=/api/items") for d in streamed) == lines
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared robots.txt cache (robots_cache.py) against a local server.
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+# Add modules directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+import robots_cache
+
+ROBOTS_TXT = "User-agent: *\nDisallow: /private/\n"
+
+
+@pytest.fixture
+def robots_server():
+    """Serves ROBOTS_TXT slowly on one port and 403 on /robots.txt of a second one."""
+    fetches = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            fetches.append((self.server.server_address[1], self.path))
+            time.sleep(0.2)
+            if self.server.forbidden:
+                self.send_response(403)
+                self.end_headers()
+                return
+            body = ROBOTS_TXT.encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    servers = []
+    for forbidden in (False, True):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.forbidden = forbidden
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield [f"http://127.0.0.1:{server.server_address[1]}" for server in servers], fetches
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_concurrent_lookups_share_one_fetch(robots_server):
+    (open_site, forbidden_site), fetches = robots_server
+    cache = robots_cache.RobotsCache(db_path=None)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(
+        cache.can_fetch(f"{open_site}/private/{i}" if i % 2 else f"{open_site}/docs/{i}")))
+        for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False] * 4 + [True] * 4
+    assert len(fetches) == 1
+    assert cache.stats()["fetches"] == 1
+    assert not cache.can_fetch(f"{forbidden_site}/anything")
+
+
+def test_rules_expire_and_persist(robots_server, tmp_path):
+    (open_site, _), fetches = robots_server
+    db_path = str(tmp_path / "robots.db")
+    cache = robots_cache.RobotsCache(ttl=0.5, db_path=db_path)
+    assert cache.can_fetch(f"{open_site}/docs")
+    assert cache.can_fetch(f"{open_site}/docs/2")
+    assert len(fetches) == 1
+    cache.close()
+
+    # A new process (or task) reads the stored rules instead of fetching
+    reopened = robots_cache.RobotsCache(ttl=0.5, db_path=db_path)
+    assert not reopened.can_fetch(f"{open_site}/private/x")
+    assert len(fetches) == 1
+    time.sleep(0.6)
+    assert reopened.can_fetch(f"{open_site}/docs")
+    assert len(fetches) == 2
+    reopened.close()
+
+
+def test_unreachable_host_is_allowed_and_retried_later():
+    cache = robots_cache.RobotsCache(timeout=1, error_ttl=0, db_path=None)
+    assert cache.can_fetch("http://127.0.0.1:9/page")
+    assert cache.can_fetch("http://127.0.0.1:9/page")
+    assert cache.stats()["fetches"] == 2
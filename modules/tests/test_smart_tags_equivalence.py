@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Equivalence tests for the compiled tag generator in Structify/claude.py
+
+The reference implementation below is the per-keyword / multi-pass version of
+generate_smart_tags that the compiled engine replaced. Every sample must
+produce exactly the same tags with both.
+"""
+
+import os
+import re
+import sys
+import random
+from collections import Counter
+from pathlib import Path
+
+# Add modules directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+from Structify import claude
+
+
+def reference_generate_smart_tags(section_name, content, stop_words_hash, file_path,
+                                  doc_type="general", language="en"):
+    """Original generate_smart_tags implementation, kept as the oracle."""
+    ext = Path(file_path).suffix.lower()
+    base_tags = [section_name.lower()]
+    if ext:
+        base_tags.append(ext[1:])
+    if ext == ".pdf" and doc_type != "general":
+        base_tags.append(f"type:{doc_type}")
+    if language != "en":
+        base_tags.append(f"lang:{language}")
+
+    file_specific_kw = claude.FILE_TYPE_KEYWORDS.get(ext, claude.DEFAULT_KEYWORDS)
+
+    if len(content) > 50_000:
+        chunk = content[:15_000] + content[len(content)//2 - 7_500 : len(content)//2 + 7_500] + content[-15_000:]
+    else:
+        chunk = content
+    lowered = chunk.lower()
+
+    found_kws = {kw for kw in file_specific_kw if f" {kw} " in f" {lowered} " or f"\n{kw} " in f"\n{lowered} "}
+
+    tokens = claude.WORD_PATTERN.findall(lowered)
+    freq = Counter(tokens)
+    all_stop = claude.PROGRAMMING_STOP_WORDS.copy()
+
+    freq_tags = set()
+    for w, c in freq.most_common(30):
+        if len(w) > 2 and c > 1 and not w.isdigit() and w not in found_kws and w not in all_stop:
+            freq_tags.add(w)
+            if len(freq_tags) >= 15:
+                break
+
+    if ext == ".pdf":
+        citations = re.findall(r'\(\w+\s+et\s+al\.,?\s+\d{4}\)|\[\d+\]', lowered)
+        if len(citations) > 3:
+            found_kws.add("citations")
+        math_patterns = re.findall(r'[\$\\\[\]\(\)\{\}]+|\b[a-z]_[a-z0-9]|\b\d+\.\d+e[+-]\d+', lowered)
+        if len(math_patterns) > 10:
+            found_kws.add("mathematics")
+        algo_patterns = re.findall(r'\balgorithm\b|\bprocedure\b|\bfunction\b|\binput\b|\boutput\b|\breturn\b', lowered)
+        if len(algo_patterns) > 5:
+            found_kws.add("algorithm")
+        code_patterns = re.findall(r'```|def\s+\w+\(|class\s+\w+[\(:]|\bfunction\s+\w+\(', lowered)
+        if len(code_patterns) > 3:
+            found_kws.add("code")
+        research_patterns = ['methodology', 'hypothesis', 'experiment', 'statistical', 'significance', 'p-value']
+        if sum(1 for term in research_patterns if term in lowered) >= 3:
+            found_kws.add("research")
+
+    combined = set(base_tags) | found_kws | freq_tags
+    return tuple(sorted(combined))
+
+
+VOCABULARY = sorted(
+    set().union(*claude.FILE_TYPE_KEYWORDS.values()) | claude.DEFAULT_KEYWORDS |
+    claude.PROGRAMMING_STOP_WORDS |
+    {"Guide", "API", "data,", "test.", "(smith et al., 2020)", "[12]", "$x$", "a_1", "1.5e-3",
+     "def run(", "class Foo:", "```", "function go(", "methodology", "hypothesis", "p-value",
+     "experiment", "statistical", "significance", "42", "7", "x", "lorem", "ipsum", "tokenizer"}
+)
+SEPARATORS = [" ", " ", " ", "\n", "\t", ", ", ". ", "  "]
+FILE_PATHS = ["a/readme.md", "src/app.py", "web/index.html", "lib/x.js", "lib/y.ts",
+              "papers/p.pdf", "data/notes.txt", "conf/.gitignore", "noext"]
+
+
+def random_text(rng, words):
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choice(VOCABULARY))
+        parts.append(rng.choice(SEPARATORS))
+    return "".join(parts)
+
+
+def test_matches_reference_on_random_corpus():
+    rng = random.Random(1234)
+    for i in range(400):
+        text = random_text(rng, rng.choice([0, 1, 5, 50, 400, 3000]))
+        if rng.random() < 0.2:
+            text = text.strip()
+        file_path = rng.choice(FILE_PATHS)
+        doc_type = rng.choice(["general", "academic_paper", "report"])
+        language = rng.choice(["en", "en", "de"])
+        args = (f"Section {i}", text, "hash", file_path, doc_type, language)
+        assert claude.generate_smart_tags(*args) == reference_generate_smart_tags(*args), args[3:]
+
+
+def test_matches_reference_on_large_sampled_content():
+    rng = random.Random(99)
+    text = random_text(rng, 40000)
+    assert len(text) > 50_000
+    for file_path in FILE_PATHS:
+        args = ("Big", text, "hash", file_path, "academic_paper", "en")
+        assert claude.generate_smart_tags(*args) == reference_generate_smart_tags(*args)
+
+
+def test_matches_reference_on_repository_sources():
+    modules_dir = Path(__file__).parent.parent
+    for name in ["Structify/claude.py", "pdf_extractor.py", "README.md", "requirements.txt"]:
+        path = modules_dir / name
+        if not path.exists():
+            continue
+        text = path.read_text(encoding="utf-8", errors="replace")[:200_000]
+        for fake_path in [str(path), "doc.pdf", "doc.md"]:
+            args = (path.stem, text, "hash", fake_path, "academic_paper", "en")
+            assert claude.generate_smart_tags(*args) == reference_generate_smart_tags(*args)
+
+
+def test_keyword_boundaries():
+    tags = claude.generate_smart_tags("s", "guide\nexample api,test setup", "h", "x.md")
+    assert "guide" not in tags  # followed by newline, not a space
+    assert "example" in tags
+    assert "api" not in tags  # followed by a comma
+    assert "setup" in tags
+
+
+def test_tag_cache_hits_return_identical_tags():
+    import tempfile
+    cache = claude.configure_tag_cache(max_entries=4)
+    cache.clear()
+    text = "install setup example guide usage usage tokenizer tokenizer"
+    first = claude.generate_smart_tags("A", text, "h", "a.md")
+    hits, misses = cache.counters()
+    # Different section and path, same content and extension: served from cache
+    second = claude.generate_smart_tags("B", text, "h", "b.md")
+    assert cache.counters() == (hits + 1, misses)
+    assert second == reference_generate_smart_tags("B", text, "h", "b.md")
+    assert first == reference_generate_smart_tags("A", text, "h", "a.md")
+
+    # Disk backing survives a fresh in-memory cache
+    with tempfile.TemporaryDirectory() as tmp:
+        disk = claude.TagCache(max_entries=4)
+        disk.attach_disk(os.path.join(tmp, "tags.db"))
+        disk.put(("k",), ("x", "y"))
+        disk.flush()
+        reopened = claude.TagCache(max_entries=4)
+        reopened.attach_disk(os.path.join(tmp, "tags.db"))
+        assert reopened.get(("k",)) == ("x", "y")
+        disk.close()
+        reopened.close()
+    claude.configure_tag_cache(max_entries=claude.TAG_CACHE_SIZE)
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent tabula worker in pdf_extractor.py
+
+Java is not needed: the worker process runs a fake body that speaks the same
+queue protocol, and the JVM startup is checked against a fake jpype.
+"""
+
+import sys
+import time
+import queue
+import types
+from pathlib import Path
+
+import pytest
+
+# Add modules directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.absolute()))
+
+import pdf_extractor
+
+
+def fake_worker_main(requests, responses):
+    """Worker body that answers requests without a JVM (runs in the spawned process)."""
+    responses.put((None, None, None))
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, file_path, pages = request
+        if file_path.endswith("broken.pdf"):
+            responses.put((request_id, None, "RuntimeError: cannot parse"))
+        else:
+            responses.put((request_id, [{"columns": ["file", "pages"],
+                                         "data": [{"file": Path(file_path).name, "pages": pages}]}], None))
+
+
+def hanging_worker_main(requests, responses):
+    """Like fake_worker_main, but never answers for hang.pdf."""
+    responses.put((None, None, None))
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, file_path, pages = request
+        if file_path.endswith("hang.pdf"):
+            time.sleep(3600)
+        responses.put((request_id, [{"columns": ["file"], "data": [{"file": Path(file_path).name}]}], None))
+
+
+def failing_worker_main(requests, responses):
+    responses.put((None, None, "ImportError: No module named 'jpype'"))
+
+
+def test_worker_round_trip():
+    worker = pdf_extractor.TabulaWorker(worker_main=fake_worker_main)
+    try:
+        tables = worker.read_pdf("docs/a.pdf", "1-2")
+        assert tables == [{"columns": ["file", "pages"], "data": [{"file": "a.pdf", "pages": "1-2"}]}]
+        # Requests are matched to their own responses
+        assert worker.read_pdf("b.pdf")[0]["data"] == [{"file": "b.pdf", "pages": "all"}]
+        with pytest.raises(RuntimeError, match="cannot parse"):
+            worker.read_pdf("broken.pdf")
+        assert worker.alive
+    finally:
+        worker.close()
+    assert not worker.alive
+
+
+def test_worker_reports_startup_failure():
+    with pytest.raises(RuntimeError, match="jpype"):
+        pdf_extractor.TabulaWorker(worker_main=failing_worker_main)
+
+
+def test_jvm_starts_with_tabula_jar_on_classpath(monkeypatch):
+    calls = []
+    jpype = types.ModuleType("jpype")
+    jpype.isJVMStarted = lambda: any(c[0] == "startJVM" for c in calls)
+    jpype.addClassPath = lambda path: calls.append(("addClassPath", path))
+    jpype.startJVM = lambda *args, **kwargs: calls.append(("startJVM", args, kwargs))
+    jpype.imports = types.ModuleType("jpype.imports")
+    technology = types.ModuleType("technology")
+    technology.tabula = types.ModuleType("technology.tabula")
+    for name, module in [("jpype", jpype), ("jpype.imports", jpype.imports),
+                         ("technology", technology), ("technology.tabula", technology.tabula)]:
+        monkeypatch.setitem(sys.modules, name, module)
+    backend = types.ModuleType("tabula.backend")
+    backend.jar_path = lambda: "/opt/tabula.jar"
+    monkeypatch.setitem(sys.modules, "tabula.backend", backend)
+    monkeypatch.setattr(pdf_extractor, "tabula", types.SimpleNamespace())
+    monkeypatch.setattr(pdf_extractor, "_tabula_read_pdf", lambda path, pages: [])
+
+    requests, responses = queue.Queue(), queue.Queue()
+    requests.put((1, "a.pdf", "all"))
+    requests.put(None)
+    pdf_extractor._tabula_worker_main(requests, responses)
+
+    assert [c[0] for c in calls] == ["addClassPath", "startJVM"]
+    assert calls[0][1] == "/opt/tabula.jar"
+    assert responses.get_nowait() == (None, None, None)
+    assert responses.get_nowait() == (1, [], None)
+
+
+def test_missing_tabula_classes_fail_startup(monkeypatch):
+    jpype = types.ModuleType("jpype")
+    jpype.isJVMStarted = lambda: True
+    jpype.imports = types.ModuleType("jpype.imports")
+    monkeypatch.setitem(sys.modules, "jpype", jpype)
+    monkeypatch.setitem(sys.modules, "jpype.imports", jpype.imports)
+    monkeypatch.setitem(sys.modules, "technology", None)
+    monkeypatch.setattr(pdf_extractor, "tabula", types.SimpleNamespace())
+
+    responses = queue.Queue()
+    pdf_extractor._tabula_worker_main(queue.Queue(), responses)
+    request_id, tables, error = responses.get_nowait()
+    assert request_id is None and "technology" in error
+
+
+def test_without_java_tables_are_skipped_without_a_worker(monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "USE_TABULA", True)
+    monkeypatch.setattr(pdf_extractor, "java_available", lambda: False)
+    monkeypatch.setattr(pdf_extractor, "TabulaWorker", lambda *a, **k: pytest.fail("worker started"))
+    monkeypatch.setattr(pdf_extractor, "_tabula_read_pdf", lambda *a: pytest.fail("tabula called"))
+    monkeypatch.setitem(pdf_extractor._tabula_worker, "worker", None)
+    monkeypatch.setitem(pdf_extractor._tabula_worker, "failed", False)
+
+    assert pdf_extractor.get_tabula_worker() is None
+    assert pdf_extractor.read_tables_with_tabula("a.pdf") == []
+
+
+def test_worker_startup_failure_falls_back_to_per_call_tabula(monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "USE_TABULA", True)
+    monkeypatch.setattr(pdf_extractor, "java_available", lambda: True)
+    monkeypatch.setitem(sys.modules, "jpype", types.ModuleType("jpype"))
+    real_worker = pdf_extractor.TabulaWorker
+    started = []
+    monkeypatch.setattr(pdf_extractor, "TabulaWorker",
+                        lambda *a, **k: started.append(1) or real_worker(worker_main=failing_worker_main))
+    frames = [types.SimpleNamespace(columns=["x"], fillna=lambda value: types.SimpleNamespace(
+        to_dict=lambda orient: [{"x": 1}]))]
+    monkeypatch.setattr(pdf_extractor, "_tabula_read_pdf", lambda path, pages: frames)
+    monkeypatch.setitem(pdf_extractor._tabula_worker, "worker", None)
+    monkeypatch.setitem(pdf_extractor._tabula_worker, "failed", False)
+
+    assert pdf_extractor.read_tables_with_tabula("a.pdf") == [{"columns": ["x"], "data": [{"x": 1}]}]
+    assert pdf_extractor._tabula_worker["failed"] and started == [1]
+    # A failed worker is not restarted for every call
+    assert pdf_extractor.read_tables_with_tabula("a.pdf") and started == [1]
+
+
+def test_timed_out_worker_is_replaced(monkeypatch):
+    monkeypatch.setattr(pdf_extractor, "USE_TABULA", True)
+    monkeypatch.setattr(pdf_extractor, "java_available", lambda: True)
+    monkeypatch.setattr(pdf_extractor, "TABULA_REQUEST_TIMEOUT", 1)
+    monkeypatch.setitem(sys.modules, "jpype", types.ModuleType("jpype"))
+    real_worker = pdf_extractor.TabulaWorker
+    workers = []
+    monkeypatch.setattr(pdf_extractor, "TabulaWorker",
+                        lambda *a, **k: workers.append(real_worker(worker_main=hanging_worker_main)) or workers[-1])
+    monkeypatch.setattr(pdf_extractor, "_tabula_read_pdf", lambda *a: pytest.fail("tabula called"))
+    monkeypatch.setitem(pdf_extractor._tabula_worker, "worker", None)
+    monkeypatch.setitem(pdf_extractor._tabula_worker, "failed", False)
+
+    try:
+        assert pdf_extractor.read_tables_with_tabula("hang.pdf") == []
+        assert len(workers) == 1 and not workers[0].alive
+        assert pdf_extractor._tabula_worker["worker"] is None
+        # Later requests are not stuck behind the hung one
+        assert pdf_extractor.read_tables_with_tabula("a.pdf") == [{"columns": ["file"], "data": [{"file": "a.pdf"}]}]
+        assert len(workers) == 2 and workers[1].alive
+    finally:
+        for worker in workers:
+            worker.close()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Tests and benchmark for the WebCrawler host scheduler and crawl engines.
+
+Several local HTTP servers on different ports stand in for separate hosts.
+Each host serves a small tree of linked pages, and every page links to the
+other hosts, so a crawl interleaves requests across hosts.
+
+    python tests/test_web_crawler.py --hosts 8 --pages 10 --delay 0.2
+    python tests/test_web_crawler.py --hosts 4 --pages 500 --delay 0 --engine async
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import importlib.util
+from collections import defaultdict
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+
+MODULES_DIR = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(MODULES_DIR))
+
+
+def load_web_crawler():
+    # web_crawler has no package-relative imports; loading it by path avoids
+    # importing every blueprint (and Flask) through blueprints/__init__.py
+    spec = importlib.util.spec_from_file_location(
+        "web_crawler", MODULES_DIR / "blueprints" / "features" / "web_crawler.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+web_crawler = load_web_crawler()
+
+
+class SiteFarm:
+    """Local multi-host stand-in: one HTTP server per host, with request times recorded per host."""
+
+    def __init__(self, hosts=4, pages=6, latency=0.02):
+        self.pages = pages
+        self.latency = latency
+        self.requests = defaultdict(list)
+        self.paths = []
+        self.active = defaultdict(int)
+        self.max_active = defaultdict(int)
+        self.lock = threading.Lock()
+        self.servers = []
+        farm = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                host = self.headers["Host"]
+                with farm.lock:
+                    farm.requests[host].append(time.monotonic())
+                    farm.paths.append((host, self.path))
+                    farm.active[host] += 1
+                    farm.max_active[host] = max(farm.max_active[host], farm.active[host])
+                time.sleep(farm.latency)
+                with farm.lock:
+                    farm.active[host] -= 1
+                if self.path == "/robots.txt":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                links = "".join(f'<a href="/page/{i}">p{i}</a>' for i in range(farm.pages))
+                links += "".join(f'<a href="{other}/">{other}</a>' for other in farm.urls)
+                body = f"<html><head><title>{host}{self.path}</title></head><body>{links}</body></html>".encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        for _ in range(hosts):
+            server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers.append(server)
+        self.urls = [f"http://127.0.0.1:{server.server_address[1]}" for server in self.servers]
+
+    @property
+    def total_pages(self):
+        return len(self.urls) * (self.pages + 1)
+
+    def close(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+
+def crawl_farm(farm, delay, workers, engine="thread", max_per_host=4, state_path=None, progress_callback=None,
+               respect_robots=False):
+    crawler = web_crawler.WebCrawler(max_depth=3, max_pages=10000, respect_robots=respect_robots,
+                                     request_delay=delay, max_workers=workers, engine=engine,
+                                     max_per_host=max_per_host, state_path=state_path)
+    start = time.monotonic()
+    results = crawler.crawl(farm.urls[0] + "/", stay_in_domain=False,
+                            progress_callback=progress_callback and (lambda info: progress_callback(crawler, info)))
+    return results, time.monotonic() - start
+
+
+@pytest.fixture
+def farm():
+    farm = SiteFarm()
+    yield farm
+    farm.close()
+
+
+ENGINES = ["thread"] + (["async"] if web_crawler.AIOHTTP_AVAILABLE else [])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_hosts_are_crawled_in_parallel_but_politely(farm, engine, monkeypatch):
+    # Send times are taken on the crawler side: arrival times at the server
+    # also carry connection setup and thread scheduling noise
+    sent = defaultdict(list)
+    mark_sent = web_crawler.HostScheduler.mark_sent
+
+    def record_send(scheduler, url):
+        sent[web_crawler.urlparse(url).netloc].append(time.monotonic())
+        mark_sent(scheduler, url)
+
+    monkeypatch.setattr(web_crawler.HostScheduler, "mark_sent", record_send)
+    delay = 0.2
+    results, elapsed = crawl_farm(farm, delay, workers=8, engine=engine)
+
+    assert results["scraped_pages"] == farm.total_pages
+    assert results["stats"]["errors"] == 0
+    assert sorted(len(times) for times in sent.values()) == sorted(len(times) for times in farm.requests.values())
+    for times in sent.values():
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        assert min(gaps) >= delay
+    # One delay per request and host, not one per request overall
+    assert elapsed < farm.total_pages * delay / 2
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_per_host_concurrency_is_bounded(engine):
+    farm = SiteFarm(hosts=2, pages=30, latency=0.05)
+    try:
+        results, _ = crawl_farm(farm, 0, workers=16, engine=engine, max_per_host=3)
+    finally:
+        farm.close()
+    assert results["scraped_pages"] == farm.total_pages
+    assert max(farm.max_active.values()) <= 3
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_disk_backed_crawl_resumes_after_cancel(tmp_path, engine):
+    farm = SiteFarm(hosts=3, pages=20, latency=0.005)
+    state_path = str(tmp_path / "crawl.db")
+
+    def stop_early(crawler, info):
+        if info["pages_crawled"] >= 15:
+            crawler.cancel()
+
+    try:
+        first, _ = crawl_farm(farm, 0, workers=4, engine=engine, state_path=state_path,
+                              progress_callback=stop_early)
+        assert 15 <= first["scraped_pages"] < farm.total_pages
+        second, _ = crawl_farm(farm, 0, workers=4, engine=engine, state_path=state_path)
+    finally:
+        farm.close()
+
+    assert second["scraped_pages"] == second["stats"]["pages_crawled"] == farm.total_pages
+    # Only requests in flight at the cancel are repeated
+    assert sum(len(times) for times in farm.requests.values()) <= farm.total_pages + 3 * 4
+    frontier = web_crawler.CrawlFrontier(state_path)
+    pages = dict(frontier.pages())
+    frontier.close_store()
+    assert len(pages) == farm.total_pages
+    assert all(page["status_code"] == 200 for page in pages.values())
+
+
+@pytest.mark.skipif(web_crawler.get_robots_cache is None, reason="robots_cache not importable")
+@pytest.mark.parametrize("engine", ENGINES)
+def test_robots_txt_fetched_once_per_host_across_crawls(engine):
+    farm = SiteFarm(hosts=3, pages=5, latency=0.005)
+    try:
+        for _ in range(2):
+            results, _ = crawl_farm(farm, 0, workers=4, engine=engine, respect_robots=True)
+            assert results["scraped_pages"] == farm.total_pages
+    finally:
+        farm.close()
+    robots_fetches = [host for host, path in farm.paths if path == "/robots.txt"]
+    assert sorted(robots_fetches) == sorted(url.split("//")[1] for url in farm.urls)
+
+
+def test_stay_in_domain_matches_links_against_the_normalized_start_url():
+    farm = SiteFarm(hosts=2, pages=4, latency=0)
+    try:
+        crawler = web_crawler.WebCrawler(max_depth=3, max_pages=100, respect_robots=False, request_delay=0)
+        # Same host as the server, spelled the way links will never be
+        start_url = farm.urls[0].replace("127.0.0.1", "LOCALHOST") + "/"
+        results = crawler.crawl(start_url, stay_in_domain=True)
+    finally:
+        farm.close()
+    assert results["scraped_pages"] == farm.pages + 1
+
+
+def test_frontier_tells_urls_with_the_same_hash_apart(tmp_path, monkeypatch):
+    monkeypatch.setattr(web_crawler, "url_hash", lambda url: 42)
+    state_path = str(tmp_path / "crawl.db")
+    frontier = web_crawler.CrawlFrontier(state_path, request_delay=0)
+    assert frontier.add("http://a/1", 0)
+    assert frontier.add_many(["http://a/2", "http://a/1", "http://b/1"], 1) == 2
+    assert not frontier.add("http://b/1", 1)
+    assert len(frontier) == 3
+
+    crawled = []
+    while (item := frontier.poll()[0]) is not None:
+        crawled.append(item[0])
+        frontier.task_done(item[0])
+    assert sorted(crawled) == ["http://a/1", "http://a/2", "http://b/1"]
+    assert frontier.visited_count() == 3
+    frontier.close_store()
+
+
+def test_page_limit_leaves_unfetched_urls_pending(tmp_path):
+    farm = SiteFarm(hosts=2, pages=6, latency=0)
+    state_path = str(tmp_path / "crawl.db")
+    try:
+        crawler = web_crawler.WebCrawler(max_depth=3, max_pages=4, respect_robots=False, request_delay=0,
+                                         max_workers=1, state_path=state_path)
+        first = crawler.crawl(farm.urls[0] + "/", stay_in_domain=False)
+        frontier = web_crawler.CrawlFrontier(state_path)
+        # The URL handed out when the limit was hit was not fetched, so it is not done
+        assert frontier.visited_count() == first["stats"]["pages_crawled"] == 4
+        frontier.close_store()
+        second, _ = crawl_farm(farm, 0, workers=2, state_path=state_path)
+    finally:
+        farm.close()
+    assert second["scraped_pages"] == farm.total_pages
+    assert sum(len(times) for times in farm.requests.values()) == farm.total_pages
+
+
+def test_requeued_url_is_handed_out_again():
+    scheduler = web_crawler.HostScheduler(request_delay=0)
+    scheduler.add("http://a/1", 2)
+    assert scheduler.poll()[0] == ("http://a/1", 2)
+    scheduler.requeue("http://a/1", 2)
+    assert len(scheduler) == 1 and scheduler.in_flight == 0
+    assert scheduler.poll()[0] == ("http://a/1", 2)
+
+
+def test_url_normalization():
+    assert web_crawler.normalize_url("HTTP://Example.COM:80#top") == "http://example.com/"
+    assert web_crawler.normalize_url("https://a.org:443/x?q=1#f") == "https://a.org/x?q=1"
+    assert web_crawler.normalize_url("https://a.org:8443/X") == "https://a.org:8443/X"
+
+
+def test_scheduler_hands_out_ready_hosts_first():
+    scheduler = web_crawler.HostScheduler(request_delay=10)
+    for url in ["http://a/1", "http://a/2", "http://b/1", "http://a/1"]:
+        scheduler.add(url, 0)
+    assert len(scheduler) == 3
+    assert scheduler.next_url() == ("http://a/1", 0)
+    scheduler.mark_sent("http://a/1")
+    # Host a is cooling down, host b is not
+    assert scheduler.next_url() == ("http://b/1", 0)
+    scheduler.task_done("http://a/1")
+    scheduler.task_done("http://b/1")
+    threading.Timer(0.1, scheduler.close).start()
+    assert scheduler.next_url() is None
+
+
+def test_scheduler_counts_the_delay_from_the_send(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(web_crawler.time, "monotonic", lambda: clock[0])
+    scheduler = web_crawler.HostScheduler(request_delay=1, max_per_host=4)
+    for url in ["http://a/1", "http://a/2", "http://a/3"]:
+        scheduler.add(url, 0)
+
+    assert scheduler.poll() == (("http://a/1", 0), None)
+    # Not sent yet: the host is held, however long the worker takes
+    clock[0] = 105.0
+    assert scheduler.poll() == (None, None)
+    scheduler.mark_sent("http://a/1")
+    assert scheduler.poll() == (None, 1.0)
+    clock[0] = 106.0
+    assert scheduler.poll() == (("http://a/2", 0), None)
+    # Finished without a request (e.g. disallowed by robots.txt): no delay owed
+    scheduler.task_done("http://a/2")
+    assert scheduler.poll() == (("http://a/3", 0), None)
+
+
+def run_benchmark(hosts, pages, delay, workers, engines, state_path=None):
+    for engine in engines:
+        farm = SiteFarm(hosts=hosts, pages=pages)
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+        try:
+            results, elapsed = crawl_farm(farm, delay, workers, engine=engine, state_path=state_path)
+        finally:
+            farm.close()
+        print(f"[{engine}] {results['scraped_pages']} pages on {hosts} hosts, {delay}s per-host delay")
+        print(f"  crawl time:            {elapsed:.2f}s ({results['scraped_pages'] * 60 / elapsed:.0f} pages/min)")
+        if delay:
+            print(f"  one delay per request: {farm.total_pages * delay:.2f}s (lower bound with a crawler-wide delay)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark WebCrawler against local multi-host servers")
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=10, help="Pages per host besides the index")
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=8, help="Worker threads for the thread engine")
+    parser.add_argument("--engine", choices=web_crawler.CRAWL_ENGINES, action="append",
+                        help="Engine to run (repeatable, default: all available)")
+    parser.add_argument("--state", help="Keep the crawl state in this SQLite file (overwritten)")
+    args = parser.parse_args()
+    run_benchmark(args.hosts, args.pages, args.delay, args.workers, args.engine or ENGINES, args.state)
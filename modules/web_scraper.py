@@ -84,6 +84,24 @@ except ImportError as e:
         logger.error("PDF extractor not available but detect_document_type was called")
         return "unknown"
 
+# Content hashes of downloaded PDFs, so identical files reuse processing results
+try:
+    from pdf_result_store import register_pdf_file
+except ImportError:
+    def register_pdf_file(file_path):
+        return None
+
+# Conditional requests against stored pages and PDFs, so unchanged content is not downloaded again
+try:
+    from http_cache import CachingHTTPAdapter, get_http_cache, http_cache_task, http_cache_task_stats
+except ImportError:
+    CachingHTTPAdapter = None
+    get_http_cache = None
+    from contextlib import nullcontext as http_cache_task
+
+    def http_cache_task_stats(task_id):
+        return {}
+
 # -----------------------------------------------------------------------------
 # Configuration
 # -----------------------------------------------------------------------------
@@ -369,7 +387,10 @@ def create_session() -> requests.Session:
         allowed_methods=["HEAD", "GET", "OPTIONS"]
     )
     
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    if CachingHTTPAdapter is not None and get_http_cache() is not None:
+        adapter = CachingHTTPAdapter(max_retries=retry_strategy)
+    else:
+        adapter = HTTPAdapter(max_retries=retry_strategy)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     session.headers.update(HEADERS)
@@ -727,6 +748,7 @@ def download_pdf(url: str, save_path: str = DEFAULT_OUTPUT_FOLDER, emit_progress
                 "file_path": file_path
             })
         
+        register_pdf_file(file_path)
         return file_path
     
     # Initial progress event
@@ -751,19 +773,20 @@ def download_pdf(url: str, save_path: str = DEFAULT_OUTPUT_FOLDER, emit_progress
                 "Accept": "application/pdf,*/*",
                 "Connection": "keep-alive",
                 "Accept-Encoding": "identity",  # Prevent any compression that might cause issues
-                "Cache-Control": "no-cache, no-store"  # Prevent caching
+                "Cache-Control": "no-cache"  # Always revalidate; unchanged PDFs come from the HTTP cache
             }
             logger.info(f"DOWNLOAD_DEBUG: Request headers: {download_headers}")
             
             logger.info(f"DOWNLOAD_DEBUG: Sending GET request with timeout {timeout}s")
-            response = session.get(
-                pdf_url, 
-                stream=True, 
-                timeout=timeout, 
-                headers=download_headers,
-                allow_redirects=True,
-                verify=True
-            )
+            with http_cache_task(task_id):
+                response = session.get(
+                    pdf_url, 
+                    stream=True, 
+                    timeout=timeout, 
+                    headers=download_headers,
+                    allow_redirects=True,
+                    verify=True
+                )
             
             # Check response status
             logger.info(f"DOWNLOAD_DEBUG: Response status code: {response.status_code}")
@@ -852,6 +875,7 @@ def download_pdf(url: str, save_path: str = DEFAULT_OUTPUT_FOLDER, emit_progress
                             "file_path": file_path
                         })
                     
+                    register_pdf_file(file_path)
                     return file_path
                 except Exception as e:
                     logger.warning(f"DOWNLOAD_DEBUG: Alternative download method failed: {e}")
@@ -894,6 +918,7 @@ def download_pdf(url: str, save_path: str = DEFAULT_OUTPUT_FOLDER, emit_progress
                             "file_path": file_path
                         })
                     
+                    register_pdf_file(file_path)
                     return file_path
                 except Exception as e:
                     logger.warning(f"DOWNLOAD_DEBUG: Low-level file writing failed: {e}")
@@ -1022,6 +1047,7 @@ def download_pdf(url: str, save_path: str = DEFAULT_OUTPUT_FOLDER, emit_progress
                     "file_path": file_path
                 })
             
+            register_pdf_file(file_path)
             return file_path
             
         except requests.exceptions.Timeout as e:
@@ -2097,7 +2123,8 @@ def scrape_and_download_pdfs(url: str, output_folder: str = DEFAULT_OUTPUT_FOLDE
         })
         
         # Get PDF links from the page
-        pdf_links = fetch_pdf_links(url)
+        with http_cache_task(task_id):
+            pdf_links = fetch_pdf_links(url)
         
         if not pdf_links:
             logger.info(f"No PDF links found on {url}")
@@ -2251,7 +2278,8 @@ def scrape_and_download_pdfs(url: str, output_folder: str = DEFAULT_OUTPUT_FOLDE
             "pdfs_failed": len(failed_pdfs),
             "downloaded_pdfs": downloaded_pdfs,
             "failed_pdfs": failed_pdfs,
-            "output_folder": output_folder
+            "output_folder": output_folder,
+            "http_cache": http_cache_task_stats(task_id) if task_id else {}
         }
     
     except Exception as e:
@@ -2366,7 +2394,7 @@ class BatchWebScraper:
                     keyword = config.get("keyword", "")
                     
                     future = executor.submit(
-                        self._process_url_with_tracking,
+                        self._process_url_in_task,
                         url,
                         setting,
                         keyword,
@@ -2452,7 +2480,11 @@ class BatchWebScraper:
             # Final statistics
             self.stats["end_time"] = time.time()
             self.stats["duration_seconds"] = self.stats["end_time"] - self.stats["start_time"]
+            self.stats["http_cache"] = http_cache_task_stats(self.task_id)
             self.stats["status"] = "completed"
+            if self.stats["http_cache"].get("revalidated"):
+                logger.info(f"Task {self.task_id}: {self.stats['http_cache']['revalidated']} unchanged responses "
+                            f"served from the HTTP cache, {self.stats['http_cache']['bytes_saved']} bytes saved")
             
             # Final progress update
             self.emit_progress(
@@ -2469,6 +2501,11 @@ class BatchWebScraper:
             self.stats["error"] = str(e)
             self.emit_progress(100, f"Error: {str(e)}")
     
+    def _process_url_in_task(self, url, setting, keyword, output_folder):
+        """Process a single URL with its HTTP traffic counted towards this task."""
+        with http_cache_task(self.task_id):
+            return self._process_url_with_tracking(url, setting, keyword, output_folder)
+    
     def _process_url_with_tracking(self, url, setting, keyword, output_folder):
         """Process a single URL with enhanced tracking and error handling."""
         try: